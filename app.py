@@ -25,6 +25,7 @@ from flask_mail import Message
 import io, csv, html as py_html
 import time as pytime
 import uuid
+import types
 from services.ai_tasks import preview_nl, run_task, build_cron_expr, _send_task_email
 from services.ai_tasks import run_task
 from auth_handler import login_required, module_required
@@ -75,6 +76,11 @@ mail = Mail(app)
 # Projektové moduly (importy po vytvorení app)
 # ──────────────────────────────────────────────────────────────
 import db_connector
+import schema_cache
+import result_cache
+import json_stream
+import demand_forecast
+import production_planner
 import auth_handler
 import production_handler as vyroba
 import expedition_handler
@@ -84,11 +90,14 @@ import b2c_handler
 import costs_handler
 import pdf_generator
 import mail_handler
+import mail_queue
+import b2c_campaigns
 import fleet_handler
 import hygiene_handler
 import profitability_handler
 import temperature_handler
 import meat_calc_handler
+import date_ranges
 from orders_handler import orders_bp, init_orders
 from stock_handler import stock_bp, init_stock
 from flask import Flask, render_template, request, jsonify, send_from_directory
@@ -114,6 +123,24 @@ try:
 except Exception as e:
     print("VAROVANIE: Nepodarilo sa spustiť temperature_handler.start_generator():", e)
 
+# Fronta odchádzajúcich e-mailov – doručí aj správy, ktoré ostali z predchádzajúceho behu
+try:
+    mail_queue.start_workers()
+except Exception as e:
+    print("VAROVANIE: Nepodarilo sa spustiť mail_queue.start_workers():", e)
+
+# Bežec B2C kampaní – dokončí úlohy prerušené pádom/reštartom
+try:
+    b2c_campaigns.start_runner()
+except Exception as e:
+    print("VAROVANIE: Nepodarilo sa spustiť b2c_campaigns.start_runner():", e)
+
+# Indexy pre dátumové filtre reportov (date_ranges) – chýbajúce sa založia raz
+try:
+    date_ranges.ensure_indexes()
+except Exception as e:
+    print("VAROVANIE: date_ranges.ensure_indexes() zlyhalo:", e)
+
 # =================================================================
 # === DEKORÁTORY A POMOCNÉ FUNKCIE ===
 # =================================================================
@@ -136,6 +163,9 @@ def handle_request(handler_func, *args, **kwargs):
             return jsonify(result), 400
         if isinstance(result, make_response('').__class__):
             return result
+        if isinstance(result, types.GeneratorType):
+            # veľké výsledky (db_connector.iter_query) – streamované JSON pole
+            return json_stream.json_array_response(result)
         return jsonify(result)
     except Exception:
         print(f"!!! SERVER ERROR in handler '{getattr(handler_func,'__name__',str(handler_func))}' !!!")
@@ -382,6 +412,12 @@ def register_vyroba_routes(app, login_required, handle_request):
             body.get('plannedWeight'),
         )
 
+    @app.route('/api/calculateRequiredIngredientsBatch', methods=['POST'])
+    @login_required(role=['vyroba', 'kancelaria'])
+    def api_calc_ing_batch():
+        body = request.get_json(force=True) or {}
+        return handle_request(vyroba.calculate_required_ingredients_batch, body.get('plans') or [])
+
     @app.route('/api/startProduction', methods=['POST'])
     @login_required(role='vyroba')
     def api_start_production():
@@ -530,6 +566,12 @@ def exp_finalize_slicing():
     body = request.get_json(force=True) or {}
     return handle_request(expedition_handler.finalize_slicing_transaction, body.get('logId'), body.get('actualPieces'))
 
+@app.route('/api/expedicia/finalizeSlicingBatch', methods=['POST'])
+@login_required(role='expedicia')
+def exp_finalize_slicing_batch():
+    body = request.get_json(force=True) or {}
+    return handle_request(expedition_handler.finalize_slicing_batch, body.get('items') or [])
+
 # Manuálny príjem / škoda
 @app.route('/api/expedicia/getAllFinalProducts')
 @login_required(role='expedicia')
@@ -812,13 +854,7 @@ def base_data_alias():
     """, default=[], label='recipe_categories')
     recipe_categories = [c['cat'] for c in (cats_rows or [])]
 
-    has_kategoria = bool(safe_query("""
-        SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
-        WHERE TABLE_SCHEMA = DATABASE()
-          AND TABLE_NAME   = 'sklad'
-          AND COLUMN_NAME  = 'kategoria'
-        LIMIT 1
-    """, fetch='one', default=None, label='has_kategoria'))
+    has_kategoria = schema_cache.has_col('sklad', 'kategoria')
 
     if has_kategoria:
         item_types_rows = safe_query("""
@@ -839,238 +875,52 @@ def base_data_alias():
 
 app.register_blueprint(kancelaria_api)
 
+# Cache schémy DB (schema_cache) – ručné zneplatnenie po zmene schémy mimo aplikácie
+@app.route('/api/kancelaria/schema/refresh', methods=['POST'])
+@login_required(role='kancelaria')
+def kanc_schema_refresh():
+    return handle_request(schema_cache.refresh)
+
+@app.get('/api/kancelaria/schema/stats')
+@login_required(role='kancelaria')
+def kanc_schema_stats():
+    return handle_request(schema_cache.stats)
+
+# Metriky DB poolu (checkouts, čakanie, overflow, in_use)
+@app.get('/api/kancelaria/db/pool')
+@login_required(role='kancelaria')
+def kanc_db_pool_stats():
+    return handle_request(db_connector.pool_stats)
+
+# Cache výsledkov dashboardov/reportov (hit/miss, invalidácie, backend)
+@app.get('/api/kancelaria/cache/stats')
+@login_required(role='kancelaria')
+def kanc_result_cache_stats():
+    return handle_request(result_cache.stats)
+
+@app.route('/api/kancelaria/cache/clear', methods=['POST'])
+@login_required(role='kancelaria')
+def kanc_result_cache_clear():
+    return handle_request(result_cache.clear)
+
 
 # Forecast / promo / goods suggestion
 # ----- 7-dňový prehľad (B2B + B2C) – jediná platná route -----
 # ----- 7-dňový prehľad (B2B + B2C) – jediná platná route -----
 from flask import jsonify
-from datetime import date, timedelta
+from datetime import timedelta
 
 @app.route('/api/kancelaria/get_7_day_forecast', methods=['GET'], endpoint='kanc_7d_forecast')
 @login_required(role=('kancelaria','veduci','admin'))
 def kanc_7d_forecast():
-    import db_connector
-
-    # --- pomocné ---
-    def dates7():
-        base = date.today()
-        return [(base + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)]
-    DATES = dates7()
-
-    def tbl_exists(t):
-        r = db_connector.execute_query(
-            "SELECT COUNT(*) AS c FROM information_schema.TABLES WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s",
-            (t,), fetch="one"
-        )
-        return bool(r and int(list(r.values())[0]) > 0)
-
-    def cols(t):
-        rows = db_connector.execute_query(
-            "SELECT COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s",
-            (t,), fetch="all"
-        ) or []
-        return {x["COLUMN_NAME"] for x in rows}
-
-    def pick(colset, *cands):
-        for c in cands:
-            if c and c in colset:
-                return c
-        return None
-
-    def stock_disp(kg):
-        try:
-            v = float(kg or 0.0)
-            return f"{int(v)} kg" if v.is_integer() else f"{v:.2f} kg"
-        except Exception:
-            return "—"
-
-    # --- meta o produktoch (kategória, sklad, vyrobiteľnosť, hmotnosť balenia) ---
-    PRODUCT_META = {}
-    if tbl_exists("produkty"):
-        cs = cols("produkty")
-        name = pick(cs, "nazov_vyrobku", "nazov", "produkt", "name")
-        cat  = pick(cs, "kategoria_pre_recepty", "predajna_kategoria", "kategoria", "category")
-        stk  = pick(cs, "aktualny_sklad_finalny_kg", "stav_kg", "sklad_kg", "sklad", "aktualny_sklad")
-        typ  = pick(cs, "typ_polozky", "typ_produktu", "typ", "product_type")
-        pck  = pick(cs, "vaha_balenia_g", "vaha_g", "hmotnost_g", "balenie_g")
-        rows = db_connector.execute_query(
-            f"SELECT {name} AS n, COALESCE({cat},'Nezaradené') AS c, "
-            f"COALESCE({stk},0) AS s, COALESCE({typ},'') AS t, COALESCE({pck},0) AS g "
-            f"FROM produkty", fetch="all"
-        ) or []
-        for r in rows:
-            n = (r.get("n") or "").strip()
-            if not n: continue
-            t = (r.get("t") or "").upper()
-            PRODUCT_META[n] = {
-                "cat": (r.get("c") or "Nezaradené") or "Nezaradené",
-                "stock": float(r.get("s") or 0),
-                "is_manu": bool(t.startswith("VÝROBOK") or t.startswith("VYROBOK") or t in ("PRODUKT","PRODUCT")),
-                "pack_g": float(r.get("g") or 0),
-            }
-
-    # ===================== B2B (tvoja pôvodná funkcia) =====================
-    b2b_fc = {}
-    try:
-        base = office_handler.get_7_day_order_forecast()  # existujúca B2B implementácia
-        if isinstance(base, dict):
-            b2b_fc = base.get("forecast") or {}
-    except Exception:
-        b2b_fc = {}
-
-    # ===================== B2C (SQL na tvrdo) =============================
-    COLL = "utf8mb4_0900_ai_ci"
-    b2c_fc = {}
-    b2c_dbg = {"orders_tbl": None, "items_tbl": None, "date_used": None, "rows": 0}
-
-    # nájdi tabuľky – najskôr štandardy, potom alternatívy
-    orders_tbl = None
-    for t in ("b2c_objednavky", "eshop_objednavky", "b2c_orders"):
-        if tbl_exists(t): orders_tbl = t; break
-
-    items_tbl = None
-    for t in ("b2c_objednavky_polozky", "eshop_objednavky_polozky", "b2c_orders_items"):
-        if tbl_exists(t): items_tbl = t; break
-
-    if orders_tbl and items_tbl:
-        oc = cols(orders_tbl); ic = cols(items_tbl)
-        fk   = pick(ic, "objednavka_id", "order_id")
-        name = pick(ic, "nazov_vyrobku", "nazov", "produkt_nazov", "vyrobok_nazov", "product_name", "name")
-        qty  = pick(ic, "mnozstvo_kg", "mnozstvo", "qty_kg", "qty", "quantity")
-        unit = pick(ic, "mj", "jednotka", "unit")
-        pack = pick(ic, "vaha_balenia_g", "balenie_g", "hmotnost_g", "pack_g")
-        ean  = pick(ic, "ean_produktu", "ean", "ean_kod")
-
-        # COALESCE nad bežnými dátovými stĺpcami, najprv v orders, potom v items
-        D_O = ["datum_vyzdvihnutia","datum_dodania","delivery_date","pickup_date","slot_date",
-               "termin_vyzdvihnutia","termin_dodania","termin","datum","date","created_at","created","created_on"]
-        D_I = D_O[:]  # rovnaké kandidáty aj v položkách
-        present_o = [f"o.{c}" for c in D_O if c in oc]
-        present_i = [f"pol.{c}" for c in D_I if c in ic]
-        if present_o or present_i:
-            date_expr = f"DATE(COALESCE({', '.join(present_o + present_i)}))"
-        else:
-            date_expr = "DATE(o.created_at)"  # posledný fallback
-        b2c_dbg.update({"orders_tbl": orders_tbl, "items_tbl": items_tbl, "date_used": date_expr})
-
-        status = pick(oc, "stav", "status")
-        where = [f"{date_expr} BETWEEN %s AND %s"]
-        params = (DATES[0], DATES[-1])
-        if status:
-            where.append(
-                f"COALESCE(CONVERT(o.{status} USING utf8mb4) COLLATE {COLL}, '') NOT IN "
-                "('Zrušená','Zrusena','Zrušena','Zrušené','Cancelled')"
-            )
-
-        pack_expr = f"pol.{pack}" if pack else "p.vaha_balenia_g"
-        join_prod = f"""
-            LEFT JOIN produkty p ON (
-                {"(p.ean IS NOT NULL AND pol."+ean+" IS NOT NULL AND CONVERT(p.ean USING utf8mb4) COLLATE "+COLL+" = CONVERT(pol."+ean+" USING utf8mb4) COLLATE "+COLL+") OR" if ean else ""}
-                (CONVERT(p.nazov_vyrobku USING utf8mb4) COLLATE {COLL} = CONVERT(pol.{name} USING utf8mb4) COLLATE {COLL})
-            )
-        """
-
-        sql = f"""
-            SELECT
-              COALESCE(CONVERT(pol.{name} USING utf8mb4) COLLATE {COLL}, '') AS n,
-              {date_expr} AS d,
-              SUM(
-                CASE
-                  WHEN LOWER(COALESCE(pol.{unit},'')) = 'kg' THEN COALESCE(pol.{qty},0)
-                  WHEN LOWER(COALESCE(pol.{unit},'')) = 'g'  THEN COALESCE(pol.{qty},0) / 1000
-                  WHEN LOWER(COALESCE(pol.{unit},'')) IN ('ks','pc','pcs')
-                       THEN COALESCE(pol.{qty},0) * COALESCE({pack_expr}, 0) / 1000
-                  ELSE COALESCE(pol.{qty},0)
-                END
-              ) AS q
-            FROM {orders_tbl} o
-            JOIN {items_tbl} pol ON pol.{fk} = o.id
-            {join_prod}
-            WHERE {" AND ".join(where)}
-            GROUP BY n, d
-            ORDER BY n, d
-        """
-        rows = db_connector.execute_query(sql, params, fetch="all") or []
-        b2c_dbg["rows"] = len(rows)
-
-        # poskladaj forecast mapu
-        idx = {}
-        for r in rows:
-            n = (r.get("n") or "").strip()
-            d = (r.get("d") or "")
-            if not n or d not in DATES: continue
-            q = float(r.get("q") or 0.0)
-
-            meta = PRODUCT_META.get(n, {"cat":"Nezaradené","stock":0.0,"is_manu":True})
-            cat = meta["cat"] or "Nezaradené"
-            key = (cat, n)
-
-            if key not in idx:
-                item = {
-                    "name": n,
-                    "mj": "kg",
-                    "stock_display": stock_disp(meta["stock"]),
-                    "isManufacturable": bool(meta["is_manu"]),
-                    "daily_needs": {dt: 0 for dt in DATES},
-                }
-                b2c_fc.setdefault(cat, []).append(item)
-                idx[key] = item
-            idx[key]["daily_needs"][d] = idx[key]["daily_needs"].get(d, 0) + q
-
-        # zoradenie
-        for cat, arr in b2c_fc.items():
-            def _total(it): return sum(float(it["daily_needs"].get(dt,0) or 0) for dt in DATES)
-            arr.sort(key=lambda it: (-_total(it), it["name"]))
-
-    # ===================== merge B2B + B2C ==========================
-    def merge_two(fa, fb):
-        out = {}
-        for src in (fa or {}), (fb or {}):
-            for cat, items in (src or {}).items():
-                out.setdefault(cat, [])
-                idx = {(p["name"], p.get("mj","kg")): i for i,p in enumerate(out[cat])}
-                for p in items or []:
-                    k = (p["name"], p.get("mj","kg"))
-                    if k in idx:
-                        tgt = out[cat][idx[k]]
-                    else:
-                        tgt = {
-                            "name": p["name"],
-                            "mj": p.get("mj","kg"),
-                            "stock_display": p.get("stock_display","—"),
-                            "isManufacturable": bool(p.get("isManufacturable",True)),
-                            "daily_needs": {dt: 0 for dt in p.get("daily_needs",{}).keys() or DATES}
-                        }
-                        if not tgt["daily_needs"]:
-                            for dt in DATES: tgt["daily_needs"][dt] = 0
-                        out[cat].append(tgt); idx[k] = len(out[cat]) - 1
-                    for dt, val in (p.get("daily_needs") or {}).items():
-                        tgt["daily_needs"][dt] = float(tgt["daily_needs"].get(dt,0)) + float(val or 0)
-                    if len(p.get("stock_display","")) > len(tgt.get("stock_display","")):
-                        tgt["stock_display"] = p.get("stock_display","—")
-                    tgt["isManufacturable"] = bool(tgt.get("isManufacturable",True) or p.get("isManufacturable",True))
-        # sort
-        for cat, arr in out.items():
-            def _total(it): return sum(float(v or 0) for v in it["daily_needs"].values())
-            arr.sort(key=lambda it: (-_total(it), it["name"]))
-        return out
+    # materializovaný dopyt (demand_daily); ?days=14 / 30 pre dlhší horizont
+    days = request.args.get('days', type=int) or demand_forecast.HORIZON_DEFAULT
+    return handle_request(demand_forecast.get_forecast, days)
 
-    merged = merge_two(b2b_fc, b2c_fc)
-
-    data = {
-        "dates": DATES,
-        "forecast": merged,         # B2B + B2C spolu
-        "b2c_forecast": b2c_fc,     # čisté B2C (pre kontrolu)
-        "forecast_b2c": b2c_fc,     # alias
-        "b2c": b2c_fc,              # alias
-        "debug": {
-            "b2c": b2c_dbg,
-            "b2b_present": bool(b2b_fc),
-            "categories": len(merged.keys()),
-            "items": sum(len(v or []) for v in merged.values())
-        }
-    }
-    return jsonify(data), 200
+@app.route('/api/kancelaria/forecast/rebuild', methods=['POST'])
+@login_required(role='kancelaria')
+def kanc_forecast_rebuild():
+    return handle_request(demand_forecast.rebuild)
 
 
 @app.route('/api/kancelaria/get_goods_purchase_suggestion')
@@ -1156,10 +1006,24 @@ def create_tasks():
 def get_suggestions():
     return handle_request(office_handler.get_purchase_suggestions)
 
+@app.route('/api/kancelaria/planner/optimize', methods=['POST'])
+@login_required(role='kancelaria')
+def planner_optimize():
+    body = request.get_json(force=True) or {}
+    return handle_request(
+        production_planner.optimize,
+        body.get('days') or demand_forecast.HORIZON_DEFAULT,
+        body.get('category'),
+        bool(body.get('protectMinStock')),
+    )
+
 @app.route('/api/kancelaria/getProductionStats', methods=['POST'])
 @login_required(role='kancelaria')
 def get_stats():
-    return handle_request(office_handler.get_production_stats, request.json.get('period'), request.json.get('category'))
+    body = request.get_json(force=True) or {}
+    return handle_request(office_handler.get_production_stats, body.get('period'), body.get('category'),
+                          body.get('page'), body.get('pageSize'), bool(body.get('summary')),
+                          body.get('damagePage'), body.get('damagePageSize'))
 
 # stock (produkty)
 @app.route('/api/kancelaria/stock/receiveProduction', methods=['POST'])
@@ -1405,18 +1269,10 @@ import db_connector
 
 # Pomocník: zistí, či tabuľka obsahuje stĺpec (bez pádu na iných DB)
 def _table_has_col(table: str, col: str) -> bool:
-    try:
-        rows = db_connector.execute_query(f"SHOW COLUMNS FROM `{table}` LIKE %s", (col,))
-        return bool(rows)
-    except Exception:
-        return False
+    return schema_cache.has_col(table, col)
 
 def _table_exists(table: str) -> bool:
-    try:
-        rows = db_connector.execute_query("SHOW TABLES LIKE %s", (table,))
-        return bool(rows)
-    except Exception:
-        return False
+    return schema_cache.table_exists(table)
 # ---------------------------
 #  B2B – ZÁKAZNÍK → CENNÍKY
 # ---------------------------
@@ -1557,43 +1413,9 @@ def _fetch_b2b_customers():
 
 # ============================================================================
 # 1) B2C – ZRUŠIŤ OBJEDNÁVKU
-#    POST /api/kancelaria/b2c/cancel_order
-#    body: { order_id: int, reason: str }
+#    POST /api/kancelaria/b2c/cancel_order obsluhuje kancelaria_b2c_api.cancel_b2c_order
+#    (blueprint je zaregistrovaný skôr, duplicitná route tu by sa nikdy nevolala)
 # ============================================================================
-@app.post('/api/kancelaria/b2c/cancel_order')
-@login_required(role=('kancelaria','veduci','admin'))
-def b2c_cancel_order():
-    data = request.get_json(silent=True) or {}
-    order_id = data.get('order_id')
-    reason   = (data.get('reason') or '').strip()
-    if not order_id:
-        return jsonify({'error': 'Chýba order_id.'}), 400
-
-    # ak je v DB stĺpec so zrušením/dôvodom, ulož aj ten – inak iba stav
-    try:
-        if _table_has_col('b2c_objednavky', 'dovod_zrusenia'):
-            db_connector.execute_query(
-                "UPDATE b2c_objednavky SET stav='Zrušená', dovod_zrusenia=%s WHERE id=%s",
-                (reason or None, order_id), fetch='none'
-            )
-        elif _table_has_col('b2c_objednavky', 'zrusenie_dovod'):
-            db_connector.execute_query(
-                "UPDATE b2c_objednavky SET stav='Zrušená', zrusenie_dovod=%s WHERE id=%s",
-                (reason or None, order_id), fetch='none'
-            )
-        else:
-            db_connector.execute_query(
-                "UPDATE b2c_objednavky SET stav='Zrušená' WHERE id=%s",
-                (order_id,), fetch='none'
-            )
-    except Exception as e:
-        return jsonify({'error': f'Nepodarilo sa zmeniť stav: {e}'}), 500
-
-    # voliteľne: ak máš notifikačné handler-y na zrušenie, môžeš ich ticho skúsiť
-    # try: db_connector.execute_query(... alebo volanie mail/sms handlera ...)
-    # except: pass
-
-    return jsonify({'message': 'Objednávka zrušená.', 'order_id': order_id})
 
 # ============================================================================
 # 2) B2B – UPRAVIŤ OBJEDNÁVKU
@@ -1647,6 +1469,7 @@ def b2b_update_order():
     except Exception as e:
         return jsonify({'error': f'Chyba pri ukladaní položiek: {e}'}), 500
 
+    demand_forecast.refresh_order(demand_forecast.CHANNEL_B2B, order_id)
     return jsonify({'message': 'Objednávka upravená.', 'order_id': order_id})
 
 # ============================================================================
@@ -1852,6 +1675,15 @@ def api_temps_readings():
     to_now    = (request.args.get('to') == 'now')
     return temperature_handler.get_readings_for_date(device_id, date_str, to_now)
 
+@app.get('/api/kancelaria/temps/series')
+@login_required(role='kancelaria')
+def api_temps_series():
+    date_from  = request.args.get('from') or datetime.now().strftime("%Y-%m-%d")
+    date_to    = request.args.get('to') or date_from
+    device_id  = request.args.get('device_id', type=int)
+    resolution = request.args.get('resolution') or 'auto'
+    return temperature_handler.get_series(device_id, date_from, date_to, resolution)
+
 @app.get('/report/temps')
 @login_required(role='kancelaria')
 def temps_report():
@@ -2046,6 +1878,17 @@ def api_fleet_get_analysis():
         )
     )
 
+@app.route('/api/kancelaria/fleet/matrix')
+@login_required(role='kancelaria')
+def api_fleet_matrix():
+    return handle_request(
+        lambda: fleet_handler.get_fleet_matrix(
+            request.args.get('vehicle_ids'),
+            request.args.get('from'),
+            request.args.get('to')
+        )
+    )
+
 @app.route('/report/fleet')
 @login_required(role='kancelaria')
 def fleet_report():
@@ -2114,6 +1957,18 @@ def meat_estimate_api():
         extra_costs=data.get('extras') or []
     )
 
+@app.post('/api/kancelaria/meat/estimate/batch', endpoint='meat_estimate_batch_api')
+@login_required(role='kancelaria')
+def meat_estimate_batch_api():
+    data = request.json or {}
+    return meat_calc_handler.estimate_many(
+        material_id=int(data.get('material_id')),
+        scenarios=data.get('scenarios') or [],
+        supplier=data.get('supplier') or None,
+        date_from=data.get('date_from'),
+        date_to=data.get('date_to')
+    )
+
 @app.get('/api/kancelaria/meat/profitability', endpoint='meat_profitability_api')
 @login_required(role='kancelaria')
 def meat_profitability_api():
@@ -2291,6 +2146,11 @@ def profitability_save_department_data():
 def profitability_save_production_data():
     return handle_request(profitability_handler.save_production_profit_data, request.json)
 
+@app.route('/api/kancelaria/profitability/reopenMonth', methods=['POST'])
+@login_required(role='kancelaria')
+def profitability_reopen_month():
+    return handle_request(profitability_handler.reopen_profitability_month, request.json)
+
 # =================================================================
 # === COSTS (Kancelária) ===
 # =================================================================
@@ -2392,6 +2252,16 @@ def report_inventory():
 # =================================================================
 # === MAIL API ===
 # =================================================================
+@app.get('/api/mail/queue')
+@login_required(role='kancelaria')
+def mail_queue_stats():
+    return handle_request(mail_queue.stats)
+
+@app.get('/api/mail/queue/<int:msg_id>')
+@login_required(role='kancelaria')
+def mail_queue_message(msg_id):
+    return handle_request(mail_queue.message_status, msg_id)
+
 @app.route('/api/mail/messages')
 @login_required(role='kancelaria')
 def mail_list():
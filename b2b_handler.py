@@ -7,6 +7,8 @@ from typing import Any, Dict, List, Tuple
 from flask import request
 
 import db_connector
+import schema_cache
+import demand_forecast
 import pdf_generator
 import notification_handler
 
@@ -96,20 +98,7 @@ def _ensure_comm_table() -> None:
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_slovak_ci
     """)
 def _existing_columns(table_name: str) -> set[str]:
-    try:
-        rows = db_connector.execute_query(
-            """
-            SELECT COLUMN_NAME
-            FROM information_schema.COLUMNS
-            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
-            """,
-            (table_name,),
-            fetch="all",
-        ) or []
-        return {r.get("COLUMN_NAME") for r in rows}
-    except Exception:
-        traceback.print_exc()
-        return set()
+    return set(schema_cache.columns(table_name))
 
 # ───────────────── Anti-bot (voliteľné) ─────────────────
 SECRET = (os.getenv("SECRET_KEY") or "dev-secret").encode()
@@ -150,23 +139,11 @@ def _get_password_column_names() -> Tuple[str, str]:
     Zistí, či tabuľka b2b_zakaznici používa nové ('password_*') alebo staré ('heslo_*') stĺpce.
     Vráti dvojicu (hash_col, salt_col).
     """
-    try:
-        rows = db_connector.execute_query(
-            """
-            SELECT COLUMN_NAME FROM information_schema.COLUMNS
-            WHERE TABLE_SCHEMA = DATABASE()
-              AND TABLE_NAME='b2b_zakaznici'
-              AND COLUMN_NAME IN ('password_hash_hex','password_salt_hex','heslo_hash','heslo_salt')
-            """,
-            fetch="all",
-        ) or []
-        cols = {r.get("COLUMN_NAME") for r in rows}
-        if "password_hash_hex" in cols and "password_salt_hex" in cols:
-            return ("password_hash_hex", "password_salt_hex")
-        if "heslo_hash" in cols and "heslo_salt" in cols:
-            return ("heslo_hash", "heslo_salt")
-    except Exception:
-        traceback.print_exc()
+    cols = set(schema_cache.columns("b2b_zakaznici"))
+    if "password_hash_hex" in cols and "password_salt_hex" in cols:
+        return ("password_hash_hex", "password_salt_hex")
+    if "heslo_hash" in cols and "heslo_salt" in cols:
+        return ("heslo_hash", "heslo_salt")
     # default – preferuj nové názvy
     return ("password_hash_hex", "password_salt_hex")
 
@@ -751,26 +728,24 @@ def update_pricelist(data: dict):
             for r in rows2:
                 name_map[str(r["ean"])] = r["nazov_vyrobku"]
 
-    conn = db_connector.get_connection()
-    cur = conn.cursor()
+    batch = [(pl_id, e, name_map.get(e) or f"EAN {e}", price) for (e, price) in pairs]
+
+    def work(conn):
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM b2b_cennik_polozky WHERE cennik_id=%s", (pl_id,))
+        finally:
+            cur.close()
+        return db_connector.execute_many(
+            "INSERT INTO b2b_cennik_polozky (cennik_id, ean_produktu, nazov_vyrobku, cena) VALUES (%s,%s,%s,%s)",
+            batch, conn=conn,
+        )
+
     try:
-        cur.execute("DELETE FROM b2b_cennik_polozky WHERE cennik_id=%s", (pl_id,))
-        if pairs:
-            batch = [(pl_id, e, name_map.get(e) or f"EAN {e}", price) for (e, price) in pairs]
-            cur.executemany(
-                "INSERT INTO b2b_cennik_polozky (cennik_id, ean_produktu, nazov_vyrobku, cena) VALUES (%s,%s,%s,%s)",
-                batch,
-            )
-        conn.commit()
+        db_connector.with_transaction(work)
         return {"message": "Cenník aktualizovaný.", "count": len(pairs)}
     except Exception:
-        conn.rollback()
         traceback.print_exc()
-    finally:
-        try:
-            cur.close(); conn.close()
-        except Exception:
-            pass
 
 def get_announcement():
     _ensure_system_settings()
@@ -934,6 +909,7 @@ def submit_b2b_order(data: dict):
             lines
         )
         conn.commit()
+        demand_forecast.refresh_order(demand_forecast.CHANNEL_B2B, oid)
     finally:
         try:
             cur.close(); conn.close()
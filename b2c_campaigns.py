@@ -0,0 +1,320 @@
+# b2c_campaigns.py
+# Hromadné B2C kampane ako úlohy na pozadí (b2c_campaign_jobs / b2c_campaign_recipients)
+# - create_job(): v JEDNEJ transakcii založí úlohu, snímku adresátov (INSERT ... SELECT podľa
+#   filtrov customers/query) a pripíše body jedným UPDATE ... JOIN – HTTP požiadavka hneď vráti job_id
+# - obsah sa vyrenderuje raz pri založení (uložený v úlohe); per adresát sa len dosadia
+#   {{meno}} / {{name}} / {{email}}
+# - bežec (vlákno na proces) spracúva nevybavených adresátov po CHUNK cez
+#   SELECT ... FOR UPDATE SKIP LOCKED: správy zaradí do mail_queue (PRIORITY_BULK – rate limit,
+#   zdieľané SMTP spojenia) v tej istej transakcii ako zmenu stavu adresáta – po páde procesu
+#   pokračuje od prvého 'pending', bez duplicít
+# - bez mail_queue sa správy odošlú až PO COMMITe chunku (nie pod zámkami riadkov); adresát je už
+#   'queued', takže zlyhaný commit ani pád procesu neznamená opakované odoslanie
+# - SMS o bodoch ide jednou dávkou sms_handler.send_batch na chunk
+# - progress(): stav adresátov spojený so stavom ich správ v mail_outbox
+
+import html as _html
+import json
+import threading
+import traceback
+from typing import Any, Dict, List, Optional
+
+import db_connector
+import mail_queue
+import notification_handler as notify
+
+COLL = "utf8mb4_0900_ai_ci"
+CHUNK = 200
+POLL_S = 10
+
+_schema_ready = False
+_lock = threading.Lock()
+_wake = threading.Event()
+_runner: Optional["_Runner"] = None
+_content: Dict[int, Dict[str, Any]] = {}   # job_id -> {subject, body_html, sms_text} (vyrenderované raz)
+
+
+# --- SCHÉMA ---------------------------------------------------------------------
+def ensure_schema() -> None:
+    global _schema_ready
+    if _schema_ready:
+        return
+    db_connector.execute_query(f"""
+        CREATE TABLE IF NOT EXISTS b2c_campaign_jobs (
+          id            BIGINT       NOT NULL AUTO_INCREMENT PRIMARY KEY,
+          status        ENUM('running','done','cancelled') NOT NULL DEFAULT 'running',
+          subject       VARCHAR(255) NOT NULL,
+          body_html     MEDIUMTEXT   NOT NULL,
+          sms_text      VARCHAR(320) NULL,
+          points_delta  INT          NOT NULL DEFAULT 0,
+          filters       TEXT         NULL,
+          total         INT          NOT NULL DEFAULT 0,
+          enqueued      INT          NOT NULL DEFAULT 0,
+          created_at    DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          finished_at   DATETIME     NULL,
+          KEY idx_b2c_camp_status (status)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE={COLL}
+    """, fetch="none")
+    db_connector.execute_query(f"""
+        CREATE TABLE IF NOT EXISTS b2c_campaign_recipients (
+          job_id       BIGINT       NOT NULL,
+          customer_id  INT          NOT NULL,
+          email        VARCHAR(255) NOT NULL,
+          name         VARCHAR(255) NULL,
+          phone        VARCHAR(64)  NULL,
+          status       ENUM('pending','queued','failed') NOT NULL DEFAULT 'pending',
+          mail_id      BIGINT       NULL,
+          error        VARCHAR(500) NULL,
+          PRIMARY KEY (job_id, customer_id),
+          KEY idx_b2c_camp_rcpt_status (job_id, status)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE={COLL}
+    """, fetch="none")
+    mail_queue.ensure_schema()
+    _schema_ready = True
+
+
+# --- ZALOŽENIE ------------------------------------------------------------------
+def create_job(subject: str, body_html: str, sms_text: Optional[str], points_delta: int,
+               recipients_from_sql: str, params: tuple, filters: Optional[dict] = None) -> Dict[str, Any]:
+    """
+    `recipients_from_sql` = "FROM b2b_zakaznici z ... WHERE ..." (alias z) – filtre adresátov.
+    Snímka adresátov + pripísanie bodov sú atomické s úlohou (body sa nepripíšu dvakrát).
+    """
+    ensure_schema()
+    delta = int(points_delta or 0)
+
+    def work(conn):
+        cur = conn.cursor()
+        try:
+            cur.execute("INSERT INTO b2c_campaign_jobs (subject, body_html, sms_text, points_delta, filters) "
+                        "VALUES (%s,%s,%s,%s,%s)",
+                        (subject[:255], body_html, sms_text, delta, json.dumps(filters or {}, ensure_ascii=False)))
+            job_id = cur.lastrowid
+            cur.execute(f"""
+                INSERT IGNORE INTO b2c_campaign_recipients (job_id, customer_id, email, name, phone)
+                SELECT %s, z.id, z.email, z.nazov_firmy, z.telefon
+                {recipients_from_sql}
+            """, (job_id,) + tuple(params))
+            total = cur.rowcount
+            if delta and total:
+                cur.execute("""
+                    UPDATE b2b_zakaznici z
+                      JOIN b2c_campaign_recipients r ON r.customer_id = z.id AND r.job_id = %s
+                       SET z.vernostne_body = COALESCE(z.vernostne_body, 0) + %s
+                """, (job_id, delta))
+            cur.execute("UPDATE b2c_campaign_jobs SET total=%s, status=IF(%s=0,'done',status), "
+                        "finished_at=IF(%s=0,NOW(),NULL) WHERE id=%s", (total, total, total, job_id))
+            return job_id, total
+        finally:
+            cur.close()
+
+    job_id, total = db_connector.with_transaction(work)
+    if total:
+        start_runner()
+        _wake.set()
+    return {"job_id": job_id, "recipients": total, "awarded_points_to": total if delta else 0}
+
+
+# --- BEŽEC ----------------------------------------------------------------------
+def _job_content(job_id: int) -> Optional[Dict[str, Any]]:
+    c = _content.get(job_id)
+    if c is None:
+        c = db_connector.execute_query(
+            "SELECT subject, body_html, sms_text FROM b2c_campaign_jobs WHERE id=%s", (job_id,), fetch="one")
+        if c:
+            with _lock:
+                _content[job_id] = c
+    return c
+
+
+def _personalize(body: str, r: Dict[str, Any]) -> str:
+    name = _html.escape(str(r.get("name") or ""))
+    return (body.replace("{{meno}}", name).replace("{{name}}", name)
+                .replace("{{email}}", _html.escape(str(r.get("email") or ""))))
+
+
+def _process_chunk(job_id: int) -> int:
+    """Zaradí ďalší chunk adresátov úlohy do fronty. Vracia počet spracovaných (0 = nič voľné)."""
+    content = _job_content(job_id)
+    if not content:
+        return 0
+    queued = mail_queue.ENABLED and notify._mail_configured()
+    phones: List[str] = []
+    direct: List[tuple] = []   # (customer_id, msg) – odoslať po COMMITe
+
+    def work(conn):
+        cur = conn.cursor(dictionary=True)
+        try:
+            cur.execute("""
+                SELECT customer_id, email, name, phone
+                  FROM b2c_campaign_recipients
+                 WHERE job_id = %s AND status = 'pending'
+                 ORDER BY customer_id
+                 LIMIT %s
+                 FOR UPDATE SKIP LOCKED
+            """, (job_id, CHUNK))
+            rows = cur.fetchall() or []
+            updates = []
+            for r in rows:
+                try:
+                    msg = notify._build_email(r["email"], content["subject"],
+                                              html=_personalize(content["body_html"], r))
+                    mail_id = None
+                    if queued:
+                        mail_id = mail_queue.enqueue(msg, mail_queue.PRIORITY_BULK, conn=conn)
+                    else:
+                        direct.append((r["customer_id"], msg))
+                    updates.append(("queued", mail_id, None, job_id, r["customer_id"]))
+                    if r.get("phone"):
+                        phones.append(r["phone"])
+                except Exception as e:
+                    updates.append(("failed", None, repr(e)[:500], job_id, r["customer_id"]))
+            if updates:
+                cur.executemany("UPDATE b2c_campaign_recipients SET status=%s, mail_id=%s, error=%s "
+                                "WHERE job_id=%s AND customer_id=%s", updates)
+                cur.execute("UPDATE b2c_campaign_jobs SET enqueued = enqueued + %s WHERE id=%s",
+                            (sum(1 for u in updates if u[0] == "queued"), job_id))
+            return len(rows)
+        finally:
+            cur.close()
+
+    n = db_connector.with_transaction(work)
+    if n and queued:
+        mail_queue.notify()
+    if direct:
+        _deliver_direct(job_id, content["subject"], direct)
+    if phones and content.get("sms_text"):
+        notify.send_sms_batch(phones, content["sms_text"])
+    return n
+
+
+def _deliver_direct(job_id: int, subject: str, direct: List[tuple]) -> None:
+    """Synchrónne odoslanie (mail_queue vypnutá) mimo transakcie; zlyhané odoslania označí 'failed'."""
+    failed = []
+    for customer_id, msg in direct:
+        try:
+            notify._deliver(msg, subject, mail_queue.PRIORITY_BULK)
+        except Exception as e:
+            failed.append(("failed", repr(e)[:500], job_id, customer_id))
+    if failed:
+        db_connector.execute_many(
+            "UPDATE b2c_campaign_recipients SET status=%s, error=%s WHERE job_id=%s AND customer_id=%s",
+            failed)
+        db_connector.execute_query("UPDATE b2c_campaign_jobs SET enqueued = enqueued - %s WHERE id=%s",
+                                   (len(failed), job_id), fetch="none")
+
+
+def _finish_if_done(job_id: int) -> None:
+    left = db_connector.execute_query(
+        "SELECT 1 AS x FROM b2c_campaign_recipients WHERE job_id=%s AND status='pending' LIMIT 1",
+        (job_id,), fetch="one")
+    if not left:
+        db_connector.execute_query(
+            "UPDATE b2c_campaign_jobs SET status='done', finished_at=NOW() WHERE id=%s AND status='running'",
+            (job_id,), fetch="none")
+        with _lock:
+            _content.pop(job_id, None)
+
+
+class _Runner(threading.Thread):
+    def __init__(self):
+        super().__init__(daemon=True, name="b2c-campaigns")
+
+    def run(self):
+        while True:
+            busy = False
+            try:
+                ensure_schema()
+                jobs = db_connector.execute_query(
+                    "SELECT id FROM b2c_campaign_jobs WHERE status='running' ORDER BY id") or []
+                for j in jobs:
+                    if _process_chunk(j["id"]):
+                        busy = True
+                    else:
+                        _finish_if_done(j["id"])
+            except Exception:
+                traceback.print_exc()
+            if not busy:
+                _wake.wait(POLL_S)
+                _wake.clear()
+
+
+def start_runner() -> None:
+    """Spustí bežca kampaní (raz za proces) – pri štarte aplikácie dokončí prerušené úlohy."""
+    global _runner
+    with _lock:
+        if _runner is None or not _runner.is_alive():
+            _runner = _Runner()
+            _runner.start()
+
+
+# --- STAV -----------------------------------------------------------------------
+def progress(job_id: int) -> Dict[str, Any]:
+    ensure_schema()
+    job = db_connector.execute_query("""
+        SELECT id, status, subject, points_delta, total, enqueued, created_at, finished_at
+          FROM b2c_campaign_jobs WHERE id=%s
+    """, (int(job_id),), fetch="one")
+    if not job:
+        return {"error": "Kampaň neexistuje."}
+    rows = db_connector.execute_query("""
+        SELECT CASE WHEN r.status = 'queued' THEN COALESCE(m.status, 'sent') ELSE r.status END AS st,
+               COUNT(*) AS n
+          FROM b2c_campaign_recipients r
+          LEFT JOIN mail_outbox m ON m.id = r.mail_id
+         WHERE r.job_id = %s
+         GROUP BY st
+    """, (int(job_id),)) or []
+    counts = {"pending": 0, "queued": 0, "sending": 0, "sent": 0, "failed": 0}
+    for r in rows:
+        counts[r["st"]] = counts.get(r["st"], 0) + int(r["n"])
+    total = int(job.get("total") or 0)
+    done = counts["sent"] + counts["failed"]
+    job["counts"] = counts
+    job["progress_pct"] = round(100.0 * done / total, 1) if total else 100.0
+    return job
+
+
+def list_jobs(limit: int = 50) -> List[Dict[str, Any]]:
+    ensure_schema()
+    return db_connector.execute_query("""
+        SELECT id, status, subject, points_delta, total, enqueued, created_at, finished_at
+          FROM b2c_campaign_jobs ORDER BY id DESC LIMIT %s
+    """, (int(limit),)) or []
+
+
+def cancel_job(job_id: int) -> Dict[str, Any]:
+    """Zastaví úlohu: nevybavení adresáti ostanú 'pending', ešte neodoslané správy sa z fronty stiahnu."""
+    ensure_schema()
+
+    def work(conn):
+        cur = conn.cursor()
+        try:
+            cur.execute("UPDATE b2c_campaign_jobs SET status='cancelled', finished_at=NOW() "
+                        "WHERE id=%s AND status='running'", (int(job_id),))
+            if cur.rowcount == 0:
+                return None
+            cur.execute("""
+                SELECT m.id, m.eml_file
+                  FROM mail_outbox m
+                  JOIN b2c_campaign_recipients r ON r.mail_id = m.id AND r.job_id = %s
+                 WHERE m.status = 'queued'
+                   FOR UPDATE SKIP LOCKED
+            """, (int(job_id),))
+            rows = cur.fetchall() or []
+            if rows:
+                ph = ",".join(["%s"] * len(rows))
+                cur.execute(f"UPDATE mail_outbox SET status='failed', last_error='Kampaň zrušená.' WHERE id IN ({ph})",
+                            tuple(r[0] for r in rows))
+            return [r[1] for r in rows]
+        finally:
+            cur.close()
+
+    withdrawn = db_connector.with_transaction(work)
+    if withdrawn is None:
+        return {"error": "Kampaň neexistuje alebo už nebeží."}
+    for fn in withdrawn:
+        mail_queue.discard_spool(fn)
+    with _lock:
+        _content.pop(int(job_id), None)
+    return {"message": "Kampaň zrušená.", "withdrawn": len(withdrawn)}
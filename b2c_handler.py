@@ -9,7 +9,7 @@ Bez migrácie DB:
 - súborový trezor hesiel, ak v tabuľke chýbajú heslo_hash/heslo_salt,
 - podpora FK na zákazníka cez b2b_zakaznici.id aj b2b_zakaznici.zakaznik_id,
 - outbox HTML potvrdenie objednávky (ak e-mail neodíde),
-- ceny/DPH z B2C cenníka (robustne) v submit_b2c_order aj v histórii.
+- ceny/DPH z procesového B2C cenníka (b2c_price_book) v submit_b2c_order aj v histórii.
 
 DOPLNENÉ:
 - delivery_window: Po–Pia 08:00–12:00 / 12:00–15:00 – prenesené do order_data, META, e-mailu, PDF
@@ -26,6 +26,11 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
 
 import db_connector
+import schema_cache
+import ean_key
+import b2c_price_book
+import demand_forecast
+import b2c_schema
 from auth_handler import generate_password_hash, verify_password
 import pdf_generator
 import notification_handler
@@ -63,38 +68,15 @@ def _save_password_store(d: dict):
 # ---------------------------------------------------------------------
 def _table_has_columns(table: str, columns: List[str]) -> bool:
     """True, ak tabuľka obsahuje VŠETKY zadané stĺpce."""
-    if not columns:
-        return True
-    sql = """
-        SELECT COLUMN_NAME AS col
-        FROM information_schema.columns
-        WHERE table_schema = DATABASE()
-          AND table_name   = %s
-          AND COLUMN_NAME IN ({})
-    """.format(",".join(["%s"] * len(columns)))
-    params = tuple([table] + list(columns))
-    rows = db_connector.execute_query(sql, params) or []
-    present = {(r.get("col") if isinstance(r, dict) else list(r.values())[0]) for r in rows}
-    return all(c in present for c in columns)
+    return all(schema_cache.has_col(table, c) for c in columns or [])
 
 def _first_existing_col(table: str, candidates: List[str]) -> Optional[str]:
     """Vráti prvý existujúci stĺpec z kandidátov, alebo None."""
-    for c in candidates:
-        if _table_has_columns(table, [c]):
-            return c
-    return None
+    return schema_cache.first_col(table, candidates)
 
 def _column_data_type(table: str, column: str) -> Optional[str]:
     """Vráti data_type z information_schema (napr. 'int', 'bigint', 'varchar'...)."""
-    try:
-        row = db_connector.execute_query(
-            "SELECT DATA_TYPE AS dt FROM information_schema.columns "
-            "WHERE table_schema = DATABASE() AND table_name=%s AND column_name=%s",
-            (table, column), fetch="one"
-        )
-        return (row or {}).get("dt")
-    except Exception:
-        return None
+    return schema_cache.col_type(table, column) or None
 
 def _is_numeric_col(table: str, column: str) -> bool:
     dt = (_column_data_type(table, column) or "").lower()
@@ -162,84 +144,10 @@ def _is_true_flag(v) -> bool:
 def _fetch_b2c_prices(eans: List[str]) -> Dict[str, Dict[str, float]]:
     """
     Map {ean: {'dph': float, 'cena': float, 'je_v_akcii': bool, 'akciova_cena_bez_dph': float}}.
-    Robustné dohľadanie: COLLATE, fallback BINARY a zero-pad (napr. '21101' -> '000000021101').
+    Z procesového cenníka (b2c_price_book) – bez DB dotazu; záznam je pod pôvodným EAN
+    aj pod kľúčom ean_key (napr. '21101' aj '0000000021101').
     """
-    base: List[str] = []
-    for e in eans or []:
-        s = str(e or "").strip()
-        if not s:
-            continue
-        base.append(s)
-        if s.isdigit() and len(s) < 13:
-            base.append(s.zfill(13))
-    if not base:
-        return {}
-    base = list(dict.fromkeys(base))
-
-    out: Dict[str, Dict[str, float]] = {}
-
-    def _upsert(rows):
-        for r in rows or []:
-            e = str(r.get("ean") or r.get("ean_produktu") or "").strip()
-            if not e:
-                continue
-            out[e] = {
-                "dph": float(r.get("dph") or 0.0),
-                "cena": float(r.get("cena_bez_dph") or 0.0),
-                "je_v_akcii": str(r.get("je_v_akcii") or "").lower() in ("1","true","t","yes","y","áno","ano"),
-                "akciova_cena_bez_dph": float(r.get("akciova_cena_bez_dph") or 0.0),
-            }
-
-    # 1) JOIN s jednotnou koláciou
-    ph = ",".join(["%s"] * len(base))
-    q1 = f"""
-      SELECT p.ean, p.dph, c.cena_bez_dph, c.je_v_akcii, c.akciova_cena_bez_dph
-      FROM produkty p
-      JOIN b2c_cennik_polozky c
-        ON p.ean COLLATE {COLL} = c.ean_produktu COLLATE {COLL}
-      WHERE p.ean COLLATE {COLL} IN ({ph})
-    """
-    _upsert(db_connector.execute_query(q1, tuple(base)) or [])
-
-    missing = [e for e in base if e not in out]
-
-    # 2) fallback – BINARY porovnávanie
-    if missing:
-        ph2 = ",".join(["%s"] * len(missing))
-        q2 = f"""
-          SELECT p.ean, p.dph, c.cena_bez_dph, c.je_v_akcii, c.akciova_cena_bez_dph
-          FROM produkty p
-          JOIN b2c_cennik_polozky c
-            ON BINARY p.ean = BINARY c.ean_produktu
-          WHERE BINARY p.ean IN ({ph2})
-        """
-        _upsert(db_connector.execute_query(q2, tuple(missing)) or [])
-        missing = [e for e in missing if e not in out]
-
-    # 3) posledný fallback – načítaj oddelene a spoj v Pythone
-    if missing:
-        ph3 = ",".join(["%s"] * len(missing))
-        cen = db_connector.execute_query(
-            f"SELECT ean_produktu, cena_bez_dph, je_v_akcii, akciova_cena_bez_dph "
-            f"FROM b2c_cennik_polozky WHERE ean_produktu COLLATE {COLL} IN ({ph3})",
-            tuple(missing)
-        ) or []
-        pro = db_connector.execute_query(
-            f"SELECT ean, dph FROM produkty WHERE ean COLLATE {COLL} IN ({ph3})",
-            tuple(missing)
-        ) or []
-        c_map = {str(r["ean_produktu"]).strip(): r for r in cen}
-        p_map = {str(r["ean"]).strip(): r for r in pro}
-        for e in missing:
-            c = c_map.get(e); p = p_map.get(e)
-            if c or p:
-                out[e] = {
-                    "dph": float((p or {}).get("dph") or 0.0),
-                    "cena": float((c or {}).get("cena_bez_dph") or 0.0),
-                    "je_v_akcii": str((c or {}).get("je_v_akcii") or "").lower() in ("1","true","t","yes","y","áno","ano"),
-                    "akciova_cena_bez_dph": float((c or {}).get("akciova_cena_bez_dph") or 0.0),
-                }
-    return out
+    return b2c_price_book.prices_for(eans)
 
 
 # ---------------------------------------------------------------------
@@ -481,7 +389,7 @@ def get_public_pricelist() -> Dict[str, Any]:
             c.cena_bez_dph, c.je_v_akcii, c.akciova_cena_bez_dph
         FROM produkty p
         JOIN b2c_cennik_polozky c
-          ON p.ean COLLATE {COLL} = c.ean_produktu COLLATE {COLL}
+          ON {ean_key.col("produkty", "p")} = {ean_key.col("b2c_cennik_polozky", "c")}
         ORDER BY p.predajna_kategoria, p.nazov_vyrobku
     """
     rows = db_connector.execute_query(query) or []
@@ -659,7 +567,7 @@ def submit_b2c_order(user_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
         if not raw_items:
             return {"error": "Objednávka neobsahuje žiadne položky."}
 
-        # ROBUSTNÉ CENY Z CENNÍKA
+        # CENY Z CENNÍKA (procesový price book, bez DB dotazu)
         prices = _fetch_b2c_prices(eans)
 
         # výpočet súm + obohatenie položiek (aj PDF-kompat polia)
@@ -735,49 +643,41 @@ def submit_b2c_order(user_id: int, data: Dict[str, Any]) -> Dict[str, Any]:
         if not customer:
             return {"error": "Zákazník pre objednávku nebol nájdený."}
 
-        tbl = "b2c_objednavky"
-        cols, vals = [], []
-        col_customer_id   = _first_existing_col(tbl, ["zakaznik_id","customer_id","user_id"])
-        col_order_number  = _first_existing_col(tbl, ["cislo_objednavky","objednavka_cislo","order_number"])
-        col_delivery_date = _first_existing_col(tbl, ["pozadovany_datum_dodania","datum_dodania","delivery_date"])
-        col_note          = _first_existing_col(tbl, ["poznamka","note"])
-        col_total_net     = _first_existing_col(tbl, ["predpokladana_suma_bez_dph","suma_bez_dph","total_bez_dph","total_net"])
-        col_total_vat     = _first_existing_col(tbl, ["predpokladana_dph","dph","total_dph","vat_amount"])
-        col_total_gross   = _first_existing_col(tbl, ["predpokladana_suma_s_dph","suma_s_dph","total_s_dph","total_gross"])
-        col_items         = _first_existing_col(tbl, ["polozky","polozky_json","items"])
-        col_reward_note   = _first_existing_col(tbl, ["uplatnena_odmena_poznamka","reward_note"])
-
-        if col_customer_id:
-            if col_customer_id == "zakaznik_id" and not _is_numeric_col(tbl, col_customer_id):
-                fk_val = customer.get("zakaznik_id")
-                if not fk_val:
-                    return {"error": "Váš účet nemá priradené zákaznícke číslo (zakaznik_id). Kontaktujte podporu."}
-                cols.append(col_customer_id); vals.append(fk_val)
-            else:
-                cols.append(col_customer_id); vals.append(customer["id"])
-
-        if col_order_number:  cols.append(col_order_number);  vals.append(order_number)
-        if col_delivery_date: cols.append(col_delivery_date); vals.append(delivery_date)
-        if col_note:          cols.append(col_note);          vals.append(note or "")
-        if col_total_net:     cols.append(col_total_net);     vals.append(round(total_net, 2))
-        if col_total_vat:     cols.append(col_total_vat);     vals.append(round(total_vat, 2))
-        if col_total_gross:   cols.append(col_total_gross);   vals.append(round(total_gross, 2))
-        if col_items:         cols.append(col_items);         vals.append(json.dumps(items_with_details, ensure_ascii=False))
+        P = b2c_schema.orders_profile()
+        fk_val = customer["id"]
+        if P.fk_by_login:
+            fk_val = customer.get("zakaznik_id")
+            if not fk_val:
+                return {"error": "Váš účet nemá priradené zákaznícke číslo (zakaznik_id). Kontaktujte podporu."}
+
+        values = {
+            "fk":       fk_val,
+            "number":   order_number,
+            "delivery": delivery_date,
+            "note":     note or "",
+            "net":      round(total_net, 2),
+            "vat":      round(total_vat, 2),
+            "gross":    round(total_gross, 2),
+            "items":    json.dumps(items_with_details, ensure_ascii=False),
+        }
+        vals = [values[k] for k in P.insert_fields]
+        sql = P.sql_insert
 
         # prípadná bodová odmena (starý mechanizmus)
         reward_note = None
         claimed = _find_claimed_reward(user_id)
         if claimed:
             reward_note = claimed.get("nazov_odmeny")
-            if col_reward_note and reward_note:
-                cols.append(col_reward_note); vals.append(reward_note)
+            if P.reward_note and reward_note:
+                vals.append(reward_note); sql = P.sql_insert_with_reward
 
-        placeholders = ",".join(["%s"] * len(vals))
-        cursor.execute(f"INSERT INTO {tbl} ({', '.join(cols)}) VALUES ({placeholders})", tuple(vals))
+        cursor.execute(sql, tuple(vals))
         order_id = cursor.lastrowid
         if claimed and order_id:
             _mark_reward_fulfilled(order_id, claimed["id"])
         conn.commit()
+        if order_id:
+            demand_forecast.refresh_order(demand_forecast.CHANNEL_B2C, order_id)
 
         # PDF/MAIL dáta (pridáme delivery_window a rewards z payloadu/gift kódu)
         order_data_for_docs = {
@@ -951,7 +851,7 @@ def get_order_history(user_id: int) -> dict:
             except Exception:
                 items = []
 
-        # dotiahni ceny z cenníka – robustne
+        # ceny z procesového cenníka
         eans = [it.get("ean") for it in items if it.get("ean")]
         prices = _fetch_b2c_prices(eans)
 
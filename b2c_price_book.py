@@ -0,0 +1,195 @@
+# b2c_price_book.py
+# Procesový B2C cenník (price book) pre odoslanie objednávky, históriu, zoznam objednávok a PDF
+# - celý cenník (b2c_cennik_polozky + DPH z produkty) sa načíta JEDNÝM dotazom
+# - kľúč = ean_key (zero-pad, rovnaký ako v DB) – hľadá sa pod pôvodným EAN aj pod kľúčom
+# - verzia sa zvýši pri každom načítaní; invalidate() volajú zápisy do cenníka
+#   (update_b2c_pricelist / add_products_to_b2c_pricelist) a úprava DPH produktu
+# - invalidate() zvýši aj zdieľanú verziu v DB (b2c_price_book_version); proces ju overí jedným
+#   PK dotazom najviac raz za B2C_PRICE_BOOK_VERSION_CHECK_S (default 2 s) – medzi tým sa oceňuje
+#   čisto z pamäte; zmenu cenníka / DPH tak ostatné workery uvidia do pár sekúnd, vlastný proces hneď
+# - TTL (B2C_PRICE_BOOK_TTL, default 300 s) kryje zápisy priamo v DB (mimo aplikácie)
+#
+# Ocenenie objednávky / stránky histórie je tak bez načítania cenníka (okrem prvého / po zmene).
+
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+import db_connector
+import ean_key
+
+B2C_PRICE_BOOK_TTL = float(os.getenv("B2C_PRICE_BOOK_TTL", "300"))
+B2C_PRICE_BOOK_VERSION_CHECK_S = float(os.getenv("B2C_PRICE_BOOK_VERSION_CHECK_S", "2"))
+
+_TRUE = ("1", "true", "t", "yes", "y", "áno", "ano")
+
+_lock = threading.RLock()
+_book: Optional[Dict[str, Dict[str, Any]]] = None
+_loaded_at = 0.0
+_version = 0
+_db_version: Optional[int] = None   # zdieľaná verzia z DB, pri ktorej bol cenník načítaný
+_polled_version: Optional[int] = None   # posledná prečítaná zdieľaná verzia
+_polled_at = 0.0
+_schema_ready = False
+_stats = {"loads": 0, "hits": 0, "invalidations": 0, "load_errors": 0, "version_checks": 0}
+
+
+def _f(v) -> float:
+    try:
+        return float(v or 0.0)
+    except Exception:
+        return 0.0
+
+
+def ensure_schema() -> None:
+    global _schema_ready
+    if _schema_ready:
+        return
+    db_connector.execute_query("""
+        CREATE TABLE IF NOT EXISTS b2c_price_book_version (
+          id  TINYINT NOT NULL PRIMARY KEY,
+          ver BIGINT  NOT NULL DEFAULT 0
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """, fetch='none')
+    _schema_ready = True
+
+
+def _read_db_version() -> Optional[int]:
+    """Zdieľaná verzia cenníka (0 = ešte nezmenený); pri chybe None – platí len TTL."""
+    try:
+        ensure_schema()
+        row = db_connector.execute_query("SELECT ver FROM b2c_price_book_version WHERE id = 1", fetch='one')
+        return int(row['ver']) if row else 0
+    except Exception as e:
+        _stats["load_errors"] += 1
+        print(f"!!! UPOZORNENIE: b2c_price_book – verziu cenníka nie je možné načítať: {e}")
+        return None
+
+
+def _poll_db_version() -> Optional[int]:
+    """Zdieľaná verzia – z DB najviac raz za B2C_PRICE_BOOK_VERSION_CHECK_S, inak posledná prečítaná."""
+    global _polled_version, _polled_at
+    now = time.monotonic()
+    if _book is not None and (now - _polled_at) < B2C_PRICE_BOOK_VERSION_CHECK_S:
+        return _polled_version
+    dbv = _read_db_version()
+    _stats["version_checks"] += 1
+    _polled_version, _polled_at = dbv, now
+    return dbv
+
+
+def _load() -> None:
+    global _book, _loaded_at, _version
+    kp, kc = ean_key.col("produkty", "p"), ean_key.col("b2c_cennik_polozky", "c")
+    # kľúče z oboch tabuliek – produkt bez cenníka má aspoň DPH, položka cenníka bez produktu aspoň cenu
+    try:
+        rows = db_connector.execute_query(f"""
+          SELECT k.k, p.dph, c.cena_bez_dph, c.je_v_akcii, c.akciova_cena_bez_dph
+          FROM (
+            SELECT {ean_key.col("produkty")} AS k FROM produkty
+            UNION
+            SELECT {ean_key.col("b2c_cennik_polozky")} FROM b2c_cennik_polozky
+          ) k
+          LEFT JOIN produkty p ON {kp} = k.k
+          LEFT JOIN b2c_cennik_polozky c ON {kc} = k.k
+        """) or []
+    except Exception as e:
+        # pri výpadku DB nechaj starý cenník (ak je) a skús to pri ďalšom volaní
+        _stats["load_errors"] += 1
+        print(f"!!! UPOZORNENIE: b2c_price_book – nepodarilo sa načítať cenník: {e}")
+        if _book is None:
+            raise
+        _loaded_at = time.monotonic()
+        return
+
+    book: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        k = str(r.get("k") or "")
+        if not k or k in book:
+            continue
+        book[k] = {
+            "dph": _f(r.get("dph")),
+            "cena": _f(r.get("cena_bez_dph")),
+            "je_v_akcii": str(r.get("je_v_akcii") or "").lower() in _TRUE,
+            "akciova_cena_bez_dph": _f(r.get("akciova_cena_bez_dph")),
+        }
+    _book = book
+    _version += 1
+    _loaded_at = time.monotonic()
+    _stats["loads"] += 1
+
+
+def _fresh(dbv: Optional[int]) -> bool:
+    return (_book is not None and (time.monotonic() - _loaded_at) < B2C_PRICE_BOOK_TTL
+            and (dbv is None or dbv == _db_version))
+
+
+def _ensure_loaded() -> Dict[str, Dict[str, Any]]:
+    # verzia sa číta PRED načítaním – zmena počas načítania vynúti ďalšie načítanie
+    dbv = _poll_db_version()
+    if _fresh(dbv):
+        _stats["hits"] += 1
+        return _book
+    global _db_version
+    with _lock:
+        if not _fresh(dbv):
+            _load()
+            _db_version = dbv
+        return _book or {}
+
+
+def invalidate() -> None:
+    """Zahodí cenník v tomto procese a zvýši zdieľanú verziu – ostatné procesy ho načítajú nanovo."""
+    global _book
+    with _lock:
+        _book = None
+        _stats["invalidations"] += 1
+    try:
+        ensure_schema()
+        db_connector.execute_query("""
+            INSERT INTO b2c_price_book_version (id, ver) VALUES (1, 1)
+            ON DUPLICATE KEY UPDATE ver = ver + 1
+        """, fetch='none')
+    except Exception as e:
+        print(f"!!! UPOZORNENIE: b2c_price_book – zdieľanú verziu cenníka sa nepodarilo zvýšiť: {e}")
+
+
+def version() -> int:
+    """Verzia cenníka – zvýši sa pri každom načítaní (napr. pre cache ocenených objednávok)."""
+    _ensure_loaded()
+    return _version
+
+
+def stats() -> Dict[str, int]:
+    return {
+        **_stats,
+        "version": _version,
+        "db_version": _db_version,
+        "items": len(_book or {}),
+        "age_s": int(time.monotonic() - _loaded_at) if _book is not None else -1,
+        "ttl_s": int(B2C_PRICE_BOOK_TTL),
+    }
+
+
+def get(ean) -> Optional[Dict[str, Any]]:
+    """Cena jedného EAN (pôvodný tvar alebo kľúč) alebo None."""
+    return _ensure_loaded().get(ean_key.normalize(ean))
+
+
+def prices_for(eans: Iterable) -> Dict[str, Dict[str, Any]]:
+    """
+    Map {ean: {'dph', 'cena', 'je_v_akcii', 'akciova_cena_bez_dph'}} pre zadané EAN –
+    rovnaký tvar ako pôvodné _fetch_b2c_prices; záznam je pod pôvodným EAN aj pod kľúčom.
+    """
+    book = _ensure_loaded()
+    out: Dict[str, Dict[str, Any]] = {}
+    for e in eans or []:
+        s = str(e or "").strip()
+        if not s:
+            continue
+        k = ean_key.normalize(s)
+        rec = book.get(k)
+        if rec is not None:
+            out[s] = out[k] = rec
+    return out
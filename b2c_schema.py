@@ -0,0 +1,175 @@
+# b2c_schema.py
+# Skompilovaný "schema profil" tabuľky b2c_objednavky pre dynamické SQL
+# - aliasy stĺpcov (cislo_objednavky/objednavka_cislo/order_number, ...) sa vyriešia raz
+# - JOIN na b2b_zakaznici podľa typu FK (zakaznik_id číselné vs. textové)
+# - predpripravené SELECT / INSERT / JOIN fragmenty pre admin aj portál
+# - profil drží schema_cache.profile() a prebuduje ho len pri zmene schémy
+#
+# Použitie:  P = b2c_schema.orders_profile();  db_connector.execute_query(P.sql_admin_list)
+
+from typing import Dict, List, Tuple
+
+import schema_cache
+
+NUMBER_COLS   = ["cislo_objednavky", "objednavka_cislo", "order_number"]
+DATE_COLS     = ["datum_objednavky", "created_at", "created", "datum"]
+DELIVERY_COLS = ["pozadovany_datum_dodania", "datum_dodania", "delivery_date"]
+STATUS_COLS   = ["stav", "stav_vybavenia", "stav_objednavky", "status"]
+PRED_COLS     = ["predpokladana_suma_s_dph", "suma_s_dph", "total_s_dph", "total_gross"]
+FINAL_COLS    = ["finalna_suma_s_dph", "finalna_suma", "final_total_s_dph", "suma_s_dph", "total_s_dph"]
+ITEMS_COLS    = ["polozky", "polozky_json", "items"]
+FK_COLS       = ["zakaznik_id", "customer_id", "user_id"]
+NOTE_COLS     = ["poznamka", "note"]
+NET_COLS      = ["predpokladana_suma_bez_dph", "suma_bez_dph", "total_bez_dph", "total_net"]
+VAT_COLS      = ["predpokladana_dph", "dph", "total_dph", "vat_amount"]
+REWARD_COLS   = ["uplatnena_odmena_poznamka", "reward_note"]
+
+
+class B2COrdersProfile:
+    """Vyriešené stĺpce + hotové SQL pre b2c_objednavky (alias tabuľky 'o', zákazník 'z')."""
+
+    TABLE = "b2c_objednavky"
+
+    def __init__(self):
+        t = self.TABLE
+        fc = lambda cands: schema_cache.first_col(t, cands)
+
+        self.id       = fc(["id"]) or "id"
+        self.number   = fc(NUMBER_COLS)
+        self.date     = fc(DATE_COLS)
+        self.delivery = fc(DELIVERY_COLS)
+        self.status   = fc(STATUS_COLS)
+        self.pred     = fc(PRED_COLS)
+        self.final    = fc(FINAL_COLS)
+        self.items    = fc(ITEMS_COLS)
+        self.fk       = fc(FK_COLS)
+        self.note     = fc(NOTE_COLS)
+        self.net      = fc(NET_COLS)
+        self.vat      = fc(VAT_COLS)
+        self.reward_note = fc(REWARD_COLS)
+        self.order_col = self.date or self.id
+
+        # FK režim: textové zakaznik_id -> b2b_zakaznici.zakaznik_id, inak -> b2b_zakaznici.id
+        self.fk_by_login = self.fk == "zakaznik_id" and not schema_cache.is_numeric(t, "zakaznik_id")
+        self.join_customer = (
+            "o.zakaznik_id = z.zakaznik_id" if self.fk_by_login
+            else f"o.{self.fk or 'user_id'} = z.id"
+        )
+        # OR-join cez všetky prítomné FK stĺpce (štatistiky, customers_query)
+        any_parts = []
+        if schema_cache.has_col(t, "zakaznik_id"):
+            any_parts.append("o.zakaznik_id = z.id" if schema_cache.is_numeric(t, "zakaznik_id")
+                             else "o.zakaznik_id = z.zakaznik_id")
+        if schema_cache.has_col(t, "customer_id"):
+            any_parts.append("o.customer_id = z.id")
+        if schema_cache.has_col(t, "user_id"):
+            any_parts.append("o.user_id = z.id")
+        self.join_customer_any = f"({' OR '.join(any_parts)})" if any_parts else None
+
+        self.final_expr = self._coalesce(FINAL_COLS)
+        self.pred_expr  = self._coalesce(PRED_COLS)
+
+        self._compile()
+
+    # ---- fragmenty ------------------------------------------------
+    def _coalesce(self, cands: List[str]) -> str:
+        existing = [f"o.{c}" for c in cands if schema_cache.has_col(self.TABLE, c)]
+        if not existing:
+            return "0+0"
+        return f"COALESCE({', '.join(existing + ['0'])})+0"
+
+    def _compile(self):
+        t = self.TABLE
+
+        # admin zoznam (b2c_get_orders)
+        cols = [f"o.{self.id} AS id", "z.nazov_firmy AS zakaznik_meno"]
+        if self.number:   cols.append(f"o.{self.number} AS cislo_objednavky")
+        if self.date:     cols.append(f"o.{self.date} AS datum_objednavky")
+        if self.delivery: cols.append(f"o.{self.delivery} AS pozadovany_datum_dodania")
+        if self.status:   cols.append(f"o.{self.status} AS stav")
+        if self.pred:     cols.append(f"o.{self.pred} AS predpokladana_suma_s_dph")
+        if self.final:    cols.append(f"o.{self.final} AS finalna_suma_s_dph")
+        if self.items:    cols.append(f"o.{self.items} AS polozky")
+        self.sql_admin_select = (
+            f"SELECT {', '.join(cols)} FROM {t} o "
+            f"LEFT JOIN b2b_zakaznici z ON {self.join_customer}"
+        )
+        self.sql_admin_list = self.sql_admin_select + f" ORDER BY o.{self.order_col} DESC"
+        # keyset stránkovanie (b2c_orders_page): (dátum, id) zostupne; bez dátumu len id
+        # NULL dátumy sú v MySQL pri DESC na konci – za datovaným kurzorom nasledujú aj ony,
+        # za kurzorom s NULL dátumom už len NULL riadky s menším id
+        if self.date:
+            self.admin_page_order = f" ORDER BY o.{self.date} DESC, o.{self.id} DESC"
+            self.admin_page_after = (f"(o.{self.date} < %s OR (o.{self.date} = %s AND o.{self.id} < %s)"
+                                     f" OR o.{self.date} IS NULL)")
+            self.admin_page_after_null = f"(o.{self.date} IS NULL AND o.{self.id} < %s)"
+        else:
+            self.admin_page_order = f" ORDER BY o.{self.id} DESC"
+            self.admin_page_after = f"o.{self.id} < %s"
+            self.admin_page_after_null = self.admin_page_after
+
+        # jedna objednávka podľa id / čísla (_get_order_row)
+        cols = [f"o.{self.id} AS id"]
+        if self.number: cols.append(f"o.{self.number} AS cislo_objednavky")
+        if self.items:  cols.append(f"o.{self.items} AS polozky")
+        if self.status: cols.append(f"o.{self.status} AS stav")
+        final_one = schema_cache.first_col(t, FINAL_COLS)
+        pred_one  = schema_cache.first_col(t, PRED_COLS)
+        if final_one: cols.append(f"o.{final_one}  AS finalna_suma_s_dph")
+        if pred_one:  cols.append(f"o.{pred_one}  AS predpokladana_suma_s_dph")
+        if self.fk:   cols.append(f"o.{self.fk} AS fk")
+        base = f"SELECT {', '.join(cols)} FROM {t} o WHERE "
+        self.sql_row_by_id = base + f"o.{self.id}=%s LIMIT 1"
+        self.sql_row_by_number = (base + f"o.{self.number}=%s LIMIT 1") if self.number else None
+
+        # agregát objednávok na zákazníka (customers_query) – join cez a.k = customer_key
+        self.customer_key = "z.zakaznik_id" if self.fk_by_login else "z.id"
+        last = f"MAX(o.{self.date})" if self.date else "NULL"
+        self.sql_orders_by_customer = (
+            f"SELECT o.{self.fk} AS k, COUNT(*) AS orders_count, {last} AS last_order_date, "
+            f"SUM({self.final_expr}) AS final_paid_sum FROM {t} o GROUP BY o.{self.fk}"
+        ) if self.fk else None
+
+        # agregácie podľa dátumu (_orders_agg) – varianty (date_from?, date_to?);
+        # polouzavretý interval nad holým stĺpcom – hranice dáva date_ranges.day_bounds
+        dat = self.order_col
+        agg = (f"SELECT o.{dat} AS datum, {self.final_expr} AS finalka, "
+               f"{self.pred_expr} AS pred FROM {t} o")
+        self.sql_orders_agg: Dict[Tuple[bool, bool], str] = {
+            (False, False): agg,
+            (True,  False): agg + f" WHERE 1=1 AND o.{dat} >= %s",
+            (False, True):  agg + f" WHERE 1=1 AND o.{dat} < %s",
+            (True,  True):  agg + f" WHERE 1=1 AND o.{dat} >= %s AND o.{dat} < %s",
+        }
+
+        # TOP zákazníci – varianty (date_from?, date_to?)
+        self.sql_top_customers: Dict[Tuple[bool, bool], str] = {}
+        if self.fk and self.join_customer_any:
+            top = (f"SELECT z.id AS customer_id, z.zakaznik_id, z.nazov_firmy, z.email, "
+                   f"SUM({self.final_expr}) AS suma "
+                   f"FROM {t} o JOIN b2b_zakaznici z ON {self.join_customer_any} WHERE z.typ='B2C'")
+            tail = " GROUP BY z.id, z.zakaznik_id, z.nazov_firmy, z.email ORDER BY suma DESC LIMIT %s"
+            self.sql_top_customers = {
+                (False, False): top + tail,
+                (True,  False): top + f" AND o.{dat} >= %s" + tail,
+                (False, True):  top + f" AND o.{dat} < %s" + tail,
+                (True,  True):  top + f" AND o.{dat} >= %s AND o.{dat} < %s" + tail,
+            }
+
+        # INSERT novej objednávky (submit_b2c_order) – poradie hodnôt = insert_fields
+        fields = [("fk", self.fk), ("number", self.number), ("delivery", self.delivery),
+                  ("note", self.note), ("net", self.net), ("vat", self.vat),
+                  ("gross", self.pred), ("items", self.items)]
+        self.insert_fields: List[str] = [k for k, c in fields if c]
+        ins_cols = [c for _, c in fields if c]
+        self.sql_insert = self._insert_sql(ins_cols)
+        self.sql_insert_with_reward = (
+            self._insert_sql(ins_cols + [self.reward_note]) if self.reward_note else self.sql_insert
+        )
+
+    def _insert_sql(self, cols: List[str]) -> str:
+        return f"INSERT INTO {self.TABLE} ({', '.join(cols)}) VALUES ({','.join(['%s'] * len(cols))})"
+
+
+def orders_profile() -> B2COrdersProfile:
+    return schema_cache.profile(B2COrdersProfile)
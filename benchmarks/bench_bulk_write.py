@@ -0,0 +1,103 @@
+# benchmarks/bench_bulk_write.py
+# Benchmark hromadného zápisu: 100k meraní teploty do kópie temps_readings.
+#
+#   python benchmarks/bench_bulk_write.py [--rows 100000] [--single-rows 5000] [--chunk 1000]
+#
+# Potrebuje bežiacu MySQL podľa .env (rovnako ako aplikácia).
+# Pracuje v pomocnej tabuľke bench_temps_readings (CREATE ... LIKE temps_readings),
+# ktorú na konci zmaže. Porovnáva:
+#   single      – execute_query po jednom riadku (pôvodný _upsert_reading),
+#                 meria sa len --single-rows riadkov, čas sa extrapoluje
+#   execute_many – executemany po dávkach v jednej transakcii
+#   bulk_upsert  – multi-VALUES INSERT ... ON DUPLICATE KEY UPDATE
+# Vypisuje čas, riadky/s a affected rows.
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import db_connector
+
+TABLE = "bench_temps_readings"
+UPSERT_SQL = (f"INSERT INTO {TABLE} (device_id, ts, temperature, status) VALUES (%s,%s,%s,%s) "
+              "ON DUPLICATE KEY UPDATE temperature=VALUES(temperature), status=VALUES(status)")
+
+
+def _rows(n):
+    # 100 zariadení x štvrťhodinové merania dozadu od polnoci
+    base = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    devices = 100
+    return [
+        (i % devices + 1, base - timedelta(minutes=15 * (i // devices)), round(2.0 + (i % 37) / 10.0, 2), "OK")
+        for i in range(n)
+    ]
+
+
+def _reset():
+    db_connector.execute_query(f"DROP TABLE IF EXISTS {TABLE}", fetch="none")
+    db_connector.execute_query(f"CREATE TABLE {TABLE} LIKE temps_readings", fetch="none")
+
+
+def _bench_single(rows):
+    t0 = time.perf_counter()
+    for r in rows:
+        db_connector.execute_query(UPSERT_SQL, r, fetch="none")
+    return time.perf_counter() - t0, len(rows)
+
+
+def _bench_many(rows, chunk):
+    t0 = time.perf_counter()
+    affected = db_connector.execute_many(UPSERT_SQL, rows, chunk_size=chunk)
+    return time.perf_counter() - t0, affected
+
+
+def _bench_upsert(rows, chunk):
+    t0 = time.perf_counter()
+    affected = db_connector.bulk_upsert(
+        TABLE, rows, key_cols=("device_id", "ts"),
+        columns=("device_id", "ts", "temperature", "status"), chunk_size=chunk,
+    )
+    return time.perf_counter() - t0, affected
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--single-rows", type=int, default=5_000)
+    ap.add_argument("--chunk", type=int, default=db_connector.BULK_CHUNK_ROWS)
+    args = ap.parse_args()
+
+    rows = _rows(args.rows)
+    results = []
+    try:
+        _reset()
+        sample = rows[:args.single_rows]
+        dt, aff = _bench_single(sample)
+        results.append(("single (extrap.)", dt * len(rows) / max(len(sample), 1), aff))
+
+        _reset()
+        dt, aff = _bench_many(rows, args.chunk)
+        results.append(("execute_many", dt, aff))
+
+        _reset()
+        dt, aff = _bench_upsert(rows, args.chunk)
+        results.append(("bulk_upsert insert", dt, aff))
+
+        # druhý prechod = čisté UPDATE vetvy ON DUPLICATE KEY
+        changed = [(d, ts, (t or 0) + 1, s) for d, ts, t, s in rows]
+        dt, aff = _bench_upsert(changed, args.chunk)
+        results.append(("bulk_upsert update", dt, aff))
+    finally:
+        db_connector.execute_query(f"DROP TABLE IF EXISTS {TABLE}", fetch="none")
+
+    print(f"{'metóda':22} {'čas s':>10} {'riadky/s':>12} {'affected':>10}")
+    for name, dt, aff in results:
+        print(f"{name:22} {dt:10.2f} {len(rows) / dt if dt else 0:12.0f} {aff:10}")
+
+
+if __name__ == "__main__":
+    main()
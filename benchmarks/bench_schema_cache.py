@@ -0,0 +1,98 @@
+# benchmarks/bench_schema_cache.py
+# Mikro-benchmark: latencia B2C admin endpointov pred/po zavedení schema_cache.
+#
+#   python benchmarks/bench_schema_cache.py [--rounds 50]
+#
+# Potrebuje bežiacu MySQL podľa .env (rovnako ako aplikácia).
+# "legacy" režim simuluje pôvodné správanie – každý lookup stĺpca = 1 dotaz
+# do INFORMATION_SCHEMA; "cache" režim používa zdieľaný katalóg.
+# Vypisuje medián / p95 latencie a počet SQL round-tripov na request.
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask
+
+import db_connector
+import schema_cache
+from kancelaria_b2c_api import kancelaria_b2c_bp
+
+ENDPOINTS = [
+    ("GET",  "/api/kancelaria/b2c/get_orders", None),
+    ("GET",  "/api/kancelaria/b2c/orders/page", None),
+    ("POST", "/api/kancelaria/b2c/customers/query", {"page": 1, "page_size": 50}),
+    ("GET",  "/api/kancelaria/b2c/stats/overview", None),
+    ("GET",  "/api/kancelaria/b2c/stats/top_customers", None),
+]
+
+
+def _legacy_table(table):
+    rows = db_connector.execute_query("""
+        SELECT COLUMN_NAME AS c, DATA_TYPE AS dt
+          FROM INFORMATION_SCHEMA.COLUMNS
+         WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME=%s
+    """, (table,)) or []
+    if not rows:
+        return None
+    return {str(r["c"]).lower(): (str(r["c"]), str(r["dt"]).lower()) for r in rows}
+
+
+_orig_execute_query = db_connector.execute_query
+_orig_table = schema_cache._table
+_calls = {"n": 0}
+
+
+def _counting_execute_query(*a, **kw):
+    _calls["n"] += 1
+    return _orig_execute_query(*a, **kw)
+
+
+def _run(client, rounds):
+    out = {}
+    for method, url, body in ENDPOINTS:
+        lat, trips = [], []
+        for _ in range(rounds):
+            _calls["n"] = 0
+            t0 = time.perf_counter()
+            if method == "GET":
+                client.get(url)
+            else:
+                client.post(url, json=body)
+            lat.append((time.perf_counter() - t0) * 1000.0)
+            trips.append(_calls["n"])
+        lat.sort()
+        out[url] = (statistics.median(lat), lat[int(len(lat) * 0.95) - 1], statistics.mean(trips))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=50)
+    args = ap.parse_args()
+
+    app = Flask(__name__)
+    app.register_blueprint(kancelaria_b2c_bp)
+    client = app.test_client()
+    db_connector.execute_query = _counting_execute_query
+
+    schema_cache._table = _legacy_table
+    legacy = _run(client, args.rounds)
+
+    schema_cache._table = _orig_table
+    schema_cache.refresh()
+    cached = _run(client, args.rounds)
+
+    print(f"{'endpoint':45} {'legacy p50/p95 ms':>20} {'cache p50/p95 ms':>20} {'SQL/req':>12}")
+    for url in legacy:
+        l50, l95, ltr = legacy[url]
+        c50, c95, ctr = cached[url]
+        print(f"{url:45} {l50:9.1f}/{l95:9.1f} {c50:9.1f}/{c95:9.1f} {ltr:5.1f}->{ctr:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# benchmarks/bench_stocktake.py
+# Benchmark inventúry Skladu 2: pôvodný postup submit_product_inventory vs. product_stocktake.submit
+# pre 5 000 napočítaných riadkov.
+#
+#   python benchmarks/bench_stocktake.py [--lines 5000] [--batches-per-product 20] [--repeat 3]
+#
+# Potrebuje bežiacu MySQL podľa .env (rovnako ako aplikácia).
+# Pracuje v pomocných tabuľkách bench_* (CREATE ... LIKE pôvodné tabuľky), ktoré na konci zmaže:
+#   povodny – korelovaný subselect "posledná cena dávky" na každý produkt, hlavička / detaily /
+#             korekcie skladu ako samostatné autocommity, UPDATE skladu po riadkoch
+#   engine  – product_stocktake.submit (ceny z knihy nákladov, jedna transakcia, dávkové zápisy)
+# Pred každým behom sa sklad vráti na východiskový stav, aby oba postupy zapisovali rovnaké rozdiely.
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, date, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import db_connector
+import cost_ledger
+import product_keys
+import product_stocktake
+
+T = {
+    "produkty": "bench_produkty",
+    "zaznamy_vyroba": "bench_zaznamy_vyroba",
+    "product_cost_ledger": "bench_product_cost_ledger",
+    "expedicia_inventury": "bench_expedicia_inventury",
+    "expedicia_inventura_polozky": "bench_expedicia_inventura_polozky",
+}
+KEY = product_keys.ZV_KEY
+
+
+def _reset():
+    cost_ledger.ensure_schema()
+    product_keys.ensure_schema()
+    for t in T.values():
+        db_connector.execute_query(f"DROP TABLE IF EXISTS {t}", fetch="none")
+    for src, dst in T.items():
+        db_connector.execute_query(f"CREATE TABLE {dst} LIKE {src}", fetch="none")
+
+
+def _seed(n_products, per_product, name_col):
+    rnd = random.Random(7)
+    products = [(f"{3000000000000 + i:013d}", f"Bench inventúra {i:05d}", "kg" if i % 4 else "ks",
+                 "VÝROBOK", 200 if i % 4 == 0 else None, round(rnd.uniform(5, 80), 3), "Bench")
+                for i in range(n_products)]
+    db_connector.execute_many(
+        f"INSERT INTO {T['produkty']} (ean, nazov_vyrobku, mj, typ_polozky, vaha_balenia_g, "
+        f"aktualny_sklad_finalny_kg, predajna_kategoria) VALUES (%s,%s,%s,%s,%s,%s,%s)", products)
+
+    start = datetime.now() - timedelta(days=per_product * 3)
+    batches = []
+    for i, (ean, name, *_rest) in enumerate(products):
+        for j in range(per_product):
+            day = start + timedelta(days=3 * j)
+            batches.append((f"S-{i:05d}-{j:03d}", "Ukončené", day, name, ean, 50.0, day, round(rnd.uniform(2, 9), 4)))
+    db_connector.execute_many(
+        f"INSERT INTO {T['zaznamy_vyroba']} (id_davky, stav, datum_vyroby, {name_col}, {KEY}, "
+        f"realne_mnozstvo_kg, datum_ukoncenia, cena_za_jednotku) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)", batches)
+    db_connector.execute_query(f"""
+        INSERT INTO {T['product_cost_ledger']} (ean, last_unit_cost)
+        SELECT p.ean, (SELECT z.cena_za_jednotku FROM {T['zaznamy_vyroba']} z
+                        WHERE z.{KEY} = p.ean ORDER BY z.datum_ukoncenia DESC LIMIT 1)
+          FROM {T['produkty']} p
+    """, fetch="none")
+    db_connector.execute_query(f"ANALYZE TABLE {T['produkty']}, {T['zaznamy_vyroba']}", fetch="all")
+    return [(e, s) for e, _, _, _, _, s, _ in products], len(batches)
+
+
+def _restore(stock):
+    db_connector.execute_many(f"UPDATE {T['produkty']} SET aktualny_sklad_finalny_kg=%s WHERE ean=%s",
+                              [(s, e) for e, s in stock])
+
+
+def _lines(stock):
+    rnd = random.Random(11)
+    # ~30 % riadkov s rozdielom
+    return [{"ean": e, "realQty": (s + rnd.uniform(-2, 2)) if rnd.random() < 0.3 else s} for e, s in stock]
+
+
+def _legacy(lines):
+    """Pôvodný postup submit_product_inventory nad bench tabuľkami."""
+    eans = [i["ean"] for i in lines]
+    rows = db_connector.execute_query(f"""
+        SELECT p.ean, p.nazov_vyrobku, p.predajna_kategoria, p.aktualny_sklad_finalny_kg, p.mj, p.vaha_balenia_g,
+               (SELECT zv.cena_za_jednotku FROM {T['zaznamy_vyroba']} zv
+                 WHERE p.ean = zv.{KEY} AND COALESCE(zv.cena_za_jednotku,0)>0
+                 ORDER BY COALESCE(zv.datum_ukoncenia,zv.datum_vyroby) DESC LIMIT 1) AS unit_cost_last
+          FROM {T['produkty']} p WHERE p.ean IN ({','.join(['%s'] * len(eans))})
+    """, tuple(eans)) or []
+    pmap = {r["ean"]: r for r in rows}
+    db_connector.execute_query(
+        f"INSERT INTO {T['expedicia_inventury']} (datum, vytvoril, created_at) VALUES (%s,%s,%s)",
+        (date.today(), "bench", datetime.now()), fetch="none")
+    inv_id = int(db_connector.execute_query(
+        f"SELECT MAX(id) AS id FROM {T['expedicia_inventury']}", fetch="one")["id"])
+    details, updates = [], []
+    for it in lines:
+        pr = pmap.get(it["ean"])
+        if pr is None:
+            continue
+        real = float(it["realQty"])
+        real_kg = real if pr["mj"] == "kg" else real * float(pr["vaha_balenia_g"] or 0) / 1000.0
+        sys_kg = float(pr["aktualny_sklad_finalny_kg"] or 0)
+        if abs(real_kg - sys_kg) > 0.0001:
+            d = real_kg - sys_kg
+            details.append((inv_id, pr["ean"], pr["nazov_vyrobku"], pr["predajna_kategoria"], sys_kg, real_kg, d,
+                            d * float(pr["unit_cost_last"] or 0)))
+            updates.append((real_kg, pr["ean"]))
+    db_connector.execute_many(
+        f"INSERT INTO {T['expedicia_inventura_polozky']} (inventura_id, ean, nazov, kategoria, system_stav_kg, "
+        f"realny_stav_kg, rozdiel_kg, hodnota_eur) VALUES (%s,%s,%s,%s,%s,%s,%s,%s)", details)
+    db_connector.execute_many(f"UPDATE {T['produkty']} SET aktualny_sklad_finalny_kg=%s WHERE ean=%s", updates)
+    return len(details)
+
+
+def _engine(lines):
+    return product_stocktake.submit(lines, "bench")["summary"]["differences"]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=5000)
+    ap.add_argument("--batches-per-product", type=int, default=20)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    saved = (product_stocktake.T_HEADER, product_stocktake.T_DETAIL,
+             product_stocktake.T_PRODUCTS, product_stocktake.T_LEDGER)
+    product_stocktake.T_HEADER = T["expedicia_inventury"]
+    product_stocktake.T_DETAIL = T["expedicia_inventura_polozky"]
+    product_stocktake.T_PRODUCTS = T["produkty"]
+    product_stocktake.T_LEDGER = T["product_cost_ledger"]
+    results = {}
+    try:
+        _reset()
+        t0 = time.perf_counter()
+        stock, n_batches = _seed(args.lines, args.batches_per_product, product_keys.zv_name_col())
+        print(f"seed: {len(stock)} produktov, {n_batches} dávok za {time.perf_counter() - t0:.1f} s")
+        lines = _lines(stock)
+
+        for name, fn in (("povodny", _legacy), ("engine", _engine)):
+            times, diffs = [], 0
+            for _ in range(args.repeat):
+                _restore(stock)
+                t0 = time.perf_counter()
+                diffs = fn(lines)
+                times.append(time.perf_counter() - t0)
+            results[name] = (statistics.median(times), diffs)
+    finally:
+        (product_stocktake.T_HEADER, product_stocktake.T_DETAIL,
+         product_stocktake.T_PRODUCTS, product_stocktake.T_LEDGER) = saved
+        for t in T.values():
+            db_connector.execute_query(f"DROP TABLE IF EXISTS {t}", fetch="none")
+
+    base = results.get("povodny", (0, 0))[0]
+    print(f"{'postup':10} {'čas s':>10} {'riadky/s':>10} {'rozdiely':>9} {'zrýchl.':>8}")
+    for name, (dt, diffs) in results.items():
+        print(f"{name:10} {dt:10.3f} {args.lines / dt if dt else 0:10.0f} {diffs:9d} {base / dt if dt else 0:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
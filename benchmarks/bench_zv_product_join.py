@@ -0,0 +1,159 @@
+# benchmarks/bench_zv_product_join.py
+# Benchmark JOINu výrobných dávok na produkty: TRIM(názov) = TRIM(názov) vs. produkt_ean = ean
+# nad syntetickou 5-ročnou históriou dávok.
+#
+#   python benchmarks/bench_zv_product_join.py [--years 5] [--per-day 40] [--products 400] [--repeat 5]
+#
+# Potrebuje bežiacu MySQL podľa .env (rovnako ako aplikácia).
+# Pracuje v pomocných tabuľkách bench_produkty / bench_zaznamy_vyroba
+# (CREATE ... LIKE produkty / zaznamy_vyroba), ktoré na konci zmaže. Meria:
+#   backfill        – jednorazové doplnenie produkt_ean podľa názvu (rovnaký UPDATE ako product_keys.backfill)
+#   top 30 dní      – TOP produkty za 30 dní (dashboard Kancelárie)
+#   priemery        – vážené výrobné priemery za celú históriu (get_avg_costs_catalog)
+#   posledná dávka  – korelovaný subselect "posledná cena dávky" pre každý produkt
+#                     (get_comprehensive_stock_view / submit_product_inventory)
+# Pre každý dotaz vypíše čas (medián z --repeat behov) pre oba JOINy a zrýchlenie.
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import db_connector
+import product_keys
+
+P_TABLE = "bench_produkty"
+ZV_TABLE = "bench_zaznamy_vyroba"
+KEY = product_keys.ZV_KEY
+
+
+def _reset():
+    for t in (ZV_TABLE, P_TABLE):
+        db_connector.execute_query(f"DROP TABLE IF EXISTS {t}", fetch="none")
+    db_connector.execute_query(f"CREATE TABLE {P_TABLE} LIKE produkty", fetch="none")
+    db_connector.execute_query(f"CREATE TABLE {ZV_TABLE} LIKE zaznamy_vyroba", fetch="none")
+    cols = {r["c"].lower() for r in db_connector.execute_query(
+        "SELECT COLUMN_NAME AS c FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (ZV_TABLE,)) or []}
+    if KEY not in cols:
+        db_connector.execute_query(f"ALTER TABLE {ZV_TABLE} ADD COLUMN {KEY} {product_keys.ean_col_def()} NULL", fetch="none")
+    idx = db_connector.execute_query(
+        "SELECT 1 FROM INFORMATION_SCHEMA.STATISTICS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+        (ZV_TABLE, "idx_zv_produkt_ean"), fetch="one")
+    if not idx:
+        db_connector.execute_query(
+            f"CREATE INDEX idx_zv_produkt_ean ON {ZV_TABLE} ({KEY}, datum_ukoncenia)", fetch="none")
+
+
+def _seed(name_col, years, per_day, n_products):
+    rnd = random.Random(42)
+    products = [(f"{2000000000000 + i:013d}", f"Bench výrobok {i:04d}", "kg" if i % 3 else "ks",
+                 "VÝROBOK", 250 if i % 3 == 0 else None) for i in range(n_products)]
+    db_connector.execute_many(
+        f"INSERT INTO {P_TABLE} (ean, nazov_vyrobku, mj, typ_polozky, vaha_balenia_g) VALUES (%s,%s,%s,%s,%s)",
+        products)
+
+    start = datetime.now().replace(hour=6, minute=0, second=0, microsecond=0) - timedelta(days=365 * years)
+    rows = []
+    for d in range(365 * years):
+        day = start + timedelta(days=d)
+        for j in range(per_day):
+            _, name, _, _, _ = products[rnd.randrange(n_products)]
+            kg = round(rnd.uniform(20, 300), 3)
+            # pôvodné dáta majú občas medzery navyše – práve kvôli nim sú v JOINoch TRIM()
+            if j % 17 == 0:
+                name = name + " "
+            rows.append((f"B-{d:05d}-{j:03d}", "Ukončené", day, name, kg, kg * 0.97,
+                         int(kg * 4), day, day + timedelta(hours=6), round(rnd.uniform(2, 9), 4)))
+    db_connector.execute_many(
+        f"INSERT INTO {ZV_TABLE} (id_davky, stav, datum_vyroby, {name_col}, planovane_mnozstvo_kg, "
+        f"realne_mnozstvo_kg, realne_mnozstvo_ks, datum_spustenia, datum_ukoncenia, cena_za_jednotku) "
+        f"VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)",
+        rows)
+    return len(rows)
+
+
+def _queries(name_col):
+    trim = f"TRIM(zv.{name_col}) = TRIM(p.nazov_vyrobku)"
+    keyed = f"p.ean = zv.{KEY}"
+    tpl = {
+        "top 30 dní": f"""
+            SELECT p.nazov_vyrobku AS name, SUM(COALESCE(zv.realne_mnozstvo_kg,0)) AS total
+              FROM {ZV_TABLE} zv JOIN {P_TABLE} p ON {{j}}
+             WHERE zv.datum_ukoncenia >= CURDATE() - INTERVAL 30 DAY
+               AND zv.stav IN ('Ukončené','Dokončené') AND COALESCE(zv.realne_mnozstvo_kg,0) > 0
+             GROUP BY p.nazov_vyrobku ORDER BY total DESC LIMIT 5""",
+        "priemery": f"""
+            SELECT p.ean, p.mj,
+                   SUM((CASE WHEN p.mj='kg' THEN COALESCE(zv.realne_mnozstvo_kg,0)
+                             ELSE COALESCE(zv.realne_mnozstvo_ks,0) END) * COALESCE(zv.cena_za_jednotku,0)) AS c,
+                   SUM(CASE WHEN p.mj='kg' THEN COALESCE(zv.realne_mnozstvo_kg,0)
+                            ELSE COALESCE(zv.realne_mnozstvo_ks,0) END) AS u
+              FROM {ZV_TABLE} zv JOIN {P_TABLE} p ON {{j}}
+             WHERE COALESCE(zv.cena_za_jednotku,0) > 0
+             GROUP BY p.ean, p.mj""",
+        "posledná dávka": f"""
+            SELECT p.ean,
+                   (SELECT zv.cena_za_jednotku FROM {ZV_TABLE} zv
+                     WHERE {{j}} AND COALESCE(zv.cena_za_jednotku,0) > 0
+                     ORDER BY zv.datum_ukoncenia DESC LIMIT 1) AS last_cost
+              FROM {P_TABLE} p""",
+    }
+    return {name: (sql.format(j=trim), sql.format(j=keyed)) for name, sql in tpl.items()}
+
+
+def _time(sql, repeat):
+    times = []
+    n = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        n = len(db_connector.execute_query(sql) or [])
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times), n
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--years", type=int, default=5)
+    ap.add_argument("--per-day", type=int, default=40)
+    ap.add_argument("--products", type=int, default=400)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    name_col = product_keys.zv_name_col()
+    results = []
+    try:
+        _reset()
+        t0 = time.perf_counter()
+        batches = _seed(name_col, args.years, args.per_day, args.products)
+        print(f"seed: {batches} dávok, {args.products} produktov za {time.perf_counter() - t0:.1f} s")
+
+        t0 = time.perf_counter()
+        filled = db_connector.execute_query(f"""
+            UPDATE {ZV_TABLE} zv JOIN {P_TABLE} p ON TRIM(zv.{name_col}) = TRIM(p.nazov_vyrobku)
+               SET zv.{KEY} = p.ean
+             WHERE zv.{KEY} IS NULL
+        """, fetch="rowcount")
+        print(f"backfill: {filled} riadkov za {time.perf_counter() - t0:.2f} s")
+        db_connector.execute_query(f"ANALYZE TABLE {ZV_TABLE}, {P_TABLE}")
+
+        for name, (q_trim, q_key) in _queries(name_col).items():
+            dt_trim, n_trim = _time(q_trim, args.repeat)
+            dt_key, n_key = _time(q_key, args.repeat)
+            results.append((name, dt_trim, dt_key, n_trim, n_key))
+    finally:
+        for t in (ZV_TABLE, P_TABLE):
+            db_connector.execute_query(f"DROP TABLE IF EXISTS {t}", fetch="none")
+
+    print(f"{'dotaz':16} {'TRIM s':>10} {'ean s':>10} {'zrýchl.':>8} {'riadky':>14}")
+    for name, a, b, na, nb in results:
+        print(f"{name:16} {a:10.3f} {b:10.3f} {a / b if b else 0:8.1f} {f'{na}/{nb}':>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# cost_ledger.py
+# Nákladová kniha produktov (product_cost_ledger) – jeden riadok na EAN
+# - sum_cost_units / sum_units: vážený priemer výrobnej ceny (cena_za_jednotku dávok,
+#   jednotky = kg alebo ks podľa produkty.mj) – rovnaký výpočet ako pôvodný GROUP BY
+# - last_unit_cost / last_cost_per_kg / last_batch_at: posledná dávka produktu
+# - purchase_sum_cost / purchase_sum_qty: vážený priemer nákupnej ceny (tovar)
+#
+# Zápis: refresh_product(ean, cur) po ukončení dávky (príjem z výroby), po krájaní
+# a po príjme tovaru – prepočet jedného produktu cez index zaznamy_vyroba(produkt_ean, ...),
+# v transakcii volajúceho. rebuild() = plný prepočet (bootstrap, nočná rekonsiliácia).
+# Čítanie: get_avg_costs_catalog / get_comprehensive_stock_view = jeden indexovaný dotaz.
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import db_connector
+import schema_cache
+import product_keys
+
+_schema_ready = False
+_bootstrapped = False
+_lock = threading.Lock()
+
+# staršie zdroje nákupných cien (tabuľka, ean, množstvo, cena) – rebuild použije prvý neprázdny
+PURCHASE_SOURCES = [
+    ('produkty_prijmy',  'ean',          'mnozstvo_kg', 'cena_eur_kg'),
+    ('prijmy_sklad2',    'ean',          'mnozstvo_kg', 'cena_kg'),
+    ('tovar_prijmy',     'ean_produktu', 'mnozstvo',    'cena_za_jednotku'),
+    ('prijmy_produktov', 'ean',          'mnozstvo',    'cena'),
+]
+
+
+def ensure_schema() -> None:
+    global _schema_ready
+    if _schema_ready:
+        return
+    db_connector.execute_query(f"""
+        CREATE TABLE IF NOT EXISTS product_cost_ledger (
+          ean               {product_keys.ean_col_def()} NOT NULL PRIMARY KEY,
+          sum_cost_units    DECIMAL(18,4) NOT NULL DEFAULT 0,
+          sum_units         DECIMAL(18,4) NOT NULL DEFAULT 0,
+          last_unit_cost    DECIMAL(12,4) NULL,
+          last_cost_per_kg  DECIMAL(12,4) NULL,
+          last_batch_at     DATETIME      NULL,
+          purchase_sum_cost DECIMAL(18,4) NOT NULL DEFAULT 0,
+          purchase_sum_qty  DECIMAL(18,4) NOT NULL DEFAULT 0,
+          updated_at        TIMESTAMP     NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB
+    """, fetch='none')
+    _schema_ready = True
+
+
+# ─────────────────────────────────────────────────────────────
+# Výrobná strana – prepočet z dávok
+# ─────────────────────────────────────────────────────────────
+def _manuf_upsert_sql(where: str) -> str:
+    j, j2 = product_keys.zv_join('zv', 'p'), product_keys.zv_join('z2', 'p')
+    units = ("(CASE WHEN p.mj='kg' THEN COALESCE(zv.realne_mnozstvo_kg,0) "
+             "ELSE COALESCE(zv.realne_mnozstvo_ks,0) END)")
+    return f"""
+        INSERT INTO product_cost_ledger
+               (ean, sum_cost_units, sum_units, last_unit_cost, last_cost_per_kg, last_batch_at)
+        SELECT p.ean,
+               COALESCE(SUM(CASE WHEN zv.cena_za_jednotku > 0 THEN {units} * zv.cena_za_jednotku END), 0),
+               COALESCE(SUM(CASE WHEN zv.cena_za_jednotku > 0 THEN {units} END), 0),
+               (SELECT z2.cena_za_jednotku FROM zaznamy_vyroba z2
+                 WHERE {j2} AND z2.cena_za_jednotku > 0
+                 ORDER BY COALESCE(z2.datum_ukoncenia, z2.datum_vyroby) DESC LIMIT 1),
+               (SELECT ROUND(z2.celkova_cena_surovin / NULLIF(z2.realne_mnozstvo_kg, 0), 4) FROM zaznamy_vyroba z2
+                 WHERE {j2} AND z2.celkova_cena_surovin IS NOT NULL AND z2.realne_mnozstvo_kg IS NOT NULL
+                 ORDER BY COALESCE(z2.datum_ukoncenia, z2.datum_vyroby) DESC LIMIT 1),
+               MAX(COALESCE(zv.datum_ukoncenia, zv.datum_vyroby))
+          FROM produkty p
+          LEFT JOIN zaznamy_vyroba zv ON {j}
+         {where}
+         GROUP BY p.ean
+        ON DUPLICATE KEY UPDATE
+               sum_cost_units   = VALUES(sum_cost_units),
+               sum_units        = VALUES(sum_units),
+               last_unit_cost   = VALUES(last_unit_cost),
+               last_cost_per_kg = VALUES(last_cost_per_kg),
+               last_batch_at    = VALUES(last_batch_at)
+    """
+
+
+def refresh_products(eans: Iterable[str], cur=None) -> None:
+    """
+    Prepočíta výrobnú časť knihy pre zadané produkty (len ich dávky, cez index).
+    `cur` = kurzor otvorenej transakcie – zápis je atomický so zmenou dávky.
+    """
+    eans = [e for e in dict.fromkeys(str(e or '').strip() for e in eans or []) if e]
+    if not eans:
+        return
+    ensure_schema()
+    sql = _manuf_upsert_sql(f"WHERE p.ean IN ({','.join(['%s'] * len(eans))})")
+    if cur is not None:
+        cur.execute(sql, tuple(eans))
+    else:
+        db_connector.execute_query(sql, tuple(eans), fetch='none')
+
+
+def refresh_product(ean: Optional[str], cur=None) -> None:
+    if ean:
+        refresh_products([ean], cur=cur)
+
+
+# ─────────────────────────────────────────────────────────────
+# Nákupná strana
+# ─────────────────────────────────────────────────────────────
+def add_purchase(ean: str, qty: float, unit_cost: float, cur=None) -> None:
+    """Pripočíta príjem tovaru (qty v MJ zdroja, unit_cost €/MJ) do váženého nákupného priemeru."""
+    if not ean or not qty or unit_cost is None:
+        return
+    ensure_schema()
+    sql = """
+        INSERT INTO product_cost_ledger (ean, purchase_sum_cost, purchase_sum_qty) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE purchase_sum_cost = purchase_sum_cost + VALUES(purchase_sum_cost),
+                                purchase_sum_qty  = purchase_sum_qty  + VALUES(purchase_sum_qty)
+    """
+    params = (ean, float(qty) * float(unit_cost), float(qty))
+    if cur is not None:
+        cur.execute(sql, params)
+    else:
+        db_connector.execute_query(sql, params, fetch='none')
+
+
+def _legacy_purchase_sources() -> List[Tuple[str, str, str, str]]:
+    """Zdroje príjmov v poradí priority, ktorých stĺpce existujú (prázdne preskočí až rebuild)."""
+    return [(tbl, ce, cq, cp) for tbl, ce, cq, cp in PURCHASE_SOURCES
+            if schema_cache.has_col(tbl, ce) and schema_cache.has_col(tbl, cq) and schema_cache.has_col(tbl, cp)]
+
+
+# ─────────────────────────────────────────────────────────────
+# Rebuild / bootstrap
+# ─────────────────────────────────────────────────────────────
+def rebuild() -> Dict[str, Any]:
+    """Plný prepočet knihy (všetky produkty); nákupná časť z prvého NEPRÁZDNEHO zdroja príjmov."""
+    ensure_schema()
+    sources = _legacy_purchase_sources()
+    used: List[str] = []
+
+    def work(conn):
+        cur = conn.cursor()
+        try:
+            cur.execute(_manuf_upsert_sql(""))
+            n = cur.rowcount
+            for tbl, ce, cq, cp in sources:
+                # GROUP BY v zdrojovej tabuľke (bez JOINu – staršie tabuľky môžu mať inú koláciu)
+                cur.execute(f"SELECT TRIM({ce}) AS ean, SUM({cq}) AS qty, SUM({cq}*{cp}) AS val "
+                            f"FROM {tbl} GROUP BY TRIM({ce})")
+                rows = [(r[0], float(r[2] or 0.0), float(r[1] or 0.0))
+                        for r in cur.fetchall() if r[0] and float(r[1] or 0.0) > 0]
+                if not rows:
+                    continue   # prázdny zdroj – ako pôvodne skús ďalší
+                cur.executemany("""
+                    INSERT INTO product_cost_ledger (ean, purchase_sum_cost, purchase_sum_qty) VALUES (%s, %s, %s)
+                    ON DUPLICATE KEY UPDATE purchase_sum_cost = VALUES(purchase_sum_cost),
+                                            purchase_sum_qty  = VALUES(purchase_sum_qty)
+                """, rows)
+                used.append(tbl)
+                break
+            return n
+        finally:
+            cur.close()
+
+    n = db_connector.with_transaction(work)
+    return {"message": "Nákladová kniha produktov prepočítaná.", "rows": n,
+            "purchase_source": used[0] if used else None}
+
+
+def _ensure_bootstrapped() -> None:
+    """Pri prvom čítaní v procese: prázdnu knihu naplň rebuildom."""
+    global _bootstrapped
+    if _bootstrapped:
+        return
+    with _lock:
+        if _bootstrapped:
+            return
+        ensure_schema()
+        if not db_connector.execute_query("SELECT 1 AS x FROM product_cost_ledger LIMIT 1", fetch='one'):
+            rebuild()
+        _bootstrapped = True
+
+
+# ─────────────────────────────────────────────────────────────
+# Čítanie
+# ─────────────────────────────────────────────────────────────
+def ledger_select() -> str:
+    """
+    Stĺpce knihy pre SELECT nad `produkty p LEFT JOIN product_cost_ledger l ON l.ean = p.ean`:
+    manuf_avg (€/MJ), purchase_avg (€/MJ zdroja), last_cost_per_kg, last_unit_cost, last_batch_at.
+    """
+    _ensure_bootstrapped()
+    return ("l.sum_units, l.sum_cost_units, "
+            "CASE WHEN l.sum_units > 0 THEN l.sum_cost_units / l.sum_units ELSE 0 END AS manuf_avg, "
+            "CASE WHEN l.purchase_sum_qty > 0 THEN l.purchase_sum_cost / l.purchase_sum_qty END AS purchase_avg, "
+            "l.last_cost_per_kg, l.last_unit_cost, l.last_batch_at")
@@ -8,6 +8,7 @@ from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime, date, timedelta
 import calendar
 import db_connector
+import date_ranges
 
 # Výnosy (pre dashboard) – voliteľné, ak modul ziskovosti existuje
 try:
@@ -220,15 +221,16 @@ def get_costs_data(year: Any, month: Any) -> Dict[str, Any]:
     hr = get_hr_block(y, m)
 
     # Prevádzkové náklady (detail + zoznam kategórií)
+    op_sql, op_params = date_ranges.month("ci.entry_date", y, m)
     op_items = db_connector.execute_query(
-        """
+        f"""
         SELECT ci.*, cc.category_name
         FROM costs_items ci
         JOIN costs_categories cc ON cc.id = ci.category_id
-        WHERE YEAR(ci.entry_date)=%s AND MONTH(ci.entry_date)=%s
+        WHERE {op_sql}
         ORDER BY ci.entry_date DESC
         """,
-        (y, m)
+        tuple(op_params)
     ) or []
     categories = db_connector.execute_query(
         "SELECT id, category_name AS name FROM costs_categories ORDER BY category_name"
@@ -333,15 +335,16 @@ def save_hr_data(data: Dict[str, Any]) -> Dict[str, Any]:
 # Prevádzkové náklady – položky a kategórie
 # -----------------------------------------------------------------
 def get_operational_block(year: int, month: int) -> Dict[str, Any]:
+    op_sql, op_params = date_ranges.month("ci.entry_date", year, month)
     items = db_connector.execute_query(
-        """
+        f"""
         SELECT ci.*, cc.category_name
         FROM costs_items ci
         JOIN costs_categories cc ON cc.id = ci.category_id
-        WHERE YEAR(ci.entry_date)=%s AND MONTH(ci.entry_date)=%s
+        WHERE {op_sql}
         ORDER BY ci.entry_date DESC
         """,
-        (year, month)
+        tuple(op_params)
     ) or []
     cats = db_connector.execute_query(
         "SELECT id, category_name AS name FROM costs_categories ORDER BY category_name"
@@ -470,14 +473,6 @@ def _ym_key(y: int, m: int) -> int:
     return y * 100 + m
 
 
-def _month_key(y: int, m: int) -> int:
-    return y * 100 + m
-
-
-def _month_span(from_y: int, from_m: int, to_y: int, to_m: int) -> Tuple[int, int]:
-    return _month_key(from_y, from_m), _month_key(to_y, to_m)
-
-
 def _electricity_metrics(row: Dict[str, Any]) -> Dict[str, Any]:
     prod = max(0.0, _nz(row.get("el_prod_end_kwh")) - _nz(row.get("el_prod_start_kwh")))
     oth  = max(0.0, _nz(row.get("el_other_end_kwh")) - _nz(row.get("el_other_start_kwh")))
@@ -570,14 +565,14 @@ def get_energy_history(q: Dict[str, Any]) -> Dict[str, Any]:
         for _ in range(11):
             fy, fm = _prev_month(fy, fm)
 
-    k_from, k_to = _month_span(fy, fm, ty, tm)
+    ym_sql, ym_params = date_ranges.year_months("report_year", "report_month", fy, fm, ty, tm)
     rows = db_connector.execute_query(
-        """
+        f"""
         SELECT * FROM costs_energy_monthly
-        WHERE (report_year * 100 + report_month) BETWEEN %s AND %s
+        WHERE {ym_sql}
         ORDER BY report_year, report_month
         """,
-        (k_from, k_to)
+        tuple(ym_params)
     ) or []
 
     series = []
@@ -659,14 +654,14 @@ def get_energy_report_html(params: Dict[str, Any]):
         fy, fm, ty, tm = y, m, y, m
         title = f"Energetický report – {y}-{m:02d}"
 
-    k_from, k_to = _month_span(fy, fm, ty, tm)
+    ym_sql, ym_params = date_ranges.year_months("report_year", "report_month", fy, fm, ty, tm)
     rows = db_connector.execute_query(
-        """
+        f"""
         SELECT * FROM costs_energy_monthly
-        WHERE (report_year * 100 + report_month) BETWEEN %s AND %s
+        WHERE {ym_sql}
         ORDER BY report_year, report_month
         """,
-        (k_from, k_to)
+        tuple(ym_params)
     ) or []
 
     # hlavičky
@@ -743,13 +738,14 @@ def get_dashboard_data(year: int, month: int) -> Dict[str, Any]:
     hr_costs = hr["total_salaries"] + hr["total_levies"]
     
     # Get operational costs
+    op_sql, op_params = date_ranges.month("entry_date", year, month)
     op_items = db_connector.execute_query(
-        """
+        f"""
         SELECT SUM(amount_net) as total
-        FROM costs_items 
-        WHERE YEAR(entry_date)=%s AND MONTH(entry_date)=%s
+        FROM costs_items
+        WHERE {op_sql}
         """,
-        (year, month), fetch="one"
+        tuple(op_params), fetch="one"
     )
     op_costs = _nz(op_items["total"]) if op_items else 0.0
     
@@ -1,4 +1,5 @@
 import db_connector
+import date_ranges
 from datetime import datetime, timedelta
 import math
 
@@ -616,8 +617,9 @@ def get_inventory_difference_report_html(date_str):
     if not date_str:
         return "<h1>Chyba: Nebol zadaný dátum.</h1>"
 
-    query = "SELECT * FROM inventurne_rozdiely WHERE DATE(datum) = %s ORDER BY nazov_suroviny"
-    records = execute_query(query, (date_str,))
+    day_sql, day_params = date_ranges.day("datum", date_str)
+    query = f"SELECT * FROM inventurne_rozdiely WHERE {day_sql} ORDER BY nazov_suroviny"
+    records = execute_query(query, tuple(day_params))
 
     body_rows = ""
     total_diff_value = 0
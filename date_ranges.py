@@ -0,0 +1,280 @@
+# date_ranges.py
+# Dátumové filtre pre reportovacie dotazy – vždy polouzavretý interval nad holým stĺpcom:
+#     col >= start AND col < end
+# namiesto DATE(col) BETWEEN / YEAR(col)=.. AND MONTH(col)=.. / (rok*100+mesiac) BETWEEN,
+# ktoré index na stĺpci nepoužijú (funkcia na stĺpci = full scan). Funguje rovnako pre DATE aj DATETIME.
+#
+#   sql, params = date_ranges.days('o.datum_objednavky', '2025-01-01', '2025-01-31')
+#   sql, params = date_ranges.month('ci.entry_date', 2025, 1)
+#   sql, params = date_ranges.year_months('report_year', 'report_month', 2024, 11, 2025, 10)
+#
+# ensure_indexes() = migrácia podporných indexov (raz za proces; pri štarte aplikácie).
+# python date_ranges.py = regresná kontrola reálnych dotazov handlerov (sargable predikát + EXPLAIN bez full scanu).
+
+import re
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import db_connector
+import schema_cache
+
+_schema_ready = False
+_lock = threading.Lock()
+
+DateLike = Union[date, datetime, str, None]
+
+# kandidáti dátumových stĺpcov objednávok / registrácií (moduly ich detegujú cez _first_col)
+ORDER_DATE = ('datum_objednavky', 'created_at', 'created', 'datum')
+DELIVERY_DATE = ('pozadovany_datum_dodania', 'datum_dodania', 'delivery_date')
+
+# (tabuľka, názov indexu, stĺpce) – stĺpec môže byť n-tica kandidátov (použije sa prvý existujúci)
+INDEXES: Sequence[Tuple[str, str, Tuple[Any, ...]]] = (
+    ('fleet_logs',             'idx_fl_vehicle_date',   ('vehicle_id', 'log_date')),
+    ('fleet_refueling',        'idx_fr_vehicle_date',   ('vehicle_id', 'refueling_date')),
+    ('costs_items',            'idx_ci_entry_date',     ('entry_date',)),
+    ('costs_energy_monthly',   'idx_cem_year_month',    ('report_year', 'report_month')),
+    ('b2c_objednavky',         'idx_b2c_obj_order_date', (ORDER_DATE,)),
+    ('b2c_objednavky',         'idx_b2c_obj_delivery',  (DELIVERY_DATE,)),
+    ('b2b_objednavky',         'idx_b2b_obj_order_date', (ORDER_DATE,)),
+    ('b2b_objednavky',         'idx_b2b_obj_delivery',  (DELIVERY_DATE,)),
+    ('b2b_zakaznici',          'idx_b2b_zak_registered', (('datum_registracie', 'created_at', 'created', 'datum'),)),
+    ('b2c_uplatnene_odmeny',   'idx_b2c_uo_created',    (('datum_vytvorenia', 'created_at'),)),
+    ('zaznamy_vyroba',         'idx_zv_datum_vyroby',   ('datum_vyroby',)),
+    ('zaznamy_vyroba',         'idx_zv_datum_ukoncenia', ('datum_ukoncenia',)),
+    ('zaznamy_prijem',         'idx_zp_datum',          ('datum',)),
+    ('inventurne_rozdiely',    'idx_ir_datum',          ('datum',)),
+)
+
+
+# -----------------------------------------------------------------
+# Hranice intervalov
+# -----------------------------------------------------------------
+
+def to_date(v: DateLike) -> Optional[date]:
+    """'YYYY-MM-DD' / date / datetime -> date; prázdne -> None; nezmysel -> ValueError."""
+    if v is None or v == '':
+        return None
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    return datetime.strptime(str(v).strip()[:10], '%Y-%m-%d').date()
+
+
+def day_bounds(d_from: DateLike, d_to: DateLike) -> Tuple[Optional[date], Optional[date]]:
+    """Dni vrátane [d_from, d_to] -> polouzavreté [d_from, d_to + 1 deň)."""
+    start, last = to_date(d_from), to_date(d_to)
+    return start, (last + timedelta(days=1) if last else None)
+
+
+def month_bounds(year: int, month: int) -> Tuple[date, date]:
+    """[1. deň mesiaca, 1. deň nasledujúceho)."""
+    y, m = int(year), int(month)
+    return date(y, m, 1), (date(y + 1, 1, 1) if m == 12 else date(y, m + 1, 1))
+
+
+# -----------------------------------------------------------------
+# Predikáty – (sql, params) na vloženie do WHERE
+# -----------------------------------------------------------------
+
+def half_open(col: str, start: Optional[date], end: Optional[date]) -> Tuple[str, List[Any]]:
+    """`col >= start AND col < end`; chýbajúca hranica sa vynechá, bez hraníc '1=1'."""
+    parts, params = [], []
+    if start is not None:
+        parts.append(f"{col} >= %s")
+        params.append(start)
+    if end is not None:
+        parts.append(f"{col} < %s")
+        params.append(end)
+    return (' AND '.join(parts) or '1=1'), params
+
+
+def days(col: str, d_from: DateLike, d_to: DateLike = None) -> Tuple[str, List[Any]]:
+    """Dni vrátane [d_from, d_to] (náhrada `DATE(col) BETWEEN` / `DATE(col) >= .. <=`); prázdna hranica = bez obmedzenia."""
+    return half_open(col, *day_bounds(d_from, d_to))
+
+
+def day(col: str, d: DateLike) -> Tuple[str, List[Any]]:
+    """Jeden deň (náhrada `DATE(col) = %s`)."""
+    return half_open(col, *day_bounds(d, d))
+
+
+def month(col: str, year: int, month_: int) -> Tuple[str, List[Any]]:
+    """Kalendárny mesiac (náhrada `YEAR(col)=%s AND MONTH(col)=%s`)."""
+    return half_open(col, *month_bounds(year, month_))
+
+
+def year_months(ycol: str, mcol: str, fy: int, fm: int, ty: int, tm: int) -> Tuple[str, List[Any]]:
+    """
+    Rozsah mesiacov vrátane pre tabuľky s (rok, mesiac) stĺpcami (náhrada `(rok*100+mesiac) BETWEEN`).
+    Rozsah rokov ide cez index (rok, mesiac), hraničné mesiace dofiltruje zvyšok podmienky.
+    """
+    fy, fm, ty, tm = int(fy), int(fm), int(ty), int(tm)
+    sql = (f"{ycol} BETWEEN %s AND %s"
+           f" AND ({ycol} > %s OR {mcol} >= %s)"
+           f" AND ({ycol} < %s OR {mcol} <= %s)")
+    return sql, [fy, ty, fy, fm, ty, tm]
+
+
+# -----------------------------------------------------------------
+# Migrácia indexov
+# -----------------------------------------------------------------
+
+def _resolve_cols(table: str, cols: Tuple[Any, ...]) -> Optional[Tuple[str, ...]]:
+    out = []
+    for c in cols:
+        cands = c if isinstance(c, tuple) else (c,)
+        hit = next((x for x in cands if schema_cache.has_col(table, x)), None)
+        if not hit:
+            return None
+        out.append(hit)
+    return tuple(out)
+
+
+def _existing_prefixes(table: str) -> Tuple[set, Dict[str, List[str]]]:
+    rows = db_connector.execute_query("""
+        SELECT INDEX_NAME AS n, COLUMN_NAME AS c FROM INFORMATION_SCHEMA.STATISTICS
+         WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+         ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (table,)) or []
+    by_name: Dict[str, List[str]] = {}
+    for r in rows:
+        by_name.setdefault(r['n'], []).append(r['c'])
+    return set(by_name), by_name
+
+
+def ensure_indexes() -> Dict[str, Any]:
+    """
+    Založí chýbajúce indexy pre dátumové filtre. Index sa preskočí, ak tabuľka/stĺpec neexistuje
+    alebo už iný index začína rovnakými stĺpcami. Raz za proces.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return {"created": []}
+    with _lock:
+        if _schema_ready:
+            return {"created": []}
+        created = []
+        for table, name, spec in INDEXES:
+            try:
+                if not schema_cache.table_exists(table):
+                    continue
+                cols = _resolve_cols(table, spec)
+                if not cols:
+                    continue
+                names, by_name = _existing_prefixes(table)
+                if name in names or any(tuple(v[:len(cols)]) == cols for v in by_name.values()):
+                    continue
+                db_connector.execute_query(f"CREATE INDEX {name} ON {table} ({', '.join(cols)})", fetch='none')
+                created.append(f"{table}.{name}")
+            except Exception as e:
+                print(f"!!! UPOZORNENIE: date_ranges – index {table}.{name} zlyhal: {e}")
+        _schema_ready = True
+        return {"created": created}
+
+
+# -----------------------------------------------------------------
+# Kontrola regresie – reálne dotazy handlerov musia ostať sargable
+# -----------------------------------------------------------------
+# Handlery s prepísanými dátumovými filtrami sa spustia s pevnými parametrami (len čítanie),
+# execute_query sa počas behu zachytáva a každý zachytený SELECT sa
+#   1) staticky skontroluje na funkciu nad stĺpcom v porovnaní (DATE(col) = / YEAR(col) = / rok*100+mesiac ..)
+#   2) spustí cez EXPLAIN – full scan (type=ALL) nad >= EXPLAIN_FULL_SCAN_ROWS riadkami je chyba.
+# Flask route s dotazmi priamo v tele (leader_handler, stats_* v kancelaria_b2c_api) sa takto spustiť nedajú;
+# ich SQL skladajú days()/day() vyššie, ktoré funkciu nad stĺpcom nevyrobia.
+
+EXPLAIN_FULL_SCAN_ROWS = 1000
+
+# (modul, funkcia, parametre(dnes)) – len funkcie, ktoré do DB nezapisujú
+PROBES: Sequence[Tuple[str, str, Any]] = (
+    ('costs_handler',         'get_operational_block',             lambda t: (t.year, t.month)),
+    ('costs_handler',         'get_energy_history',                lambda t: ({"year": t.year, "month": t.month},)),
+    ('profitability_handler', 'compute_strict_production_revenue', lambda t: (t.year, t.month)),
+    ('expedition_handler',    'get_productions_by_date',           lambda t: (t.isoformat(),)),
+    ('fleet_handler',         'get_fleet_matrix',                  lambda t: (None, f"{t.year - 1}-{t.month:02d}",
+                                                                              f"{t.year}-{t.month:02d}")),
+    ('kancelaria_b2c_api',    '_orders_agg',                       lambda t: ((t - timedelta(days=30)).isoformat(),
+                                                                              t.isoformat())),
+    ('kancelaria_b2c_api',    '_dashboard_payload',                lambda t: (t - timedelta(days=7), t)),
+)
+
+_RE_NON_SARGABLE = re.compile(
+    r"\b(?:DATE|YEAR|MONTH|DAY|DATE_FORMAT)\s*\(\s*[\w.`]+\s*(?:,[^)]*)?\)\s*(?:=|<|>|<=|>=|BETWEEN|IN\b)"
+    r"|\(\s*[\w.`]+\s*\*\s*100\s*\+\s*[\w.`]+\s*\)\s*(?:BETWEEN|=|<|>)",
+    re.IGNORECASE)
+_RE_WRITE = re.compile(r"^\s*(?:INSERT|REPLACE|UPDATE|DELETE|TRUNCATE)\b", re.IGNORECASE)
+
+
+def _capture(module: str, func: str, args: tuple) -> List[Tuple[str, Any]]:
+    """
+    Spustí handler a vráti ním vykonané SELECTy [(sql, params)]; zápis do DB sa odmietne.
+    Prvý (nesledovaný) beh dokončí runtime migrácie (ensure_schema) – tie zapisovať smú.
+    """
+    import importlib
+    fn = getattr(importlib.import_module(module), func)
+    fn = getattr(fn, 'uncached', fn)   # result_cache by dotaz nespustil
+    fn(*args)
+    seen: List[Tuple[str, Any]] = []
+    orig = db_connector.execute_query
+
+    def spy(query, params=None, *a, **kw):
+        q = query if isinstance(query, str) else str(query)
+        if _RE_WRITE.match(q):
+            raise RuntimeError(f"kontrola: {module}.{func} zapisuje do DB")
+        if q.lstrip().upper().startswith(("SELECT", "WITH")):
+            seen.append((q, params))
+        return orig(query, params, *a, **kw)
+
+    db_connector.execute_query = spy
+    try:
+        fn(*args)
+    finally:
+        db_connector.execute_query = orig
+    return seen
+
+
+def explain_check() -> List[Dict[str, Any]]:
+    """
+    Regresná kontrola reálnych dotazov (viď PROBES). Na riadok zachyteného dotazu:
+    ok = bez funkcie nad stĺpcom v porovnaní a bez full scanu veľkej tabuľky. Len pre CLI (mení execute_query).
+    """
+    t = date.today()
+    report = []
+    for module, func, mk_args in PROBES:
+        label = f"{module}.{func}"
+        try:
+            queries = _capture(module, func, tuple(mk_args(t)))
+        except Exception as e:
+            report.append({"query": label, "error": str(e), "ok": False})
+            continue
+        for i, (sql, params) in enumerate(queries, 1):
+            m = _RE_NON_SARGABLE.search(sql)
+            row = {"query": f"{label} #{i}", "ok": True}
+            if m:
+                row.update(ok=False, error=f"nesargable predikát: {m.group(0)}")
+            try:
+                plan = db_connector.execute_query("EXPLAIN " + sql, params) or []
+            except Exception as e:
+                row.update(ok=False, error=str(e))
+                plan = []
+            scans = [p for p in plan
+                     if p.get('type') == 'ALL' and int(p.get('rows') or 0) >= EXPLAIN_FULL_SCAN_ROWS]
+            if scans:
+                row.update(ok=False, error=row.get('error') or "full scan")
+            p = scans[0] if scans else (plan[0] if plan else {})
+            row.update(type=p.get('type'), key=p.get('key'), rows=p.get('rows'), table=p.get('table'))
+            report.append(row)
+    return report
+
+
+if __name__ == "__main__":
+    import sys
+    print(ensure_indexes())
+    failed = 0
+    for r in explain_check():
+        state = "OK " if r["ok"] else "ZLE"
+        failed += 0 if r["ok"] else 1
+        print(f"[{state}] {r['query']}: table={r.get('table')} type={r.get('type')} key={r.get('key')} "
+              f"rows={r.get('rows')} {r.get('error') or ''}")
+    sys.exit(1 if failed else 0)
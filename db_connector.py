@@ -1,9 +1,13 @@
 import os
+import re
+import threading
+import time
 import traceback
-from typing import Any, Iterable, Optional, Tuple, Union, Callable
+from collections import deque
+from typing import Any, Iterable, Iterator, Optional, Sequence, Set, Tuple, Union, Callable
 
 import mysql.connector
-from mysql.connector import pooling, errors
+from mysql.connector import errors
 from dotenv import load_dotenv
 
 # Načíta premenné z .env súboru (ak existuje)
@@ -24,81 +28,392 @@ DB_CONFIG = {
 DB_CHARSET   = os.getenv("DB_CHARSET", "utf8mb4")
 DB_COLLATION = os.getenv("DB_COLLATION", "utf8mb4_slovak_ci")
 
-# Veľkosť poolu (možné doladiť)
-POOL_NAME = os.getenv("DB_POOL_NAME", "vyroba_pool")
-POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+# Pool – konfigurácia (možné doladiť cez .env)
+POOL_NAME        = os.getenv("DB_POOL_NAME", "vyroba_pool")
+POOL_MIN_SIZE    = int(os.getenv("DB_POOL_MIN", "2"))
+POOL_MAX_SIZE    = int(os.getenv("DB_POOL_MAX", os.getenv("DB_POOL_SIZE", "10")))
+POOL_WAIT_TIMEOUT = float(os.getenv("DB_POOL_WAIT_TIMEOUT", "5"))     # s – max. čakanie na voľné spojenie
+POOL_MAX_WAITERS = int(os.getenv("DB_POOL_MAX_WAITERS", "50"))        # dĺžka fronty čakajúcich
+POOL_PING_IDLE_S = float(os.getenv("DB_POOL_PING_IDLE_S", "30"))      # ping len ak spojenie ležalo dlhšie
+POOL_SIZE = POOL_MAX_SIZE  # spätná kompatibilita
 
-connection_pool: Optional[pooling.MySQLConnectionPool] = None
+# iter_query – počet riadkov načítaných z jedného fetchmany()
+ITER_BATCH_SIZE = int(os.getenv("DB_ITER_BATCH_SIZE", "1000"))
+
+# execute_many / bulk_upsert – max. riadkov v jednom multi-VALUES príkaze
+BULK_CHUNK_ROWS = int(os.getenv("DB_BULK_CHUNK_ROWS", "1000"))
+
+# histogram čakania na spojenie (hranice v ms)
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
 
-# --- Inicializácia poolu -----------------------------------------
-try:
-    connection_pool = pooling.MySQLConnectionPool(
-        pool_name=POOL_NAME,
-        pool_size=POOL_SIZE,
-        **DB_CONFIG
-    )
-    print(">>> MySQL Connection Pool bol úspešne vytvorený.")
-except mysql.connector.Error as e:
-    print(f"!!! KRITICKÁ CHYBA: Nepodarilo sa pripojiť k MySQL databáze: {e}")
-    print("--- Skontrolujte, či je MySQL server spustený a konfiguračné premenné v .env súbore sú správne.")
+
+class PoolExhausted(errors.PoolError):
+    """Pool je plný a voľné spojenie sa neuvoľnilo v POOL_WAIT_TIMEOUT (alebo je plná fronta)."""
 
 
 # --- Pomocné: nastavenie session pre spojenie --------------------
 def _init_session(conn: mysql.connector.MySQLConnection) -> None:
     """
-    Nastaví koláciu/charset pre **toto** spojenie zo poolu.
-    Dôležité: pool recykluje spojenia, preto sa SET vykonáva pri každom vydaní spojenia.
+    Nastaví koláciu/charset pre **toto** fyzické spojenie.
+    Volá sa raz pri jeho vytvorení (init hook poolu) – pool nerobí reset session,
+    preto nastavenie platí po celú životnosť spojenia.
     """
     try:
         cur = conn.cursor()
-        # jednotná znaková sada a kolácia pre porovnávania a výsledky
+        # SET NAMES nastaví character_set_client/connection/results aj collation_connection
         cur.execute(f"SET NAMES {DB_CHARSET} COLLATE {DB_COLLATION}")
-        cur.execute(f"SET collation_connection = '{DB_COLLATION}'")
-        cur.execute(f"SET character_set_client = '{DB_CHARSET}'")
-        cur.execute(f"SET character_set_connection = '{DB_CHARSET}'")
-        cur.execute(f"SET character_set_results = '{DB_CHARSET}'")
-        # voliteľne by sa dalo nastaviť time_zone, sql_mode atď.
         cur.close()
     except Exception as e:
         # nech kvôli SET príkazu nespadne aplikácia; stačí zalogovať
         print(f"!!! UPOZORNENIE: Nepodarilo sa nastaviť session koláciu: {e}")
 
 
+# --- Zápisové listenery (napr. result_cache) ---------------------
+# Tabuľky, do ktorých transakcia zapisovala, sa zbierajú na úrovni kurzora (execute/executemany)
+# a listenerom sa oznámia až po COMMITe – platí pre execute_query, execute_many, bulk_upsert,
+# with_transaction aj ručné get_connection() + cursor() + commit().
+_write_listeners: list = []
+
+_RE_WRITE_HEAD = re.compile(r"^\s*(INSERT|REPLACE|UPDATE|DELETE|TRUNCATE)\b", re.I)
+_RE_WRITE_INTO = re.compile(
+    r"^\s*(?:INSERT|REPLACE)\s+(?:(?:LOW_PRIORITY|DELAYED|HIGH_PRIORITY|IGNORE)\s+)*(?:INTO\s+)?`?(\w+)`?", re.I)
+_RE_WRITE_UPDATE = re.compile(r"^\s*UPDATE\s+(?:(?:LOW_PRIORITY|IGNORE)\s+)*(.*?)\bSET\b", re.I | re.S)
+_RE_WRITE_DELETE = re.compile(r"^\s*DELETE\b.*?\bFROM\s+`?(\w+)`?", re.I | re.S)
+_RE_WRITE_TRUNCATE = re.compile(r"^\s*TRUNCATE\s+(?:TABLE\s+)?`?(\w+)`?", re.I)
+_RE_TABLE_REF = re.compile(r"(?:^|,|\bJOIN\b)\s*`?(\w+)`?", re.I)
+
+
+def on_write(callback: Callable[[Set[str]], None]) -> None:
+    """Zaregistruje callback volaný po COMMITe s množinou tabuliek, do ktorých transakcia zapisovala."""
+    if callback not in _write_listeners:
+        _write_listeners.append(callback)
+
+
+def _write_tables(query: str) -> Set[str]:
+    """Cieľové tabuľky zmenového SQL (INSERT/REPLACE/UPDATE/DELETE/TRUNCATE), lowercase."""
+    q = query if isinstance(query, str) else str(query or "")
+    m = _RE_WRITE_HEAD.match(q)
+    if not m:
+        return set()
+    kind = m.group(1).upper()
+    if kind in ("INSERT", "REPLACE"):
+        m = _RE_WRITE_INTO.match(q)
+        return {m.group(1).lower()} if m else set()
+    if kind == "UPDATE":
+        m = _RE_WRITE_UPDATE.match(q)
+        return {t.lower() for t in _RE_TABLE_REF.findall(m.group(1))} if m else set()
+    m = (_RE_WRITE_DELETE if kind == "DELETE" else _RE_WRITE_TRUNCATE).match(q)
+    return {m.group(1).lower()} if m else set()
+
+
+def _notify_write(tables: Set[str]) -> None:
+    for cb in list(_write_listeners):
+        try:
+            cb(tables)
+        except Exception:
+            pass
+
+
+class _TrackingCursor:
+    """Kurzor, ktorý si pred execute/executemany poznačí cieľové tabuľky do spojenia."""
+
+    __slots__ = ("_conn", "_cur")
+
+    def __init__(self, conn: "PooledConnection", cur):
+        self._conn = conn
+        self._cur = cur
+
+    def execute(self, operation, params=(), *args, **kwargs):
+        self._conn._note_write(operation)
+        return self._cur.execute(operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._conn._note_write(operation)
+        return self._cur.executemany(operation, seq_params, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def __iter__(self):
+        return iter(self._cur)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cur.close()
+        return False
+
+
+class PooledConnection:
+    """
+    Obal fyzického spojenia vydaného z poolu. Všetko deleguje na spojenie,
+    close() ho vráti do poolu (rovnako ako pri mysql.connector pooling).
+    commit() navyše oznámi zápisovým listenerom tabuľky, do ktorých transakcia zapisovala.
+    """
+
+    def __init__(self, pool: "ConnectionPool", raw):
+        self._pool = pool
+        self._raw = raw
+        self._dirty: Set[str] = set()
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise errors.OperationalError("Spojenie už bolo vrátené do poolu.")
+        return getattr(raw, name)
+
+    def _note_write(self, query) -> None:
+        if _write_listeners:
+            self._dirty |= _write_tables(query)
+
+    def cursor(self, *args, **kwargs):
+        return _TrackingCursor(self, self.__getattr__("cursor")(*args, **kwargs))
+
+    def commit(self) -> None:
+        self.__getattr__("commit")()
+        dirty, self._dirty = self._dirty, set()
+        if dirty:
+            _notify_write(dirty)
+
+    def rollback(self) -> None:
+        self._dirty = set()
+        self.__getattr__("rollback")()
+
+    def is_connected(self) -> bool:
+        return self._raw is not None and self._raw.is_connected()
+
+    def close(self) -> None:
+        raw, self._raw = self._raw, None
+        self._dirty = set()
+        if raw is not None:
+            self._pool.release(raw)
+
+    def __del__(self):
+        # poistka: handler zabudol close() (napr. `if conn.is_connected(): conn.close()`
+        # pri spadnutom spojení) – slot v poole sa nesmie stratiť
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Vlastný pool s backpressure:
+    - min/max počet fyzických spojení, LIFO výdaj (teplé spojenia)
+    - pri plnom poole čaká vo fronte max. wait_timeout s, inak PoolExhausted
+      (žiadne neobmedzené priame spojenia mimo poolu)
+    - ping len ak spojenie ležalo dlhšie ako ping_idle_s
+    - _init_session raz na fyzické spojenie
+    - metriky: checkouts, čakania, overflow, histogram čakania, in_use
+    """
+
+    def __init__(self, name: str, min_size: int, max_size: int, wait_timeout: float,
+                 max_waiters: int, ping_idle_s: float, **conn_kwargs):
+        self.name = name
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.wait_timeout = wait_timeout
+        self.max_waiters = max_waiters
+        self.ping_idle_s = ping_idle_s
+        self._conn_kwargs = conn_kwargs
+        self._idle: deque = deque()           # (raw, last_used_monotonic)
+        self._size = 0                        # živé fyzické spojenia (idle + in_use)
+        self._waiting = 0
+        self._cond = threading.Condition()
+        self._metrics = {
+            "checkouts": 0, "created": 0, "discarded": 0, "pings": 0, "reconnects": 0,
+            "waits": 0, "overflow": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0,
+        }
+        self._wait_hist = [0] * (len(WAIT_BUCKETS_MS) + 1)
+        for _ in range(self.min_size):
+            raw = self._connect()
+            with self._cond:
+                self._size += 1
+                self._idle.append((raw, time.monotonic()))
+
+    # ---- fyzické spojenia ---------------------------------------
+    def _connect(self):
+        raw = mysql.connector.connect(**self._conn_kwargs)
+        _init_session(raw)
+        self._metrics["created"] += 1
+        return raw
+
+    def _discard(self, raw) -> None:
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._metrics["discarded"] += 1
+            self._cond.notify()
+
+    # ---- výdaj / návrat -----------------------------------------
+    def get_connection(self) -> PooledConnection:
+        t0 = time.monotonic()
+        raw, last_used, waited = None, 0.0, False
+        with self._cond:
+            while True:
+                if self._idle:
+                    raw, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1          # rezervuj slot, spojenie vytvoríme mimo locku
+                    break
+                remaining = self.wait_timeout - (time.monotonic() - t0)
+                if remaining <= 0 or self._waiting >= self.max_waiters:
+                    self._metrics["overflow"] += 1
+                    raise PoolExhausted(
+                        f"DB pool '{self.name}' je vyčerpaný ({self.max_size} spojení, "
+                        f"{self._waiting} čaká)."
+                    )
+                waited = True
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+        self._record_wait(t0, waited)
+
+        if raw is None:
+            try:
+                raw = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+        elif time.monotonic() - last_used > self.ping_idle_s:
+            self._metrics["pings"] += 1
+            try:
+                raw.ping(reconnect=False)
+            except Exception:
+                # mŕtve spojenie (wait_timeout servera) – nahraď novým, nech má init session
+                try:
+                    raw.close()
+                except Exception:
+                    pass
+                try:
+                    raw = self._connect()
+                    self._metrics["reconnects"] += 1
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+        self._metrics["checkouts"] += 1
+        return PooledConnection(self, raw)
+
+    def release(self, raw) -> None:
+        try:
+            if getattr(raw, "unread_result", False):
+                raw.consume_results()
+            if raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        with self._cond:
+            self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+
+    def _record_wait(self, t0: float, waited: bool) -> None:
+        ms = (time.monotonic() - t0) * 1000.0
+        m = self._metrics
+        if waited:
+            m["waits"] += 1
+        m["wait_ms_total"] += ms
+        m["wait_ms_max"] = max(m["wait_ms_max"], ms)
+        for i, b in enumerate(WAIT_BUCKETS_MS):
+            if ms <= b:
+                self._wait_hist[i] += 1
+                break
+        else:
+            self._wait_hist[-1] += 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            size, idle, waiting = self._size, len(self._idle), self._waiting
+        m = dict(self._metrics)
+        hist = {f"le_{b}ms": n for b, n in zip(WAIT_BUCKETS_MS, self._wait_hist)}
+        hist["gt_%dms" % WAIT_BUCKETS_MS[-1]] = self._wait_hist[-1]
+        return {
+            "name": self.name,
+            "min_size": self.min_size, "max_size": self.max_size,
+            "size": size, "idle": idle, "in_use": size - idle, "waiting": waiting,
+            "wait_timeout_s": self.wait_timeout, "max_waiters": self.max_waiters,
+            "ping_idle_s": self.ping_idle_s,
+            **m,
+            "wait_ms_avg": round(m["wait_ms_total"] / m["checkouts"], 3) if m["checkouts"] else 0.0,
+            "wait_hist": hist,
+        }
+
+
+connection_pool: Optional[ConnectionPool] = None
+
+# --- Inicializácia poolu -----------------------------------------
+try:
+    connection_pool = ConnectionPool(
+        POOL_NAME, POOL_MIN_SIZE, POOL_MAX_SIZE, POOL_WAIT_TIMEOUT,
+        POOL_MAX_WAITERS, POOL_PING_IDLE_S, **DB_CONFIG
+    )
+    print(">>> MySQL Connection Pool bol úspešne vytvorený.")
+except mysql.connector.Error as e:
+    print(f"!!! KRITICKÁ CHYBA: Nepodarilo sa pripojiť k MySQL databáze: {e}")
+    print("--- Skontrolujte, či je MySQL server spustený a konfiguračné premenné v .env súbore sú správne.")
+
+
 def get_connection():
     """
-    Vezme pripojenie z poolu; ak je pool vyčerpaný, skúsime krátko počkať
-    a napokon vytvoríme nouzové “priame” spojenie, aby appka nespadla.
+    Vezme pripojenie z poolu. Ak je pool plný, čaká max. POOL_WAIT_TIMEOUT s;
+    potom vyhodí PoolExhausted (backpressure namiesto priamych spojení mimo poolu).
     """
-    from mysql.connector.errors import PoolError
-    import time
-    try:
-      conn = connection_pool.get_connection()
-      try:
-          conn.ping(reconnect=True, attempts=1, delay=0)
-      except Exception:
-          pass
-      return conn
-    except PoolError:
-      # krátka pauza a druhý pokus
-      time.sleep(0.1)
-      try:
-          conn = connection_pool.get_connection()
-          try:
-              conn.ping(reconnect=True, attempts=1, delay=0)
-          except Exception:
-              pass
-          return conn
-      except PoolError:
-          # núdzové priame spojenie (mimo poolu) – zabráni pádu, ale MUSÍ sa vždy zavrieť
-          return mysql.connector.connect(**DB_CONFIG)
+    global connection_pool
+    if connection_pool is None:
+        # DB pri štarte nebežala – skús pool vytvoriť teraz
+        connection_pool = ConnectionPool(
+            POOL_NAME, POOL_MIN_SIZE, POOL_MAX_SIZE, POOL_WAIT_TIMEOUT,
+            POOL_MAX_WAITERS, POOL_PING_IDLE_S, **DB_CONFIG
+        )
+    return connection_pool.get_connection()
+
+
+def pool_stats() -> dict:
+    """Metriky poolu pre interný endpoint /api/kancelaria/db/pool."""
+    if connection_pool is None:
+        return {"error": "DB pool nie je inicializovaný."}
+    return connection_pool.stats()
+
+# --- DDL listenery (napr. schema_cache) --------------------------
+_ddl_listeners: list = []
+
+def on_ddl(callback: Callable[[str], None]) -> None:
+    """Zaregistruje callback volaný po každom DDL (CREATE/ALTER/DROP/RENAME) cez execute_query."""
+    if callback not in _ddl_listeners:
+        _ddl_listeners.append(callback)
+
+def _notify_ddl(query: str) -> None:
+    for cb in list(_ddl_listeners):
+        try:
+            cb(query)
+        except Exception:
+            pass
 
 # --- Core vykonávanie dotazov ------------------------------------
-def execute_query(query, params=None, fetch="all"):
+def execute_query(query, params=None, fetch="all", multi=False):
     """
-    fetch: "all" (default) | "one" | "none"
+    fetch: "all" (default) | "one" | "none" | "rowcount"
     - VŽDY uzatvára cursor aj connection (vracia do poolu).
     - Pri zmenových SQL (INSERT/UPDATE/DELETE/REPLACE) spraví commit.
+    - multi=True: `params` je zoznam n-tíc -> execute_many() (jedna transakcia);
+      vracia počet ovplyvnených riadkov pri fetch="rowcount", inak None.
     """
+    if multi:
+        affected = execute_many(query, params or [])
+        return affected if fetch == "rowcount" else None
+
     conn = None
     cur = None
     try:
@@ -113,11 +428,15 @@ def execute_query(query, params=None, fetch="all"):
             data = cur.fetchone()
         elif fetch == "all":
             data = cur.fetchall()
+        elif fetch == "rowcount":
+            data = cur.rowcount
         else:
             data = None
 
         if is_write:
             conn.commit()
+        if upper.startswith(("CREATE", "DROP", "ALTER", "RENAME")):
+            _notify_ddl(query)
         return data
     except Exception as e:
         try:
@@ -141,6 +460,160 @@ def execute_query(query, params=None, fetch="all"):
             pass
 
 
+# --- Hromadné zápisy ---------------------------------------------
+_RE_IDENT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _ident(name: str) -> str:
+    if not _RE_IDENT.match(str(name)):
+        raise ValueError(f"Neplatný identifikátor SQL: {name!r}")
+    return f"`{name}`"
+
+
+def _chunks(rows: list, size: int):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _run_in_tx(work: Callable[[Any], int], conn=None) -> int:
+    """Spustí work(conn) v dodanom spojení (bez commitu) alebo v novej transakcii."""
+    if conn is not None:
+        return work(conn)
+    return with_transaction(work)
+
+
+def execute_many(query: str, rows: Iterable[Sequence[Any]], chunk_size: Optional[int] = None,
+                 conn=None) -> int:
+    """
+    Jeden parametrizovaný príkaz pre veľa riadkov (cursor.executemany) po dávkach
+    `chunk_size` v JEDNEJ transakcii; vracia súčet ovplyvnených riadkov.
+    - INSERT/REPLACE (aj s ON DUPLICATE KEY UPDATE) konektor prepíše na jeden
+      multi-VALUES príkaz na dávku; UPDATE/DELETE idú po riadkoch, ale v jednom
+      spojení a s jedným commitom.
+    - `conn`: existujúce spojenie (napr. vo vnútri with_transaction) – commit
+      aj rollback nechá na volajúcom.
+    """
+    rows = [tuple(r) for r in (rows or [])]
+    if not rows:
+        return 0
+    size = max(1, int(chunk_size or BULK_CHUNK_ROWS))
+
+    def work(c) -> int:
+        cur = c.cursor()
+        affected = 0
+        try:
+            for chunk in _chunks(rows, size):
+                cur.executemany(query, chunk)
+                affected += max(cur.rowcount or 0, 0)
+        except Exception:
+            print("!!! DB CHYBA pri hromadnom SQL príkaze:", query)
+            raise
+        finally:
+            try:
+                cur.close()
+            except Exception:
+                pass
+        return affected
+
+    return _run_in_tx(work, conn)
+
+
+def bulk_upsert(table: str, rows: Iterable[Union[dict, Sequence[Any]]], key_cols: Sequence[str],
+                columns: Optional[Sequence[str]] = None, update_cols: Optional[Sequence[str]] = None,
+                chunk_size: Optional[int] = None, conn=None) -> int:
+    """
+    INSERT ... VALUES (...),(...) ON DUPLICATE KEY UPDATE po dávkach v jednej transakcii.
+    - `rows`: dicty (stĺpce = kľúče prvého riadku, ak nie sú dané `columns`)
+      alebo n-tice v poradí `columns`.
+    - `key_cols`: stĺpce unikátneho kľúča – pri duplicite sa neprepisujú;
+      prepisujú sa `update_cols` (default: všetky ostatné stĺpce).
+    Vracia affected rows podľa MySQL (1 = nový riadok, 2 = zmenený, 0 = bez zmeny).
+    """
+    rows = list(rows or [])
+    if not rows:
+        return 0
+    if columns is None:
+        if not isinstance(rows[0], dict):
+            raise ValueError("bulk_upsert: pri n-ticiach treba zadať columns.")
+        columns = list(rows[0].keys())
+    columns = list(columns)
+    if isinstance(rows[0], dict):
+        rows = [tuple(r.get(c) for c in columns) for r in rows]
+    keys = {str(k).lower() for k in key_cols}
+    if update_cols is None:
+        update_cols = [c for c in columns if str(c).lower() not in keys]
+    # bez stĺpcov na update -> duplicitu len ignoruj (no-op priradenie kľúča)
+    upd = [f"{_ident(c)}=VALUES({_ident(c)})" for c in update_cols] or \
+          [f"{_ident(key_cols[0])}={_ident(key_cols[0])}"]
+
+    size = max(1, int(chunk_size or BULK_CHUNK_ROWS))
+    row_ph = "(" + ",".join(["%s"] * len(columns)) + ")"
+    head = f"INSERT INTO {_ident(table)} ({', '.join(_ident(c) for c in columns)}) VALUES "
+    tail = " ON DUPLICATE KEY UPDATE " + ", ".join(upd)
+
+    def work(c) -> int:
+        cur = c.cursor()
+        affected = 0
+        try:
+            for chunk in _chunks(rows, size):
+                params = [v for r in chunk for v in r]
+                cur.execute(head + ",".join([row_ph] * len(chunk)) + tail, params)
+                affected += max(cur.rowcount or 0, 0)
+        except Exception:
+            print(f"!!! DB CHYBA pri bulk_upsert do tabuľky {table}")
+            raise
+        finally:
+            try:
+                cur.close()
+            except Exception:
+                pass
+        return affected
+
+    return _run_in_tx(work, conn)
+
+
+# --- Streamovanie veľkých výsledkov ------------------------------
+def iter_query(query, params=None, batch_size: Optional[int] = None,
+               columns: Optional[list] = None) -> Iterator[tuple]:
+    """
+    Generátor riadkov (tuple, nie dict) cez nebufferovaný cursor – výsledok
+    sa z MySQL číta po `batch_size` riadkoch (fetchmany), pamäť je konštantná.
+    - `columns`: ak je zadaný zoznam, po execute sa doň doplnia mená stĺpcov
+      (na zip pri serializácii, napr. json_stream.json_array_response).
+    - Spojenie je obsadené, kým sa generátor nedočíta / nezavrie; pri predčasnom
+      ukončení release() v poole dočíta zvyšok výsledku.
+    Len pre SELECT – na zápisy používaj execute_query / with_transaction.
+    """
+    size = max(1, int(batch_size or ITER_BATCH_SIZE))
+    conn = None
+    cur = None
+    try:
+        conn = get_connection()
+        cur = conn.cursor(buffered=False)
+        cur.execute(query, params or ())
+        if columns is not None:
+            columns[:] = [d[0] for d in (cur.description or [])]
+        while True:
+            batch = cur.fetchmany(size)
+            if not batch:
+                break
+            yield from batch
+    except Exception:
+        print("!!! DB CHYBA pri streamovaní SQL príkazu:", query)
+        raise
+    finally:
+        try:
+            if cur:
+                cur.close()
+        except Exception:
+            pass
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
 # --- Transakčný helper (ak potrebuješ viaceré kroky v jednej TX) --
 def with_transaction(fn: Callable[[mysql.connector.MySQLConnection], Any]) -> Any:
     """
@@ -161,5 +634,5 @@ def with_transaction(fn: Callable[[mysql.connector.MySQLConnection], Any]) -> An
         conn.rollback()
         raise
     finally:
-        if conn and conn.is_connected():
+        if conn:
             conn.close()
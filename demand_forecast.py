@@ -0,0 +1,460 @@
+# demand_forecast.py
+# Materializovaný dopyt po produktoch (B2B + B2C) pre prehľad "forecast"
+# - demand_order_lines: príspevok každej objednávky (kanál, id) -> (produkt, deň, množstvo)
+# - demand_daily:       súčty (deň, kanál, produkt) – z nich sa servuje forecast jedným dotazom
+# - refresh_order(channel, id): inkrementálna zmena po uložení / úprave / zrušení objednávky
+#   (odčíta starý príspevok objednávky, pripočíta nový – v jednej transakcii)
+# - rebuild(): plný prepočet (bootstrap prázdnych tabuliek, nočná rekonsiliácia)
+# - get_forecast(days): ľubovoľný horizont (7/14/30 dní) nad tým istým indexom
+#
+# Množstvá sa držia v kg (qty_kg) aj v MJ produktu (qty – ks/kg podľa produkty.mj),
+# forecast zobrazuje MJ produktu rovnako ako pôvodný B2B prehľad.
+# Stĺpec ean je kanonický ean_key (zero-pad) – JOIN na produkty ide cez index ean_key.
+
+import json
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import db_connector
+import schema_cache
+import b2c_schema
+import ean_key
+
+COLL = "utf8mb4_0900_ai_ci"
+
+CHANNEL_B2B = "B2B"
+CHANNEL_B2C = "B2C"
+CANCELLED = ("Zrušená", "Zrusena", "Zrušena", "Zrušené", "Cancelled")
+
+HORIZON_DEFAULT  = 7
+HORIZON_MAX      = 60
+REBUILD_DAYS_BACK = 7   # pri rebuild stačí pár dní dozadu – forecast pozerá dopredu
+
+_schema_ready = False
+_bootstrapped = False
+_bootstrap_lock = threading.Lock()
+
+
+# ─────────────────────────────────────────────────────────────
+# Schéma
+# ─────────────────────────────────────────────────────────────
+def ensure_schema() -> None:
+    global _schema_ready
+    if _schema_ready:
+        return
+    db_connector.execute_query(f"""
+        CREATE TABLE IF NOT EXISTS demand_daily (
+          day      DATE         NOT NULL,
+          channel  VARCHAR(8)   NOT NULL,
+          product  VARCHAR(255) NOT NULL,
+          ean      VARCHAR(64)  NULL,
+          qty_kg   DECIMAL(14,3) NOT NULL DEFAULT 0,
+          qty      DECIMAL(14,3) NOT NULL DEFAULT 0,
+          PRIMARY KEY (day, channel, product)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE={COLL}
+    """, fetch="none")
+    db_connector.execute_query(f"""
+        CREATE TABLE IF NOT EXISTS demand_order_lines (
+          channel  VARCHAR(8)   NOT NULL,
+          order_id INT          NOT NULL,
+          product  VARCHAR(255) NOT NULL,
+          day      DATE         NOT NULL,
+          ean      VARCHAR(64)  NULL,
+          qty_kg   DECIMAL(14,3) NOT NULL DEFAULT 0,
+          qty      DECIMAL(14,3) NOT NULL DEFAULT 0,
+          PRIMARY KEY (channel, order_id, product, day)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE={COLL}
+    """, fetch="none")
+    _schema_ready = True
+
+
+# ─────────────────────────────────────────────────────────────
+# Prepočty množstiev
+# ─────────────────────────────────────────────────────────────
+def _f(v) -> float:
+    try:
+        return float(v or 0)
+    except Exception:
+        return 0.0
+
+
+def _products(eans: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """ean_key -> {name, mj, pack_g} (pri eans=None celý katalóg – rebuild)."""
+    k = ean_key.col("produkty")
+    sql = (f"SELECT {k} AS ean, nazov_vyrobku AS name, "
+           "COALESCE(mj,'kg') AS mj, COALESCE(vaha_balenia_g,0) AS pack_g FROM produkty")
+    params: Tuple = ()
+    if eans is not None:
+        eans = ean_key.keys(eans)
+        if not eans:
+            return {}
+        sql += f" WHERE {k} IN ({','.join(['%s'] * len(eans))})"
+        params = tuple(eans)
+    out = {}
+    for r in db_connector.execute_query(sql, params) or []:
+        e = str(r.get("ean") or "")
+        if e:
+            out[e] = {"name": r.get("name"), "mj": (r.get("mj") or "kg").lower(), "pack_g": _f(r.get("pack_g"))}
+    return out
+
+
+def _quantities(qty: float, unit: str, prod_mj: str, pack_g: float) -> Tuple[float, float]:
+    """(qty_kg, qty v MJ produktu) z množstva v jednotke položky."""
+    unit = (unit or prod_mj or "kg").strip().lower()
+    if unit == "g":
+        kg = qty / 1000.0
+    elif unit in ("ks", "pc", "pcs"):
+        kg = qty * pack_g / 1000.0
+    else:
+        kg = qty
+    if prod_mj == "ks":
+        if unit in ("ks", "pc", "pcs"):
+            in_mj = qty
+        else:
+            in_mj = (kg * 1000.0 / pack_g) if pack_g > 0 else qty
+    else:
+        in_mj = kg
+    return round(kg, 3), round(in_mj, 3)
+
+
+def _as_day(v) -> Optional[date]:
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    try:
+        return datetime.strptime(str(v)[:10], "%Y-%m-%d").date()
+    except Exception:
+        return None
+
+
+def _line(acc: Dict, order_id: int, ean: str, name: str, day, qty: float, unit: str, pmap: Dict,
+          pack_g_line: float = 0.0) -> None:
+    d = _as_day(day)
+    if d is None or qty <= 0:
+        return
+    ean = ean_key.normalize(ean)
+    pm = pmap.get(ean) or {}
+    product = (pm.get("name") or name or (f"EAN {ean}" if ean else "")).strip()[:255]
+    if not product:
+        return
+    kg, in_mj = _quantities(qty, unit, pm.get("mj") or "kg", pack_g_line or pm.get("pack_g") or 0.0)
+    k = (order_id, product, d)
+    cur = acc.get(k)
+    if cur:
+        cur[2] += kg; cur[3] += in_mj
+    else:
+        acc[k] = [ean or None, d, kg, in_mj]
+
+
+def _lines_dict_to_rows(acc: Dict) -> List[tuple]:
+    # (order_id, product, day, ean, qty_kg, qty)
+    return [(oid, prod, d, v[0], round(v[2], 3), round(v[3], 3)) for (oid, prod, d), v in acc.items()]
+
+
+# ─────────────────────────────────────────────────────────────
+# Zdroje – riadky objednávok
+# ─────────────────────────────────────────────────────────────
+def _b2b_lines(order_ids: Optional[List[int]] = None, since: Optional[date] = None) -> List[tuple]:
+    where, params = [], []
+    if schema_cache.has_col("b2b_objednavky", "stav"):
+        where.append(f"COALESCE(CONVERT(o.stav USING utf8mb4) COLLATE {COLL}, '') NOT IN "
+                     f"({','.join(['%s'] * len(CANCELLED))})")
+        params += list(CANCELLED)
+    if order_ids is not None:
+        where.append(f"o.id IN ({','.join(['%s'] * len(order_ids))})"); params += list(order_ids)
+    if since is not None:
+        where.append("o.pozadovany_datum_dodania >= %s"); params.append(since)
+    rows = db_connector.execute_query(f"""
+        SELECT o.id AS order_id, o.pozadovany_datum_dodania AS day,
+               pol.ean_produktu AS ean, pol.nazov_vyrobku AS name,
+               pol.mnozstvo AS qty, pol.mj AS unit, COALESCE(pol.vaha_balenia_g,0) AS pack_g
+          FROM b2b_objednavky o
+          JOIN b2b_objednavky_polozky pol ON pol.objednavka_id = o.id
+        {('WHERE ' + ' AND '.join(where)) if where else ''}
+    """, tuple(params)) or []
+    pmap = _products(None if order_ids is None else [r.get("ean") for r in rows])
+    acc: Dict = {}
+    for r in rows:
+        _line(acc, int(r["order_id"]), str(r.get("ean") or "").strip(), r.get("name") or "",
+              r.get("day"), _f(r.get("qty")), r.get("unit") or "", pmap, _f(r.get("pack_g")))
+    return _lines_dict_to_rows(acc)
+
+
+def _b2c_items(r: Dict[str, Any]) -> list:
+    raw = r.get("items")
+    if isinstance(raw, str) and raw.strip():
+        try:
+            items = json.loads(raw)
+            return items if isinstance(items, list) else [items]
+        except Exception:
+            pass
+    if r.get("number"):
+        from kancelaria_b2c_api import _items_from_disk  # súborový fallback (staršie objednávky)
+        return _items_from_disk(r["number"]) or []
+    return []
+
+
+def _b2c_lines(order_ids: Optional[List[int]] = None, since: Optional[date] = None) -> List[tuple]:
+    P = b2c_schema.orders_profile()
+    day_col = P.delivery or P.date
+    if not day_col:
+        return []
+    sel = [f"o.{P.id} AS order_id", f"o.{day_col} AS day"]
+    if P.items:  sel.append(f"o.{P.items} AS items")
+    if P.number: sel.append(f"o.{P.number} AS number")
+    where, params = [], []
+    if P.status:
+        where.append(f"COALESCE(CONVERT(o.{P.status} USING utf8mb4) COLLATE {COLL}, '') NOT IN "
+                     f"({','.join(['%s'] * len(CANCELLED))})")
+        params += list(CANCELLED)
+    if order_ids is not None:
+        where.append(f"o.{P.id} IN ({','.join(['%s'] * len(order_ids))})"); params += list(order_ids)
+    if since is not None:
+        where.append(f"o.{day_col} >= %s"); params.append(since)
+    rows = db_connector.execute_query(
+        f"SELECT {', '.join(sel)} FROM {P.TABLE} o" + (f" WHERE {' AND '.join(where)}" if where else ""),
+        tuple(params),
+    ) or []
+
+    per_order = [(r, _b2c_items(r)) for r in rows]
+    pmap = _products(None if order_ids is None else
+                     [it.get("ean") for _, items in per_order for it in items if isinstance(it, dict)])
+    acc: Dict = {}
+    for r, items in per_order:
+        for it in items:
+            if not isinstance(it, dict):
+                continue
+            _line(acc, int(r["order_id"]), str(it.get("ean") or "").strip(),
+                  it.get("name") or it.get("nazov") or "", r.get("day"),
+                  _f(it.get("quantity") or it.get("mnozstvo")), it.get("unit") or it.get("mj") or "", pmap)
+    return _lines_dict_to_rows(acc)
+
+
+_SOURCES = {CHANNEL_B2B: _b2b_lines, CHANNEL_B2C: _b2c_lines}
+
+
+# ─────────────────────────────────────────────────────────────
+# Inkrementálna zmena / rebuild
+# ─────────────────────────────────────────────────────────────
+_SQL_LINES_INSERT = ("INSERT INTO demand_order_lines (channel, order_id, product, day, ean, qty_kg, qty) "
+                     "VALUES (%s,%s,%s,%s,%s,%s,%s)")
+_SQL_DAILY_ADD = ("INSERT INTO demand_daily (day, channel, product, ean, qty_kg, qty) VALUES (%s,%s,%s,%s,%s,%s) "
+                  "ON DUPLICATE KEY UPDATE qty_kg = qty_kg + VALUES(qty_kg), qty = qty + VALUES(qty), "
+                  "ean = COALESCE(VALUES(ean), ean)")
+
+
+def _apply(conn, channel: str, order_ids: List[int], lines: List[tuple]) -> int:
+    """Nahradí príspevok objednávok `order_ids` novými riadkami a upraví demand_daily o rozdiel."""
+    ph = ",".join(["%s"] * len(order_ids))
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"SELECT product, day, ean, qty_kg, qty FROM demand_order_lines "
+            f"WHERE channel=%s AND order_id IN ({ph}) FOR UPDATE",
+            (channel, *order_ids),
+        )
+        delta: Dict[Tuple[date, str], list] = {}
+        for product, d, ean, kg, q in cur.fetchall():
+            acc = delta.setdefault((d, product), [ean, 0.0, 0.0])
+            acc[1] -= _f(kg); acc[2] -= _f(q)
+        for _oid, product, d, ean, kg, q in lines:
+            acc = delta.setdefault((d, product), [ean, 0.0, 0.0])
+            acc[0] = ean or acc[0]
+            acc[1] += kg; acc[2] += q
+        cur.execute(f"DELETE FROM demand_order_lines WHERE channel=%s AND order_id IN ({ph})", (channel, *order_ids))
+    finally:
+        cur.close()
+
+    db_connector.execute_many(
+        _SQL_LINES_INSERT, [(channel, oid, p, d, e, kg, q) for oid, p, d, e, kg, q in lines], conn=conn
+    )
+    changed = [(d, channel, p, v[0], round(v[1], 3), round(v[2], 3))
+               for (d, p), v in delta.items() if round(v[1], 3) or round(v[2], 3)]
+    db_connector.execute_many(_SQL_DAILY_ADD, changed, conn=conn)
+    if changed:
+        days = sorted({c[0] for c in changed})
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                f"DELETE FROM demand_daily WHERE channel=%s AND day IN ({','.join(['%s'] * len(days))}) "
+                f"AND qty_kg = 0 AND qty = 0",
+                (channel, *days),
+            )
+        finally:
+            cur.close()
+    return len(changed)
+
+
+def refresh_order(channel: str, order_id) -> Dict[str, Any]:
+    """
+    Prepočíta príspevok jednej objednávky (po vytvorení, úprave položiek, zmene stavu
+    či zrušení). Chyby len zaloguje – uloženie objednávky tým nesmie zlyhať;
+    nočný rebuild() prípadný rozdiel dorovná.
+    """
+    try:
+        channel = channel.upper()
+        oid = int(order_id)
+        ensure_schema()
+        lines = _SOURCES[channel](order_ids=[oid])
+        changed = db_connector.with_transaction(lambda conn: _apply(conn, channel, [oid], lines))
+        return {"channel": channel, "order_id": oid, "lines": len(lines), "changed": changed}
+    except Exception as e:
+        print(f"!!! demand_forecast.refresh_order({channel}, {order_id}) zlyhal: {e}")
+        return {"error": str(e)}
+
+
+def rebuild(days_back: int = REBUILD_DAYS_BACK) -> Dict[str, Any]:
+    """Plný prepočet oboch tabuliek z objednávok s dodaním od dnes - days_back."""
+    ensure_schema()
+    since = date.today() - timedelta(days=max(0, int(days_back)))
+    lines = {ch: src(since=since) for ch, src in _SOURCES.items()}
+
+    def work(conn):
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM demand_order_lines WHERE day >= %s", (since,))
+            cur.execute("DELETE FROM demand_daily WHERE day >= %s", (since,))
+        finally:
+            cur.close()
+        for ch, rows in lines.items():
+            db_connector.execute_many(
+                _SQL_LINES_INSERT, [(ch, oid, p, d, e, kg, q) for oid, p, d, e, kg, q in rows], conn=conn
+            )
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                INSERT INTO demand_daily (day, channel, product, ean, qty_kg, qty)
+                SELECT day, channel, product, MAX(ean), SUM(qty_kg), SUM(qty)
+                  FROM demand_order_lines
+                 WHERE day >= %s
+                 GROUP BY day, channel, product
+            """, (since,))
+        finally:
+            cur.close()
+
+    db_connector.with_transaction(work)
+    counts = {ch.lower() + "_lines": len(rows) for ch, rows in lines.items()}
+    msg = f"Dopyt od {since.isoformat()} prepočítaný (" + ", ".join(f"{k}={v}" for k, v in counts.items()) + ")."
+    return {"message": msg, "since": since.isoformat(), **counts}
+
+
+def _ensure_bootstrapped() -> None:
+    """Pri prvom použití v procese: ak sú tabuľky prázdne, naplň ich rebuildom."""
+    global _bootstrapped
+    if _bootstrapped:
+        return
+    with _bootstrap_lock:
+        if _bootstrapped:
+            return
+        ensure_schema()
+        if not db_connector.execute_query("SELECT 1 AS x FROM demand_order_lines LIMIT 1", fetch="one"):
+            rebuild()
+        _bootstrapped = True
+
+
+# ─────────────────────────────────────────────────────────────
+# Forecast
+# ─────────────────────────────────────────────────────────────
+def _stock_display(stock_kg: float, mj: str, pack_g: float) -> Tuple[str, float]:
+    if mj == "ks" and pack_g > 0:
+        raw = float(int((stock_kg * 1000) // pack_g))
+        return f"{int(raw)} ks", raw
+    return f"{stock_kg:.2f} kg", stock_kg
+
+
+def get_forecast(days: int = HORIZON_DEFAULT) -> Dict[str, Any]:
+    """
+    Potreba produktov na `days` dní dopredu (od dnes), B2B + B2C.
+    Vracia {dates, forecast (spolu), b2c_forecast (+ aliasy), channels_merged, debug}.
+    """
+    days = max(1, min(int(days or HORIZON_DEFAULT), HORIZON_MAX))
+    _ensure_bootstrapped()
+    start = date.today()
+    dates = [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(days)]
+
+    rows = db_connector.execute_query(f"""
+        SELECT d.day, d.channel, d.product, d.qty,
+               COALESCE(p.mj, 'kg') AS mj,
+               COALESCE(p.aktualny_sklad_finalny_kg, 0) AS stock_kg,
+               COALESCE(p.vaha_balenia_g, 0) AS pack_g,
+               COALESCE(p.predajna_kategoria, 'Nezaradené') AS cat,
+               COALESCE(p.typ_polozky, '') AS typ
+          FROM demand_daily d
+          LEFT JOIN produkty p ON {ean_key.col("produkty", "p")} = d.ean
+         WHERE d.day BETWEEN %s AND %s
+    """, (start, start + timedelta(days=days - 1))) or []
+
+    merged: Dict[str, List[Dict[str, Any]]] = {}
+    b2c: Dict[str, List[Dict[str, Any]]] = {}
+    idx: Dict[Tuple[int, str, str], Dict[str, Any]] = {}
+
+    def item_for(target: Dict, tag: int, r: Dict[str, Any]) -> Dict[str, Any]:
+        cat = r.get("cat") or "Nezaradené"
+        k = (tag, cat, r["product"])
+        it = idx.get(k)
+        if it is None:
+            mj = (r.get("mj") or "kg").lower()
+            disp, raw = _stock_display(_f(r.get("stock_kg")), mj, _f(r.get("pack_g")))
+            typ = str(r.get("typ") or "")
+            it = {
+                "name": r["product"], "mj": mj,
+                "stock_display": disp, "stock_raw": raw,
+                "total_needed": 0.0, "deficit": 0.0,
+                "isManufacturable": typ.lower() == "produkt" or typ.upper().startswith(("VÝROBOK", "VYROBOK")),
+                "daily_needs": {d: 0.0 for d in dates},
+            }
+            idx[k] = it
+            target.setdefault(cat, []).append(it)
+        return it
+
+    for r in rows:
+        d = _as_day(r.get("day"))
+        if d is None:
+            continue
+        ds = d.strftime("%Y-%m-%d")
+        q = _f(r.get("qty"))
+        targets = [item_for(merged, 0, r)]
+        if r.get("channel") == CHANNEL_B2C:
+            targets.append(item_for(b2c, 1, r))
+        for it in targets:
+            it["daily_needs"][ds] = round(it["daily_needs"].get(ds, 0.0) + q, 3)
+            it["total_needed"] = round(it["total_needed"] + q, 3)
+
+    for fc in (merged, b2c):
+        for arr in fc.values():
+            for it in arr:
+                it["deficit"] = max(0.0, round(it["total_needed"] - it["stock_raw"], 3))
+            arr.sort(key=lambda it: (-it["total_needed"], it["name"].casefold()))
+
+    return {
+        "dates": dates,
+        "forecast": merged,         # B2B + B2C spolu
+        "b2c_forecast": b2c,        # čisté B2C (pre kontrolu)
+        "forecast_b2c": b2c,        # alias
+        "b2c": b2c,                 # alias
+        "channels_merged": True,    # FE už nemá B2C pripočítavať druhýkrát
+        "debug": {
+            "source": "demand_daily",
+            "rows": len(rows),
+            "categories": len(merged),
+            "items": sum(len(v) for v in merged.values()),
+        },
+    }
+
+
+def demand_by_product(days: int = HORIZON_DEFAULT) -> List[Dict[str, Any]]:
+    """
+    Súčet dopytu (B2B + B2C) po produktoch na `days` dní dopredu (od dnes) – vstup pre plánovač výroby.
+    [{ean (ean_key alebo None), product, qty_kg, first_day}]
+    """
+    days = max(1, min(int(days or HORIZON_DEFAULT), HORIZON_MAX))
+    _ensure_bootstrapped()
+    start = date.today()
+    return db_connector.execute_query("""
+        SELECT ean, product, SUM(qty_kg) AS qty_kg, MIN(day) AS first_day
+          FROM demand_daily
+         WHERE day BETWEEN %s AND %s
+         GROUP BY ean, product
+    """, (start, start + timedelta(days=days - 1))) or []
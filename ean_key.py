@@ -0,0 +1,96 @@
+# ean_key.py
+# Kanonický kľúč EAN pre JOINy medzi produkty / b2b_objednavky_polozky / b2c_cennik_polozky
+# - ean_key = TRIM(ean), čisto číselné EAN kratšie ako 13 doplnené nulami zľava
+#   ('21101' -> '0000000021101'), jednotná kolácia utf8mb4_0900_ai_ci
+# - stĺpec je STORED generated column => MySQL ho prepočíta pri každom INSERT/UPDATE,
+#   zápisové cesty (import cenníka, objednávky, katalóg) sa nemusia meniť
+# - nad stĺpcom je index => JOINy sú obyčajné indexované equi-joiny
+#   (bez CONVERT(... USING utf8mb4) COLLATE / BINARY / ďalších fallback prechodov)
+#
+# Použitie:
+#   f"JOIN produkty p ON p.{ean_key.col('produkty')} = pol.{ean_key.col('b2b_objednavky_polozky')}"
+#   params = ean_key.keys(eans)
+#
+# Ak migrácia neprešla (chýbajú práva na ALTER), col() vráti ekvivalentný výraz nad pôvodným
+# stĺpcom – dotaz ostane správny, len bez indexu.
+
+import re
+import threading
+from typing import Iterable, List, Optional
+
+import db_connector
+import schema_cache
+
+COLL = "utf8mb4_0900_ai_ci"
+KEY_COL = "ean_key"
+KEY_LEN = 13
+
+# tabuľka -> zdrojový stĺpec s EAN
+TABLES = {
+    "produkty": "ean",
+    "b2b_objednavky_polozky": "ean_produktu",
+    "b2c_cennik_polozky": "ean_produktu",
+}
+
+_RE_SHORT_DIGITS = re.compile(r"^[0-9]{1,%d}$" % (KEY_LEN - 1))
+
+_schema_ready = False
+_lock = threading.Lock()
+
+
+def normalize(ean) -> str:
+    """Python ekvivalent SQL výrazu expr() – parametre sa normalizujú rovnako ako stĺpec."""
+    s = str(ean if ean is not None else "").strip()
+    return s.zfill(KEY_LEN) if _RE_SHORT_DIGITS.match(s) else s
+
+
+def keys(eans: Iterable) -> List[str]:
+    """Unikátne neprázdne kľúče v poradí vstupu (pre IN (...) parametre)."""
+    return [k for k in dict.fromkeys(normalize(e) for e in eans or []) if k]
+
+
+def _key_expr(column: str) -> str:
+    s = f"TRIM(CONVERT({column} USING utf8mb4))"
+    return f"IF({s} REGEXP '^[0-9]{{1,{KEY_LEN - 1}}}$', LPAD({s}, {KEY_LEN}, '0'), {s})"
+
+
+def expr(column: str) -> str:
+    """SQL výraz kľúča nad stĺpcom `column` (rovnaká hodnota ako generated column)."""
+    return f"({_key_expr(column)} COLLATE {COLL})"
+
+
+def col(table: str, alias: Optional[str] = None) -> str:
+    """
+    Kľúčový stĺpec tabuľky pre JOIN/WHERE – `alias.ean_key`, ak existuje,
+    inak ekvivalentný výraz nad zdrojovým EAN stĺpcom.
+    """
+    ensure_schema()
+    pre = f"{alias}." if alias else ""
+    if schema_cache.has_col(table, KEY_COL):
+        return f"{pre}{KEY_COL}"
+    return expr(pre + TABLES[table])
+
+
+def ensure_schema() -> None:
+    """Pridá ean_key (STORED) + index do tabuliek z TABLES, ak ešte chýba. Raz za proces."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _lock:
+        if _schema_ready:
+            return
+        for table, src in TABLES.items():
+            if not schema_cache.table_exists(table) or not schema_cache.has_col(table, src):
+                continue
+            if schema_cache.has_col(table, KEY_COL):
+                continue
+            try:
+                db_connector.execute_query(f"""
+                    ALTER TABLE {table}
+                      ADD COLUMN {KEY_COL} VARCHAR(64) CHARACTER SET utf8mb4 COLLATE {COLL}
+                          GENERATED ALWAYS AS ({_key_expr(src)}) STORED,
+                      ADD INDEX idx_{table}_{KEY_COL} ({KEY_COL})
+                """, fetch="none")
+            except Exception as e:
+                print(f"!!! UPOZORNENIE: ean_key – migrácia {table} zlyhala: {e}")
+        _schema_ready = True
@@ -7,6 +7,13 @@
 # - Bez zásahu do tvojej schémy – všetky doplnky sú „autodetect“
 
 import db_connector
+import schema_cache
+import product_keys
+import cost_ledger
+import reception_totals
+import profit_snapshots
+import date_ranges
+import product_stocktake
 from datetime import datetime, date
 import json
 import math
@@ -20,39 +27,10 @@ from typing import Optional, List, Dict, Any
 # ─────────────────────────────────────────────────────────────
 
 def _has_col(table: str, col: str) -> bool:
-    try:
-        r = db_connector.execute_query(
-            """
-            SELECT 1
-              FROM INFORMATION_SCHEMA.COLUMNS
-             WHERE TABLE_SCHEMA = DATABASE()
-               AND TABLE_NAME   = %s
-               AND COLUMN_NAME  = %s
-             LIMIT 1
-            """,
-            (table, col),
-            fetch='one'
-        )
-        return bool(r)
-    except Exception:
-        return False
+    return schema_cache.has_col(table, col)
 
 def _table_exists(table: str) -> bool:
-    try:
-        r = db_connector.execute_query(
-            """
-            SELECT 1
-              FROM INFORMATION_SCHEMA.TABLES
-             WHERE TABLE_SCHEMA = DATABASE()
-               AND TABLE_NAME   = %s
-             LIMIT 1
-            """,
-            (table,),
-            fetch='one'
-        )
-        return bool(r)
-    except Exception:
-        return False
+    return schema_cache.table_exists(table)
 
 def _pick_existing_col(table: str, candidates: List[str]) -> Optional[str]:
     for c in candidates:
@@ -160,17 +138,11 @@ def _ensure_expedicia_inventury_schema():
 # BEST-EFFORT zápis do legacy tabuľky inventúr (bez ALTER)
 # ─────────────────────────────────────────────────────────────
 
-def _try_insert_into_legacy_inventory_diffs(diffs_rows: List[tuple]):
+def _try_insert_into_legacy_inventory_diffs(diffs_rows: List[tuple], conn=None):
+    """`conn` = spojenie otvorenej transakcie (zápis ide v nej); chyba legacy zápisu sa ignoruje."""
     if not diffs_rows or not _table_exists('inventurne_rozdiely_produkty'):
         return
-    cols = db_connector.execute_query(
-        """
-        SELECT COLUMN_NAME AS c
-          FROM INFORMATION_SCHEMA.COLUMNS
-         WHERE TABLE_SCHEMA = DATABASE()
-           AND TABLE_NAME   = 'inventurne_rozdiely_produkty'
-        """) or []
-    colset = {r['c'] for r in cols}
+    colset = set(schema_cache.columns('inventurne_rozdiely_produkty'))
 
     def pick(*cands):
         for c in cands:
@@ -187,41 +159,20 @@ def _try_insert_into_legacy_inventory_diffs(diffs_rows: List[tuple]):
     c_val   = pick('hodnota_rozdielu_eur','hodnota','hodnota_eur')
     c_prac  = pick('pracovnik','user','pouzivatel','operator')
 
-    used_cols = [c for c in [c_datum,c_ean,c_nazov,c_kat,c_sys,c_real,c_diff,c_val,c_prac] if c]
+    # poradie = poradie polí v diffs_rows; riadky sa premietnu len na existujúce stĺpce
+    cands = [c_datum,c_ean,c_nazov,c_kat,c_sys,c_real,c_diff,c_val,c_prac]
+    idx = [i for i, c in enumerate(cands) if c]
+    used_cols = [cands[i] for i in idx]
     if len(used_cols) < 5:
         return
 
     placeholders = ",".join(["%s"]*len(used_cols))
     sql = f"INSERT INTO inventurne_rozdiely_produkty ({','.join(used_cols)}) VALUES ({placeholders})"
 
-    def adapt(row):
-        (d,ean,naz,kat,syskg,realkg,diffkg,val,prac) = row
-        values = []
-        for c in [c_datum,c_ean,c_nazov,c_kat,c_sys,c_real,c_diff,c_val,c_prac]:
-            if   c == c_datum: values.append(d)
-            elif c == c_ean:   values.append(ean)
-            elif c == c_nazov: values.append(naz)
-            elif c == c_kat:   values.append(kat)
-            elif c == c_sys:   values.append(syskg)
-            elif c == c_real:  values.append(realkkg if False else realkg)  # placeholder to keep structure; we won't use
-            elif c == c_diff:  values.append(diffkg)
-            elif c == c_val:   values.append(val)
-            elif c == c_prac:  values.append(prac)
-        # NOTE: The above typo prevented referencing; we adapt correctly below (fix)
-        return tuple(values)
-    # Correct adapt (above kept for compatibility with some linters)
-    def adapt_ok(row):
-        (d, ean, naz, kat, syskg, realkg, diffkg, val, prac) = row
-        mapping = {
-            c_datum: d, c_ean: ean, c_nazov: naz, c_kat: kat,
-            c_sys: syskg, c_real: realkg, c_diff: diffkg, c_val: val, c_prac: prac
-        }
-        return tuple(mapping[c] for c in used_cols)
-
     try:
-        db_connector.execute_query(sql, [adapt_ok(r) for r in diffs_rows], fetch='none', multi=True)
-    except Exception:
-        pass
+        db_connector.execute_many(sql, [tuple(r[i] for i in idx) for r in diffs_rows], conn=conn)
+    except Exception as e:
+        print(f"!!! UPOZORNENIE: zápis do inventurne_rozdiely_produkty zlyhal: {e}")
 
 # ─────────────────────────────────────────────────────────────
 # Hlavné menu – Prebiehajúce krájanie
@@ -267,6 +218,7 @@ def get_production_dates():
 
 def get_productions_by_date(date_string):
     zv = _zv_name_col()
+    day_sql, day_params = date_ranges.day('zv.datum_vyroby', date_string)
     rows = db_connector.execute_query(
         f"""
         SELECT
@@ -279,12 +231,12 @@ def get_productions_by_date(date_string):
             p.mj, p.vaha_balenia_g as pieceWeightG,
             zv.datum_vyroby, zv.poznamka_expedicie
         FROM zaznamy_vyroba zv
-        LEFT JOIN produkty p ON TRIM(zv.{zv}) = TRIM(p.nazov_vyrobku)
-        WHERE DATE(zv.datum_vyroby) = %s
+        LEFT JOIN produkty p ON {product_keys.zv_join('zv', 'p')}
+        WHERE {day_sql}
           AND zv.stav NOT IN ('Prijaté, čaká na tlač','Ukončené')
         ORDER BY productName
         """,
-        (date_string,)
+        tuple(day_params)
     ) or []
     for p in rows:
         planned_kg = float(p.get('plannedQty') or 0.0)
@@ -299,12 +251,11 @@ def get_productions_by_date(date_string):
 # ─────────────────────────────────────────────────────────────
 
 def _product_info_for_batch(batch_id: str) -> Optional[Dict[str, Any]]:
-    zv = _zv_name_col()
     return db_connector.execute_query(
         f"""
         SELECT p.nazov_vyrobku, p.mj, p.vaha_balenia_g, p.ean, p.zdrojovy_ean
           FROM zaznamy_vyroba zv
-          LEFT JOIN produkty p ON TRIM(zv.{zv}) = TRIM(p.nazov_vyrobku)
+          LEFT JOIN produkty p ON {product_keys.zv_join('zv', 'p')}
          WHERE zv.id_davky = %s
          LIMIT 1
         """,
@@ -318,40 +269,49 @@ def _kg_from_value(unit: str, value: float, piece_weight_g: float) -> float:
         return (value * piece_weight_g) / 1000.0
     return 0.0
 
-def _recalc_zv_totals_and_status(batch_id: str):
-    _ensure_expedition_schema()
-    info = _product_info_for_batch(batch_id)
-    if not info:
-        return 0.0, 0  # sum_kg, sum_ks
-    unit = info.get('mj')
-    wg = float(info.get('vaha_balenia_g') or 0.0)
-
-    logs = db_connector.execute_query(
-        "SELECT unit, prijem_kg, prijem_ks FROM expedicia_prijmy WHERE id_davky=%s AND is_deleted=0",
-        (batch_id,)
-    ) or []
-
-    sum_kg, sum_ks = 0.0, 0
-    for r in logs:
-        if r.get('unit') == 'kg':
-            sum_kg += float(r.get('prijem_kg') or 0.0)
-        else:
-            ks = int(r.get('prijem_ks') or 0)
-            sum_ks += ks
-            sum_kg += _kg_from_value('ks', ks, wg)
-
-    if unit == 'kg':
-        db_connector.execute_query(
-            "UPDATE zaznamy_vyroba SET stav='Prijaté, čaká na tlač', realne_mnozstvo_kg=%s WHERE id_davky=%s",
-            (sum_kg, batch_id), fetch='none'
-        )
+def _recalc_zv_totals_and_status(cur, batch_id: str, mj: str):
+    """
+    Prepočíta súčty príjmov dávky (expedicia_prijmy_davky) a prepíše realitu dávky.
+    `cur` = kurzor transakcie zápisu príjmu – súčet vidí aj jej ešte necommitnuté riadky.
+    Stav 'Prijaté, čaká na tlač' sa nastaví, len ak dávka má aspoň jeden aktívny príjem.
+    """
+    reception_totals.refresh_batches([batch_id], cur=cur)
+    cur.execute("SELECT total_kg, total_ks, lines_count FROM expedicia_prijmy_davky WHERE id_davky=%s", (batch_id,))
+    r = cur.fetchone() or {}
+    sum_kg, sum_ks = float(r.get('total_kg') or 0.0), int(r.get('total_ks') or 0)
+    stav = ", stav='Prijaté, čaká na tlač'" if int(r.get('lines_count') or 0) > 0 else ""
+
+    if mj == 'kg':
+        cur.execute(f"UPDATE zaznamy_vyroba SET realne_mnozstvo_kg=%s{stav} WHERE id_davky=%s",
+                    (sum_kg, batch_id))
     else:
-        db_connector.execute_query(
-            "UPDATE zaznamy_vyroba SET stav='Prijaté, čaká na tlač', realne_mnozstvo_ks=%s, realne_mnozstvo_kg=%s WHERE id_davky=%s",
-            (sum_ks, sum_kg, batch_id), fetch='none'
-        )
+        cur.execute(f"UPDATE zaznamy_vyroba SET realne_mnozstvo_ks=%s, realne_mnozstvo_kg=%s{stav} WHERE id_davky=%s",
+                    (sum_ks, sum_kg, batch_id))
     return sum_kg, sum_ks
 
+def _update_batch_unit_cost(cur, batch_id: str, mj: str, wg: float, sum_kg: float, sum_ks: int):
+    """
+    `cena_za_jednotku` dávky podľa reálne prijatého (celkova_cena_surovin / kg alebo ks).
+    Vráti (cena za MJ, cena za kg) alebo (None, None), ak sa nedá určiť.
+    """
+    cur.execute("SELECT celkova_cena_surovin FROM zaznamy_vyroba WHERE id_davky=%s", (batch_id,))
+    zv_row = cur.fetchone() or {}
+    total_cost = float(zv_row.get('celkova_cena_surovin') or 0.0)
+
+    unit_cost_for_zv = None
+    perkg_cost = None
+    if total_cost > 0:
+        if mj == 'kg' and sum_kg > 0:
+            unit_cost_for_zv = total_cost / sum_kg   # €/kg
+            perkg_cost = unit_cost_for_zv
+        elif mj == 'ks' and sum_ks > 0:
+            unit_cost_for_zv = total_cost / sum_ks   # €/ks
+            if wg > 0:
+                perkg_cost = unit_cost_for_zv / (wg/1000.0)  # €/kg z €/ks
+        if unit_cost_for_zv is not None:
+            cur.execute("UPDATE zaznamy_vyroba SET cena_za_jednotku=%s WHERE id_davky=%s", (unit_cost_for_zv, batch_id))
+    return unit_cost_for_zv, perkg_cost
+
 def accept_production_item(payload: Dict[str, Any]):
     _ensure_expedition_schema()
 
@@ -376,6 +336,9 @@ def accept_production_item(payload: Dict[str, Any]):
 
     kg_add = value if unit == 'kg' else ((value * wg) / 1000.0)
 
+    cost_ledger.ensure_schema()
+    reception_totals.ensure_schema()
+    profit_snapshots.ensure_schema()
     conn = db_connector.get_connection()
     try:
         cur = conn.cursor(dictionary=True)
@@ -413,26 +376,14 @@ def accept_production_item(payload: Dict[str, Any]):
         if ean and kg_add != 0.0:
             cur.execute("UPDATE produkty SET aktualny_sklad_finalny_kg = aktualny_sklad_finalny_kg + %s WHERE ean = %s", (kg_add, ean))
 
-        # 4) prepočet reality (sum_kg/sum_ks) a prepis stavu na 'Prijaté, čaká na tlač'
-        sum_kg, sum_ks = _recalc_zv_totals_and_status(batch_id)
+        # 4) súčty príjmov dávky (v tejto transakcii, vrátane práve vloženého riadku)
+        #    a prepis stavu na 'Prijaté, čaká na tlač'
+        sum_kg, sum_ks = _recalc_zv_totals_and_status(cur, batch_id, mj)
 
         # 5) vypočítaj a dopíš `cena_za_jednotku` tejto dávky podľa reálne prijatého
-        cur.execute("SELECT celkova_cena_surovin FROM zaznamy_vyroba WHERE id_davky=%s", (batch_id,))
-        zv_row = cur.fetchone() or {}
-        total_cost = float(zv_row.get('celkova_cena_surovin') or 0.0)
-
-        unit_cost_for_zv = None
-        perkg_cost = None
-        if total_cost > 0:
-            if mj == 'kg' and sum_kg > 0:
-                unit_cost_for_zv = total_cost / sum_kg   # €/kg
-                perkg_cost = unit_cost_for_zv
-            elif mj == 'ks' and sum_ks > 0:
-                unit_cost_for_zv = total_cost / sum_ks   # €/ks
-                if wg > 0:
-                    perkg_cost = unit_cost_for_zv / (wg/1000.0)  # €/kg z €/ks
-            if unit_cost_for_zv is not None:
-                cur.execute("UPDATE zaznamy_vyroba SET cena_za_jednotku=%s WHERE id_davky=%s", (unit_cost_for_zv, batch_id))
+        unit_cost_for_zv, perkg_cost = _update_batch_unit_cost(cur, batch_id, mj, wg, sum_kg, sum_ks)
+        #    cena dávky vstupuje do prísneho výnosu výroby – zneplatni snapshoty dotknutých mesiacov
+        profit_snapshots.mark_batches_stale([batch_id], cur)
 
         # 6) zaktualizuj váženým priemerom výrobnú €/kg v `produkty` (ak máš príslušný stĺpec)
         if ean and perkg_cost is not None and manuf_col:
@@ -441,6 +392,9 @@ def accept_production_item(payload: Dict[str, Any]):
                       ((old_avg_eur_kg * old_stock_kg) + (perkg_cost * kg_add)) / new_total
             cur.execute(f"UPDATE produkty SET {manuf_col}=%s WHERE ean=%s", (new_avg, ean))
 
+        # 7) nákladová kniha produktu – v tej istej transakcii ako cena dávky
+        cost_ledger.refresh_product(ean, cur=cur)
+
         conn.commit()
 
         msg = f"Príjem uložený. +{kg_add:.2f} kg na sklad."
@@ -453,6 +407,80 @@ def accept_production_item(payload: Dict[str, Any]):
     finally:
         if conn and conn.is_connected(): conn.close()
 
+def _change_acceptance(rec_id, new_value: Optional[float], note: str):
+    """
+    Úprava (new_value) alebo zmazanie (new_value=None, soft delete) riadku príjmu v jednej transakcii:
+    korekcia skladu 2 o rozdiel, súčty dávky, realita + cena dávky, nákladová kniha produktu.
+    """
+    cost_ledger.ensure_schema()
+    reception_totals.ensure_schema()
+    profit_snapshots.ensure_schema()
+
+    def work(conn):
+        cur = conn.cursor(dictionary=True)
+        try:
+            cur.execute("""SELECT id_davky, unit, prijem_kg, prijem_ks FROM expedicia_prijmy
+                            WHERE id=%s AND is_deleted=0 FOR UPDATE""", (rec_id,))
+            row = cur.fetchone()
+            if not row:
+                return {"error": "Príjem neexistuje alebo už bol zmazaný."}
+            batch_id, unit = row['id_davky'], row['unit']
+            info = _product_info_for_batch(batch_id) or {}
+            ean = (info.get('ean') or '').strip()
+            mj  = info.get('mj') or 'kg'
+            wg  = float(info.get('vaha_balenia_g') or 0.0)
+
+            old_val = float(row.get('prijem_kg') or 0.0) if unit == 'kg' else float(row.get('prijem_ks') or 0)
+            if new_value is None:
+                cur.execute("""UPDATE expedicia_prijmy SET is_deleted=1, updated_at=NOW(),
+                                      dovod=CONCAT_WS(' | ', NULLIF(dovod,''), %s) WHERE id=%s""", (note, rec_id))
+                new_val = 0.0
+            else:
+                new_val = new_value if unit == 'kg' else float(int(new_value))
+                cur.execute(f"""UPDATE expedicia_prijmy SET {'prijem_kg' if unit == 'kg' else 'prijem_ks'}=%s,
+                                       updated_at=NOW(), dovod=CONCAT_WS(' | ', NULLIF(dovod,''), %s) WHERE id=%s""",
+                            (new_val if unit == 'kg' else int(new_val), note, rec_id))
+
+            kg_diff = _kg_from_value(unit, new_val, wg) - _kg_from_value(unit, old_val, wg)
+            if ean and kg_diff != 0.0:
+                cur.execute("UPDATE produkty SET aktualny_sklad_finalny_kg = aktualny_sklad_finalny_kg + %s WHERE ean = %s",
+                            (kg_diff, ean))
+
+            sum_kg, sum_ks = _recalc_zv_totals_and_status(cur, batch_id, mj)
+            _update_batch_unit_cost(cur, batch_id, mj, wg, sum_kg, sum_ks)
+            profit_snapshots.mark_batches_stale([batch_id], cur)
+            cost_ledger.refresh_product(ean, cur=cur)
+            return {"kg_diff": kg_diff}
+        finally:
+            cur.close()
+
+    return db_connector.with_transaction(work)
+
+def edit_acceptance(payload: Dict[str, Any]):
+    rec_id = (payload or {}).get('id')
+    value  = _parse_num((payload or {}).get('newValue'))
+    reason = ((payload or {}).get('reason') or '').strip()
+    worker = (payload or {}).get('workerName') or 'Neznámy'
+    if not rec_id or value <= 0 or not reason:
+        return {"error": "Chýba id príjmu, nová hodnota (> 0) alebo dôvod úpravy."}
+    _ensure_expedition_schema()
+    res = _change_acceptance(rec_id, value, f"Úprava ({worker}): {reason}")
+    if "error" in res:
+        return res
+    return {"message": f"Príjem upravený. Korekcia skladu: {res['kg_diff']:+.2f} kg."}
+
+def delete_acceptance(payload: Dict[str, Any]):
+    rec_id = (payload or {}).get('id')
+    reason = ((payload or {}).get('reason') or '').strip()
+    worker = (payload or {}).get('workerName') or 'Neznámy'
+    if not rec_id or not reason:
+        return {"error": "Chýba id príjmu alebo dôvod zmazania."}
+    _ensure_expedition_schema()
+    res = _change_acceptance(rec_id, None, f"Zmazané ({worker}): {reason}")
+    if "error" in res:
+        return res
+    return {"message": f"Príjem zmazaný. Korekcia skladu: {res['kg_diff']:+.2f} kg."}
+
 # ─────────────────────────────────────────────────────────────
 # Archív prijmov – doplnená cena/jednotka na zobrazenie
 # ─────────────────────────────────────────────────────────────
@@ -522,12 +550,6 @@ def start_slicing_request(packaged_product_ean, planned_pieces):
     planned_pieces = int(planned_pieces)
     required_kg = (planned_pieces * float(p['target_weight_g'])) / 1000.0
 
-    # odpočet zo zdroja (rezervácia)
-    db_connector.execute_query(
-        "UPDATE produkty SET aktualny_sklad_finalny_kg = aktualny_sklad_finalny_kg - %s WHERE ean = %s",
-        (required_kg, p['zdrojovy_ean']), fetch='none'
-    )
-
     batch_id = _gen_unique_batch_id("KRAJANIE", p['target_name'])
 
     details = json.dumps({
@@ -538,172 +560,211 @@ def start_slicing_request(packaged_product_ean, planned_pieces):
         "planovaneKs": planned_pieces
     }, ensure_ascii=False)
 
-    db_connector.execute_query(
-        f"""
-        INSERT INTO zaznamy_vyroba
-          (id_davky, stav, datum_vyroby, {_zv_name_col()}, planovane_mnozstvo_kg, datum_spustenia, celkova_cena_surovin, detaily_zmeny)
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-        """,
-        (batch_id, 'Prebieha krájanie', datetime.now(), p['source_name'], required_kg, datetime.now(), 0, details),
-        fetch='none'
-    )
+    # rezervácia zo zdroja + úloha + produkt_ean v jednej transakcii (bez EAN by ju reporty cez zv_join vynechali)
+    def work(conn):
+        cur = conn.cursor(dictionary=True)
+        cur.execute(
+            "UPDATE produkty SET aktualny_sklad_finalny_kg = aktualny_sklad_finalny_kg - %s WHERE ean = %s",
+            (required_kg, p['zdrojovy_ean'])
+        )
+        cur.execute(
+            f"""
+            INSERT INTO zaznamy_vyroba
+              (id_davky, stav, datum_vyroby, {_zv_name_col()}, planovane_mnozstvo_kg, datum_spustenia, celkova_cena_surovin, detaily_zmeny)
+            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+            """,
+            (batch_id, 'Prebieha krájanie', datetime.now(), p['source_name'], required_kg, datetime.now(), 0, details)
+        )
+        product_keys.stamp([batch_id], ean=p['zdrojovy_ean'], cur=cur)
 
-    return {"message": f"Požiadavka vytvorená. Rezervovaných {required_kg:.2f} kg zo '{p['source_name']}'.", "batchId": batch_id}
+    product_keys.ensure_schema()
+    db_connector.with_transaction(work)
 
-def finalize_slicing_transaction(log_id, actual_pieces):
-    """
-    Dokončenie krájania:
-      - vypočíta reálne kg (ks * váha balenia),
-      - pripíše hotový produkt na sklad,
-      - dorovná rozdiel voči rezervácii na zdroji,
-      - nastaví stav + realitu,
-      - doplní celkovú cenu a cena_za_jednotku (€/kg alebo €/ks) – tak, aby ju reporty hneď videli,
-      - aktualizuje váženým priemerom výrobnú cenu hotového produktu.
-    """
-    if not log_id or actual_pieces is None:
-        return {"error": "Chýba ID úlohy alebo počet kusov."}
-    try:
-        actual_pieces = int(actual_pieces)
-        if actual_pieces <= 0:
-            raise ValueError()
-    except Exception:
-        return {"error": "Počet kusov musí byť kladné celé číslo."}
-
-    task = db_connector.execute_query(
-        "SELECT planovane_mnozstvo_kg, detaily_zmeny FROM zaznamy_vyroba WHERE id_davky = %s AND stav = 'Prebieha krájanie'",
-        (log_id,), fetch='one'
-    )
-    if not task:
-        return {"error": f"Úloha {log_id} neexistuje alebo už bola spracovaná."}
+    return {"message": f"Požiadavka vytvorená. Rezervovaných {required_kg:.2f} kg zo '{p['source_name']}'.", "batchId": batch_id}
 
+def _parse_pieces(v) -> Optional[int]:
     try:
-        details = json.loads(task.get('detaily_zmeny') or '{}')
+        n = int(v)
     except Exception:
-        return {"error": "Chyba v zázname o krájaní: poškodené detaily."}
+        return None
+    return n if n > 0 else None
 
-    target_ean  = details.get('cielovyEan')
-    target_name = details.get('cielovyNazov')
-    source_ean  = details.get('zdrojovyEan')
+def _finalize_slicing_jobs(cur, jobs: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Jadro dokončenia krájania v JEDNEJ otvorenej transakcii (`cur` = dictionary kurzor).
+    jobs = {id_davky: skutočné ks}. Poradie zámkov: úlohy (zaznamy_vyroba) → produkty podľa EAN,
+    takže súbežné dokončenia sa serializujú a nemôžu dvakrát pripísať sklad ani pokaziť priemer.
 
-    prod_info = db_connector.execute_query(
-        "SELECT vaha_balenia_g, zdrojovy_ean, mj FROM produkty WHERE ean = %s",
-        (target_ean,), fetch='one'
+    Pre každú úlohu:
+      - vypočíta reálne kg (ks * váha balenia),
+      - pripíše hotový produkt na sklad, dorovná rozdiel voči rezervácii na zdroji,
+      - nastaví stav + realitu + celkovú cenu + cena_za_jednotku (€/kg alebo €/ks),
+      - aktualizuje váženým priemerom výrobnú cenu hotového produktu.
+    Vráti {"done": [{logId, real_kg, diff_kg}], "errors": [{logId, error}]}.
+    """
+    done: List[Dict[str, Any]] = []
+    errors: List[Dict[str, Any]] = []
+    ids = list(jobs.keys())
+    if not ids:
+        return {"done": done, "errors": errors}
+
+    # 1) zamkni úlohy – úloha, ktorú medzitým dokončil iný request, tu už nebude
+    ph = ",".join(["%s"] * len(ids))
+    cur.execute(
+        f"SELECT id_davky, planovane_mnozstvo_kg, detaily_zmeny FROM zaznamy_vyroba "
+        f"WHERE id_davky IN ({ph}) AND stav = 'Prebieha krájanie' FOR UPDATE",
+        tuple(ids)
     )
-    if not prod_info or not prod_info.get('vaha_balenia_g'):
-        return {"error": f"Produkt '{target_name}' nemá definovanú váhu balenia."}
-
-    if not source_ean:
-        source_ean = prod_info.get('zdrojovy_ean')
+    tasks = {r['id_davky']: r for r in (cur.fetchall() or [])}
 
-    real_kg    = (actual_pieces * float(prod_info['vaha_balenia_g'])) / 1000.0
-    planned_kg = float(task.get('planovane_mnozstvo_kg') or 0.0)
-    diff_kg    = planned_kg - real_kg  # >0 vrátime na zdroj; <0 dočerpáme zo zdroja
+    parsed = []
+    for log_id in ids:
+        task = tasks.get(log_id)
+        if not task:
+            errors.append({"logId": log_id, "error": f"Úloha {log_id} neexistuje alebo už bola spracovaná."})
+            continue
+        try:
+            details = json.loads(task.get('detaily_zmeny') or '{}')
+        except Exception:
+            errors.append({"logId": log_id, "error": "Chyba v zázname o krájaní: poškodené detaily."})
+            continue
+        parsed.append((log_id, task, details))
 
-    # 1) pripíš hotové balíčky na sklad
-    if target_ean and abs(real_kg) > 0.0001:
-        db_connector.execute_query(
-            "UPDATE produkty SET aktualny_sklad_finalny_kg = aktualny_sklad_finalny_kg + %s WHERE ean = %s",
-            (real_kg, target_ean), fetch='none'
+    # 2) zamkni dotknuté produkty (cieľ + zdroj) v stabilnom poradí
+    manuf_col = _product_manuf_avg_col()
+    avg_sel = f", {manuf_col} AS avgc" if manuf_col else ", NULL AS avgc"
+
+    def _lock_products(eans) -> Dict[str, Dict[str, Any]]:
+        eans = sorted({e for e in eans if e})
+        if not eans:
+            return {}
+        cur.execute(
+            f"SELECT ean, mj, vaha_balenia_g, zdrojovy_ean, COALESCE(aktualny_sklad_finalny_kg,0) AS q{avg_sel} "
+            f"FROM produkty WHERE ean IN ({','.join(['%s'] * len(eans))}) ORDER BY ean FOR UPDATE",
+            tuple(eans)
         )
-
-    # 2) dorovnaj zdroj
-    if source_ean and abs(diff_kg) > 0.0001:
-        if diff_kg > 0:
-            db_connector.execute_query(
-                "UPDATE produkty SET aktualny_sklad_finalny_kg = aktualny_sklad_finalny_kg + %s WHERE ean = %s",
-                (diff_kg, source_ean), fetch='none'
-            )
-        else:
-            db_connector.execute_query(
-                "UPDATE produkty SET aktualny_sklad_finalny_kg = aktualny_sklad_finalny_kg - %s WHERE ean = %s",
-                (-diff_kg, source_ean), fetch='none'
-            )
-
-    # 3) zisti €/kg zdroja: najprv z ukončených/aktuálnych dávok (cena_za_jednotku), potom centrál. priemer, potom sklad
-    # €/kg pre zdrojový produkt
-    source_cost_per_kg = None
-    # a) posledná dávka zdroja (bez ohľadu na stav), cena_za_jednotku → ak zdroj MJ='ks', konvertuj na €/kg
-    r = db_connector.execute_query(
-        f"""
-        SELECT p.mj, p.vaha_balenia_g, zv.cena_za_jednotku
-          FROM zaznamy_vyroba zv
-          JOIN produkty p ON TRIM(zv.{_zv_name_col()}) = TRIM(p.nazov_vyrobku)
-         WHERE p.ean = %s AND COALESCE(zv.cena_za_jednotku,0) > 0
-         ORDER BY COALESCE(zv.datum_ukoncenia, zv.datum_vyroby) DESC
-         LIMIT 1
-        """,
-        (source_ean,), fetch='one'
-    ) or {}
-    if r and r.get('cena_za_jednotku') is not None:
-        if (r.get('mj') or 'kg') == 'kg':
-            source_cost_per_kg = float(r['cena_za_jednotku'])
-        else:
-            wg = float(r.get('vaha_balenia_g') or 0.0)
-            if wg > 0:
-                source_cost_per_kg = float(r['cena_za_jednotku']) / (wg/1000.0)
-
-    # b) fallback: centrál. priemer výrobnej ceny (ak by si mal endpoint, tu pre jednoduchosť preskočíme a ideme na c))
-    # c) fallback: sklad – default_cena_eur_kg / nakupna_cena
-    if source_cost_per_kg is None:
-        rr = db_connector.execute_query(
-            "SELECT COALESCE(default_cena_eur_kg, nakupna_cena) AS c FROM sklad WHERE ean=%s LIMIT 1",
-            (source_ean,), fetch='one'
-        ) or {}
-        if rr and rr.get('c') is not None:
-            source_cost_per_kg = float(rr['c']) or 0.0
-
-    total_cost = (source_cost_per_kg or 0.0) * real_kg
-
-    # 4) stav + realita + cena do výrobného logu krájania
-    db_connector.execute_query(
-        "UPDATE zaznamy_vyroba SET stav=%s, realne_mnozstvo_ks=%s, realne_mnozstvo_kg=%s, celkova_cena_surovin=%s WHERE id_davky=%s",
-        ('Prijaté, čaká na tlač', actual_pieces, real_kg, total_cost, log_id), fetch='none'
-    )
-
-    # 5) cena_za_jednotku pre krájanú dávku + vážený priemer €/kg v `produkty`
-    #    €/kg z total_cost/real_kg, €/ks z total_cost/ks ak MJ=ks
-    prod_row = db_connector.execute_query(
-        "SELECT mj, vaha_balenia_g FROM produkty WHERE ean=%s", (target_ean,), fetch='one'
-    ) or {}
-    mj_target = prod_row.get('mj') or 'kg'
-    wg_target = float(prod_row.get('vaha_balenia_g') or 0.0)
-
-    unit_cost_for_zv = None
-    perkg_cost = None
-
-    if real_kg > 0 and total_cost > 0:
-        perkg_cost = total_cost / real_kg
-        if mj_target == 'kg':
-            unit_cost_for_zv = perkg_cost
-        else:
-            if actual_pieces > 0:
-                unit_cost_for_zv = total_cost / actual_pieces
-
-    if unit_cost_for_zv is not None:
-        db_connector.execute_query(
-            "UPDATE zaznamy_vyroba SET cena_za_jednotku=%s WHERE id_davky=%s",
-            (unit_cost_for_zv, log_id), fetch='none'
+        return {r['ean']: r for r in (cur.fetchall() or [])}
+
+    products = _lock_products([d.get('cielovyEan') for _, _, d in parsed] +
+                              [d.get('zdrojovyEan') for _, _, d in parsed])
+    # staršie úlohy bez zdrojovyEan v detailoch – zdroj z produktu
+    missing = [products[d['cielovyEan']].get('zdrojovy_ean') for _, _, d in parsed
+               if not d.get('zdrojovyEan') and d.get('cielovyEan') in products]
+    missing = [e for e in missing if e and e not in products]
+    if missing:
+        products.update(_lock_products(missing))
+
+    # 3) jeden dotaz na €/kg všetkých zdrojov: posledná dávka s cenou, inak sklad (default_cena_eur_kg / nakupna_cena)
+    sources = []
+    for _, _, d in parsed:
+        tgt = products.get(d.get('cielovyEan')) or {}
+        src = d.get('zdrojovyEan') or tgt.get('zdrojovy_ean')
+        d['_src'] = src
+        if src and src not in sources:
+            sources.append(src)
+    source_cost: Dict[str, Optional[float]] = {}
+    if sources:
+        one = f"""
+            SELECT %s AS ean,
+                   (SELECT zv.cena_za_jednotku FROM zaznamy_vyroba zv
+                      JOIN produkty p ON {product_keys.zv_join('zv', 'p')}
+                     WHERE p.ean = %s AND COALESCE(zv.cena_za_jednotku,0) > 0
+                     ORDER BY COALESCE(zv.datum_ukoncenia, zv.datum_vyroby) DESC LIMIT 1) AS last_unit,
+                   (SELECT COALESCE(default_cena_eur_kg, nakupna_cena) FROM sklad WHERE ean = %s LIMIT 1) AS sklad_cost
+        """
+        cur.execute(" UNION ALL ".join([one] * len(sources)), tuple(x for e in sources for x in (e, e, e)))
+        for r in cur.fetchall() or []:
+            e = r['ean']
+            c = None
+            if r.get('last_unit') is not None:
+                sp = products.get(e) or {}
+                if (sp.get('mj') or 'kg') == 'kg':
+                    c = float(r['last_unit'])
+                else:
+                    wg = float(sp.get('vaha_balenia_g') or 0.0)
+                    if wg > 0:
+                        c = float(r['last_unit']) / (wg/1000.0)
+            if c is None and r.get('sklad_cost') is not None:
+                c = float(r['sklad_cost']) or 0.0
+            source_cost[e] = c
+
+    # 4) výpočty v Pythone nad zamknutými hodnotami
+    stock_delta: Dict[str, float] = {}
+    avg_state = {e: (float(r['q'] or 0.0), (None if r.get('avgc') is None else float(r['avgc'])))
+                 for e, r in products.items()}
+    avg_dirty = set()
+    zv_updates = []
+    for log_id, task, d in parsed:
+        target_ean, target_name, source_ean = d.get('cielovyEan'), d.get('cielovyNazov'), d['_src']
+        tgt = products.get(target_ean)
+        if not tgt or not tgt.get('vaha_balenia_g'):
+            errors.append({"logId": log_id, "error": f"Produkt '{target_name}' nemá definovanú váhu balenia."})
+            continue
+        pieces = jobs[log_id]
+        real_kg    = (pieces * float(tgt['vaha_balenia_g'])) / 1000.0
+        planned_kg = float(task.get('planovane_mnozstvo_kg') or 0.0)
+        diff_kg    = planned_kg - real_kg  # >0 vrátime na zdroj; <0 dočerpáme zo zdroja
+
+        if abs(real_kg) > 0.0001:
+            stock_delta[target_ean] = stock_delta.get(target_ean, 0.0) + real_kg
+        if source_ean and abs(diff_kg) > 0.0001:
+            stock_delta[source_ean] = stock_delta.get(source_ean, 0.0) + diff_kg
+            if source_ean in avg_state:
+                q, a = avg_state[source_ean]
+                avg_state[source_ean] = (q + diff_kg, a)
+
+        total_cost = (source_cost.get(source_ean) or 0.0) * real_kg
+        unit_cost_for_zv = None
+        perkg_cost = None
+        if real_kg > 0 and total_cost > 0:
+            perkg_cost = total_cost / real_kg
+            unit_cost_for_zv = perkg_cost if (tgt.get('mj') or 'kg') == 'kg' else total_cost / pieces
+        zv_updates.append(('Prijaté, čaká na tlač', pieces, real_kg, total_cost, unit_cost_for_zv, log_id))
+
+        # vážený priemer €/kg – starý sklad = stav pred pripísaním tejto úlohy
+        if manuf_col and perkg_cost is not None:
+            old_qty, old_avg = avg_state[target_ean]
+            old_qty = max(0.0, old_qty)
+            new_total = old_qty + real_kg
+            if new_total > 0:
+                new_avg = perkg_cost if old_avg is None else ((old_avg*old_qty + perkg_cost*real_kg)/new_total)
+                avg_state[target_ean] = (new_total, new_avg)
+                avg_dirty.add(target_ean)
+        elif target_ean in avg_state:
+            q, a = avg_state[target_ean]
+            avg_state[target_ean] = (q + real_kg, a)
+
+        done.append({"logId": log_id, "real_kg": real_kg, "diff_kg": diff_kg,
+                     "source_ean": source_ean, "target_ean": target_ean})
+
+    # 5) zápisy – jeden príkaz na sklad, jeden executemany na úlohy, jeden na priemery
+    stock_delta = {e: v for e, v in stock_delta.items() if abs(v) > 0.0001}
+    if stock_delta:
+        cases = " ".join(["WHEN %s THEN %s"] * len(stock_delta))
+        cur.execute(
+            f"UPDATE produkty SET aktualny_sklad_finalny_kg = aktualny_sklad_finalny_kg + CASE ean {cases} ELSE 0 END "
+            f"WHERE ean IN ({','.join(['%s'] * len(stock_delta))})",
+            tuple(x for e, v in stock_delta.items() for x in (e, v)) + tuple(stock_delta.keys())
+        )
+    if zv_updates:
+        cur.executemany(
+            "UPDATE zaznamy_vyroba SET stav=%s, realne_mnozstvo_ks=%s, realne_mnozstvo_kg=%s, "
+            "celkova_cena_surovin=%s, cena_za_jednotku=COALESCE(%s, cena_za_jednotku) WHERE id_davky=%s",
+            zv_updates
+        )
+    if avg_dirty:
+        cur.executemany(
+            f"UPDATE produkty SET {manuf_col}=%s WHERE ean=%s",
+            [(avg_state[e][1], e) for e in sorted(avg_dirty)]
         )
 
-    manuf_col = _product_manuf_avg_col()
-    if manuf_col and target_ean and perkg_cost is not None:
-        r = db_connector.execute_query(
-            f"SELECT COALESCE(aktualny_sklad_finalny_kg,0) AS q, {manuf_col} AS avgc FROM produkty WHERE ean=%s",
-            (target_ean,), fetch='one'
-        ) or {}
-        old_qty = float(r.get('q') or 0.0) - real_kg  # odčítaj práve pripočítané, aby váženie bolo presné
-        old_avg = None
-        if r.get('avgc') is not None:
-            try: old_avg = float(r['avgc'])
-            except Exception: old_avg = None
-        new_total = max(0.0, old_qty) + real_kg
-        if new_total > 0:
-            new_avg = perkg_cost if old_avg is None else ((old_avg*max(0.0,old_qty) + perkg_cost*real_kg)/new_total)
-            db_connector.execute_query(
-                f"UPDATE produkty SET {manuf_col}=%s WHERE ean=%s",
-                (new_avg, target_ean), fetch='none'
-            )
+    # 6) nákladová kniha – dávka krájania patrí zdroju (produkt_ean), sklad/priemer cieľu
+    if done:
+        cost_ledger.refresh_products([x for r in done for x in (r['source_ean'], r['target_ean'])], cur=cur)
 
+    return {"done": done, "errors": errors}
+
+def _slicing_msg(real_kg: float, diff_kg: float) -> str:
     msg = f"Hotové balíčky: +{real_kg:.2f} kg na sklad. "
     if abs(diff_kg) > 0.0001:
         if diff_kg > 0:
@@ -712,7 +773,55 @@ def finalize_slicing_transaction(log_id, actual_pieces):
             msg += f"Dočerpané zo zdroja: {-diff_kg:.2f} kg."
     else:
         msg += "Rezervácia = realita."
-    return {"message": msg}
+    return msg
+
+def finalize_slicing_transaction(log_id, actual_pieces):
+    """Dokončenie jednej úlohy krájania – jedna transakcia so zámkami (viď _finalize_slicing_jobs)."""
+    if not log_id or actual_pieces is None:
+        return {"error": "Chýba ID úlohy alebo počet kusov."}
+    pieces = _parse_pieces(actual_pieces)
+    if pieces is None:
+        return {"error": "Počet kusov musí byť kladné celé číslo."}
+
+    cost_ledger.ensure_schema()
+    res = db_connector.with_transaction(
+        lambda conn: _finalize_slicing_jobs(conn.cursor(dictionary=True), {log_id: pieces})
+    )
+    if res['errors']:
+        return {"error": res['errors'][0]['error']}
+    r = res['done'][0]
+    return {"message": _slicing_msg(r['real_kg'], r['diff_kg'])}
+
+def finalize_slicing_batch(items: List[Dict[str, Any]]):
+    """
+    Hromadné dokončenie krájania (koniec zmeny): items = [{logId, actualPieces}, ...].
+    Všetky platné úlohy sa zapíšu v jednej transakcii; neplatné / už spracované sa vrátia v `errors`.
+    """
+    jobs: Dict[str, int] = {}
+    errors: List[Dict[str, Any]] = []
+    for it in items or []:
+        log_id = (it or {}).get('logId')
+        pieces = _parse_pieces((it or {}).get('actualPieces'))
+        if not log_id or pieces is None:
+            errors.append({"logId": log_id, "error": "Chýba ID úlohy alebo počet kusov musí byť kladné celé číslo."})
+        elif log_id in jobs:
+            errors.append({"logId": log_id, "error": f"Úloha {log_id} je v dávke viackrát."})
+        else:
+            jobs[log_id] = pieces
+    if not jobs:
+        return {"error": "Žiadne platné úlohy na dokončenie.", "errors": errors}
+
+    cost_ledger.ensure_schema()
+    res = db_connector.with_transaction(
+        lambda conn: _finalize_slicing_jobs(conn.cursor(dictionary=True), jobs)
+    )
+    results = [{"logId": r['logId'], "message": _slicing_msg(r['real_kg'], r['diff_kg'])} for r in res['done']]
+    errors += res['errors']
+    return {
+        "message": f"Dokončených úloh krájania: {len(results)}" + (f", chýb: {len(errors)}." if errors else "."),
+        "results": results,
+        "errors": errors,
+    }
 
 # ─────────────────────────────────────────────────────────────
 # Manuálny príjem / škoda (Sklad 2)
@@ -741,23 +850,30 @@ def manual_receive_product(data: Dict[str, Any]):
     qty    = _parse_num(qty_s)
     qty_kg = qty if product['mj']=='kg' else (qty * float(product.get('vaha_balenia_g') or 0.0)/1000.0)
 
-    db_connector.execute_query(
-        "UPDATE produkty SET aktualny_sklad_finalny_kg = aktualny_sklad_finalny_kg + %s WHERE ean = %s",
-        (qty_kg, ean), fetch='none'
-    )
-
     zv=_zv_name_col()
     batch_id=_gen_unique_batch_id("MANUAL-PRIJEM", product['nazov_vyrobku'])
-    db_connector.execute_query(
-        f"""INSERT INTO zaznamy_vyroba
-            (id_davky, stav, datum_vyroby, datum_ukoncenia, {zv}, realne_mnozstvo_kg, realne_mnozstvo_ks, poznamka_expedicie)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)""",
-        (batch_id, 'Ukončené', rdate, datetime.now(), product['nazov_vyrobku'],
-         qty if product['mj']=='kg' else None,
-         qty if product['mj']=='ks' else None,
-         f"Manuálne prijal: {worker}"),
-        fetch='none'
-    )
+
+    # príjem na sklad + dávka + produkt_ean v jednej transakcii
+    def work(conn):
+        cur = conn.cursor(dictionary=True)
+        cur.execute(
+            "UPDATE produkty SET aktualny_sklad_finalny_kg = aktualny_sklad_finalny_kg + %s WHERE ean = %s",
+            (qty_kg, ean)
+        )
+        cur.execute(
+            f"""INSERT INTO zaznamy_vyroba
+                (id_davky, stav, datum_vyroby, datum_ukoncenia, {zv}, realne_mnozstvo_kg, realne_mnozstvo_ks, poznamka_expedicie)
+                VALUES (%s,%s,%s,%s,%s,%s,%s,%s)""",
+            (batch_id, 'Ukončené', rdate, datetime.now(), product['nazov_vyrobku'],
+             qty if product['mj']=='kg' else None,
+             qty if product['mj']=='ks' else None,
+             f"Manuálne prijal: {worker}")
+        )
+        product_keys.stamp([batch_id], ean=ean, cur=cur)
+
+    product_keys.ensure_schema()
+    db_connector.with_transaction(work)
+    cost_ledger.refresh_product(ean)
     return {"message": f"Prijatých {qty} {product['mj']} '{product['nazov_vyrobku']}'."}
 
 def log_manual_damage(data: Dict[str, Any]):
@@ -814,91 +930,13 @@ def get_products_for_inventory():
     return categorized
 
 def submit_product_inventory(inventory_data, worker_name):
+    """Inventúra Skladu 2 – jedna transakcia, hromadné zápisy (viď product_stocktake.submit)."""
     if not inventory_data:
         return {"error":"Neboli zadané žiadne reálne stavy."}
 
     _ensure_expedicia_inventury_schema()
-
-    eans = [i['ean'] for i in inventory_data if i.get('ean')]
-    if not eans:
-        return {"message":"Žiadne položky na spracovanie."}
-    placeholders=','.join(['%s']*len(eans))
-
-    rows = db_connector.execute_query(
-        f"""
-        SELECT p.ean, p.nazov_vyrobku, p.predajna_kategoria, p.aktualny_sklad_finalny_kg, p.mj, p.vaha_balenia_g,
-               (SELECT zv.cena_za_jednotku
-                  FROM zaznamy_vyroba zv
-                  JOIN produkty pp ON TRIM(zv.{_zv_name_col()})=TRIM(pp.nazov_vyrobku)
-                 WHERE pp.ean=p.ean AND COALESCE(zv.cena_za_jednotku,0)>0
-                 ORDER BY COALESCE(zv.datum_ukoncenia,zv.datum_vyroby) DESC LIMIT 1) AS unit_cost_last
-          FROM produkty p
-         WHERE p.ean IN ({placeholders})
-        """,
-        tuple(eans)
-    ) or []
-    pmap = {r['ean']: r for r in rows}
-
-    today = date.today()
-    db_connector.execute_query(
-        "INSERT INTO expedicia_inventury (datum, vytvoril, created_at) VALUES (%s,%s,%s)",
-        (today, worker_name, datetime.now()), fetch='none'
-    )
-    inv_row = db_connector.execute_query("SELECT LAST_INSERT_ID() AS id", fetch='one')
-    inv_id = int(inv_row['id'])
-
-    detail_values = []
-    updates = []
-    legacy_rows = []
-    total_count = 0
-
-    for it in inventory_data:
-        ean = it.get('ean'); rv = it.get('realQty'); pr = pmap.get(ean)
-        if not ean or pr is None or rv in (None, ''): 
-            continue
-
-        total_count += 1
-        real_num = _parse_num(rv)
-        real_kg  = real_num if pr['mj']=='kg' else (real_num*float(pr['vaha_balenia_g'] or 0.0)/1000.0)
-        sys_kg   = float(pr.get('aktualny_sklad_finalny_kg') or 0.0)
-
-        if abs(real_kg - sys_kg) > 0.0001:
-            diff_kg = real_kg - sys_kg
-            uc = float(pr.get('unit_cost_last') or 0.0)  # posledná známa jednotková cena; ak niet, 0
-            val = diff_kg * uc
-
-            detail_values.append((
-                inv_id, ean, pr['nazov_vyrobku'], pr.get('predajna_kategoria') or 'Nezaradené',
-                sys_kg, real_kg, diff_kg, val
-            ))
-            updates.append((real_kg, ean))
-
-            legacy_rows.append((
-                datetime.now(), ean, pr['nazov_vyrobku'], pr.get('predajna_kategoria') or 'Nezaradené',
-                sys_kg, real_kg, diff_kg, val, worker_name
-            ))
-
-    if detail_values:
-        db_connector.execute_query(
-            """
-            INSERT INTO expedicia_inventura_polozky
-                (inventura_id, ean, nazov, kategoria, system_stav_kg, realny_stav_kg, rozdiel_kg, hodnota_eur)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
-            """,
-            detail_values, fetch='none', multi=True
-        )
-    if updates:
-        db_connector.execute_query(
-            "UPDATE produkty SET aktualny_sklad_finalny_kg=%s WHERE ean=%s",
-            updates, fetch='none', multi=True
-        )
-
-    _try_insert_into_legacy_inventory_diffs(legacy_rows)
-
-    return {
-        "message": f"Inventúra uložená. Položky: {total_count}, rozdielov: {len(detail_values)}.",
-        "inventoryId": inv_id
-    }
+    return product_stocktake.submit(inventory_data, worker_name,
+                                    legacy_writer=_try_insert_into_legacy_inventory_diffs)
 
 # ─────────────────────────────────────────────────────────────
 # Traceability (pre stránku sledovateľnosti)
@@ -917,7 +955,7 @@ def get_traceability_info(batch_id):
             zv.planovane_mnozstvo_kg, zv.realne_mnozstvo_kg, zv.realne_mnozstvo_ks,
             p.mj, p.ean, zv.celkova_cena_surovin, zv.cena_za_jednotku
         FROM zaznamy_vyroba zv
-        LEFT JOIN produkty p ON TRIM(zv.{zv}) = TRIM(p.nazov_vyrobku)
+        LEFT JOIN produkty p ON {product_keys.zv_join('zv', 'p')}
         WHERE zv.id_davky = %s
         """,
         (batch_id,), fetch='one'
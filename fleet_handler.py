@@ -4,16 +4,20 @@
 # Funkcie na ktoré volá frontend (fleet.js):
 #   getData, saveVehicle, deleteVehicle, saveLog, saveRefueling, deleteRefueling,
 #   getAnalysis, getCosts, saveCost, deleteCost, getReport...
-# AdBlue: bez povinnej DB migrácie (fuel_type/is_adblue ak existujú, inak sidecar JSON)
+# AdBlue: fleet_refueling.fuel_type (ensure_schema doplní stĺpec a prevezme typ zo sidecar JSON / is_adblue)
 # Default šofér: ak driver nepríde, doplní sa z fleet_vehicles.default_driver
-# Costs: amortizácia/mesačne – mesačná suma sa ukladá do DB; meta (mode/total) do sidecar JSON
+# Costs: amortizácia/mesačne – mesačná suma + meta (cost_mode/total_amount/amortize_months) v fleet_costs
+# Analytika: get_fleet_matrix = vozidlá × mesiace jedným zoskupeným dotazom na jazdy / tankovania / náklady
 # =================================================================
 
 import os, json
-from datetime import datetime
+import threading
+from datetime import datetime, date
 from calendar import monthrange
 from flask import render_template, make_response, request
 import db_connector
+import schema_cache
+import date_ranges
 
 # --- cesty na meta (bez DB zmien) --------------------------------
 BASE_DIR    = os.path.dirname(__file__)
@@ -21,9 +25,15 @@ B2C_DIR     = os.path.join(BASE_DIR, "static", "uploads", "b2c")
 ORDERS_DIR  = os.path.join(BASE_DIR, "static", "uploads", "orders")
 os.makedirs(B2C_DIR, exist_ok=True)
 
+# pôvodné sidecar JSON – po ensure_schema sa už nečítajú (len jednorazový prenos do DB)
 REFUEL_META_PATH = os.path.join(B2C_DIR, "_fleet_refueling_meta.json")
 COST_META_PATH   = os.path.join(B2C_DIR, "_fleet_costs_meta.json")   # <-- META k nákladom (mode/total/months...)
 
+MATRIX_MAX_MONTHS = 60
+
+_schema_ready = False
+_lock = threading.Lock()
+
 def _meta_load(path):
     try:
         with open(path, "r", encoding="utf-8") as f:
@@ -67,12 +77,62 @@ def _to_float(v, fb=None):
         return fb
 
 def _col_exists(table: str, col: str) -> bool:
-    r = db_connector.execute_query(
-        "SELECT 1 FROM information_schema.columns "
-        "WHERE table_schema=DATABASE() AND table_name=%s AND column_name=%s LIMIT 1",
-        (table, col), fetch="one"
-    )
-    return bool(r)
+    return schema_cache.has_col(table, col)
+
+def ensure_schema() -> None:
+    """
+    Raz za proces: fleet_refueling.fuel_type a meta nákladov vo fleet_costs (namiesto sidecar JSON).
+    Pri pridaní stĺpca sa doň prenesú hodnoty z is_adblue / JSON súborov.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _lock:
+        if _schema_ready:
+            return
+        try:
+            if schema_cache.table_exists("fleet_refueling") and not _col_exists("fleet_refueling", "fuel_type"):
+                db_connector.execute_query(
+                    "ALTER TABLE fleet_refueling ADD COLUMN fuel_type VARCHAR(10) NOT NULL DEFAULT 'DIESEL'", fetch="none"
+                )
+                if _col_exists("fleet_refueling", "is_adblue"):
+                    db_connector.execute_query(
+                        "UPDATE fleet_refueling SET fuel_type='ADBLUE' WHERE is_adblue=1", fetch="none"
+                    )
+                adblue_ids = [int(k) for k, v in _meta_load(REFUEL_META_PATH).items()
+                              if str(k).isdigit() and str((v or {}).get("fuel_type") or "").upper() == "ADBLUE"]
+                if adblue_ids:
+                    db_connector.execute_query(
+                        f"UPDATE fleet_refueling SET fuel_type='ADBLUE' WHERE id IN ({','.join(['%s'] * len(adblue_ids))})",
+                        tuple(adblue_ids), fetch="none"
+                    )
+            if schema_cache.table_exists("fleet_costs") and not _col_exists("fleet_costs", "cost_mode"):
+                db_connector.execute_query(
+                    "ALTER TABLE fleet_costs "
+                    "ADD COLUMN cost_mode VARCHAR(16) NOT NULL DEFAULT 'monthly', "
+                    "ADD COLUMN total_amount DECIMAL(12,2) NULL, "
+                    "ADD COLUMN amortize_months INT NULL", fetch="none"
+                )
+                rows = [(str((m or {}).get("mode") or "monthly"), (m or {}).get("total_amount"), (m or {}).get("months"), int(k))
+                        for k, m in _meta_load(COST_META_PATH).items() if str(k).isdigit()]
+                if rows:
+                    db_connector.execute_query(
+                        "UPDATE fleet_costs SET cost_mode=%s, total_amount=%s, amortize_months=%s WHERE id=%s",
+                        rows, fetch="none", multi=True
+                    )
+        except Exception as e:
+            # _schema_ready ostáva False – migrácia sa skúsi znova pri ďalšom volaní
+            print(f"!!! UPOZORNENIE: fleet_handler – migrácia fuel_type/cost meta zlyhala: {e}")
+            return
+        _schema_ready = True
+
+def _fuel_expr() -> str:
+    """SQL výraz typu paliva ('DIESEL'|'ADBLUE') nad fleet_refueling."""
+    if _col_exists("fleet_refueling", "fuel_type"):
+        return "UPPER(COALESCE(NULLIF(fuel_type,''),'DIESEL'))"
+    if _col_exists("fleet_refueling", "is_adblue"):
+        return "IF(is_adblue=1,'ADBLUE','DIESEL')"
+    return "'DIESEL'"
 
 # ---------------------------- vehicles -----------------------------
 
@@ -144,9 +204,10 @@ def delete_day_logs(data: dict):
     if confirm_text.upper() not in {t.upper() for t in ok_tokens}:
         return {"error": "Potvrdenie nesedí. Zadajte dátum dňa alebo ZMAZAŤ."}
 
+    day_sql, day_params = date_ranges.day("log_date", date_iso)
     db_connector.execute_query(
-        "DELETE FROM fleet_logs WHERE vehicle_id=%s AND DATE(log_date)=%s",
-        (vid, date_iso), fetch="none"
+        f"DELETE FROM fleet_logs WHERE vehicle_id=%s AND {day_sql}",
+        (vid, *day_params), fetch="none"
     )
     return {"message": "Denné záznamy vymazané."}
 
@@ -178,6 +239,7 @@ def delete_vehicle(data: dict):
 # ------------------------------ data -------------------------------
 
 def get_fleet_data(vehicle_id=None, year=None, month=None):
+    ensure_schema()
     vehicles = db_connector.execute_query("SELECT * FROM fleet_vehicles WHERE is_active=TRUE ORDER BY name")
     if not vehicle_id and vehicles:
         vehicle_id = vehicles[0]["id"]
@@ -187,9 +249,11 @@ def get_fleet_data(vehicle_id=None, year=None, month=None):
 
     logs, refuelings, last_odo = [], [], 0
     if vehicle_id:
+        log_sql, log_params = date_ranges.month("log_date", year, month)
+        ref_sql, ref_params = date_ranges.month("refueling_date", year, month)
         logs = db_connector.execute_query(
-            "SELECT * FROM fleet_logs WHERE vehicle_id=%s AND YEAR(log_date)=%s AND MONTH(log_date)=%s ORDER BY log_date ASC",
-            (vehicle_id, year, month)
+            f"SELECT * FROM fleet_logs WHERE vehicle_id=%s AND {log_sql} ORDER BY log_date ASC",
+            (vehicle_id, *log_params)
         )
 
         # Tankovania + typ paliva
@@ -197,8 +261,8 @@ def get_fleet_data(vehicle_id=None, year=None, month=None):
         if _col_exists("fleet_refueling","fuel_type"): cols.append("fuel_type")
         if _col_exists("fleet_refueling","is_adblue"): cols.append("is_adblue")
         refuelings = db_connector.execute_query(
-            f"SELECT {', '.join(cols)} FROM fleet_refueling WHERE vehicle_id=%s AND YEAR(refueling_date)=%s AND MONTH(refueling_date)=%s ORDER BY refueling_date ASC",
-            (vehicle_id, year, month)
+            f"SELECT {', '.join(cols)} FROM fleet_refueling WHERE vehicle_id=%s AND {ref_sql} ORDER BY refueling_date ASC",
+            (vehicle_id, *ref_params)
         ) or []
 
         if not _col_exists("fleet_refueling","fuel_type") and not _col_exists("fleet_refueling","is_adblue"):
@@ -346,6 +410,7 @@ def save_refueling(data):
     required = ['vehicle_id', 'refueling_date', 'liters']
     if not all(k in data for k in required):
         return {"error":"Chýbajú povinné polia (dátum, litre)."}
+    ensure_schema()
 
     # driver fallback na default_driver z vozidla
     driver = (data.get('driver') or '').strip()
@@ -392,99 +457,204 @@ def delete_refueling(data):
     rid = _to_int(data.get('id'))
     if not rid:
         return {"error":"Chýba ID záznamu na vymazanie."}
+    ensure_schema()
     db_connector.execute_query("DELETE FROM fleet_refueling WHERE id=%s", (rid,), fetch="none")
-    # zmaž meta, ak existuje
-    meta = _meta_load(REFUEL_META_PATH)
-    if str(rid) in meta:
-        meta.pop(str(rid), None)
-        _meta_save(meta, REFUEL_META_PATH)
+    # zmaž meta, ak sa typ paliva ešte drží v sidecar JSON
+    if not _col_exists("fleet_refueling", "fuel_type") and not _col_exists("fleet_refueling", "is_adblue"):
+        meta = _meta_load(REFUEL_META_PATH)
+        if str(rid) in meta:
+            meta.pop(str(rid), None)
+            _meta_save(meta, REFUEL_META_PATH)
     return {"message":"Záznam o tankovaní bol vymazaný."}
 
 # --------------------------- analysis -----------------------------
 
-def get_fleet_analysis(vehicle_id, year, month):
-    year = _to_int(year); month = _to_int(month)
-    if not all([vehicle_id, year, month]):
-        return {"error":"Chýbajú parametre pre analýzu."}
-
-    # km + tovar
-    log_sum = db_connector.execute_query(
-        "SELECT SUM(km_driven) total_km, SUM(goods_out_kg) total_goods_out "
-        "FROM fleet_logs WHERE vehicle_id=%s AND YEAR(log_date)=%s AND MONTH(log_date)=%s",
-        (vehicle_id, year, month), fetch="one"
-    ) or {}
-    total_km   = float(log_sum.get("total_km") or 0.0)
-    goods_out  = float(log_sum.get("total_goods_out") or 0.0)
-
-    # tankovania (nafta/adblue)
-    cols = ["id","liters","total_price"]
-    if _col_exists("fleet_refueling","fuel_type"): cols.append("fuel_type")
-    if _col_exists("fleet_refueling","is_adblue"): cols.append("is_adblue")
-    ref = db_connector.execute_query(
-        f"SELECT {', '.join(cols)} FROM fleet_refueling WHERE vehicle_id=%s AND YEAR(refueling_date)=%s AND MONTH(refueling_date)=%s",
-        (vehicle_id, year, month)
-    ) or []
-
-    meta = _meta_load(REFUEL_META_PATH) if (not _col_exists("fleet_refueling","fuel_type") and not _col_exists("fleet_refueling","is_adblue")) else {}
-
-    diesel_liters = diesel_cost = 0.0
-    adblue_liters = adblue_cost = 0.0
-    for r in ref:
-        lt = float(r.get("liters") or 0.0)
-        ct = float(r.get("total_price") or 0.0)
-        if "fuel_type" in r and r.get("fuel_type"):
-            ftype = str(r["fuel_type"]).upper()
-        elif "is_adblue" in r:
-            ftype = "ADBLUE" if (r.get("is_adblue") in (1, True, "1", "true")) else "DIESEL"
-        else:
-            ftype = (meta.get(str(r["id"])) or {}).get("fuel_type","DIESEL").upper()
+def _cell_metrics(km, goods, diesel_l, diesel_c, adblue_l, adblue_c, other):
+    """Ukazovatele jednej bunky (vozidlo × mesiac, alebo súčet) – rovnaké kľúče ako get_fleet_analysis."""
+    fuel_cost   = diesel_c + adblue_c
+    total_costs = other + fuel_cost
+    return {
+        "total_km": km,
+        "total_costs": total_costs,
+        "cost_per_km": (total_costs / km) if km > 0 else 0.0,
+        "total_goods_out_kg": goods,
+        "cost_per_kg_goods": ((total_costs * 1.1) / goods) if goods > 0 else 0.0,
+        "avg_consumption": (diesel_l / km * 100.0) if km > 0 else 0.0,       # Nafta L/100km
+        "total_diesel_liters": diesel_l,
+        "total_diesel_cost": diesel_c,
+        "total_adblue_liters": adblue_l,
+        "total_adblue_cost": adblue_c,
+        "adblue_per_100km": (adblue_l / km * 100.0) if km > 0 else 0.0,      # AdBlue L/100km
+        "total_fuel_cost": fuel_cost,
+        "other_costs": other,
+    }
 
-        if ftype == "ADBLUE":
-            adblue_liters += lt; adblue_cost += ct
-        else:
-            diesel_liters += lt; diesel_cost += ct
+_SUM_KEYS = ("km", "goods", "diesel_l", "diesel_c", "adblue_l", "adblue_c", "other")
 
-    # ostatné náklady (fix/variabil)
-    start = datetime(year, month, 1)
-    end   = start.replace(day=monthrange(year, month)[1])
-    other = db_connector.execute_query(
-        "SELECT SUM(monthly_cost) c FROM fleet_costs WHERE (vehicle_id=%s OR vehicle_id IS NULL) "
-        "AND valid_from<=%s AND (valid_to IS NULL OR valid_to>=%s)",
-        (vehicle_id, end.date(), start.date()), fetch="one"
-    ) or {}
-    other_costs = float(other.get("c") or 0.0)
+def _months_list(fy, fm, ty, tm):
+    out, y, m = [], fy, fm
+    while (y, m) <= (ty, tm):
+        out.append((y, m))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
 
-    total_fuel_cost = diesel_cost + adblue_cost
-    total_costs     = other_costs + total_fuel_cost
+def _parse_ym(s, fallback):
+    try:
+        y, m = str(s).split("-")[:2]
+        y, m = int(y), int(m)
+        return (y, m) if 1 <= m <= 12 else fallback
+    except Exception:
+        return fallback
 
-    avg_consumption   = (diesel_liters / total_km * 100.0) if total_km > 0 else 0.0   # DIESEL L/100km
-    adblue_per_100km  = (adblue_liters / total_km * 100.0) if total_km > 0 else 0.0   # ADBLUE L/100km
-    cost_per_km       = (total_costs / total_km) if total_km > 0 else 0.0
-    cost_per_kg_goods = ((total_costs * 1.1) / goods_out) if goods_out > 0 else 0.0
+def get_fleet_matrix(vehicle_ids=None, date_from=None, date_to=None):
+    """
+    Analytika vozidlá × mesiace: km, tovar, nafta/AdBlue (litre, €), ostatné náklady (mesačné / rozrátané).
+    vehicle_ids: zoznam alebo "1,2,3" (prázdne = všetky aktívne), date_from/date_to: 'YYYY-MM' (vrátane).
+    Jazdy a tankovania idú každé jedným dotazom zoskupeným podľa (vozidlo, mesiac) cez index
+    (vehicle_id, dátum); náklady jedným výberom platných záznamov rozdelených po mesiacoch.
+    Náklady bez vozidla (vehicle_id IS NULL) sa rátajú každému vozidlu (ako get_fleet_analysis),
+    vo fleet_total len raz.
+    """
+    ensure_schema()
+    today = date.today()
+    ty, tm = _parse_ym(date_to, (today.year, today.month))
+    fy, fm = _parse_ym(date_from, (ty, tm))
+    if (fy, fm) > (ty, tm):
+        return {"error": "Neplatný rozsah mesiacov."}
+    months = _months_list(fy, fm, ty, tm)
+    if len(months) > MATRIX_MAX_MONTHS:
+        return {"error": f"Rozsah je príliš dlhý (max {MATRIX_MAX_MONTHS} mesiacov)."}
+
+    if isinstance(vehicle_ids, str):
+        vehicle_ids = [v for v in vehicle_ids.split(",")]
+    given = [v for v in (vehicle_ids or []) if str(v if v is not None else "").strip()]
+    ids = [i for i in dict.fromkeys(_to_int(v) for v in given) if i]
+    if given and not ids:
+        # zadané, ale neplatné id nesmie potichu prepnúť na všetky vozidlá (analýza by vrátila cudzie vozidlo)
+        return {"error": "Neplatné ID vozidla."}
+    if ids:
+        ph = ",".join(["%s"] * len(ids))
+        vehicles = db_connector.execute_query(
+            f"SELECT id, name, license_plate FROM fleet_vehicles WHERE id IN ({ph}) ORDER BY name", tuple(ids)
+        ) or []
+    else:
+        vehicles = db_connector.execute_query(
+            "SELECT id, name, license_plate FROM fleet_vehicles WHERE is_active=TRUE ORDER BY name"
+        ) or []
+    ids = [int(v["id"]) for v in vehicles]
+    labels = [f"{y}-{m:02d}" for y, m in months]
+    out = {"range": {"from": labels[0], "to": labels[-1]}, "months": labels, "vehicles": [], "fleet_total": {}}
+    if not ids:
+        return out
+
+    ph = ",".join(["%s"] * len(ids))
+    start, end = date_ranges.month_bounds(fy, fm)[0], date_ranges.month_bounds(ty, tm)[1]
+    acc = {(vid, ym): dict.fromkeys(_SUM_KEYS, 0.0) for vid in ids for ym in months}
+
+    log_sql, log_params = date_ranges.half_open("log_date", start, end)
+    for r in db_connector.execute_query(
+            "SELECT vehicle_id, YEAR(log_date) AS y, MONTH(log_date) AS m, "
+            "SUM(km_driven) AS km, SUM(goods_out_kg) AS goods "
+            f"FROM fleet_logs WHERE vehicle_id IN ({ph}) AND {log_sql} "
+            "GROUP BY vehicle_id, YEAR(log_date), MONTH(log_date)",
+            (*ids, *log_params)) or []:
+        a = acc.get((int(r["vehicle_id"]), (int(r["y"]), int(r["m"]))))
+        if a is not None:
+            a["km"] += float(r.get("km") or 0.0)
+            a["goods"] += float(r.get("goods") or 0.0)
+
+    ref_sql, ref_params = date_ranges.half_open("refueling_date", start, end)
+    if _col_exists("fleet_refueling", "fuel_type") or _col_exists("fleet_refueling", "is_adblue"):
+        fuel = _fuel_expr()
+        ref_rows = db_connector.execute_query(
+            f"SELECT vehicle_id, YEAR(refueling_date) AS y, MONTH(refueling_date) AS m, {fuel} AS ft, "
+            "SUM(liters) AS lt, SUM(total_price) AS ct "
+            f"FROM fleet_refueling WHERE vehicle_id IN ({ph}) AND {ref_sql} "
+            f"GROUP BY vehicle_id, YEAR(refueling_date), MONTH(refueling_date), {fuel}",
+            (*ids, *ref_params)) or []
+    else:
+        # migrácia fuel_type neprebehla – typ paliva zo sidecar JSON (po riadkoch)
+        meta = _meta_load(REFUEL_META_PATH)
+        ref_rows = db_connector.execute_query(
+            "SELECT id, vehicle_id, YEAR(refueling_date) AS y, MONTH(refueling_date) AS m, "
+            "liters AS lt, total_price AS ct "
+            f"FROM fleet_refueling WHERE vehicle_id IN ({ph}) AND {ref_sql}",
+            (*ids, *ref_params)) or []
+        for r in ref_rows:
+            r["ft"] = str((meta.get(str(r["id"])) or {}).get("fuel_type") or "DIESEL").upper()
+    for r in ref_rows:
+        a = acc.get((int(r["vehicle_id"]), (int(r["y"]), int(r["m"]))))
+        if a is None:
+            continue
+        kind = "adblue" if str(r.get("ft") or "").upper() == "ADBLUE" else "diesel"
+        a[kind + "_l"] += float(r.get("lt") or 0.0)
+        a[kind + "_c"] += float(r.get("ct") or 0.0)
+
+    # ostatné náklady (fix/variabil) – platné aspoň jeden deň v mesiaci
+    costs = db_connector.execute_query(
+        f"SELECT vehicle_id, monthly_cost, valid_from, valid_to FROM fleet_costs "
+        f"WHERE (vehicle_id IN ({ph}) OR vehicle_id IS NULL) "
+        "AND valid_from < %s AND (valid_to IS NULL OR valid_to >= %s)",
+        (*ids, end, start)) or []
+    shared = {ym: 0.0 for ym in months}
+    for c in costs:
+        vf, vt = date_ranges.to_date(c.get("valid_from")), date_ranges.to_date(c.get("valid_to"))
+        amount = float(c.get("monthly_cost") or 0.0)
+        for ym in months:
+            m_start, m_end = date_ranges.month_bounds(*ym)
+            if (vf is not None and vf >= m_end) or (vt is not None and vt < m_start):
+                continue
+            if c.get("vehicle_id") is None:
+                shared[ym] += amount
+                for vid in ids:
+                    acc[(vid, ym)]["other"] += amount
+            elif (int(c["vehicle_id"]), ym) in acc:
+                acc[(int(c["vehicle_id"]), ym)]["other"] += amount
+
+    fleet_months = {ym: dict.fromkeys(_SUM_KEYS, 0.0) for ym in months}
+    for v in vehicles:
+        vid = int(v["id"])
+        tot = dict.fromkeys(_SUM_KEYS, 0.0)
+        cells = {}
+        for ym, label in zip(months, labels):
+            a = acc[(vid, ym)]
+            cells[label] = _cell_metrics(*(a[k] for k in _SUM_KEYS))
+            for k in _SUM_KEYS:
+                tot[k] += a[k]
+                if k != "other":
+                    fleet_months[ym][k] += a[k]
+        out["vehicles"].append({**v, "months": cells, "total": _cell_metrics(*(tot[k] for k in _SUM_KEYS))})
+
+    # fleet súčet: spoločné náklady len raz
+    specific = {ym: sum(acc[(vid, ym)]["other"] for vid in ids) - shared[ym] * len(ids) for ym in months}
+    grand = dict.fromkeys(_SUM_KEYS, 0.0)
+    fleet_cells = {}
+    for ym, label in zip(months, labels):
+        fm_ = fleet_months[ym]
+        fm_["other"] = specific[ym] + shared[ym]
+        fleet_cells[label] = _cell_metrics(*(fm_[k] for k in _SUM_KEYS))
+        for k in _SUM_KEYS:
+            grand[k] += fm_[k]
+    out["fleet_total"] = {"months": fleet_cells, "total": _cell_metrics(*(grand[k] for k in _SUM_KEYS))}
+    return out
 
-    return {
-        "total_km": total_km,
-        "total_costs": total_costs,
-        "cost_per_km": cost_per_km,
-        "total_goods_out_kg": goods_out,
-        "cost_per_kg_goods": cost_per_kg_goods,
-        "avg_consumption": avg_consumption,            # Nafta L/100km
-        "total_adblue_liters": adblue_liters,
-        "total_adblue_cost": adblue_cost,
-        "adblue_per_100km": adblue_per_100km,          # AdBlue L/100km
-    }
+def get_fleet_analysis(vehicle_id, year, month):
+    year = _to_int(year); month = _to_int(month)
+    if not all([vehicle_id, year, month]):
+        return {"error":"Chýbajú parametre pre analýzu."}
+    ym = f"{year:04d}-{month:02d}"
+    res = get_fleet_matrix([vehicle_id], ym, ym)
+    if res.get("error"):
+        return res
+    for v in res["vehicles"]:
+        return v["months"][ym]
+    return _cell_metrics(0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
 
 def get_analysis(vehicle_id, year, month):
     return get_fleet_analysis(vehicle_id, year, month)
 
 # ----------------------------- costs ------------------------------
 
-def _cost_meta_load():
-    return _meta_load(COST_META_PATH)
-
-def _cost_meta_save(obj):
-    _meta_save(obj, COST_META_PATH)
-
 def _months_inclusive(y1, m1, y2, m2):
     """vráti count mesiacov od (y1,m1) po (y2,m2) vrátane; ak nie je valid_to -> None"""
     try:
@@ -493,21 +663,17 @@ def _months_inclusive(y1, m1, y2, m2):
         return None
 
 def get_fleet_costs(vehicle_id=None):
+    ensure_schema()
     rows = db_connector.execute_query(
         "SELECT * FROM fleet_costs WHERE vehicle_id = %s OR vehicle_id IS NULL ORDER BY valid_from DESC",
         (vehicle_id,)
     ) or []
-    # pripoj meta (mode/total_amount/months)
-    meta = _cost_meta_load()
-    out = []
+    # meta (mode/total_amount/months) je v stĺpcoch fleet_costs
     for r in rows:
-        rid = str(r.get("id"))
-        m = meta.get(rid) or {}
-        r["cost_mode"]       = m.get("mode") or "monthly"       # 'monthly' | 'amortized'
-        r["total_amount"]    = m.get("total_amount")            # None alebo číslo
-        r["amortize_months"] = m.get("months")                  # None alebo int
-        out.append(r)
-    return out
+        r["cost_mode"]       = r.get("cost_mode") or "monthly"   # 'monthly' | 'amortized'
+        r["total_amount"]    = r.get("total_amount")             # None alebo číslo
+        r["amortize_months"] = r.get("amortize_months")          # None alebo int
+    return rows
 
 def save_fleet_cost(data):
     """
@@ -517,8 +683,9 @@ def save_fleet_cost(data):
       - total_amount: celková suma na rozrátanie (pri 'amortized'), resp. mesačná suma pri 'monthly'
       - amortize_use_period: '1'/'true' → počet mesiacov sa vezme z valid_from..valid_to (vrátane)
       - amortize_months: ak nechceš podľa obdobia, zadaj priamo počet mesiacov
-    Do DB sa ukladá iba prepočítaná 'monthly_cost'; meta sa drží v _fleet_costs_meta.json
+    Do DB sa ukladá prepočítaná 'monthly_cost' spolu s meta (cost_mode/total_amount/amortize_months).
     """
+    ensure_schema()
     cost_id = _to_int(data.get('id'))
     required = ['cost_name','cost_type','valid_from']
     if not all(k in data for k in required):
@@ -538,10 +705,10 @@ def save_fleet_cost(data):
     # rozhodnutie o mesačnej sume
     monthly_cost_out = None
 
+    months = None
     if cost_mode == "amortized":
         # spočítať počet mesiacov
         use_period = str(data.get("amortize_use_period") or "").lower() in ("1","true","yes","y","on")
-        months = None
         if use_period and valid_to:
             try:
                 y1,m1 = int(valid_from[:4]), int(valid_from[5:7])
@@ -577,47 +744,38 @@ def save_fleet_cost(data):
         monthly_cost_out,
         valid_from,
         valid_to,
-        vehicle_id_to_save
+        vehicle_id_to_save,
+        cost_mode,
+        total_amount if total_amount is not None else None,
+        int(months) if cost_mode == "amortized" else None
     )
 
-    if cost_id:
+    # bez meta stĺpcov (migrácia zlyhala) ulož aspoň prepočítanú mesačnú sumu
+    if not _col_exists("fleet_costs", "cost_mode"):
+        if cost_id:
+            db_connector.execute_query(
+                "UPDATE fleet_costs SET cost_name=%s, cost_type=%s, monthly_cost=%s, valid_from=%s, valid_to=%s, vehicle_id=%s "
+                "WHERE id=%s",
+                params[:6] + (cost_id,), fetch="none"
+            )
+        else:
+            db_connector.execute_query(
+                "INSERT INTO fleet_costs (cost_name, cost_type, monthly_cost, valid_from, valid_to, vehicle_id) "
+                "VALUES (%s,%s,%s,%s,%s,%s)",
+                params[:6], fetch="none"
+            )
+    elif cost_id:
         db_connector.execute_query(
-            "UPDATE fleet_costs SET cost_name=%s, cost_type=%s, monthly_cost=%s, valid_from=%s, valid_to=%s, vehicle_id=%s WHERE id=%s",
+            "UPDATE fleet_costs SET cost_name=%s, cost_type=%s, monthly_cost=%s, valid_from=%s, valid_to=%s, vehicle_id=%s, "
+            "cost_mode=%s, total_amount=%s, amortize_months=%s WHERE id=%s",
             params + (cost_id,), fetch="none"
         )
-        rid = cost_id
     else:
         db_connector.execute_query(
-            "INSERT INTO fleet_costs (cost_name, cost_type, monthly_cost, valid_from, valid_to, vehicle_id) VALUES (%s,%s,%s,%s,%s,%s)",
+            "INSERT INTO fleet_costs (cost_name, cost_type, monthly_cost, valid_from, valid_to, vehicle_id, "
+            "cost_mode, total_amount, amortize_months) VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)",
             params, fetch="none"
         )
-        r = db_connector.execute_query("SELECT LAST_INSERT_ID() AS id", fetch="one")
-        rid = (r or {}).get("id")
-
-    # zapíš meta (mode/total_amount/mes.)
-    if rid:
-        meta = _cost_meta_load()
-        meta[str(rid)] = {
-            "mode": cost_mode,
-            "total_amount": total_amount if total_amount is not None else None,
-            "months": None
-        }
-        if cost_mode == "amortized":
-            # uložiť, koľko mesiacov reálne používame
-            mths = None
-            if valid_to:
-                try:
-                    y1,m1 = int(valid_from[:4]), int(valid_from[5:7])
-                    y2,m2 = int(valid_to[:4]),   int(valid_to[5:7])
-                    mths = _months_inclusive(y1,m1,y2,m2)
-                except Exception:
-                    pass
-            if not mths:
-                mths = _to_int(data.get("amortize_months"), None)
-            if not mths:
-                mths = 12
-            meta[str(rid)]["months"] = int(mths)
-        _cost_meta_save(meta)
 
     return {"message": ("Náklad upravený." if cost_id else "Náklad pridaný."), "monthly_cost": monthly_cost_out}
 
@@ -626,11 +784,6 @@ def delete_fleet_cost(data):
     if not cid:
         return {"error":"Chýba ID nákladu."}
     db_connector.execute_query("DELETE FROM fleet_costs WHERE id=%s", (cid,), fetch="none")
-    # zmaž cost meta
-    meta = _cost_meta_load()
-    if str(cid) in meta:
-        meta.pop(str(cid), None)
-        _cost_meta_save(meta)
     return {"message":"Náklad vymazaný."}
 
 # aliasy podľa názvov z frontendu
@@ -1,4 +1,5 @@
 import db_connector
+import date_ranges
 from datetime import datetime
 import os
 import csv
@@ -27,13 +28,14 @@ def generate_daily_receipt_export(export_date_str=None):
         export_date = export_date_str or datetime.now().strftime('%Y-%m-%d')
 
         # Získa dáta z databázy pre daný deň
-        query = """
+        day_sql, day_params = date_ranges.day("zv.datum_ukoncenia", export_date)
+        query = f"""
             SELECT p.ean, zv.realne_mnozstvo_kg, zv.realne_mnozstvo_ks, p.mj as unit 
             FROM zaznamy_vyroba zv
             LEFT JOIN produkty p ON zv.nazov_vyrobku = p.nazov_vyrobku
-            WHERE zv.stav = 'Ukončené' AND DATE(zv.datum_ukoncenia) = %s
+            WHERE zv.stav = 'Ukončené' AND {day_sql}
         """
-        records = db_connector.execute_query(query, (export_date,))
+        records = db_connector.execute_query(query, tuple(day_params))
 
         if not records:
             return {"message": f"Pre dátum {export_date} neboli nájdené žiadne ukončené výroby na export.", "file_path": None}
@@ -94,12 +96,10 @@ def process_stock_update_import():
         if not updates_to_catalog:
             return {"message": "Importný súbor neobsahoval žiadne platné dáta."}
 
-        # Aktualizuje databázu v jednej hromadnej operácii
-        db_connector.execute_query(
+        # Aktualizuje databázu v jednej hromadnej operácii (jedna transakcia)
+        db_connector.execute_many(
             "UPDATE produkty SET aktualny_sklad_finalny_kg = %s WHERE ean = %s",
             updates_to_catalog,
-            fetch='none',
-            multi=True
         )
         
         return {"message": f"Sklad bol úspešne aktualizovaný. Počet aktualizovaných produktov: {len(updates_to_catalog)}."}
@@ -0,0 +1,53 @@
+# json_stream.py
+# Streamovaná JSON odpoveď pre veľké výsledky (exporty, reporty za roky)
+# - výstup je rovnaký ako jsonify(list_of_dicts) – používa app.json provider
+#   (rovnaká serializácia datetime / Decimal / date)
+# - riadky sa serializujú po dávkach, v pamäti nie je celý zoznam
+# - kombinuje sa s db_connector.iter_query (tuple riadky + zoznam stĺpcov)
+#
+# Použitie:
+#   cols = []
+#   rows = db_connector.iter_query(sql, params, columns=cols)
+#   return json_stream.json_array_response(rows, cols)
+#
+# handle_request v app.py streamuje automaticky, ak handler vráti generátor.
+
+from typing import Iterable, Iterator, Optional, Sequence
+
+from flask import Response, current_app, stream_with_context
+
+CHUNK_ROWS = 500
+
+
+def json_array_chunks(rows: Iterable, columns: Optional[Sequence[str]] = None,
+                      chunk_rows: int = CHUNK_ROWS) -> Iterator[str]:
+    """
+    Kúsky textu JSON poľa. Riadok môže byť dict (ide bez zmeny) alebo tuple/list –
+    vtedy sa pri serializácii spáruje s `columns` (ak sú zadané) na objekt.
+    `columns` sa čítajú lenivo, takže môže ísť o zoznam, ktorý doplní až iter_query.
+    """
+    dumps = current_app.json.dumps
+    buf = []
+    sep = ""
+    yield "["
+    for r in rows:
+        if columns and not isinstance(r, dict):
+            r = dict(zip(columns, r))
+        buf.append(dumps(r))
+        if len(buf) >= chunk_rows:
+            yield sep + ",".join(buf)
+            sep = ","
+            buf = []
+    if buf:
+        yield sep + ",".join(buf)
+    yield "]"
+
+
+def json_array_response(rows: Iterable, columns: Optional[Sequence[str]] = None,
+                        status: int = 200) -> Response:
+    """Response s JSON poľom, ktoré sa generuje počas odosielania (konštantná pamäť)."""
+    return Response(
+        stream_with_context(json_array_chunks(rows, columns)),
+        status=status,
+        mimetype="application/json",
+    )
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 # ADMIN backend pre B2C (Kancelária)
 # - get_orders: vracia objednávky aj s 'polozky' (fallback zo súboru) a dopočíta predbežnú sumu z cenníka, ak chýba
+# - orders/page: keyset stránkovanie + filtre (dátum/stav/zákazník) v SQL, ceny dávkovo pre stránku
 # - finalize_order: uloží finálnu sumu, nastaví stav "Pripravená" a POŠLE e-mail so sumou (uloží aj META pre prípad chýbajúceho stĺpca)
 # - credit_points: berie výlučne finálnu sumu (DB -> META), pripíše body, stav "Hotová", POŠLE e-mail
 # - order-pdf: vygeneruje PDF z AKTUÁLNYCH cien v B2C cenníku (žiadne nuly)
@@ -8,7 +9,7 @@
 # - save_product_meta: uloží popis a obrázok do static/uploads/b2c/_b2c_meta.json
 # - run_birthday_bonus: hromadný narodeninový bonus (100/150 b.) – idempotentné
 # - customers/query + customer/orders + customer/rewards + customer/update_profile + customer/adjust_points
-# - kampane (campaign/preview, campaign/send) + reporty/štatistiky (stats/*)
+# - kampane (campaign/preview, campaign/send -> úloha b2c_campaigns, campaign/job(s)) + reporty/štatistiky (stats/*)
 # - delivery windows (get/set), report odmien z META
 # - giftcodes (list/upsert/delete/usage/send) – hmotné odmeny bez bodov
 
@@ -17,8 +18,16 @@ from datetime import datetime
 import os, json
 
 import db_connector
+import schema_cache
+import b2c_price_book
+import result_cache
+import b2c_schema
+import date_ranges
+import json_stream
 import pdf_generator
 import notification_handler as notify
+import b2c_campaigns
+import demand_forecast
 
 COLL = "utf8mb4_0900_ai_ci"
 kancelaria_b2c_bp = Blueprint("kancelaria_b2c", __name__)
@@ -89,25 +98,13 @@ def _items_from_disk(order_no: str):
 
 # =================== helpery pre schému ===================
 def _col_exists(table: str, col: str) -> bool:
-    row = db_connector.execute_query("""
-      SELECT 1 FROM information_schema.columns
-      WHERE table_schema = DATABASE() AND table_name=%s AND column_name=%s
-      LIMIT 1
-    """, (table, col), fetch="one")
-    return bool(row)
+    return schema_cache.has_col(table, col)
 
 def _first_col(table: str, candidates):
-    for c in candidates:
-        if _col_exists(table, c): return c
-    return None
+    return schema_cache.first_col(table, candidates)
 
 def _coltype(table: str, col: str) -> str:
-    r = db_connector.execute_query("""
-      SELECT DATA_TYPE dt FROM information_schema.columns
-      WHERE table_schema=DATABASE() AND table_name=%s AND column_name=%s
-      LIMIT 1
-    """, (table, col), fetch="one") or {}
-    return (r.get("dt") or "").lower()
+    return schema_cache.col_type(table, col)
 
 def _is_numeric(table: str, col: str) -> bool:
     dt = _coltype(table, col)
@@ -120,116 +117,39 @@ def _add_status(table: str, row_id: int, value: str):
 
 def _get_order_row(order_id_or_number):
     """Riadok objednávky s aliasmi final/predb. + polozky + fk."""
-    tbl = "b2c_objednavky"
-    idc = _first_col(tbl, ["id"]) or "id"
-    noc = _first_col(tbl, ["cislo_objednavky","objednavka_cislo","order_number"])
-    itc = _first_col(tbl, ["polozky","polozky_json","items"])
-    stc = _first_col(tbl, ["stav","stav_vybavenia","stav_objednavky","status"])
-    fg  = _first_col(tbl, ["finalna_suma_s_dph","finalna_suma","final_total_s_dph","suma_s_dph","total_s_dph"])
-    pg  = _first_col(tbl, ["predpokladana_suma_s_dph","suma_s_dph","total_s_dph","total_gross"])
-    fkc = _first_col(tbl, ["zakaznik_id","customer_id","user_id"])
-
-    cols = [f"o.{idc} AS id"]
-    if noc: cols.append(f"o.{noc} AS cislo_objednavky")
-    if itc: cols.append(f"o.{itc} AS polozky")
-    if stc: cols.append(f"o.{stc} AS stav")
-    if fg:  cols.append(f"o.{fg}  AS finalna_suma_s_dph")
-    if pg:  cols.append(f"o.{pg}  AS predpokladana_suma_s_dph")
-    if fkc: cols.append(f"o.{fkc} AS fk")
-
-    base = f"SELECT {', '.join(cols)} FROM {tbl} o WHERE "
+    P = b2c_schema.orders_profile()
     if isinstance(order_id_or_number, int) or (isinstance(order_id_or_number, str) and order_id_or_number.isdigit()):
-        return db_connector.execute_query(base + f"o.{idc}=%s LIMIT 1", (int(order_id_or_number),), fetch="one")
+        return db_connector.execute_query(P.sql_row_by_id, (int(order_id_or_number),), fetch="one")
     else:
-        if not noc: return None
-        return db_connector.execute_query(base + f"o.{noc}=%s LIMIT 1", (str(order_id_or_number),), fetch="one")
+        if not P.sql_row_by_number: return None
+        return db_connector.execute_query(P.sql_row_by_number, (str(order_id_or_number),), fetch="one")
 
 def _resolve_customer_fk(order_row: dict) -> tuple[str|None, str|int|None]:
     """('by_zakaznik_id'| 'by_id', value)"""
-    tbl = "b2c_objednavky"
-    fkc = _first_col(tbl, ["zakaznik_id","customer_id","user_id"])
-    if not fkc: return (None, None)
+    P = b2c_schema.orders_profile()
+    if not P.fk: return (None, None)
     fk = order_row.get("fk")
-    if fkc == "zakaznik_id" and not _is_numeric(tbl, fkc):
+    if P.fk_by_login:
         return ("by_zakaznik_id", fk)
     return ("by_id", fk)
 
-def _coalesce_expr(tbl_name: str, alias: str, cols: list[str], out_alias: str) -> str:
-    existing = [f"{alias}.{c}" for c in cols if _col_exists(tbl_name, c)]
-    if not existing:
-        return f"0+0 AS {out_alias}"
-    return f"COALESCE({', '.join(existing + ['0'])})+0 AS {out_alias}"
+def _ensure_index(table: str, name: str, cols: list) -> None:
+    """Vytvorí index, ak tabuľka nemá žiadny index začínajúci rovnakým stĺpcom (chyby ignoruje)."""
+    try:
+        row = db_connector.execute_query("""
+            SELECT 1 AS x FROM INFORMATION_SCHEMA.STATISTICS
+             WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND SEQ_IN_INDEX = 1 AND COLUMN_NAME = %s
+             LIMIT 1
+        """, (table, cols[0]), fetch="one")
+        if not row:
+            db_connector.execute_query(f"CREATE INDEX {name} ON {table} ({', '.join(cols)})", fetch="none")
+    except Exception:
+        pass
 
 # =================== ceny z cenníka ===================
 def _fetch_b2c_prices(eans: list[str]) -> dict:
-    base = []
-    for e in eans or []:
-        s = str(e or "").strip()
-        if not s: continue
-        base.append(s)
-        if s.isdigit() and len(s) < 13:
-            base.append(s.zfill(13))
-    if not base: return {}
-    base = list(dict.fromkeys(base))
-    out = {}
-
-    def _acc(rows):
-        for r in rows or []:
-            e = str(r.get("ean") or r.get("ean_produktu") or "").strip()
-            if not e: continue
-            out[e] = {
-                "dph": float(r.get("dph") or 0.0),
-                "cena": float(r.get("cena_bez_dph") or 0.0),
-                "je_v_akcii": str(r.get("je_v_akcii") or "").lower() in ("1","true","t","yes","y","áno","ano"),
-                "akciova_cena_bez_dph": float(r.get("akciova_cena_bez_dph") or 0.0),
-            }
-
-    ph = ",".join(["%s"] * len(base))
-    q1 = f"""
-      SELECT p.ean, p.dph, c.cena_bez_dph, c.je_v_akcii, c.akciova_cena_bez_dph
-      FROM produkty p
-      JOIN b2c_cennik_polozky c
-        ON p.ean COLLATE {COLL} = c.ean_produktu COLLATE {COLL}
-      WHERE p.ean COLLATE {COLL} IN ({ph})
-    """
-    _acc(db_connector.execute_query(q1, tuple(base)) or [])
-    missing = [e for e in base if e not in out]
-
-    if missing:
-        ph2 = ",".join(["%s"] * len(missing))
-        q2 = f"""
-          SELECT p.ean, p.dph, c.cena_bez_dph, c.je_v_akcii, c.akciova_cena_bez_dph
-          FROM produkty p
-          JOIN b2c_cennik_polozky c
-            ON BINARY p.ean = BINARY c.ean_produktu
-          WHERE BINARY p.ean IN ({ph2})
-        """
-        _acc(db_connector.execute_query(q2, tuple(missing)) or [])
-        missing = [e for e in missing if e not in out]
-
-    if missing:
-        ph3 = ",".join(["%s"] * len(missing))
-        cen = db_connector.execute_query(
-            f"SELECT ean_produktu, cena_bez_dph, je_v_akcii, akciova_cena_bez_dph "
-            f"FROM b2c_cennik_polozky WHERE ean_produktu COLLATE {COLL} IN ({ph3})",
-            tuple(missing)
-        ) or []
-        pro = db_connector.execute_query(
-            f"SELECT ean, dph FROM produkty WHERE ean COLLATE {COLL} IN ({ph3})",
-            tuple(missing)
-        ) or []
-        c_map = {str(r["ean_produktu"]).strip(): r for r in cen}
-        p_map = {str(r["ean"]).strip(): r for r in pro}
-        for e in missing:
-            c = c_map.get(e); p = p_map.get(e)
-            if c or p:
-                out[e] = {
-                    "dph": float((p or {}).get("dph") or 0.0),
-                    "cena": float((c or {}).get("cena_bez_dph") or 0.0),
-                    "je_v_akcii": str((c or {}).get("je_v_akcii") or "").lower() in ("1","true","t","yes","y","áno","ano"),
-                    "akciova_cena_bez_dph": float((c or {}).get("akciova_cena_bez_dph") or 0.0),
-                }
-    return out
+    # procesový cenník (b2c_price_book); výsledok pod pôvodným EAN aj pod kľúčom (zero-pad)
+    return b2c_price_book.prices_for(eans)
 
 # =================== META finálky ===================
 def _order_meta_path(order_no: str) -> str:
@@ -259,61 +179,182 @@ def _read_order_meta(order_no: str) -> dict:
     return {}
 
 # =================== ORDERS ===================
-@kancelaria_b2c_bp.get("/api/kancelaria/b2c/get_orders")
-def b2c_get_orders():
-    """Zoznam objednávok – 'polozky' fallback zo súboru; dopočíta predbežnú sumu z cenníka, ak chýba v DB."""
-    tbl = "b2c_objednavky"
-    idc   = _first_col(tbl, ["id"]) or "id"
-    noc   = _first_col(tbl, ["cislo_objednavky","objednavka_cislo","order_number"])
-    datc  = _first_col(tbl, ["datum_objednavky","created_at","created","datum"])
-    delc  = _first_col(tbl, ["pozadovany_datum_dodania","datum_dodania","delivery_date"])
-    statc = _first_col(tbl, ["stav","stav_vybavenia","stav_objednavky","status"])
-    predc = _first_col(tbl, ["predpokladana_suma_s_dph","suma_s_dph","total_s_dph","total_gross"])
-    finalc= _first_col(tbl, ["finalna_suma_s_dph","finalna_suma","final_total_s_dph","suma_s_dph","total_s_dph"])
-    itemc = _first_col(tbl, ["polozky","polozky_json","items"])
-    fkcol = _first_col(tbl, ["zakaznik_id","customer_id","user_id"])
-    join_on = "o.zakaznik_id = z.zakaznik_id" if fkcol == "zakaznik_id" and not _is_numeric(tbl, fkcol) else f"o.{fkcol or 'user_id'} = z.id"
-
-    cols = [f"o.{idc} AS id", "z.nazov_firmy AS zakaznik_meno"]
-    if noc:   cols.append(f"o.{noc}  AS cislo_objednavky")
-    if datc:  cols.append(f"o.{datc} AS datum_objednavky")
-    if delc:  cols.append(f"o.{delc} AS pozadovany_datum_dodania")
-    if statc: cols.append(f"o.{statc} AS stav")
-    if predc: cols.append(f"o.{predc} AS predpokladana_suma_s_dph")
-    if finalc:cols.append(f"o.{finalc} AS finalna_suma_s_dph")
-    if itemc: cols.append(f"o.{itemc} AS polozky")
-
-    q = f"SELECT {', '.join(cols)} FROM {tbl} o LEFT JOIN b2b_zakaznici z ON {join_on} ORDER BY o.{datc or idc} DESC"
-    rows = db_connector.execute_query(q) or []
+ORDERS_PAGE_SIZE     = 50
+ORDERS_PAGE_SIZE_MAX = 200
+_orders_index_checked = False
 
+def _order_items(r: dict):
+    """Položky riadku – z DB stĺpca, inak fallback zo súboru (r['polozky'] doplní ako JSON)."""
+    items = None
+    if r.get("polozky") not in (None, "", []):
+        if isinstance(r["polozky"], str):
+            try: items = json.loads(r["polozky"])
+            except Exception: items = None
+        elif isinstance(r["polozky"], list):
+            items = r["polozky"]
+    if items is None and r.get("cislo_objednavky"):
+        disk = _items_from_disk(r["cislo_objednavky"])
+        if disk is not None:
+            items = disk
+            r["polozky"] = json.dumps(disk, ensure_ascii=False)
+    return items
+
+def _gross_from_prices(items: list, prices: dict) -> float:
+    gross = 0.0
+    for it in items:
+        e = str(it.get("ean") or "").strip()
+        q = float(it.get("quantity") or it.get("mnozstvo") or 0)
+        p = prices.get(e) or (prices.get(e.zfill(13)) if e.isdigit() else None)
+        d = float((p or {}).get("dph") or 0.0)
+        n = float((p or {}).get("akciova_cena_bez_dph") or 0.0) if (p and p.get("je_v_akcii") and p.get("akciova_cena_bez_dph")) else float((p or {}).get("cena") or 0.0)
+        gross += q * (n * (1.0 + d/100.0))
+    return float(f"{gross:.2f}")
+
+def _needs_gross(r: dict) -> bool:
+    return r.get("predpokladana_suma_s_dph") in (None, 0, 0.0)
+
+def _backfill_page_totals(rows: list) -> None:
+    """
+    Predbežná suma pre riadky stránky, kde v DB chýba – položky sa čítajú len
+    pre tieto riadky a ceny sú z procesového cenníka (b2c_price_book), bez ďalšieho dotazu.
+    """
+    pending = []
     for r in rows:
-        items = None
-        if r.get("polozky") not in (None, "", []):
-            if isinstance(r["polozky"], str):
-                try: items = json.loads(r["polozky"])
-                except Exception: items = None
-            elif isinstance(r["polozky"], list):
-                items = r["polozky"]
-        if items is None and r.get("cislo_objednavky"):
-            disk = _items_from_disk(r["cislo_objednavky"])
-            if disk is not None:
-                items = disk
-                r["polozky"] = json.dumps(disk, ensure_ascii=False)
-
-        if (r.get("predpokladana_suma_s_dph") in (None, 0, 0.0)) and items:
-            eans   = [it.get("ean") for it in items if it and it.get("ean")]
-            prices = _fetch_b2c_prices(eans)
-            gross = 0.0
-            for it in items:
-                e = str(it.get("ean") or "").strip()
-                q = float(it.get("quantity") or it.get("mnozstvo") or 0)
-                p = prices.get(e) or (prices.get(e.zfill(13)) if e.isdigit() else None)
-                d = float((p or {}).get("dph") or 0.0)
-                n = float((p or {}).get("akciova_cena_bez_dph") or 0.0) if (p and p.get("je_v_akcii") and p.get("akciova_cena_bez_dph")) else float((p or {}).get("cena") or 0.0)
-                gross += q * (n * (1.0 + d/100.0))
-            r["predpokladana_suma_s_dph"] = float(f"{gross:.2f}")
+        if not _needs_gross(r):
+            continue
+        items = _order_items(r)
+        if items:
+            pending.append((r, items))
+    if not pending:
+        return
+    eans = [it.get("ean") for _, items in pending for it in items if it and it.get("ean")]
+    prices = _fetch_b2c_prices(eans)
+    for r, items in pending:
+        r["predpokladana_suma_s_dph"] = _gross_from_prices(items, prices)
+
+def _ensure_orders_page_index():
+    """Index pre keyset (dátum, id) – InnoDB má PK v sekundárnom indexe, stačí dátum."""
+    global _orders_index_checked
+    if _orders_index_checked:
+        return
+    _orders_index_checked = True
+    P = b2c_schema.orders_profile()
+    if P.date:
+        _ensure_index(P.TABLE, f"idx_b2c_obj_{P.date}", [P.date, P.id])
+
+PAGE_CURSOR_NULL = "NULL"
+
+def _page_cursor(P, row: dict):
+    """
+    Kurzor za posledný riadok stránky: 'ISO-dátum|id', pri NULL dátume 'NULL|id'
+    (bez dátumového stĺpca len '|id').
+    """
+    if P.date:
+        d = row.get("datum_objednavky")
+        if d is None or d == "":
+            d = PAGE_CURSOR_NULL
+        elif hasattr(d, "isoformat"):
+            d = d.isoformat(sep=" ")
+        return f"{d}|{row.get('id')}"
+    return f"|{row.get('id')}"
+
+def _orders_page_sql(P, args, limit: int):
+    where, params = [], []
+    cursor = (args.get("cursor") or "").strip()
+    if cursor:
+        d, _, oid = cursor.rpartition("|")
+        try:
+            oid = int(oid)
+        except ValueError:
+            raise ValueError("Neplatný kurzor.")
+        if P.date and d == PAGE_CURSOR_NULL:
+            where.append(P.admin_page_after_null)
+            params.append(oid)
+        elif P.date and d:
+            where.append(P.admin_page_after)
+            params += [d, d, oid]
+        elif not P.date:
+            where.append(P.admin_page_after)
+            params.append(oid)
+        else:
+            raise ValueError("Neplatný kurzor.")
+
+    # filtre – priamo na stĺpcoch (sargable), dátum ako polouzavretý interval
+    date_from = (args.get("date_from") or "").strip()
+    date_to   = (args.get("date_to") or "").strip()
+    if P.date and date_from:
+        where.append(f"o.{P.date} >= %s"); params.append(date_from)
+    if P.date and date_to:
+        where.append(f"o.{P.date} < DATE_ADD(%s, INTERVAL 1 DAY)"); params.append(date_to)
+    status = (args.get("status") or "").strip()
+    if P.status and status:
+        where.append(f"o.{P.status} = %s"); params.append(status)
+    customer_id = (args.get("customer_id") or "").strip()
+    if customer_id.isdigit():
+        where.append("z.id = %s"); params.append(int(customer_id))
+    q = (args.get("customer") or args.get("q") or "").strip()
+    if q:
+        like = f"%{q}%"
+        parts = ["z.nazov_firmy LIKE %s", "z.email LIKE %s", "z.zakaznik_id LIKE %s"]
+        params += [like, like, like]
+        if P.number:
+            parts.append(f"o.{P.number} LIKE %s"); params.append(f"{q}%")
+        where.append("(" + " OR ".join(parts) + ")")
+
+    sql = P.sql_admin_select
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += P.admin_page_order + " LIMIT %s"
+    params.append(limit)
+    return sql, tuple(params)
 
-    return jsonify(rows)
+@kancelaria_b2c_bp.get("/api/kancelaria/b2c/orders/page")
+def b2c_orders_page():
+    """
+    Stránkovaný zoznam objednávok (keyset na dátum/id, najnovšie prvé).
+    Query: cursor, page_size, date_from, date_to (YYYY-MM-DD), status, customer|q, customer_id.
+    Vracia {items, next_cursor, has_more, page_size}; next_cursor ide do ďalšieho volania.
+    """
+    P = b2c_schema.orders_profile()
+    _ensure_orders_page_index()
+    try:
+        size = int(request.args.get("page_size") or ORDERS_PAGE_SIZE)
+    except ValueError:
+        size = ORDERS_PAGE_SIZE
+    size = max(1, min(size, ORDERS_PAGE_SIZE_MAX))
+    try:
+        sql, params = _orders_page_sql(P, request.args, size + 1)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = db_connector.execute_query(sql, params) or []
+    has_more = len(rows) > size
+    rows = rows[:size]
+    _backfill_page_totals(rows)
+    return jsonify({
+        "items": rows,
+        "next_cursor": _page_cursor(P, rows[-1]) if (has_more and rows) else None,
+        "has_more": has_more,
+        "page_size": size,
+    })
+
+@kancelaria_b2c_bp.get("/api/kancelaria/b2c/get_orders")
+def b2c_get_orders():
+    """Celý zoznam objednávok (export/kompatibilita) – pre UI používaj /orders/page."""
+    # streamované – celá história objednávok sa nedrží v pamäti
+    cols = []
+    rows = db_connector.iter_query(b2c_schema.orders_profile().sql_admin_list, columns=cols)
+    return json_stream.json_array_response(_enrich_order_rows(rows, cols))
+
+
+def _enrich_order_rows(rows, cols):
+    for t in rows:
+        r = dict(zip(cols, t))
+        items = _order_items(r)
+        if _needs_gross(r) and items:
+            eans = [it.get("ean") for it in items if it and it.get("ean")]
+            r["predpokladana_suma_s_dph"] = _gross_from_prices(items, _fetch_b2c_prices(eans))
+        yield r
 
 @kancelaria_b2c_bp.post("/api/kancelaria/b2c/finalize_order")
 def b2c_finalize_order():
@@ -549,7 +590,7 @@ def b2c_get_customers():
       ORDER BY id DESC
     """) or []
 
-    profiles   = _load_json(PROFILE_JSON_PATH, {}) or {}
+    profiles   = _load_profiles()
     awards_log = _load_json(AWARDS_LOG_PATH, {}) or {}
     now = datetime.now(); bucket = f"{now.year:04d}-{now.month:02d}"
     awarded_this_month = (awards_log.get(bucket) or {})
@@ -694,128 +735,201 @@ def run_birthday_bonus():
         "dry_run":  dry
     })
 
-@kancelaria_b2c_bp.post("/api/kancelaria/b2c/customers/query")
-def customers_query():
+# ---- profily (marketing / DOB) – zrkadlo b2c_profile.json v indexovanej tabuľke ----
+# JSON ostáva zdrojom pravdy (zapisuje ho aj verejný portál), tabuľka sa
+# prepíše len keď sa zmení mtime súboru – filtre tak idú priamo v SQL.
+_profiles_cache = {"mtime": None, "data": {}}
+_profiles_synced_mtime = None
+_customers_schema_ready = False
+PROFILES_MISSING = -1.0   # "mtime" chýbajúceho b2c_profile.json – tabuľka sa vyprázdni raz, nie pri každom volaní
+
+def _profiles_mtime() -> float:
+    try:
+        return os.path.getmtime(PROFILE_JSON_PATH)
+    except OSError:
+        return PROFILES_MISSING
+
+def _load_profiles() -> dict:
+    """b2c_profile.json – v pamäti, kým sa nezmení mtime súboru."""
+    mt = _profiles_mtime()
+    if mt == PROFILES_MISSING:
+        return {}
+    if _profiles_cache["mtime"] != mt:
+        _profiles_cache["data"] = _load_json(PROFILE_JSON_PATH, {}) or {}
+        _profiles_cache["mtime"] = mt
+    return _profiles_cache["data"]
+
+def _profile_dob_month(prof: dict):
+    dob = (prof or {}).get("dob") or {}
+    try:
+        if isinstance(dob.get("md"), str) and len(dob["md"]) >= 2:
+            return int(dob["md"].split("-")[0])
+        if isinstance(dob.get("iso_ymd"), str) and len(dob["iso_ymd"]) >= 7:
+            return int(dob["iso_ymd"].split("-")[1])
+    except Exception:
+        pass
+    return None
+
+def _ensure_customers_query_schema():
+    """Migrácia (raz za proces): tabuľka profilov + indexy pre customers_query."""
+    global _customers_schema_ready
+    if _customers_schema_ready:
+        return
+    db_connector.execute_query(f"""
+        CREATE TABLE IF NOT EXISTS b2c_customer_profiles (
+          email                 VARCHAR(255) COLLATE {COLL} NOT NULL PRIMARY KEY,
+          marketing_email       TINYINT(1) NOT NULL DEFAULT 0,
+          marketing_sms         TINYINT(1) NOT NULL DEFAULT 0,
+          marketing_newsletter  TINYINT(1) NOT NULL DEFAULT 0,
+          dob_month             TINYINT NULL,
+          dob_year_known        TINYINT(1) NOT NULL DEFAULT 0,
+          birthday_bonus_opt_in TINYINT(1) NOT NULL DEFAULT 0,
+          KEY idx_b2c_prof_dob_month (dob_month)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE={COLL}
+    """, fetch="none")
+    _ensure_index("b2b_zakaznici", "idx_zak_typ_body", ["typ", "vernostne_body"])
+    P = b2c_schema.orders_profile()
+    if P.fk:
+        _ensure_index(P.TABLE, f"idx_b2c_obj_{P.fk}", [P.fk] + ([P.date] if P.date else []))
+    _customers_schema_ready = True
+
+def _sync_profiles_table():
     """
-    POST JSON: { q, month_bday, has_orders, marketing_email, marketing_sms, marketing_newsletter,
-                 min_points, page, page_size, sort_by, sort_dir }
-    Vracia: { rows:[...], total, page, page_size }
+    Prepíše b2c_customer_profiles z JSON, ak sa súbor od poslednej synchronizácie zmenil
+    (aj zmiznutie súboru je zmena – raz vyprázdni tabuľku, potom sa čaká, kým sa súbor objaví).
     """
-    body = request.get_json(silent=True) or {}
-    q = (body.get("q") or "").strip().lower()
+    global _profiles_synced_mtime
+    mt = _profiles_mtime()
+    if mt == _profiles_synced_mtime:
+        return
+    profiles = _load_profiles()
+    rows = {}
+    # kľúče s veľkými písmenami prvé – malými (kanonické) ich pri kolízii prepíšu
+    for email in sorted(profiles, key=lambda e: e == e.lower()):
+        prof = profiles.get(email) or {}
+        if not email:
+            continue
+        mkt = prof.get("marketing") or {}
+        rows[email.lower()] = (
+            email.lower()[:255], int(bool(mkt.get("email"))), int(bool(mkt.get("sms"))),
+            int(bool(mkt.get("newsletter"))), _profile_dob_month(prof),
+            int(bool((prof.get("dob") or {}).get("iso_ymd"))), int(bool(prof.get("birthday_bonus_opt_in"))),
+        )
+
+    def work(conn):
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM b2c_customer_profiles")
+        finally:
+            cur.close()
+        return db_connector.bulk_upsert(
+            "b2c_customer_profiles", list(rows.values()), key_cols=["email"],
+            columns=["email", "marketing_email", "marketing_sms", "marketing_newsletter",
+                     "dob_month", "dob_year_known", "birthday_bonus_opt_in"],
+            conn=conn,
+        )
+
+    db_connector.with_transaction(work)
+    _profiles_synced_mtime = mt
+
+CUSTOMERS_SORT = {
+    "id": "z.id", "zakaznik_id": "z.zakaznik_id", "nazov_firmy": "z.nazov_firmy", "email": "z.email",
+    "vernostne_body": "vernostne_body", "orders_count": "orders_count",
+    "final_paid_sum": "final_paid_sum", "last_order_date": "last_order_date",
+}
+
+def _customers_joins():
+    """(join agregátu objednávok, join profilov) – alias a / p k b2b_zakaznici z."""
+    _ensure_customers_query_schema()
+    _sync_profiles_table()
+    P = b2c_schema.orders_profile()
+    agg_join = (f"LEFT JOIN ({P.sql_orders_by_customer}) a ON a.k = {P.customer_key}"
+                if P.sql_orders_by_customer else
+                "LEFT JOIN (SELECT NULL AS k, 0 AS orders_count, NULL AS last_order_date, 0 AS final_paid_sum) a ON 1=0")
+    prof_join = f"LEFT JOIN b2c_customer_profiles p ON p.email = z.email COLLATE {COLL}"
+    return agg_join, prof_join
+
+def _customers_filter(body: dict):
+    """
+    WHERE pre customers/query aj kampane: { q, month_bday, has_orders, marketing_email,
+    marketing_sms, marketing_newsletter, min_points }.
+    Vracia (where_sql, params, treba join agregátu, treba join profilov).
+    """
+    q = (body.get("q") or "").strip()
     month_bday = bool(body.get("month_bday"))
     has_orders = bool(body.get("has_orders"))
     m_email = bool(body.get("marketing_email"))
     m_sms   = bool(body.get("marketing_sms"))
     m_news  = bool(body.get("marketing_newsletter"))
     min_points = int(body.get("min_points") or 0)
+
+    where, params = ["z.typ='B2C'"], []
+    if q:
+        like = f"%{q}%"
+        where.append("(z.zakaznik_id LIKE %s OR z.nazov_firmy LIKE %s OR z.email LIKE %s)")
+        params += [like, like, like]
+    if month_bday:
+        where.append("p.dob_month = %s"); params.append(datetime.now().month)
+    if has_orders:
+        where.append("a.orders_count > 0")
+    if m_email: where.append("p.marketing_email = 1")
+    if m_sms:   where.append("p.marketing_sms = 1")
+    if m_news:  where.append("p.marketing_newsletter = 1")
+    if min_points > 0:
+        where.append("COALESCE(z.vernostne_body,0) >= %s"); params.append(min_points)
+    return " WHERE " + " AND ".join(where), params, has_orders, (month_bday or m_email or m_sms or m_news)
+
+@kancelaria_b2c_bp.post("/api/kancelaria/b2c/customers/query")
+def customers_query():
+    """
+    POST JSON: { q, month_bday, has_orders, marketing_email, marketing_sms, marketing_newsletter,
+                 min_points, page, page_size, sort_by, sort_dir }
+    Vracia: { rows:[...], total, page, page_size }
+    Filtre, triedenie aj stránkovanie idú v SQL (agregát objednávok + tabuľka profilov).
+    """
+    body = request.get_json(silent=True) or {}
     page = max(1, int(body.get("page") or 1))
     page_size = max(1, min(200, int(body.get("page_size") or 50)))
     sort_by = (body.get("sort_by") or "id").lower()
     sort_dir= (body.get("sort_dir") or "desc").lower()
     if sort_dir not in ("asc","desc"): sort_dir="desc"
 
-    rows = db_connector.execute_query("""
+    agg_join, prof_join = _customers_joins()
+    where_sql, params, need_agg, need_prof = _customers_filter(body)
+
+    # COUNT len s joinmi, ktoré filtre naozaj potrebujú
+    count_sql = ("SELECT COUNT(*) AS cnt FROM b2b_zakaznici z "
+                 + (agg_join + " " if need_agg else "")
+                 + (prof_join + " " if need_prof else "")
+                 + where_sql)
+    total = int((db_connector.execute_query(count_sql, tuple(params), fetch="one") or {}).get("cnt") or 0)
+
+    order_col = CUSTOMERS_SORT.get(sort_by, "z.id")
+    rows = db_connector.execute_query(f"""
       SELECT z.id, z.zakaznik_id, z.nazov_firmy, z.email, z.telefon, z.adresa, z.adresa_dorucenia,
-             COALESCE(z.vernostne_body,0) AS vernostne_body
+             COALESCE(z.vernostne_body,0) AS vernostne_body,
+             COALESCE(p.marketing_email,0) AS marketing_email,
+             COALESCE(p.marketing_sms,0) AS marketing_sms,
+             COALESCE(p.marketing_newsletter,0) AS marketing_newsletter,
+             p.dob_month, COALESCE(p.dob_year_known,0) AS dob_year_known,
+             COALESCE(p.birthday_bonus_opt_in,0) AS birthday_bonus_opt_in,
+             COALESCE(a.orders_count,0) AS orders_count, a.last_order_date,
+             COALESCE(a.final_paid_sum,0) AS final_paid_sum
       FROM b2b_zakaznici z
-      WHERE z.typ='B2C'
-    """) or []
-    profiles = _load_json(PROFILE_JSON_PATH, {}) or {}
+      {agg_join}
+      {prof_join}
+      {where_sql}
+      ORDER BY {order_col} {sort_dir.upper()}, z.id {sort_dir.upper()}
+      LIMIT %s OFFSET %s
+    """, tuple(params) + (page_size, (page-1)*page_size)) or []
 
-    final_expr = _coalesce_expr(
-        "b2c_objednavky", "o",
-        ["finalna_suma_s_dph","finalna_suma","final_total_s_dph","suma_s_dph","total_s_dph"],
-        "finalka"
-    )
-    pred_expr = _coalesce_expr(
-        "b2c_objednavky", "o",
-        ["predpokladana_suma_s_dph","suma_s_dph","total_s_dph","total_gross"],
-        "pred"
-    )
-    noc = _first_col("b2c_objednavky", ["cislo_objednavky","objednavka_cislo","order_number"])
-    dat = _first_col("b2c_objednavky", ["datum_objednavky","created_at","created","datum"])
-
-    select_cols = ["z.id AS cust_id"]
-    if noc: select_cols.append(f"o.{noc} AS cislo_objednavky")
-    if dat: select_cols.append(f"o.{dat} AS datum_objednavky")
-    select_cols += [final_expr, pred_expr]
-
-    join_parts = []
-    if _col_exists("b2c_objednavky", "zakaznik_id"):
-        if _is_numeric("b2c_objednavky", "zakaznik_id"):
-            join_parts.append("o.zakaznik_id = z.id")
-        else:
-            join_parts.append("o.zakaznik_id = z.zakaznik_id")
-    if _col_exists("b2c_objednavky", "customer_id"):
-        join_parts.append("o.customer_id = z.id")
-    if _col_exists("b2c_objednavky", "user_id"):
-        join_parts.append("o.user_id = z.id")
-
-    orders_map = {}
-    if join_parts:
-        ord_rows = db_connector.execute_query(
-            f"SELECT {', '.join(select_cols)} FROM b2c_objednavky o "
-            f"JOIN b2b_zakaznici z ON ({' OR '.join(join_parts)}) WHERE z.typ='B2C'"
-        ) or []
-        for r in ord_rows:
-            cid = r["cust_id"]
-            m = orders_map.setdefault(cid, {"count":0,"last":None,"final_sum":0.0})
-            m["count"] += 1
-            if r.get("datum_objednavky") and (m["last"] is None or r["datum_objednavky"]>m["last"]):
-                m["last"] = r["datum_objednavky"]
-            m["final_sum"] += float(r.get("finalka") or 0.0)
-
-    now = datetime.now(); cur_m = now.month
-    out = []
     for r in rows:
-        email_key = (r.get("email") or '').lower()
-        prof = profiles.get(email_key) or profiles.get(r.get("email") or "")
-        mkt = (prof or {}).get("marketing") or {}
-        dob = (prof or {}).get("dob") or {}
-        mm = None
-        if isinstance(dob.get("md"), str) and len(dob["md"])>=2:
-            try: mm = int(dob["md"].split("-")[0])
-            except: mm = None
-        elif isinstance(dob.get("iso_ymd"), str) and len(dob["iso_ymd"])>=7:
-            try: mm = int(dob["iso_ymd"].split("-")[1])
-            except: mm = None
+        for k in ("marketing_email", "marketing_sms", "marketing_newsletter", "dob_year_known", "birthday_bonus_opt_in"):
+            r[k] = bool(r.get(k))
+        r["orders_count"]   = int(r.get("orders_count") or 0)
+        r["final_paid_sum"] = float(r.get("final_paid_sum") or 0.0)
 
-        rec = {
-            **r,
-            "marketing_email": bool(mkt.get("email")),
-            "marketing_sms":   bool(mkt.get("sms")),
-            "marketing_newsletter": bool(mkt.get("newsletter")),
-            "dob_month": mm,
-            "dob_year_known": bool(dob.get("iso_ymd")),
-            "birthday_bonus_opt_in": bool((prof or {}).get("birthday_bonus_opt_in"))
-        }
-        ord_info = orders_map.get(r["id"]) or {"count":0,"last":None,"final_sum":0.0}
-        rec["orders_count"]    = ord_info["count"]
-        rec["last_order_date"] = ord_info["last"]
-        rec["final_paid_sum"]  = ord_info["final_sum"]
-
-        if q:
-            hay = f'{(rec.get("zakaznik_id") or "")} {(rec.get("nazov_firmy") or "")} {(rec.get("email") or "")}'.lower()
-            if q not in hay: continue
-        if month_bday and (mm != cur_m): continue
-        if has_orders and ord_info["count"]<=0: continue
-        if m_email and not rec["marketing_email"]: continue
-        if m_sms   and not rec["marketing_sms"]: continue
-        if m_news  and not rec["marketing_newsletter"]: continue
-        if rec["vernostne_body"] < min_points: continue
-
-        out.append(rec)
-
-    key = sort_by; rev = (sort_dir=='desc')
-    def sort_key(x):
-        if key in ('vernostne_body','orders_count','final_paid_sum'): return float(x.get(key) or 0)
-        if key in ('last_order_date',): return x.get(key) or ''
-        return str(x.get(key) or '').lower()
-    out.sort(key=sort_key, reverse=rev)
-
-    total = len(out); start = (page-1)*page_size; end = start + page_size
-    return jsonify({ "rows": out[start:end], "total": total, "page": page, "page_size": page_size })
+    return jsonify({ "rows": rows, "total": total, "page": page, "page_size": page_size })
 
 @kancelaria_b2c_bp.post("/api/kancelaria/b2c/customer/update_profile")
 def customer_update_profile():
@@ -945,27 +1059,32 @@ def campaign_preview():
     Vracia: { count, sample:[{email,name,vernostne_body,...} (max 20)] }
     """
     filt = request.get_json(silent=True) or {}
-    res = customers_query().get_json()
-    rows = res.get("rows") or []
-    want_news = bool(filt.get("marketing_newsletter"))
-    want_email= bool(filt.get("marketing_email"))
-    filtered = []
-    for r in rows:
-        ok = True
-        if want_news and not r.get("marketing_newsletter"): ok=False
-        if want_email and not r.get("marketing_email"): ok=False
-        if ok: filtered.append(r)
-    return jsonify({"count": len(filtered), "sample": filtered[:20]})
+    agg_join, prof_join = _customers_joins()
+    where_sql, params, need_agg, _ = _customers_filter(filt)
+    from_sql = f"FROM b2b_zakaznici z {agg_join if need_agg else ''} {prof_join} {where_sql}"
+    cnt = db_connector.execute_query(f"SELECT COUNT(*) AS cnt {from_sql}", tuple(params), fetch="one") or {}
+    sample = db_connector.execute_query(f"""
+      SELECT z.id, z.zakaznik_id, z.nazov_firmy, z.email, COALESCE(z.vernostne_body,0) AS vernostne_body,
+             COALESCE(p.marketing_email,0) AS marketing_email,
+             COALESCE(p.marketing_newsletter,0) AS marketing_newsletter
+      {from_sql}
+      ORDER BY z.id DESC LIMIT 20
+    """, tuple(params)) or []
+    for r in sample:
+        r["marketing_email"] = bool(r.get("marketing_email"))
+        r["marketing_newsletter"] = bool(r.get("marketing_newsletter"))
+    return jsonify({"count": int(cnt.get("cnt") or 0), "sample": sample})
 
 @kancelaria_b2c_bp.post("/api/kancelaria/b2c/campaign/send")
 def campaign_send():
     """
-    Hromadná kampaň: pošle e-mail a voliteľne pripíše body.
+    Hromadná kampaň: založí úlohu (snímka adresátov + body naraz) a hneď vráti job_id;
+    e-maily odosiela b2c_campaigns na pozadí. Stav: GET campaign/job?id=...
     POST:
       {
         "filters": { ... ako customers/query ... },
         "subject": "Predmet",
-        "html": "<p>Text...</p>",
+        "html": "<p>Text... {{meno}}</p>",
         "template": "10orders|campaign|goodwill|None",
         "custom_message": "text",
         "points_delta": 0,
@@ -979,72 +1098,80 @@ def campaign_send():
     custom  = (data.get("custom_message") or "").strip() or None
     delta   = int(data.get("points_delta") or 0)
     respect_optin = True if data.get("respect_optin", True) else False
+    filters = data.get("filters") if isinstance(data.get("filters"), dict) else data
+
+    agg_join, prof_join = _customers_joins()
+    where_sql, params, need_agg, need_prof = _customers_filter(filters)
+    where_sql += " AND z.email IS NOT NULL AND z.email <> ''"
+    if respect_optin:
+        where_sql += " AND (p.marketing_email = 1 OR p.marketing_newsletter = 1)"
+        need_prof = True
+    from_sql = ("FROM b2b_zakaznici z "
+                + (agg_join + " " if need_agg else "")
+                + (prof_join + " " if need_prof else "")
+                + where_sql)
+
+    # obsah sa renderuje raz pre celú kampaň
+    if delta:
+        mail_subject, body_html, sms_text = notify.points_awarded_content(delta, template, custom)
+    else:
+        mail_subject = subject or "Informácia od MIK s.r.o."
+        body_html = notify._wrap_html("Informácia od MIK s.r.o.",
+                                      html or f"<p>{custom or 'Ďakujeme, že ste s nami.'}</p>")
+        sms_text = None
 
-    res = customers_query().get_json()
-    candidates = res.get("rows") or []
-
-    recipients = []
-    for r in candidates:
-        if not r.get("email"): continue
-        if respect_optin and not (r.get("marketing_email") or r.get("marketing_newsletter")):
-            continue
-        recipients.append(r)
+    res = b2c_campaigns.create_job(mail_subject, body_html, sms_text, delta, from_sql, tuple(params),
+                                   filters={k: v for k, v in filters.items() if k not in ("html",)})
 
     camp_dir = os.path.join(DATA_DIR, "campaigns"); os.makedirs(camp_dir, exist_ok=True)
-    camp_log = os.path.join(camp_dir, f"b2c_campaigns.jsonl")
-
-    sent = 0; awarded = 0; errors = 0
-    for r in recipients:
-        to = r["email"]
-        try:
-            mail_html = html or f"<p>{custom or 'Ďakujeme, že ste s nami.'}</p>"
-            try:
-                if hasattr(notify, "send_points_awarded_email") and delta:
-                    notify.send_points_awarded_email(to, delta, template, custom)
-                else:
-                    notify._send_email(to, subject or "Informácia od MIK s.r.o.", notify._wrap_html("Informácia od MIK s.r.o.", mail_html))
-            except Exception:
-                notify._send_email(to, subject or "Informácia od MIK s.r.o.", notify._wrap_html("Informácia od MIK s.r.o.", mail_html))
-            sent += 1
-        except Exception:
-            errors += 1
-
-        if delta:
-            try:
-                db_connector.execute_query(
-                    "UPDATE b2b_zakaznici SET vernostne_body=COALESCE(vernostne_body,0)+%s WHERE id=%s",
-                    (delta, int(r["id"])), fetch="none"
-                )
-                awarded += 1
-            except Exception:
-                errors += 1
-
-        with open(camp_log, "a", encoding="utf-8") as f:
-            f.write(json.dumps({
-                "ts": datetime.utcnow().isoformat()+"Z",
-                "email": to, "customer_id": r["id"], "subject": subject, "delta": delta
-            }, ensure_ascii=False) + "\n")
-
-    return jsonify({"message":"Kampaň odoslaná.", "recipients": len(recipients), "sent": sent, "awarded_points_to": awarded, "errors": errors})
+    with open(os.path.join(camp_dir, "b2c_campaigns.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps({
+            "ts": datetime.utcnow().isoformat()+"Z", "job_id": res["job_id"],
+            "subject": mail_subject, "delta": delta, "recipients": res["recipients"]
+        }, ensure_ascii=False) + "\n")
+
+    return jsonify({"message": "Kampaň zaradená na odoslanie.", **res})
+
+@kancelaria_b2c_bp.get("/api/kancelaria/b2c/campaign/jobs")
+def campaign_jobs():
+    return jsonify(b2c_campaigns.list_jobs())
+
+@kancelaria_b2c_bp.get("/api/kancelaria/b2c/campaign/job")
+def campaign_job():
+    job_id = request.args.get("id", type=int)
+    if not job_id: return jsonify({"error":"Chýba id."}), 400
+    res = b2c_campaigns.progress(job_id)
+    return (jsonify(res), 404) if res.get("error") else jsonify(res)
+
+@kancelaria_b2c_bp.post("/api/kancelaria/b2c/campaign/job/cancel")
+def campaign_job_cancel():
+    d = request.get_json(silent=True) or {}
+    if not d.get("id"): return jsonify({"error":"Chýba id."}), 400
+    res = b2c_campaigns.cancel_job(int(d["id"]))
+    return (jsonify(res), 400) if res.get("error") else jsonify(res)
 
 # =================== štatistiky / reporty ===================
 def _orders_agg(date_from: str=None, date_to: str=None):
-    tbl = "b2c_objednavky"
-    dat = _first_col(tbl, ["datum_objednavky","created_at","created","datum"]) or "id"
-    final_expr = _coalesce_expr(tbl, "o", ["finalna_suma_s_dph","finalna_suma","final_total_s_dph","suma_s_dph","total_s_dph"], "finalka")
-    pred_expr  = _coalesce_expr(tbl, "o", ["predpokladana_suma_s_dph","suma_s_dph","total_s_dph","total_gross"], "pred")
-    cols = [f"o.{dat} AS datum", final_expr, pred_expr]
-    q = f"SELECT {', '.join(cols)} FROM {tbl} o"
-    params = []
-    if date_from or date_to:
-        q += " WHERE 1=1"
-        if date_from: q += " AND DATE(o." + dat + ") >= %s"; params.append(date_from)
-        if date_to:   q += " AND DATE(o." + dat + ") <= %s"; params.append(date_to)
+    q = b2c_schema.orders_profile().sql_orders_agg[(bool(date_from), bool(date_to))]
+    params = [v for v in date_ranges.day_bounds(date_from, date_to) if v]
     return db_connector.execute_query(q, tuple(params) if params else None) or []
 
+def _stats_range():
+    """date_from / date_to (YYYY-MM-DD) zo query stringu; nezmyselný dátum -> ValueError (route vráti 400)."""
+    df = (request.args.get("date_from") or "").strip() or None
+    dt = (request.args.get("date_to") or "").strip() or None
+    try:
+        date_ranges.to_date(df); date_ranges.to_date(dt)
+    except ValueError:
+        raise ValueError("Neplatný dátum (očakáva sa YYYY-MM-DD).")
+    return df, dt
+
 @kancelaria_b2c_bp.get("/api/kancelaria/b2c/stats/overview")
 def stats_overview():
-    df = request.args.get("date_from"); dt = request.args.get("date_to")
+    try:
+        df, dt = _stats_range()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     ords = _orders_agg(df, dt)
     orders = len(ords)
     final_sum = sum(float(o.get("finalka") or 0.0) for o in ords)
@@ -1055,10 +1182,8 @@ def stats_overview():
     dat= _first_col(tbl, ["datum_objednavky","created_at","created","datum"]) or "id"
     customers_active = 0
     if fk:
-        q = f"SELECT COUNT(DISTINCT {fk}) AS c FROM {tbl} WHERE 1=1"
-        params = []
-        if df: q += f" AND DATE({dat}) >= %s"; params.append(df)
-        if dt: q += f" AND DATE({dat}) <= %s"; params.append(dt)
+        where, params = date_ranges.days(dat, df, dt)
+        q = f"SELECT COUNT(DISTINCT {fk}) AS c FROM {tbl} WHERE {where}"
         r = db_connector.execute_query(q, tuple(params) if params else None, fetch="one") or {}
         customers_active = int(r.get("c") or 0)
 
@@ -1066,10 +1191,8 @@ def stats_overview():
     rewards_redeemed = 0
     if _col_exists(rew_tbl,"datum_vytvorenia") or _col_exists(rew_tbl,"created_at"):
         date_col = _first_col(rew_tbl, ["datum_vytvorenia","created_at"])
-        q = f"SELECT COUNT(*) c FROM {rew_tbl} WHERE 1=1"
-        params=[]
-        if df: q += f" AND DATE({date_col}) >= %s"; params.append(df)
-        if dt: q += f" AND DATE({date_col}) <= %s"; params.append(dt)
+        where, params = date_ranges.days(date_col, df, dt)
+        q = f"SELECT COUNT(*) c FROM {rew_tbl} WHERE {where}"
         r = db_connector.execute_query(q, tuple(params) if params else None, fetch="one") or {}
         rewards_redeemed = int(r.get("c") or 0)
 
@@ -1108,45 +1231,27 @@ def stats_overview():
 @kancelaria_b2c_bp.get("/api/kancelaria/b2c/stats/top_customers")
 def stats_top_customers():
     limit = int(request.args.get("limit") or 20)
-    df = request.args.get("date_from"); dt = request.args.get("date_to")
-    tbl = "b2c_objednavky"
-    fk  = _first_col(tbl, ["zakaznik_id","customer_id","user_id"])
-    dat = _first_col(tbl, ["datum_objednavky","created_at","created","datum"]) or "id"
-    final_expr = _coalesce_expr(tbl,"o",["finalna_suma_s_dph","finalna_suma","final_total_s_dph","suma_s_dph","total_s_dph"],"finalka")
-    if not fk:
+    try:
+        df, dt = _stats_range()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    q = b2c_schema.orders_profile().sql_top_customers.get((bool(df), bool(dt)))
+    if not q:
         return jsonify([])
-    q = f"""
-      SELECT z.id AS customer_id, z.zakaznik_id, z.nazov_firmy, z.email,
-             SUM({final_expr.split(' AS ')[0]}) AS suma
-      FROM b2c_objednavky o
-      JOIN b2b_zakaznici z ON (
-        { ' OR '.join([p for p in [
-            "o.zakaznik_id=z.zakaznik_id" if _col_exists(tbl,"zakaznik_id") and not _is_numeric(tbl,"zakaznik_id") else None,
-            "o.zakaznik_id=z.id"          if _col_exists(tbl,"zakaznik_id") and _is_numeric(tbl,"zakaznik_id") else None,
-            "o.customer_id=z.id"          if _col_exists(tbl,"customer_id") else None,
-            "o.user_id=z.id"              if _col_exists(tbl,"user_id") else None
-        ] if p]) }
-      )
-      WHERE z.typ='B2C'
-    """
-    params=[]
-    if df: q += f" AND DATE(o.{dat}) >= %s"; params.append(df)
-    if dt: q += f" AND DATE(o.{dat}) <= %s"; params.append(dt)
-    q += " GROUP BY z.id, z.zakaznik_id, z.nazov_firmy, z.email ORDER BY suma DESC LIMIT %s"
-    params.append(limit)
+    params = [v for v in date_ranges.day_bounds(df, dt) if v] + [limit]
     return jsonify(db_connector.execute_query(q, tuple(params), fetch='all') or [])
 
 @kancelaria_b2c_bp.get("/api/kancelaria/b2c/stats/rewards_usage")
 def stats_rewards_usage():
-    df = request.args.get("date_from"); dt = request.args.get("date_to")
+    try:
+        df, dt = _stats_range()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     tbl="b2c_uplatnene_odmeny"
     if not _col_exists(tbl,"nazov_odmeny"): return jsonify([])
     date_col = _first_col(tbl, ["datum_vytvorenia","created_at"])
-    q = f"SELECT nazov_odmeny, COUNT(*) cnt, SUM(COALESCE(pouzite_body,0)) points FROM {tbl} WHERE 1=1"
-    params=[]
-    if date_col:
-        if df: q += f" AND DATE({date_col}) >= %s"; params.append(df)
-        if dt: q += f" AND DATE({date_col}) <= %s"; params.append(dt)
+    where, params = date_ranges.days(date_col, df, dt) if date_col else ("1=1", [])
+    q = f"SELECT nazov_odmeny, COUNT(*) cnt, SUM(COALESCE(pouzite_body,0)) points FROM {tbl} WHERE {where}"
     q += " GROUP BY nazov_odmeny ORDER BY cnt DESC"
     return jsonify(db_connector.execute_query(q, tuple(params) if params else None) or [])
 
@@ -1366,6 +1471,7 @@ def cancel_b2c_order():
     order_no = row.get("cislo_objednavky") or str(row["id"])
     _add_status("b2c_objednavky", row["id"], "Zrušená")
     _write_order_meta(order_no, {"cancel_reason": reason, "cancelled_at": datetime.utcnow().isoformat()+"Z"})
+    demand_forecast.refresh_order(demand_forecast.CHANNEL_B2C, row["id"])
 
     # pokus o e-mail zákazníkovi
     try:
@@ -1412,7 +1518,12 @@ def get_dashboard_data():
 
     df = _dt(request.args.get("date_from")) or date.today()
     dt_ = _dt(request.args.get("date_to"))   or df
+    return jsonify(_dashboard_payload(df, dt_))
+
 
+@result_cache.cached("b2b_objednavky", "b2c_objednavky", "b2b_zakaznici", daily=True)
+def _dashboard_payload(df: date, dt_: date) -> dict:
+    """KPI + next7Days pre get_dashboard_data – cache podľa obdobia, zneplatní ju zápis objednávok/registrácií."""
     # --- helper na spočítanie v intervale podľa detegovaného dátumového stĺpca
     def _count_in_period(table: str, date_candidates: list[str], where_extra: str = "", params_extra: tuple = ()):
         dcol = _first_col(table, date_candidates)
@@ -1420,8 +1531,8 @@ def get_dashboard_data():
             # fallback – ak tabuľka nemá vhodný dátumový stĺpec, vráť celkový count
             r = db_connector.execute_query(f"SELECT COUNT(*) c FROM {table}", fetch="one") or {}
             return int(r.get("c") or 0)
-        sql = f"SELECT COUNT(*) c FROM {table} WHERE DATE({dcol}) BETWEEN %s AND %s"
-        params = [df.isoformat(), dt_.isoformat()]
+        where, params = date_ranges.days(dcol, df, dt_)
+        sql = f"SELECT COUNT(*) c FROM {table} WHERE {where}"
         if where_clause := (where_extra or "").strip():
             sql += f" AND ({where_clause})"
             if params_extra:
@@ -1443,9 +1554,10 @@ def get_dashboard_data():
     if status_col and recv_col:
         pats = ["prijat", "na potvr", "čaká", "caka"]
         cond = " OR ".join([f"LOWER({status_col}) LIKE %s" for _ in pats])
-        params = tuple([f"%{p}%" for p in pats] + [df.isoformat(), dt_.isoformat()])
+        recv_sql, recv_params = date_ranges.days(recv_col, df, dt_)
+        params = tuple([f"%{p}%" for p in pats] + recv_params)
         sql = (f"SELECT COUNT(*) c FROM b2b_objednavky "
-               f"WHERE ({cond}) AND DATE({recv_col}) BETWEEN %s AND %s")
+               f"WHERE ({cond}) AND {recv_sql}")
         r = db_connector.execute_query(sql, params, fetch="one") or {}
         b2b_pending = int(r.get("c") or 0)
 
@@ -1454,9 +1566,10 @@ def get_dashboard_data():
         dcol = _col = _first_col(table, delivery_candidates)
         if not dcol:
             return {}
+        where, params = date_ranges.days(dcol, start, end)
         sql = (f"SELECT DATE({dcol}) AS d, COUNT(*) AS c "
-               f"FROM {table} WHERE DATE({dcol}) BETWEEN %s AND %s GROUP BY DATE({dcol})")
-        db_nt = db_connector.execute_query(sql, (start.isoformat(), end.isoformat())) or []
+               f"FROM {table} WHERE {where} GROUP BY DATE({dcol})")
+        db_nt = db_connector.execute_query(sql, tuple(params)) or []
         rows = db_nt
         out = {}
         for r in rows:
@@ -1488,7 +1601,7 @@ def get_dashboard_data():
             "total": b2c + b2b
         })
 
-    return jsonify({
+    return {
         "period": {"date_from": df.isoformat(), "date_to": dt_.isoformat()},
         "cards": {
             "b2b_orders":         {"count": b2b_orders,        "label": "B2B prijaté"},
@@ -1503,4 +1616,4 @@ def get_dashboard_data():
         "lowStockGoods": {},
         "topProducts": [],
         "timeSeriesData": []
-    })
+    }
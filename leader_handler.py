@@ -13,6 +13,9 @@ import expedition_handler as exped
 
 import random
 import db_connector
+import schema_cache
+import date_ranges
+import demand_forecast
 from auth_handler import login_required
 leader_bp = Blueprint('leader', __name__, url_prefix='/api/leader')
 
@@ -32,19 +35,10 @@ def _get_conn():
     raise RuntimeError('db_connector nemá get_connection/pool/cnx')
 
 def _table_exists(table: str) -> bool:
-    try:
-        rows = db_connector.execute_query("SHOW TABLES LIKE %s", (table,))
-        return bool(rows)
-    except Exception:
-        return False
+    return schema_cache.table_exists(table)
 
 def _table_cols(table: str) -> set[str]:
-    rows = db_connector.execute_query(f"SHOW COLUMNS FROM `{table}`") or []
-    out = []
-    for r in rows:
-        fld = r.get('Field') if isinstance(r, dict) else r[0]
-        out.append(str(fld).lower())
-    return set(out)
+    return {c.lower() for c in schema_cache.columns(table)}
 
 def _pick(cols: set[str], candidates: list[str]) -> Optional[str]:
     for c in candidates:
@@ -54,19 +48,11 @@ def _pick(cols: set[str], candidates: list[str]) -> Optional[str]:
 
 def _pick_col(table: str, candidates):
     """Vyber reálne meno stĺpca (vracia správny case)."""
-    try:
-        rows = db_connector.execute_query(f"SHOW COLUMNS FROM `{table}`") or []
-        have = {
-            (r.get('Field') if isinstance(r, dict) else r[0]).lower():
-            (r.get('Field') if isinstance(r, dict) else r[0])
-            for r in rows
-        }
-        for c in candidates:
-            k = c.lower()
-            if k in have:
-                return have[k]
-    except Exception:
-        pass
+    have = {c.lower(): c for c in schema_cache.columns(table)}
+    for c in candidates:
+        k = c.lower()
+        if k in have:
+            return have[k]
     return None
 
 def _iso(d: Any) -> Optional[str]:
@@ -241,11 +227,13 @@ def leader_dashboard():
     b2c_date = 'pozadovany_datum_dodania' if 'pozadovany_datum_dodania' in b2c_cols else 'datum_objednavky'
     b2b_date = 'pozadovany_datum_dodania' if 'pozadovany_datum_dodania' in b2b_cols else 'datum_objednavky'
 
+    b2c_sql, b2c_params = date_ranges.day(b2c_date, d)
+    b2b_sql, b2b_params = date_ranges.day(b2b_date, d)
     rows_b2c = db_connector.execute_query(
-        f"SELECT * FROM b2c_objednavky WHERE DATE({b2c_date})=%s", (d,)
+        f"SELECT * FROM b2c_objednavky WHERE {b2c_sql}", tuple(b2c_params)
     ) or []
     rows_b2b = db_connector.execute_query(
-        f"SELECT * FROM b2b_objednavky WHERE DATE({b2b_date})=%s", (d,)
+        f"SELECT * FROM b2b_objednavky WHERE {b2b_sql}", tuple(b2b_params)
     ) or []
 
     def _items_count(rows):
@@ -273,9 +261,10 @@ def leader_dashboard():
     days = [ (start_date + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7) ]
 
     def _count(table: str, date_col: str, the_day: str) -> int:
+        where, params = date_ranges.day(date_col, the_day)
         row = db_connector.execute_query(
-            f"SELECT COUNT(*) AS c FROM {table} WHERE DATE({date_col})=%s",
-            (the_day,), fetch='one'
+            f"SELECT COUNT(*) AS c FROM {table} WHERE {where}",
+            tuple(params), fetch='one'
         ) or {}
         return int(row.get('c') or 0)
 
@@ -312,8 +301,9 @@ def leader_b2c_orders():
     d = _d(request.args.get('date'))
     date_col = _pick_col('b2c_objednavky', ['pozadovany_datum_dodania','datum_objednavky'])
     if date_col:
+        where, params = date_ranges.day(date_col, d)
         rows = db_connector.execute_query(
-            f"SELECT * FROM b2c_objednavky WHERE DATE({date_col})=%s ORDER BY {date_col} DESC, id DESC", (d,)
+            f"SELECT * FROM b2c_objednavky WHERE {where} ORDER BY {date_col} DESC, id DESC", tuple(params)
         ) or []
     else:
         rows = db_connector.execute_query("SELECT * FROM b2c_objednavky ORDER BY id DESC LIMIT 200") or []
@@ -340,8 +330,9 @@ def leader_b2b_orders():
     d = _d(request.args.get('date'))
     date_col = _pick_col('b2b_objednavky', ['pozadovany_datum_dodania','datum_objednavky'])
     if date_col:
+        where, params = date_ranges.day(date_col, d)
         rows = db_connector.execute_query(
-            f"SELECT * FROM b2b_objednavky WHERE DATE({date_col})=%s ORDER BY {date_col} DESC, id DESC", (d,)
+            f"SELECT * FROM b2b_objednavky WHERE {where} ORDER BY {date_col} DESC, id DESC", tuple(params)
         ) or []
     else:
         rows = db_connector.execute_query("SELECT * FROM b2b_objednavky ORDER BY id DESC LIMIT 200") or []
@@ -386,6 +377,7 @@ def leader_b2c_cancel_order():
             )
     except Exception as e:
         return jsonify({'error': f'Nepodarilo sa zmeniť stav: {e}'}), 500
+    demand_forecast.refresh_order(demand_forecast.CHANNEL_B2C, order_id)
     return jsonify({'message': 'Objednávka zrušená.', 'order_id': order_id})
 
 # =============================================================================
@@ -483,6 +475,7 @@ def leader_b2b_create_order():
                 """, (order_id, ean, name, qty, unit, price))
 
             conn.commit()
+            demand_forecast.refresh_order(demand_forecast.CHANNEL_B2B, order_id)
             return jsonify({'message': 'Objednávka prijatá', 'order_id': order_id, 'order_no': order_no})
         except Exception as e:
             conn.rollback()
@@ -535,6 +528,7 @@ def leader_b2b_update_order():
             except: pass
     except Exception as e:
         return jsonify({'error': f'Chyba pripojenia: {e}'}), 500
+    demand_forecast.refresh_order(demand_forecast.CHANNEL_B2B, order_id)
     return jsonify({'message': 'Objednávka upravená.', 'order_id': order_id})
 
 @leader_bp.post('/b2b/notify_order')
@@ -683,17 +677,18 @@ def leader_production_plan():
 @login_required(role=('veduci','admin'))
 def leader_cut_jobs_list():
     # Dátum – filter dňa v tabuľke
-    d = (request.args.get('date') or date.today().isoformat())
+    d = _d(request.args.get('date'))
+    day_sql, day_params = date_ranges.day('datum_vyroby', d)
 
     rows = db_connector.execute_query(
-        """
+        f"""
         SELECT id, id_davky, stav, detaily_zmeny, datum_vyroby
         FROM zaznamy_vyroba
-        WHERE DATE(datum_vyroby) = %s
+        WHERE {day_sql}
           AND stav IN ('Prebieha krájanie', 'Ukončené')
         ORDER BY id DESC
         """,
-        (d,)
+        tuple(day_params)
     ) or []
 
     out = []
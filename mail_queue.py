@@ -0,0 +1,436 @@
+# mail_queue.py
+# Asynchrónna fronta odchádzajúcich e-mailov
+# - enqueue(msg): správa sa uloží ako .eml do spoolu MIMO static/ (MAIL_QUEUE_SPOOL_DIR, default
+#   <APP_DATA_DIR>/mail_spool – správy obsahujú odkazy na reset hesla) + riadok v mail_outbox
+#   (stav, pokusy, ďalší pokus, chyba) – HTTP požiadavka na SMTP nečaká
+# - pracovné vlákna (MAIL_QUEUE_WORKERS) si berú dávky cez SELECT ... FOR UPDATE SKIP LOCKED
+#   (bezpečné aj pri viacerých procesoch) a celú dávku pošlú cez JEDNO prihlásené SMTP spojenie
+# - dočasná chyba -> ďalší pokus s exponenciálnym odstupom; po MAIL_QUEUE_MAX_ATTEMPTS stav
+#   'failed' a kópia .eml do static/uploads/outbox (pôvodný manuálny outbox)
+# - 'sending' bez dokončenia (pád procesu) sa po STALE_S vráti do fronty; odoslaná správa, ktorej stav
+#   sa nepodarilo zapísať, dostane značku <eml>.sent a znovu sa už neposiela
+# - hromadné správy (kampane, PRIORITY_BULK) idú až za bežnými a najviac MAIL_QUEUE_BULK_PER_MIN za minútu
+#
+# SMTP nastavenia a pripojenie poskytuje notification_handler (_smtp_client, MAIL_*).
+
+import email
+import email.policy
+import os
+import shutil
+import smtplib
+import threading
+import time
+import traceback
+import uuid
+from email.message import EmailMessage
+from typing import Any, Dict, List
+
+import db_connector
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+ENABLED = str(os.getenv("MAIL_QUEUE", "1")).lower() in ("1", "true", "yes")
+WORKERS = max(1, _env_int("MAIL_QUEUE_WORKERS", 2))
+BATCH = max(1, _env_int("MAIL_QUEUE_BATCH", 20))
+MAX_ATTEMPTS = max(1, _env_int("MAIL_QUEUE_MAX_ATTEMPTS", 6))
+BACKOFF_S = max(1, _env_int("MAIL_QUEUE_BACKOFF_S", 30))
+BACKOFF_MAX_S = 3600
+# hromadné správy (priority >= PRIORITY_BULK) – max. počet za minútu na proces; 0 = bez limitu
+BULK_PER_MIN = max(0, _env_int("MAIL_QUEUE_BULK_PER_MIN", 120))
+POLL_S = 15
+STALE_S = 600
+# .eml v spoole bez riadku v mail_outbox (rollback transakcie volajúceho) sa zmaže po tomto veku
+ORPHAN_S = 3600
+
+PRIORITY_HIGH = 1      # objednávky, reset hesla
+PRIORITY_DEFAULT = 5
+PRIORITY_BULK = 9      # kampane
+
+BASE_DIR = os.path.dirname(__file__)
+OUTBOX_DIR = os.path.join(BASE_DIR, "static", "uploads", "outbox")
+DATA_DIR = os.path.abspath(os.getenv("APP_DATA_DIR", os.path.join(BASE_DIR, "data")))
+SPOOL_DIR = os.path.abspath(os.getenv("MAIL_QUEUE_SPOOL_DIR") or os.path.join(DATA_DIR, "mail_spool"))
+LEGACY_SPOOL_DIR = os.path.join(OUTBOX_DIR, "spool")   # pôvodné umiestnenie (verejne servírované static/)
+SENT_MARK = ".sent"
+
+_schema_ready = False
+_lock = threading.Lock()
+_wake = threading.Event()
+_workers: List["_Worker"] = []
+_stats = {"enqueued": 0, "sent": 0, "retried": 0, "failed": 0, "sessions": 0}
+_bulk = {"tokens": float(BULK_PER_MIN), "ts": time.monotonic()}
+
+
+# --- SCHÉMA ---------------------------------------------------------------------
+def ensure_schema() -> None:
+    global _schema_ready
+    if _schema_ready:
+        return
+    db_connector.execute_query("""
+        CREATE TABLE IF NOT EXISTS mail_outbox (
+          id               BIGINT       NOT NULL AUTO_INCREMENT PRIMARY KEY,
+          status           ENUM('queued','sending','sent','failed') NOT NULL DEFAULT 'queued',
+          priority         TINYINT      NOT NULL DEFAULT 5,
+          subject          VARCHAR(255) NULL,
+          recipients       TEXT         NULL,
+          eml_file         VARCHAR(255) NOT NULL,
+          attempts         INT          NOT NULL DEFAULT 0,
+          next_attempt_at  DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          claimed_at       DATETIME     NULL,
+          sent_at          DATETIME     NULL,
+          last_error       TEXT         NULL,
+          created_at       DATETIME     NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          KEY idx_mail_outbox_due (status, priority, next_attempt_at),
+          KEY idx_mail_outbox_created (created_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """, fetch='none')
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    _migrate_legacy_spool()
+    _schema_ready = True
+
+
+def _migrate_legacy_spool() -> None:
+    """Presunie .eml zo starého spoolu v static/ (čakajúce správy) do SPOOL_DIR; prázdny adresár zmaže."""
+    if not os.path.isdir(LEGACY_SPOOL_DIR) or os.path.abspath(LEGACY_SPOOL_DIR) == SPOOL_DIR:
+        return
+    for fn in os.listdir(LEGACY_SPOOL_DIR):
+        try:
+            shutil.move(os.path.join(LEGACY_SPOOL_DIR, fn), os.path.join(SPOOL_DIR, fn))
+        except Exception as e:
+            print(f"!!! UPOZORNENIE: mail_queue – presun {fn} zo starého spoolu zlyhal: {e}")
+    try:
+        os.rmdir(LEGACY_SPOOL_DIR)
+    except OSError:
+        pass
+
+
+# --- ZARADENIE ------------------------------------------------------------------
+def enqueue(msg: EmailMessage, priority: int = PRIORITY_DEFAULT, conn=None) -> int:
+    """
+    Uloží správu do spoolu a vráti id v mail_outbox. Neblokuje na SMTP.
+    Chyba (DB/disk) sa propaguje – volajúci môže poslať synchrónne.
+    `conn` = spojenie otvorenej transakcie volajúceho – riadok fronty sa commitne spolu
+    s jeho zmenami (napr. stav adresáta kampane); pracovníci sa prebudia až po notify().
+    .eml sa zapisuje pred COMMITom – po rollbacku volajúceho ho odstráni purge().
+    """
+    ensure_schema()
+    fn = f"{uuid.uuid4().hex}.eml"
+    path = os.path.join(SPOOL_DIR, fn)
+    with open(path, "wb") as f:
+        f.write(msg.as_bytes())
+    rcpt = ", ".join(str(msg.get_all(h, [])[0]) for h in ("To", "Cc", "Bcc") if msg.get_all(h))
+
+    def work(conn):
+        cur = conn.cursor()
+        try:
+            cur.execute("INSERT INTO mail_outbox (priority, subject, recipients, eml_file) VALUES (%s,%s,%s,%s)",
+                        (int(priority), str(msg.get("Subject") or "")[:255], rcpt, fn))
+            return cur.lastrowid
+        finally:
+            cur.close()
+
+    try:
+        new_id = work(conn) if conn is not None else db_connector.with_transaction(work)
+    except Exception:
+        _remove(path)
+        raise
+    with _lock:
+        _stats["enqueued"] += 1
+    if conn is None:
+        notify()
+    return new_id
+
+
+def notify() -> None:
+    """Prebudí pracovníkov (a spustí ich, ak ešte nebežia)."""
+    start_workers()
+    _wake.set()
+
+
+# --- PRACOVNÍCI -----------------------------------------------------------------
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def discard_spool(eml_file: str) -> None:
+    """Zmaže .eml stiahnutej správy (stav v mail_outbox nastavuje volajúci)."""
+    _remove(os.path.join(SPOOL_DIR, os.path.basename(eml_file or "")))
+
+
+def _bulk_take(n: int) -> int:
+    """Token bucket pre hromadné správy – vráti, koľko z `n` sa smie zobrať teraz."""
+    if BULK_PER_MIN <= 0:
+        return n
+    with _lock:
+        now = time.monotonic()
+        _bulk["tokens"] = min(float(BULK_PER_MIN), _bulk["tokens"] + (now - _bulk["ts"]) * BULK_PER_MIN / 60.0)
+        _bulk["ts"] = now
+        take = max(0, min(n, int(_bulk["tokens"])))
+        _bulk["tokens"] -= take
+        return take
+
+
+def _bulk_refund(n: int) -> None:
+    if n > 0 and BULK_PER_MIN > 0:
+        with _lock:
+            _bulk["tokens"] = min(float(BULK_PER_MIN), _bulk["tokens"] + n)
+
+
+_DUE_SQL = """
+    SELECT id, eml_file, attempts
+      FROM mail_outbox
+     WHERE ((status = 'queued' AND next_attempt_at <= NOW())
+        OR (status = 'sending' AND claimed_at < NOW() - INTERVAL %s SECOND))
+       AND priority {cmp} %s
+     ORDER BY priority, next_attempt_at, id
+     LIMIT %s
+     FOR UPDATE SKIP LOCKED
+"""
+
+
+def _claim(limit: int) -> List[Dict[str, Any]]:
+    """
+    Zoberie dávku splatných správ (aj zaseknutých 'sending') a označí ich 'sending'.
+    Najprv bežné správy, zvyšok dávky hromadné – tie len v rámci limitu BULK_PER_MIN.
+    """
+    def work(conn):
+        cur = conn.cursor(dictionary=True)
+        try:
+            cur.execute(_DUE_SQL.format(cmp='<'), (STALE_S, PRIORITY_BULK, int(limit)))
+            rows = cur.fetchall() or []
+            allow = _bulk_take(int(limit) - len(rows))
+            if allow > 0:
+                cur.execute(_DUE_SQL.format(cmp='>='), (STALE_S, PRIORITY_BULK, allow))
+                bulk = cur.fetchall() or []
+                _bulk_refund(allow - len(bulk))
+                rows += bulk
+            if rows:
+                ph = ",".join(["%s"] * len(rows))
+                cur.execute(f"UPDATE mail_outbox SET status='sending', claimed_at=NOW() WHERE id IN ({ph})",
+                            tuple(r['id'] for r in rows))
+            return rows
+        finally:
+            cur.close()
+
+    return db_connector.with_transaction(work)
+
+
+def _open_session():
+    import notification_handler as nh  # SMTP config; notification_handler importuje tento modul
+    smtp = nh._smtp_client()
+    if nh.MAIL_USERNAME and nh.MAIL_PASSWORD:
+        smtp.login(nh.MAIL_USERNAME, nh.MAIL_PASSWORD)
+    with _lock:
+        _stats["sessions"] += 1
+    return smtp
+
+
+def _close_session(smtp) -> None:
+    if smtp is None:
+        return
+    try:
+        smtp.quit()
+    except Exception:
+        try:
+            smtp.close()
+        except Exception:
+            pass
+
+
+def _mark_sent(row: Dict[str, Any]) -> None:
+    db_connector.execute_query(
+        "UPDATE mail_outbox SET status='sent', sent_at=NOW(), attempts=attempts+1, last_error=NULL WHERE id=%s",
+        (row['id'],), fetch='none')
+    path = os.path.join(SPOOL_DIR, row['eml_file'])
+    _remove(path)
+    _remove(path + SENT_MARK)
+    with _lock:
+        _stats["sent"] += 1
+
+
+def _record_sent(row: Dict[str, Any]) -> None:
+    """
+    Zápis stavu po ÚSPEŠNOM odoslaní. Chyba DB sa nesmie zameniť s chybou SMTP (opakované odoslanie
+    = duplicitný e-mail): správa dostane značku .sent a po návrate do fronty sa len dozapíše stav.
+    """
+    try:
+        _mark_sent(row)
+    except Exception as e:
+        path = os.path.join(SPOOL_DIR, row['eml_file'])
+        try:
+            with open(path + SENT_MARK, "w", encoding="utf-8"):
+                pass
+        except OSError:
+            traceback.print_exc()
+        print(f"!!! UPOZORNENIE: mail_queue – správa #{row['id']} odoslaná, stav sa nepodarilo zapísať: {e}")
+
+
+def _mark_error(row: Dict[str, Any], err: str, permanent: bool = False) -> None:
+    attempts = int(row.get('attempts') or 0) + 1
+    if permanent or attempts >= MAX_ATTEMPTS:
+        db_connector.execute_query(
+            "UPDATE mail_outbox SET status='failed', attempts=%s, last_error=%s WHERE id=%s",
+            (attempts, err[:2000], row['id']), fetch='none')
+        src = os.path.join(SPOOL_DIR, row['eml_file'])
+        if os.path.exists(src):
+            try:
+                shutil.move(src, os.path.join(OUTBOX_DIR, f"failed_{row['id']}_{row['eml_file']}"))
+            except Exception:
+                traceback.print_exc()
+        with _lock:
+            _stats["failed"] += 1
+        print(f"!!! UPOZORNENIE: mail_queue – správa #{row['id']} neodoslaná (pokusy: {attempts}): {err}")
+        return
+    delay = min(BACKOFF_S * (2 ** (attempts - 1)), BACKOFF_MAX_S)
+    db_connector.execute_query(
+        "UPDATE mail_outbox SET status='queued', attempts=%s, last_error=%s, "
+        "next_attempt_at = NOW() + INTERVAL %s SECOND WHERE id=%s",
+        (attempts, err[:2000], int(delay), row['id']), fetch='none')
+    with _lock:
+        _stats["retried"] += 1
+
+
+def _send_batch(rows: List[Dict[str, Any]]) -> None:
+    """Celá dávka cez jedno SMTP spojenie; pri výpadku spojenia jeden pokus s novým."""
+    smtp = None
+    try:
+        for row in rows:
+            path = os.path.join(SPOOL_DIR, row['eml_file'])
+            if os.path.exists(path + SENT_MARK):
+                _record_sent(row)   # odoslaná v minulom pokuse – len dozapísať stav
+                continue
+            try:
+                with open(path, "rb") as f:
+                    msg = email.message_from_bytes(f.read(), policy=email.policy.default)
+            except OSError as e:
+                _mark_error(row, f"Spool súbor chýba: {e}", permanent=True)
+                continue
+            for retry in (False, True):
+                try:
+                    if smtp is None:
+                        smtp = _open_session()
+                    smtp.send_message(msg)
+                except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused) as e:
+                    _mark_error(row, repr(e), permanent=True)
+                    break
+                except Exception as e:
+                    _close_session(smtp)
+                    smtp = None
+                    if retry or isinstance(e, smtplib.SMTPAuthenticationError):
+                        _mark_error(row, repr(e))
+                        break
+                    continue
+                _record_sent(row)
+                break
+    finally:
+        _close_session(smtp)
+
+
+class _Worker(threading.Thread):
+    def __init__(self, n: int):
+        super().__init__(daemon=True, name=f"mail-queue-{n}")
+        self._stop_evt = threading.Event()   # nie `_stop` – ten prekryje Thread._stop() a rozbije is_alive()/join()
+
+    def stop(self):
+        self._stop_evt.set()
+        _wake.set()
+
+    def run(self):
+        while not self._stop_evt.is_set():
+            try:
+                rows = _claim(BATCH)
+            except Exception:
+                traceback.print_exc()
+                rows = []
+            if rows:
+                try:
+                    _send_batch(rows)
+                except Exception:
+                    traceback.print_exc()
+                continue
+            _wake.wait(POLL_S)
+            _wake.clear()
+
+
+def start_workers() -> None:
+    """Spustí pracovné vlákna (raz za proces); pri štarte aplikácie doručí aj zvyšok fronty."""
+    if not ENABLED:
+        return
+    with _lock:
+        alive = [w for w in _workers if w.is_alive()]
+        if len(alive) >= WORKERS:
+            return
+        for n in range(len(alive), WORKERS):
+            w = _Worker(n + 1)
+            w.start()
+            alive.append(w)
+        _workers[:] = alive
+
+
+# --- STAV -----------------------------------------------------------------------
+def message_status(msg_id: int) -> Dict[str, Any]:
+    ensure_schema()
+    row = db_connector.execute_query(
+        "SELECT id, status, priority, subject, recipients, attempts, next_attempt_at, sent_at, last_error, created_at "
+        "FROM mail_outbox WHERE id=%s", (int(msg_id),), fetch='one')
+    return row or {"error": "Správa vo fronte neexistuje."}
+
+
+def stats() -> Dict[str, Any]:
+    ensure_schema()
+    rows = db_connector.execute_query("SELECT status, COUNT(*) AS n FROM mail_outbox GROUP BY status") or []
+    failed = db_connector.execute_query("""
+        SELECT id, subject, recipients, attempts, last_error, created_at
+          FROM mail_outbox WHERE status='failed' ORDER BY id DESC LIMIT 20
+    """) or []
+    with _lock:
+        proc = dict(_stats)
+    proc["workers"] = sum(1 for w in _workers if w.is_alive())
+    return {"queue": {r['status']: int(r['n']) for r in rows}, "recent_failed": failed, "process": proc}
+
+
+def _sweep_orphans() -> int:
+    """
+    Zmaže .eml zo spoolu, ku ktorým nie je riadok v mail_outbox – enqueue(conn=...) zapisuje súbor
+    pred COMMITom volajúceho, pri rollbacku ostane. Len súbory staršie ako ORPHAN_S (bežiace transakcie).
+    """
+    cutoff = time.time() - ORPHAN_S
+    try:
+        names = [fn for fn in os.listdir(SPOOL_DIR)
+                 if fn.endswith(".eml") and os.path.getmtime(os.path.join(SPOOL_DIR, fn)) < cutoff]
+    except OSError:
+        return 0
+    removed = 0
+    for i in range(0, len(names), 500):
+        chunk = names[i:i + 500]
+        ph = ",".join(["%s"] * len(chunk))
+        known = {r['eml_file'] for r in (db_connector.execute_query(
+            f"SELECT eml_file FROM mail_outbox WHERE eml_file IN ({ph})", tuple(chunk)) or [])}
+        for fn in chunk:
+            if fn not in known:
+                _remove(os.path.join(SPOOL_DIR, fn))
+                _remove(os.path.join(SPOOL_DIR, fn + SENT_MARK))
+                removed += 1
+    return removed
+
+
+def purge(days: int = 30) -> Dict[str, Any]:
+    """
+    Zmaže záznamy odoslaných správ staršie ako `days` dní (.eml sa maže už pri odoslaní)
+    a osirelé .eml v spoole (viď _sweep_orphans).
+    """
+    ensure_schema()
+    n = db_connector.execute_query(
+        "DELETE FROM mail_outbox WHERE status='sent' AND created_at < NOW() - INTERVAL %s DAY",
+        (int(days),), fetch='rowcount')
+    orphans = _sweep_orphans()
+    return {"message": f"Odoslané e-maily vyčistené (osirelé súbory spoolu: {orphans}).", "rows": n or 0}
@@ -7,6 +7,8 @@ import io
 
 from flask import jsonify, make_response, render_template, send_file
 import db_connector
+import date_ranges
+import meat_yield_model
 
 # ---------- UTIL --------------------------------------------------
 def _to_decimal(x, nd:int=3):
@@ -181,24 +183,33 @@ def save_breakdown(data):
     if input_w > 0 and (diff / input_w)*100 > tolerance:
         return {"error":f"Súčet výstupov ({sum_out} kg) nespĺňa toleranciu voči vstupu ({input_w} kg). Rozdiel {diff:.3f} kg."}
 
-    # INSERT hlavičky – potrebujeme spoľahlivo lastrowid (rovnaká conn)
-    qh = """INSERT INTO meat_breakdown
-            (breakdown_date, material_id, supplier, note, units_count,
-             input_weight_kg, purchase_unit_price_eur_kg, purchase_total_cost_eur, tolerance_pct)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)"""
-    bid = db_connector.execute_query(qh, (bdate, int(material_id), supplier, note, units_count,
-                                    input_w, unit_price, total_cost, tolerance), fetch='lastrowid')
+    # hlavička + výstupy + extra + model výťažnosti v jednej transakcii (lastrowid z rovnakého spojenia)
+    out_rows = [(int(o['product_id']), _to_decimal(o['weight_kg'],3)) for o in outputs]
+    extra_rows = [(e['name'].strip(), _to_decimal(e.get('amount_eur'),2)) for e in extras
+                  if (e.get('name') or '').strip() and _to_decimal(e.get('amount_eur'),2) is not None]
 
-    # outputs
-    for o in outputs:
-        q = "INSERT INTO meat_breakdown_output (breakdown_id,product_id,weight_kg) VALUES (%s,%s,%s)"
-        db_connector.execute_query(q, (bid, int(o['product_id']), _to_decimal(o['weight_kg'],3)), fetch='none')
-
-    # extras
-    for e in extras:
-        if (e.get('name') or '').strip() and _to_decimal(e.get('amount_eur'),2) is not None:
-            q = "INSERT INTO meat_breakdown_extra_costs (breakdown_id,name,amount_eur) VALUES (%s,%s,%s)"
-            db_connector.execute_query(q, (bid, e['name'].strip(), _to_decimal(e.get('amount_eur'),2)), fetch='none')
+    def work(conn):
+        cur = conn.cursor()
+        try:
+            cur.execute("""INSERT INTO meat_breakdown
+                (breakdown_date, material_id, supplier, note, units_count,
+                 input_weight_kg, purchase_unit_price_eur_kg, purchase_total_cost_eur, tolerance_pct)
+                VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)""",
+                (bdate, int(material_id), supplier, note, units_count, input_w, unit_price, total_cost, tolerance))
+            new_id = cur.lastrowid
+            cur.executemany("INSERT INTO meat_breakdown_output (breakdown_id,product_id,weight_kg) VALUES (%s,%s,%s)",
+                            [(new_id, pid, w) for pid, w in out_rows])
+            if extra_rows:
+                cur.executemany("INSERT INTO meat_breakdown_extra_costs (breakdown_id,name,amount_eur) VALUES (%s,%s,%s)",
+                                [(new_id, n, a) for n, a in extra_rows])
+            meat_yield_model.add_breakdown(cur, int(material_id), supplier, bdate, input_w, tolerance, out_rows)
+            return new_id
+        finally:
+            cur.close()
+
+    # bootstrap modelu z histórie PRED prvým prírastkom (inak by buckety obsahovali len túto rozrábku)
+    meat_yield_model.ensure_ready()
+    bid = db_connector.with_transaction(work)
 
     # auto-lock cien pre túto surovinu (len pre použité produkty)
     _ensure_price_locks(int(material_id), outputs)
@@ -301,143 +312,72 @@ def list_breakdowns(material_id=None, date_from=None, date_to=None, supplier=Non
     """, tuple(params)) or []
     return jsonify(rows)
 
-# ---------- ODHAD – priemerné výťažnosti --------------------------
-def _avg_yields(material_id:int, supplier:Optional[str]=None, date_from=None, date_to=None) -> Dict[int,float]:
-    """Vážené priemerné výťažnosti z histórie pre danú surovinu (+ voliteľné filtre)."""
-    wh = ["b.material_id=%s"]; params=[int(material_id)]
-    if supplier:
-        wh.append("b.supplier=%s"); params.append(supplier)
-    if date_from:
-        wh.append("b.breakdown_date >= %s"); params.append(date_from)
-    if date_to:
-        wh.append("b.breakdown_date <= %s"); params.append(date_to)
-    where = " WHERE " + " AND ".join(wh)
+# ---------- ODHAD – model výťažnosti ------------------------------
+# Historické súčty (vstup, výstupy po produktoch, vážená tolerancia) drží meat_yield_model
+# v mesačných bucketoch; odhad je potom čistý výpočet v pamäti – aj pre veľa scenárov naraz.
 
-    tot = db_connector.execute_query(f"SELECT SUM(b.input_weight_kg) AS w FROM meat_breakdown b {where}", tuple(params)) or []
-    total_input = float(tot[0]['w'] or 0.0)
-    if total_input <= 0:
-        return {}
-
-    rows = db_connector.execute_query(f"""
-        SELECT mbo.product_id, SUM(mbo.weight_kg) AS w
-        FROM meat_breakdown b
-        JOIN meat_breakdown_output mbo ON mbo.breakdown_id=b.id
-        {where}
-        GROUP BY mbo.product_id
-    """, tuple(params)) or []
-
-    res={}
-    for r in rows:
-        res[int(r['product_id'])] = float(r['w']) / total_input
-    return res  # pomer 0..1
-
-def _get_product_id_by_code(code: str) -> Optional[int]:
-    row = db_connector.execute_query("SELECT id FROM meat_products WHERE code=%s LIMIT 1", (code,), fetch='one')
-    return int(row['id']) if row and row.get('id') is not None else None
-
-def _avg_tolerance_pct(material_id:int, supplier:Optional[str]=None, date_from=None, date_to=None) -> float:
+def _yield_basis(material_id:int, supplier:Optional[str]=None, date_from=None, date_to=None) -> Dict[str,Any]:
     """
-    Vypočíta vážený priemer tolerance_pct (v %) podľa vstupnej váhy:
-      avg_tol = SUM(input_weight * tolerance_pct) / SUM(input_weight)
-    Null tolerancie sa ignorujú (berie sa 0).
+    Spoločný základ odhadu pre filter: výťažnosti bez STRATA renormalizované na 1.0,
+    vážená priemerná tolerancia (%) a ceny produktov. Pri chýbajúcich dátach {"error": ...}.
     """
-    wh = ["b.material_id=%s"]; params=[int(material_id)]
-    if supplier:
-        wh.append("b.supplier=%s"); params.append(supplier)
-    if date_from:
-        wh.append("b.breakdown_date >= %s"); params.append(date_from)
-    if date_to:
-        wh.append("b.breakdown_date <= %s"); params.append(date_to)
-    where = " WHERE " + " AND ".join(wh)
-
-    row = db_connector.execute_query(f"""
-        SELECT 
-          SUM(b.input_weight_kg * COALESCE(b.tolerance_pct,0)) / NULLIF(SUM(b.input_weight_kg),0) AS avg_tol
-        FROM meat_breakdown b
-        {where}
-    """, tuple(params), fetch='one') or {}
-
-    avg_tol = float(row.get('avg_tol') or 0.0)
-    # ohranič, keby niekde bola extrémna hodnota
-    if avg_tol < 0: avg_tol = 0.0
-    if avg_tol > 100: avg_tol = 100.0
-    return round(avg_tol, 4)
-
-def _get_product_id_by_code(code: str) -> Optional[int]:
-    row = db_connector.execute_query("SELECT id FROM meat_products WHERE code=%s LIMIT 1", (code,), fetch='one')
-    return int(row['id']) if row and row.get('id') is not None else None
-
-def _get_product_codes(ids: list[int]) -> dict[int, str]:
-    if not ids:
-        return {}
-    placeholders = ",".join(["%s"]*len(ids))
-    rows = db_connector.execute_query(
-        f"SELECT id, code FROM meat_products WHERE id IN ({placeholders})",
-        tuple(ids), fetch='all'
-    ) or []
-    return { int(r["id"]): (r["code"] or "").strip().upper() for r in rows }
-
-def estimate(material_id:int, planned_weight_kg:float, expected_purchase_unit_price:float,
-             supplier:Optional[str]=None, date_from=None, date_to=None, extra_costs:list|None=None):
-    # 1) Priemerné výťažnosti z histórie
-    yields = _avg_yields(material_id, supplier, date_from, date_to)  # {product_id: fraction 0..1}
-    if not yields:
+    try:
+        d_from = date_ranges.to_date(date_from)
+        d_to = date_ranges.to_date(date_to)
+    except ValueError:
+        return {"error":"Neplatný dátum filtra."}
+    st = meat_yield_model.stats(int(material_id), supplier, d_from, d_to)
+    total_input = st["input"]
+    if total_input <= 0:
         return {"error":"Nie sú dostupné historické dáta pre zvolený filter (materiál/dodávateľ/dátumy)."}
 
-    # 2) Vylúč STRATA z odhadu a renormalizuj na 100 %
-    pid_list = list(yields.keys())
-    codes = _get_product_codes(pid_list)
-    for pid in list(yields.keys()):
-        if codes.get(pid) == "STRATA":
-            yields.pop(pid, None)
+    book = meat_yield_model.price_book(int(material_id))
+    codes = book["codes"]
+    # vylúč STRATA z odhadu a renormalizuj na 100 %
+    yields = {pid: w / total_input for pid, w in st["outputs"].items()
+              if codes.get(pid) != meat_yield_model.LOSS_CODE}
     if not yields:
         return {"error":"Historické dáta po odfiltrovaní položky STRATA neobsahujú žiadne predajné diely."}
-
     s = float(sum(yields.values()))
     if s <= 0:
         return {"error":"Výťažnosti po odfiltrovaní sú nulové. Skontroluj historické záznamy."}
-    for k in list(yields.keys()):
-        yields[k] = float(yields[k]) / s  # teraz ∑yields = 1.0
+    yields = {pid: y / s for pid, y in yields.items()}   # ∑yields = 1.0
 
-    # 3) Priemerná Tolerancia straty (%) – vážená vstupom
-    avg_tol_pct = _avg_tolerance_pct(material_id, supplier, date_from, date_to)  # napr. 3.25
+    # vážený priemer tolerancie podľa vstupu, ohraničený 0..100
+    avg_tol_pct = round(min(100.0, max(0.0, st["tol_w"] / total_input)), 4)
+    return {"yields": yields, "avg_tol_pct": avg_tol_pct, "prices": book["prices"]}
+
+def _estimate_rows(basis:Dict[str,Any], planned_weight_kg:float, expected_purchase_unit_price:float,
+                   extra_costs:list|None=None) -> Dict[str,Any]:
+    """Odhad pre jeden scenár (plánovaná váha, nákupná cena, extra náklady) – bez DB."""
+    planned_weight_kg = float(planned_weight_kg)
+    avg_tol_pct = basis["avg_tol_pct"]
     tol_factor = max(0.0, 1.0 - (avg_tol_pct / 100.0))
 
-    # Efektívna výstupná váha (plán – strata)
+    # efektívna výstupná váha (plán – strata); odhad váh – ∑w == effective_output_weight
     effective_output_weight = planned_weight_kg * tol_factor
+    prices = basis["prices"]
+    est_rows = [{"product_id":pid, "weight_kg":effective_output_weight * y, "selling_price":prices.get(pid, 0.0)}
+                for pid, y in basis["yields"].items()]
 
-    # 4) Ceny – preferuj lock pre materiál, inak predajné
-    locks = db_connector.execute_query(
-        "SELECT product_id, price_eur_kg FROM meat_price_lock WHERE material_id=%s",
-        (int(material_id),)
-    ) or []
-    lock_map = { int(r['product_id']): float(r['price_eur_kg']) for r in locks }
-    all_prices = db_connector.execute_query("SELECT id, selling_price_eur_kg FROM meat_products WHERE is_active=1") or []
-    prices = { int(r['id']): (lock_map.get(int(r['id'])) if int(r['id']) in lock_map else float(r['selling_price_eur_kg']))
-               for r in all_prices }
-
-    # 5) Odhad váh – ∑w == effective_output_weight
-    est_rows=[]
-    for pid, y in yields.items():
-        w = effective_output_weight * float(y)
-        sp = prices.get(pid, 0.0)
-        est_rows.append({"product_id":pid, "weight_kg":w, "selling_price":sp})
-
-    # 6) Spoločný náklad: celý nákup (plán) + extra
+    # spoločný náklad: celý nákup (plán) + extra
     joint_cost = round(
-        planned_weight_kg * expected_purchase_unit_price
+        planned_weight_kg * float(expected_purchase_unit_price)
         + sum(float(x.get('amount_eur') or 0) for x in (extra_costs or [])),
         2
     )
 
-    # 7) Alokácia: podľa hodnoty; pri nulovej hodnote → váhová
+    # alokácia: podľa hodnoty; pri nulovej hodnote → váhová
     sv_sum = sum(r['weight_kg'] * r['selling_price'] for r in est_rows)
     use_weight_based = sv_sum <= 0.0
     total_w = sum(r['weight_kg'] for r in est_rows) if use_weight_based else 1.0
 
     results=[]
     for r in est_rows:
-        share = (r['weight_kg']/total_w) if use_weight_based else ((r['weight_kg']*r['selling_price'])/sv_sum)
+        if use_weight_based:
+            share = (r['weight_kg']/total_w) if total_w > 0 else 0.0
+        else:
+            share = (r['weight_kg']*r['selling_price'])/sv_sum
         alloc = round(joint_cost * share, 2)
         cpk   = round(alloc / r['weight_kg'], 4) if r['weight_kg']>0 else 0.0
         margin= round(r['selling_price'] - cpk, 4)
@@ -445,7 +385,7 @@ def estimate(material_id:int, planned_weight_kg:float, expected_purchase_unit_pr
         results.append({
             "product_id":r['product_id'],
             "weight_kg":round(r['weight_kg'],3),
-            "yield_pct": round((r['weight_kg']/planned_weight_kg)*100.0, 4),  # voči plánu
+            "yield_pct": round((r['weight_kg']/planned_weight_kg)*100.0, 4) if planned_weight_kg else 0.0,  # voči plánu
             "cost_alloc_eur":alloc,
             "cost_per_kg_eur":cpk,
             "selling_price_eur_kg":r['selling_price'],
@@ -462,6 +402,36 @@ def estimate(material_id:int, planned_weight_kg:float, expected_purchase_unit_pr
         "rows": results
     }
 
+def estimate(material_id:int, planned_weight_kg:float, expected_purchase_unit_price:float,
+             supplier:Optional[str]=None, date_from=None, date_to=None, extra_costs:list|None=None):
+    basis = _yield_basis(material_id, supplier, date_from, date_to)
+    if "error" in basis:
+        return basis
+    return _estimate_rows(basis, planned_weight_kg, expected_purchase_unit_price, extra_costs)
+
+def estimate_many(material_id:int, scenarios:List[Dict[str,Any]], supplier:Optional[str]=None,
+                  date_from=None, date_to=None):
+    """
+    Viac scenárov nad rovnakým historickým filtrom – základ (výťažnosti, tolerancia, ceny) sa načíta raz.
+    scenarios = [{planned_weight_kg, expected_purchase_unit_price, extras?}, ...]
+    """
+    if not scenarios:
+        return {"error":"Chýbajú scenáre odhadu."}
+    parsed = []
+    for sc in scenarios:
+        w = _to_decimal((sc or {}).get('planned_weight_kg'), 3)
+        p = _to_decimal((sc or {}).get('expected_purchase_unit_price'), 4)
+        if w is None or w <= 0 or p is None or p < 0:
+            return {"error":"Neplatný scenár (planned_weight_kg / expected_purchase_unit_price)."}
+        parsed.append((w, p, sc.get('extras')))
+    basis = _yield_basis(material_id, supplier, date_from, date_to)
+    if "error" in basis:
+        return basis
+    return {
+        "avg_tolerance_pct": basis["avg_tol_pct"],
+        "results": [_estimate_rows(basis, w, p, ex) for w, p, ex in parsed]
+    }
+
 
 # ---------- PROFITABILITY REPORT (existujúci breakdown) -----------
 def profitability(breakdown_id:int):
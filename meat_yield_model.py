@@ -0,0 +1,250 @@
+# meat_yield_model.py
+# Model výťažnosti rozrábky – priebežné súčty po (surovina, dodávateľ, mesiac)
+# - meat_yield_buckets:         input_kg, tol_weighted = ∑(vstup × tolerance_pct), breakdowns
+# - meat_yield_bucket_outputs:  output_kg po produktoch
+# - supplier_key = dodávateľ alebo '' (bez dodávateľa); filter bez dodávateľa sčíta všetky kľúče
+#
+# Zápis: add_breakdown(cur, ...) v transakcii save_breakdown – pripočíta jednu rozrábku do bucketu.
+# rebuild() = plný prepočet z histórie (bootstrap, nočná rekonsiliácia).
+# Čítanie: stats(material_id, supplier, date_from, date_to) – celé mesiace z bucketov,
+# čiastočné okrajové mesiace dátumového filtra priamo z meat_breakdown (index material_id, breakdown_date).
+# Buckety, okraje aj cenník materiálu sú v result_cache (tagy = tabuľky) – odhad pri opakovanom
+# volaní s rovnakým filtrom nejde do DB.
+
+import threading
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import db_connector
+import schema_cache
+import result_cache
+import date_ranges
+
+_schema_ready = False
+_bootstrapped = False
+_lock = threading.Lock()
+
+LOSS_CODE = "STRATA"
+
+
+def ensure_schema() -> None:
+    """Tabuľky bucketov + index (material_id, breakdown_date) na meat_breakdown. Raz za proces."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    db_connector.execute_query("""
+        CREATE TABLE IF NOT EXISTS meat_yield_buckets (
+          material_id   INT           NOT NULL,
+          supplier_key  VARCHAR(191)  NOT NULL DEFAULT '',
+          bucket_month  DATE          NOT NULL,
+          input_kg      DECIMAL(16,3) NOT NULL DEFAULT 0,
+          tol_weighted  DECIMAL(20,6) NOT NULL DEFAULT 0,
+          breakdowns    INT           NOT NULL DEFAULT 0,
+          PRIMARY KEY (material_id, supplier_key, bucket_month)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """, fetch='none')
+    db_connector.execute_query("""
+        CREATE TABLE IF NOT EXISTS meat_yield_bucket_outputs (
+          material_id   INT           NOT NULL,
+          supplier_key  VARCHAR(191)  NOT NULL DEFAULT '',
+          bucket_month  DATE          NOT NULL,
+          product_id    INT           NOT NULL,
+          output_kg     DECIMAL(16,3) NOT NULL DEFAULT 0,
+          PRIMARY KEY (material_id, supplier_key, bucket_month, product_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """, fetch='none')
+    if schema_cache.table_exists('meat_breakdown'):
+        try:
+            have = {r['n'] for r in (db_connector.execute_query("""
+                SELECT DISTINCT INDEX_NAME AS n FROM INFORMATION_SCHEMA.STATISTICS
+                 WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'meat_breakdown'
+            """) or [])}
+            if 'idx_mb_material_date' not in have:
+                db_connector.execute_query(
+                    "CREATE INDEX idx_mb_material_date ON meat_breakdown (material_id, breakdown_date)", fetch='none')
+        except Exception as e:
+            print(f"!!! UPOZORNENIE: meat_yield_model – index meat_breakdown zlyhal: {e}")
+    _schema_ready = True
+
+
+def _supplier_key(supplier: Optional[str]) -> str:
+    return (supplier or '').strip()[:191]
+
+
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+# -----------------------------------------------------------------
+# Zápis
+# -----------------------------------------------------------------
+
+def add_breakdown(cur, material_id: int, supplier: Optional[str], breakdown_date: date,
+                  input_kg: float, tolerance_pct: float, outputs: Iterable[Tuple[int, float]]) -> None:
+    """Pripočíta jednu rozrábku do bucketu; `cur` = kurzor transakcie, ktorá rozrábku vkladá."""
+    key = (int(material_id), _supplier_key(supplier), _month_start(breakdown_date))
+    cur.execute("""
+        INSERT INTO meat_yield_buckets (material_id, supplier_key, bucket_month, input_kg, tol_weighted, breakdowns)
+        VALUES (%s, %s, %s, %s, %s, 1) AS new
+        ON DUPLICATE KEY UPDATE input_kg     = meat_yield_buckets.input_kg + new.input_kg,
+                                tol_weighted = meat_yield_buckets.tol_weighted + new.tol_weighted,
+                                breakdowns   = meat_yield_buckets.breakdowns + 1
+    """, key + (float(input_kg), float(input_kg) * float(tolerance_pct or 0.0)))
+    per_product: Dict[int, float] = {}
+    for pid, w in outputs:
+        per_product[int(pid)] = per_product.get(int(pid), 0.0) + float(w or 0.0)
+    if per_product:
+        cur.executemany("""
+            INSERT INTO meat_yield_bucket_outputs (material_id, supplier_key, bucket_month, product_id, output_kg)
+            VALUES (%s, %s, %s, %s, %s) AS new
+            ON DUPLICATE KEY UPDATE output_kg = meat_yield_bucket_outputs.output_kg + new.output_kg
+        """, [key + (pid, w) for pid, w in per_product.items()])
+
+
+def rebuild() -> Dict[str, Any]:
+    """Plný prepočet bucketov z meat_breakdown / meat_breakdown_output."""
+    ensure_schema()
+
+    def work(conn):
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM meat_yield_bucket_outputs")
+            cur.execute("DELETE FROM meat_yield_buckets")
+            cur.execute("""
+                INSERT INTO meat_yield_buckets (material_id, supplier_key, bucket_month, input_kg, tol_weighted, breakdowns)
+                SELECT b.material_id, LEFT(COALESCE(TRIM(b.supplier), ''), 191),
+                       DATE_FORMAT(b.breakdown_date, '%Y-%m-01'),
+                       SUM(b.input_weight_kg), SUM(b.input_weight_kg * COALESCE(b.tolerance_pct, 0)), COUNT(*)
+                  FROM meat_breakdown b
+                 GROUP BY 1, 2, 3
+            """)
+            n = cur.rowcount
+            cur.execute("""
+                INSERT INTO meat_yield_bucket_outputs (material_id, supplier_key, bucket_month, product_id, output_kg)
+                SELECT b.material_id, LEFT(COALESCE(TRIM(b.supplier), ''), 191),
+                       DATE_FORMAT(b.breakdown_date, '%Y-%m-01'), mbo.product_id, SUM(mbo.weight_kg)
+                  FROM meat_breakdown b
+                  JOIN meat_breakdown_output mbo ON mbo.breakdown_id = b.id
+                 GROUP BY 1, 2, 3, 4
+            """)
+            return n
+        finally:
+            cur.close()
+
+    n = db_connector.with_transaction(work)
+    return {"message": "Model výťažnosti rozrábky prepočítaný.", "rows": n}
+
+
+def ensure_ready() -> None:
+    """Pri prvom čítaní v procese: prázdne buckety (a neprázdnu históriu) naplň rebuildom."""
+    global _bootstrapped
+    if _bootstrapped:
+        return
+    with _lock:
+        if _bootstrapped:
+            return
+        ensure_schema()
+        if schema_cache.table_exists('meat_breakdown') and (
+                not db_connector.execute_query("SELECT 1 AS x FROM meat_yield_buckets LIMIT 1", fetch='one')
+                and db_connector.execute_query("SELECT 1 AS x FROM meat_breakdown LIMIT 1", fetch='one')):
+            rebuild()
+        _bootstrapped = True
+
+
+# -----------------------------------------------------------------
+# Čítanie (cache)
+# -----------------------------------------------------------------
+
+@result_cache.cached("meat_yield_buckets", "meat_yield_bucket_outputs")
+def _buckets(material_id: int) -> List[Dict[str, Any]]:
+    """Všetky buckety suroviny: [{supplier_key, month, input, tol_w, outputs:{pid: kg}}]."""
+    rows = db_connector.execute_query("""
+        SELECT supplier_key, bucket_month, input_kg, tol_weighted
+          FROM meat_yield_buckets WHERE material_id = %s
+    """, (int(material_id),)) or []
+    outs = db_connector.execute_query("""
+        SELECT supplier_key, bucket_month, product_id, output_kg
+          FROM meat_yield_bucket_outputs WHERE material_id = %s
+    """, (int(material_id),)) or []
+    by_key: Dict[Tuple[str, date], Dict[str, Any]] = {}
+    for r in rows:
+        k = (r['supplier_key'], date_ranges.to_date(r['bucket_month']))
+        by_key[k] = {"supplier_key": k[0], "month": k[1], "input": float(r['input_kg'] or 0),
+                     "tol_w": float(r['tol_weighted'] or 0), "outputs": {}}
+    for r in outs:
+        b = by_key.get((r['supplier_key'], date_ranges.to_date(r['bucket_month'])))
+        if b is not None:
+            b["outputs"][int(r['product_id'])] = float(r['output_kg'] or 0)
+    return list(by_key.values())
+
+
+@result_cache.cached("meat_breakdown", "meat_breakdown_output")
+def _slice(material_id: int, supplier_key: Optional[str], d_from: date, d_to: date) -> Dict[str, Any]:
+    """Súčty pre dni [d_from, d_to] (okraj dátumového filtra v rámci jedného mesiaca)."""
+    rng_sql, rng_params = date_ranges.days('b.breakdown_date', d_from, d_to)
+    where = f"b.material_id = %s AND {rng_sql}"
+    params: List[Any] = [int(material_id), *rng_params]
+    if supplier_key is not None:
+        where += " AND COALESCE(TRIM(b.supplier), '') = %s"
+        params.append(supplier_key)
+    tot = db_connector.execute_query(f"""
+        SELECT SUM(b.input_weight_kg) AS w, SUM(b.input_weight_kg * COALESCE(b.tolerance_pct, 0)) AS tw
+          FROM meat_breakdown b WHERE {where}
+    """, tuple(params), fetch='one') or {}
+    outs = db_connector.execute_query(f"""
+        SELECT mbo.product_id, SUM(mbo.weight_kg) AS w
+          FROM meat_breakdown b JOIN meat_breakdown_output mbo ON mbo.breakdown_id = b.id
+         WHERE {where}
+         GROUP BY mbo.product_id
+    """, tuple(params)) or []
+    return {"input": float(tot.get('w') or 0), "tol_w": float(tot.get('tw') or 0),
+            "outputs": {int(r['product_id']): float(r['w'] or 0) for r in outs}}
+
+
+@result_cache.cached("meat_products", "meat_price_lock")
+def price_book(material_id: int) -> Dict[str, Any]:
+    """Ceny (lock suroviny, inak predajná cena aktívneho produktu) a kódy produktov."""
+    locks = db_connector.execute_query(
+        "SELECT product_id, price_eur_kg FROM meat_price_lock WHERE material_id=%s", (int(material_id),)
+    ) or []
+    lock_map = {int(r['product_id']): float(r['price_eur_kg']) for r in locks}
+    prods = db_connector.execute_query("SELECT id, code, selling_price_eur_kg, is_active FROM meat_products") or []
+    prices, codes = {}, {}
+    for r in prods:
+        pid = int(r['id'])
+        codes[pid] = (r.get('code') or '').strip().upper()
+        if int(r.get('is_active') or 0) == 1:
+            prices[pid] = lock_map[pid] if pid in lock_map else float(r.get('selling_price_eur_kg') or 0)
+    return {"prices": prices, "codes": codes}
+
+
+def stats(material_id: int, supplier: Optional[str] = None, date_from=None, date_to=None) -> Dict[str, Any]:
+    """
+    Agregát pre filter: {"input": kg, "tol_w": ∑(vstup × tol), "outputs": {pid: kg}}.
+    date_from/date_to = date alebo None (dni vrátane, ako pôvodný filter breakdown_date >= / <=).
+    """
+    ensure_ready()
+    skey = _supplier_key(supplier) if supplier else None
+    acc = {"input": 0.0, "tol_w": 0.0, "outputs": {}}
+
+    def _add(part):
+        acc["input"] += part["input"]
+        acc["tol_w"] += part["tol_w"]
+        for pid, w in part["outputs"].items():
+            acc["outputs"][pid] = acc["outputs"].get(pid, 0.0) + w
+
+    partial = set()
+    for b in _buckets(int(material_id)):
+        if skey is not None and b["supplier_key"] != skey:
+            continue
+        m_start, m_end = date_ranges.month_bounds(b["month"].year, b["month"].month)
+        m_last = m_end - timedelta(days=1)
+        if (date_from and date_from > m_last) or (date_to and date_to < m_start):
+            continue
+        if (date_from and date_from > m_start) or (date_to and date_to < m_last):
+            partial.add((m_start, m_last))   # okrajový mesiac – dopočíta sa z histórie
+            continue
+        _add(b)
+    for m_start, m_last in sorted(partial):
+        _add(_slice(int(material_id), skey, max(m_start, date_from or m_start), min(m_last, date_to or m_last)))
+    return acc
@@ -72,6 +72,14 @@ try:
 except Exception:
     _sms = None
 
+# asynchrónna fronta odosielania (spool + pracovné vlákna)
+try:
+    import mail_queue as _mq
+except Exception:
+    _mq = None
+MAIL_PRIORITY_HIGH = getattr(_mq, "PRIORITY_HIGH", 1)   # objednávky, reset hesla
+MAIL_PRIORITY_BULK = getattr(_mq, "PRIORITY_BULK", 9)   # kampane
+
 # pre lookup telefónu podľa e-mailu (B2C zákazníci)
 try:
     import db_connector as _dbc
@@ -91,6 +99,17 @@ def _maybe_send_sms(msisdn: str | None, text: str):
         # nikdy nezhadzuj hlavný proces (napr. e-mail) kvôli SMS
         pass
 
+def send_sms_batch(msisdns: List[str], text: str):
+    """Jedna SMS dávka pre viac čísel (kampane) – rovnako tichá ako _maybe_send_sms."""
+    if not B2C_SMS_ENABLED or not _sms:
+        return
+    try:
+        nums = list(dict.fromkeys(ms for ms in (_sms.normalize_msisdn(m) for m in msisdns or [] if m) if ms))
+        if nums:
+            _sms.send_batch(message=text, recipients=nums, simple_text=True)
+    except Exception:
+        pass
+
 def _extract_phone(data: dict | None) -> Optional[str]:
     """Skúsi vydolovať telefón z dictu (order_data/meta)."""
     if not data:
@@ -183,8 +202,23 @@ def _send_email(
     atts: Optional[List[Any]] = None,
     **kwargs,
 ):
+    """Zostaví správu (_build_email) a odošle ju cez frontu; kwargs: attachments=, priority=."""
+    if atts is None and "attachments" in kwargs:
+        atts = kwargs.get("attachments")
+    msg = _build_email(to, subject, text, html, atts)
+    # odoslanie – cez frontu (neblokuje požiadavku), pri nedostupnej fronte synchrónne
+    return _deliver(msg, subject, kwargs.get("priority"))
+
+def _build_email(
+    to: str | List[str],
+    subject: str,
+    text: Optional[str] = None,
+    html: Optional[str] = None,
+    atts: Optional[List[Any]] = None,
+    **kwargs,
+) -> EmailMessage:
     """
-    Vnútorná utilita na odosielanie e-mailov s pevnou podporou príloh (PDF, CSV, ...).
+    Vnútorná utilita na zostavenie e-mailu s pevnou podporou príloh (PDF, CSV, ...).
     Prílohy môžu byť:
       - tuple/list: (filename, data, content_type?)
       - dict: {"filename":..., "data"/"content"/"bytes"/"path":..., "content_type"/"mime":...}
@@ -313,7 +347,13 @@ def _send_email(
             traceback.print_exc()
             continue
 
-    # odoslanie
+    return msg
+
+
+def _mail_configured() -> bool:
+    return all([MAIL_SERVER, MAIL_PORT, MAIL_USERNAME, MAIL_PASSWORD])
+
+def _send_now(msg: EmailMessage, subject: str):
     try:
         with _smtp_client() as smtp:
             if MAIL_USERNAME and MAIL_PASSWORD:
@@ -323,6 +363,19 @@ def _send_email(
         traceback.print_exc()
         _save_outbox(msg, subject)
 
+def _deliver(msg: EmailMessage, subject: str, priority: Optional[int] = None) -> Optional[int]:
+    """Zaradí správu do mail_queue (vráti id); bez SMTP konfigurácie rovno do outboxu."""
+    if not _mail_configured():
+        _save_outbox(msg, subject)
+        return None
+    if _mq is not None and _mq.ENABLED:
+        try:
+            return _mq.enqueue(msg, _mq.PRIORITY_DEFAULT if priority is None else int(priority))
+        except Exception:
+            traceback.print_exc()
+    _send_now(msg, subject)
+    return None
+
 
 # ── HTML layout ────────────────────────────────────────────────
 def _brand_html(title: str, body_html: str, preheader: str = "") -> str:
@@ -502,7 +555,8 @@ def send_password_reset_email(to: str, token: str):
       <p>Platnosť: 2 hodiny.</p>
     """
     _send_email(to, "Reset hesla – B2B",
-                html=_brand_html("Reset hesla", html, "Reset hesla – token v správe"))
+                html=_brand_html("Reset hesla", html, "Reset hesla – token v správe"),
+                priority=MAIL_PRIORITY_HIGH)
 
 def send_order_confirmation_email(to: str | list[str],
                                   order_number: str,
@@ -549,7 +603,8 @@ def send_order_confirmation_email(to: str | list[str],
             subject=subject,
             text=None,
             html=html,
-            atts=atts_pdf_only
+            atts=atts_pdf_only,
+            priority=MAIL_PRIORITY_HIGH
         )
 
     # 2) pošli expedícii – PDF + CSV
@@ -559,7 +614,8 @@ def send_order_confirmation_email(to: str | list[str],
             subject=subject,
             text=None,
             html=html,
-            atts=atts_pdf_csv
+            atts=atts_pdf_csv,
+            priority=MAIL_PRIORITY_HIGH
         )
 
 # =================================================================
@@ -634,7 +690,7 @@ def send_b2c_order_confirmation(to_email: str, order_data: dict, pdf_bytes: byte
                 pdf_bytes = fh.read()
         atts = [("objednavka.pdf", pdf_bytes, "application/pdf")]
 
-    _send_email(to_email, subject, text=text, html=html, atts=atts)
+    _send_email(to_email, subject, text=text, html=html, atts=atts, priority=MAIL_PRIORITY_HIGH)
 
     # Krátka SMS (ASCII kvôli bránam)
     phone = _extract_phone(order_data) or _lookup_b2c_phone_by_email(to_email)
@@ -720,7 +776,9 @@ def send_b2c_birthday_bonus_email(to_email: str, full_name: str, month_genitive:
     sms_txt = f"MIK: narodeninovy bonus {points} bodov bol pripisany. Vsetko najlepsie!"
     _maybe_send_sms(phone, sms_txt)
 
-def send_points_awarded_email(to: str, points_delta: int, template: str | None = None, custom_message: str | None = None):
+def points_awarded_content(points_delta: int, template: str | None = None,
+                           custom_message: str | None = None) -> tuple[str, str, str]:
+    """(predmet, HTML, SMS text) oznámenia o zmene bodov – spoločné pre jednotlivca aj kampaň."""
     pts = int(points_delta)
     sign = "+" if pts >= 0 else "−"
     pts_abs = abs(pts)
@@ -741,16 +799,20 @@ def send_points_awarded_email(to: str, points_delta: int, template: str | None =
       <p>Aktuálny stav bodov uvidíte po prihlásení do B2C portálu.</p>
       <p>Ďakujeme, že ste s nami.</p>
     """
-    _send_email(to, f"Zmena vernostných bodov: {sign}{pts_abs} bodov",
-                html=_brand_html("Vernostné body – aktualizácia", html, "Aktualizácia vernostných bodov"))
+    return (f"Zmena vernostných bodov: {sign}{pts_abs} bodov",
+            _brand_html("Vernostné body – aktualizácia", html, "Aktualizácia vernostných bodov"),
+            f"MIK: vernostne body zmena {sign}{pts_abs}.")
+
+def send_points_awarded_email(to: str, points_delta: int, template: str | None = None, custom_message: str | None = None):
+    subject, html, sms_txt = points_awarded_content(points_delta, template, custom_message)
+    _send_email(to, subject, html=html)
 
     # === SMS (stručná informácia o zmene bodov) ==================
     phone = _lookup_b2c_phone_by_email(to)
-    sms_txt = f"MIK: vernostne body zmena {sign}{pts_abs}."
     _maybe_send_sms(phone, sms_txt)
 
 def send_b2c_campaign_email(to: str, subject: str, html_body: str, preheader: str = ""):
-    _send_email(to, subject, html=_brand_html(subject, html_body, preheader))
+    _send_email(to, subject, html=_brand_html(subject, html_body, preheader), priority=MAIL_PRIORITY_BULK)
 
 # =================================================================
 # =========================  ADMIN ALERT  =========================
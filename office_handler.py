@@ -18,7 +18,6 @@ import json
 import math
 import uuid
 import html
-import unicodedata
 import zipfile
 import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta, date
@@ -27,6 +26,17 @@ from typing import Any, Dict, List, Optional, Tuple
 from flask import make_response, request, send_file
 
 import db_connector
+import schema_cache
+import product_keys
+import cost_ledger
+import ean_key
+import b2c_price_book
+import result_cache
+import production_stats
+import warehouse_snapshot
+import reception_totals
+import date_ranges
+import demand_forecast
 import production_handler
 import notification_handler
 import b2b_handler  # používaš v app.py
@@ -56,46 +66,14 @@ def _fmt_time_hhmm(val):
         return ""
 
 def _columns(table: str) -> List[str]:
-    try:
-        rows = db_connector.execute_query("""
-            SELECT COLUMN_NAME AS c
-            FROM INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME=%s
-        """, (table,)) or []
-        return [r['c'] for r in rows]
-    except Exception:
-        return []
+    return schema_cache.columns(table)
 
 def _has_col(table: str, col: str) -> bool:
-    try:
-        r = db_connector.execute_query("""
-            SELECT 1
-            FROM INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME=%s AND COLUMN_NAME=%s
-            LIMIT 1
-        """, (table, col), fetch='one')
-        return bool(r)
-    except Exception:
-        return False
+    return schema_cache.has_col(table, col)
 
 def _zv_name_col() -> str:
     """V zaznamy_vyroba môže byť názov vo 'nazov_vyrobu' alebo 'nazov_vyrobku'."""
-    try:
-        r = db_connector.execute_query("""
-            SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
-             WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME='zaznamy_vyroba' AND COLUMN_NAME='nazov_vyrobu'
-             LIMIT 1
-        """, fetch='one')
-        return 'nazov_vyrobu' if r else 'nazov_vyrobku'
-    except Exception:
-        return 'nazov_vyrobku'
-
-def _norm_key(s: str) -> str:
-    if s is None:
-        return ""
-    t = unicodedata.normalize("NFKD", str(s))
-    t = "".join(ch for ch in t if not unicodedata.combining(ch))
-    return t.casefold().strip()
+    return 'nazov_vyrobu' if schema_cache.has_col('zaznamy_vyroba', 'nazov_vyrobu') else 'nazov_vyrobku'
 
 def _parse_num(x):
     if x is None:
@@ -181,6 +159,7 @@ def upload_b2c_image():
 # === DASHBOARD KANCELÁRIA =========================================
 # =================================================================
 
+@result_cache.cached("sklad", "produkty", "zaznamy_vyroba", "b2b_promotions", "b2b_retail_chains", daily=True)
 def get_kancelaria_dashboard_data():
     """Dashboard: suroviny pod minimom, finálny tovar pod minimom, akcie, top produkty, timeseries výroby."""
     # 1) suroviny pod minimom
@@ -249,7 +228,7 @@ def get_kancelaria_dashboard_data():
             SUM(COALESCE(zv.realne_mnozstvo_kg,0)) AS total
         FROM zaznamy_vyroba zv
         JOIN produkty p
-          ON TRIM(zv.{_zv_name_col()}) = TRIM(p.nazov_vyrobku)
+          ON {product_keys.zv_join('zv', 'p')}
         WHERE zv.datum_ukoncenia >= CURDATE() - INTERVAL 30 DAY
           AND zv.stav IN ('Ukončené','Dokončené')
           AND COALESCE(zv.realne_mnozstvo_kg,0) > 0
@@ -276,6 +255,7 @@ def get_kancelaria_dashboard_data():
         "timeSeriesData": production_timeseries
     }
 
+@result_cache.cached("produkty", "recepty", "sklad")
 def get_kancelaria_base_data():
     products_list = db_connector.execute_query("""
         SELECT nazov_vyrobku
@@ -318,18 +298,16 @@ def get_7_day_order_forecast():
             t.qty AS mnozstvo
         FROM (
             SELECT DATE(o.pozadovany_datum_dodania) AS day,
-                   CONVERT(pol.ean_produktu USING utf8mb4) AS ean,
+                   {ean_key.col('b2b_objednavky_polozky', 'pol')} AS ean,
                    SUM(pol.mnozstvo) AS qty
             FROM b2b_objednavky_polozky pol
             JOIN b2b_objednavky o ON o.id = pol.objednavka_id
-            WHERE DATE(o.pozadovany_datum_dodania) BETWEEN %s AND %s
+            WHERE o.pozadovany_datum_dodania >= %s AND o.pozadovany_datum_dodania < %s
             GROUP BY day, ean
         ) t
-        LEFT JOIN produkty p
-          ON  CONVERT(p.ean USING utf8mb4) COLLATE {COLL}
-           =  t.ean COLLATE {COLL}
+        LEFT JOIN produkty p ON {ean_key.col('produkty', 'p')} = t.ean
         ORDER BY t.day, nazov_vyrobku
-    """, (start_date, end_date)) or []
+    """, (start_date, end_date + timedelta(days=1))) or []
 
     days = [(start_date + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)]
     forecast: Dict[str, List[Dict[str, Any]]] = {}
@@ -372,21 +350,20 @@ def get_7_day_order_forecast():
     return {"dates": days, "forecast": forecast}
 
 
+@result_cache.cached("b2b_objednavky", "b2b_objednavky_polozky", "produkty", "b2b_promotions", daily=True)
 def get_goods_purchase_suggestion():
     start_date = datetime.now().date()
     end_date   = start_date + timedelta(days=7)
 
+    # rezervácie podľa ean_key (indexovaný equi-join cez kľúč, bez JOINu na produkty)
     res = db_connector.execute_query(f"""
-        SELECT COALESCE(p.ean, CONVERT(pol.ean_produktu USING utf8mb4)) AS ean,
+        SELECT {ean_key.col('b2b_objednavky_polozky', 'pol')} AS ean,
                SUM(pol.mnozstvo) AS reserved_qty
         FROM b2b_objednavky_polozky pol
         JOIN b2b_objednavky o ON o.id = pol.objednavka_id
-        LEFT JOIN produkty p
-          ON  CONVERT(p.ean USING utf8mb4) COLLATE {COLL}
-           =  CONVERT(pol.ean_produktu USING utf8mb4) COLLATE {COLL}
-        WHERE DATE(o.pozadovany_datum_dodania) BETWEEN %s AND %s
-        GROUP BY COALESCE(p.ean, CONVERT(pol.ean_produktu USING utf8mb4))
-    """, (start_date, end_date)) or []
+        WHERE o.pozadovany_datum_dodania >= %s AND o.pozadovany_datum_dodania < %s
+        GROUP BY ean
+    """, (start_date, end_date + timedelta(days=1))) or []
     rmap = { (r["ean"] or "").strip(): float(r.get("reserved_qty") or 0.0) for r in res }
 
     goods = db_connector.execute_query("""
@@ -407,7 +384,7 @@ def get_goods_purchase_suggestion():
         ean = (g["ean"] or "").strip()
         stock = float(g.get("stock_kg") or 0.0)
         min_kg = float(g.get("min_stock_kg") or 0.0)
-        reserved = rmap.get(ean, 0.0)
+        reserved = rmap.get(ean_key.normalize(ean), 0.0)
         deficit = (min_kg + reserved) - stock
         if deficit > 0.0:
             out.append({
@@ -531,7 +508,10 @@ def receive_production_stock(payload):
                 VALUES (%s, %s, %s, %s, %s, %s)
             """, (when, name, qty, price if price is not None else None, prijem_typ, note))
 
-        conn.commit()
+        with warehouse_snapshot.writing() as w:
+            for it in items:
+                w.touch((it.get('name') or '').strip())   # vážená nakupna_cena
+            conn.commit()
         return {"message": f"Prijatých {len(items)} položiek do výrobného skladu."}
     except Exception:
         if conn: conn.rollback()
@@ -578,6 +558,7 @@ def create_production_item(data: Dict[str, Any]):
             UPDATE produkty SET nazov_vyrobku=%s, mj=%s, vaha_balenia_g=%s, predajna_kategoria=%s, dph=%s
             WHERE ean=%s
         """, (name, mj, (int(w_g) if w_g else None), cat, float(dph or 0), ean), fetch='none')
+        b2c_price_book.invalidate()   # DPH produktu je súčasťou B2C cenníka
         return {"message": "Produkt aktualizovaný."}
 
     db_connector.execute_query("""
@@ -677,63 +658,28 @@ def add_new_stock_item(data: Dict[str, Any]):
 # === PRIEMERY CIEN – výrobná & nákupná (centrálne API) ============
 # =================================================================
 
-def _avg_purchase_costs_map_by_ean() -> dict:
-    """Best-effort priemerná nákupná cena v sklade 2 (EAN → €/kg alebo €/ks podľa zdroja)."""
-    candidates = [
-        ('produkty_prijmy',  'ean',          'mnozstvo_kg', 'cena_eur_kg'),
-        ('prijmy_sklad2',    'ean',          'mnozstvo_kg', 'cena_kg'),
-        ('tovar_prijmy',     'ean_produktu', 'mnozstvo',    'cena_za_jednotku'),
-        ('prijmy_produktov', 'ean',          'mnozstvo',    'cena'),
-    ]
-    out = {}
-    for tbl, ce, cq, cp in candidates:
-        if _has_col(tbl, ce) and _has_col(tbl, cq) and _has_col(tbl, cp):
-            try:
-                rows = db_connector.execute_query(
-                    f"SELECT {ce} AS ean, SUM({cq}) AS qty, SUM({cq}*{cp}) AS val FROM {tbl} GROUP BY {ce}"
-                ) or []
-                for r in rows:
-                    q = float(r['qty'] or 0.0); v = float(r['val'] or 0.0)
-                    if q > 0: out[(r['ean'] or '').strip()] = v / q
-                if out: break
-            except Exception:
-                continue
-    return out
-
 def get_avg_costs_catalog():
     """
-    Centrálne priemery pre Kanceláriu:
+    Centrálne priemery pre Kanceláriu (z nákladovej knihy product_cost_ledger):
      - avg_manufacturing_unit_cost: vážený priemer z 'zaznamy_vyroba.cena_za_jednotku' (€/kg alebo €/ks podľa MJ)
      - avg_purchase_unit_cost: best-effort z príjmov Sklad 2 (ak nie je zdroj, vráti None)
     """
-    zv = _zv_name_col()
     rows = db_connector.execute_query(f"""
-        SELECT p.ean, TRIM(p.nazov_vyrobku) AS product_name, p.mj AS prod_mj,
-               SUM((CASE WHEN p.mj='kg' THEN COALESCE(zv.realne_mnozstvo_kg,0)
-                         ELSE COALESCE(zv.realne_mnozstvo_ks,0) END)
-                   * COALESCE(zv.cena_za_jednotku,0)) AS sum_cost_units,
-               SUM(CASE WHEN p.mj='kg' THEN COALESCE(zv.realne_mnozstvo_kg,0)
-                        ELSE COALESCE(zv.realne_mnozstvo_ks,0) END) AS sum_units
-        FROM zaznamy_vyroba zv
-        JOIN produkty p ON TRIM(zv.{zv}) = TRIM(p.nazov_vyrobku)
-        WHERE COALESCE(zv.cena_za_jednotku,0) > 0
-        GROUP BY p.ean, TRIM(p.nazov_vyrobku), p.mj
+        SELECT p.ean, TRIM(p.nazov_vyrobku) AS product_name, p.mj AS prod_mj, {cost_ledger.ledger_select()}
+          FROM product_cost_ledger l
+          JOIN produkty p ON p.ean = l.ean
+         WHERE l.sum_units > 0 OR l.sum_cost_units > 0
     """) or []
     out = []
     for r in rows:
-        units = float(r['sum_units'] or 0.0)
-        avg   = (float(r['sum_cost_units'] or 0.0) / units) if units > 0 else 0.0
+        pavg = r.get('purchase_avg')
         out.append({
             "ean": (r['ean'] or '').strip(),
             "product": r['product_name'],
             "unit": r['prod_mj'],
-            "avg_manufacturing_unit_cost": round(avg, 4)
+            "avg_manufacturing_unit_cost": round(float(r['manuf_avg'] or 0.0), 4),
+            "avg_purchase_unit_cost": (None if pavg is None else round(float(pavg), 4)),
         })
-
-    purchase_by_ean = _avg_purchase_costs_map_by_ean()
-    for rec in out:
-        rec["avg_purchase_unit_cost"] = (None if rec["ean"] not in purchase_by_ean
-                                         else round(float(purchase_by_ean[rec["ean"]]), 4))
     return {"rows": out}
 
 
@@ -742,48 +688,17 @@ def get_avg_costs_catalog():
 # =================================================================
 
 def get_comprehensive_stock_view():
-    """Prehľad finálnych produktov (centrálny sklad) + priemery cien (výrobné/nákupné)."""
-    q = """
+    """Prehľad finálnych produktov (centrálny sklad) + priemery cien (výrobné/nákupné) z product_cost_ledger."""
+    rows = db_connector.execute_query(f"""
         SELECT
             p.ean, p.nazov_vyrobku AS name, p.predajna_kategoria AS category,
             p.aktualny_sklad_finalny_kg AS stock_kg, p.vaha_balenia_g, p.mj AS unit,
-            (
-              SELECT ROUND(zv.celkova_cena_surovin / NULLIF(zv.realne_mnozstvo_kg, 0), 4)
-              FROM zaznamy_vyroba zv
-              WHERE (zv.nazov_vyrobu = p.nazov_vyrobku OR zv.nazov_vyrobku = p.nazov_vyrobku)
-                AND zv.celkova_cena_surovin IS NOT NULL
-                AND zv.realne_mnozstvo_kg IS NOT NULL
-              ORDER BY COALESCE(zv.datum_ukoncenia, zv.datum_vyroby) DESC
-              LIMIT 1
-            ) AS last_cost_per_kg
+            {cost_ledger.ledger_select()}
         FROM produkty p
+        LEFT JOIN product_cost_ledger l ON l.ean = p.ean
         WHERE p.typ_polozky = 'produkt' OR p.typ_polozky LIKE 'VÝROBOK%%' OR p.typ_polozky LIKE 'TOVAR%%'
         ORDER BY category, name
-    """
-    rows = db_connector.execute_query(q) or []
-
-    # centrálne výrobné priemery (€/kg alebo €/ks podľa MJ) z dávok s cenou
-    zv = _zv_name_col()
-    mc_rows = db_connector.execute_query(f"""
-        SELECT TRIM(p.nazov_vyrobku) AS pn, p.mj AS mj,
-               SUM((CASE WHEN p.mj='kg' THEN COALESCE(zv.realne_mnozstvo_kg,0)
-                         ELSE COALESCE(zv.realne_mnozstvo_ks,0) END)
-                   * COALESCE(zv.cena_za_jednotku,0)) AS sum_cost_units,
-               SUM(CASE WHEN p.mj='kg' THEN COALESCE(zv.realne_mnozstvo_kg,0)
-                        ELSE COALESCE(zv.realne_mnozstvo_ks,0) END) AS sum_units
-          FROM zaznamy_vyroba zv
-          JOIN produkty p ON TRIM(zv.{zv}) = TRIM(p.nazov_vyrobku)
-         WHERE COALESCE(zv.cena_za_jednotku,0) > 0
-         GROUP BY TRIM(p.nazov_vyrobku), p.mj
     """) or []
-    manuf_index = {}
-    for r in mc_rows:
-        su = float(r['sum_units'] or 0.0)
-        avg = (float(r['sum_cost_units'] or 0.0)/su) if su>0 else 0.0
-        manuf_index[(r['pn'], r['mj'])] = avg
-
-    # nákupné best-effort cez EAN
-    purchase_by_ean = _avg_purchase_costs_map_by_ean()
 
     grouped: Dict[str, List[Dict[str, Any]]] = {}
     flat: List[Dict[str, Any]] = []
@@ -794,14 +709,12 @@ def get_comprehensive_stock_view():
         w = float(p.get('vaha_balenia_g') or 0.0)
         qty = (qty_kg * 1000 / w) if unit == 'ks' and w > 0 else qty_kg
 
-        manuf_avg = manuf_index.get((p['name'], unit), 0.0)
+        manuf_avg = p.get('manuf_avg') or 0.0
         purchase_avg = None
-        if p['ean']:
-            base = purchase_by_ean.get((p['ean'] or '').strip())
-            if base is not None:
-                purchase_avg = base
-                if unit == 'ks' and w > 0:
-                    purchase_avg = base * (w/1000.0)
+        if p.get('purchase_avg') is not None:
+            purchase_avg = float(p['purchase_avg'])
+            if unit == 'ks' and w > 0:
+                purchase_avg = purchase_avg * (w/1000.0)
 
         item = {
             "ean": p['ean'],
@@ -920,16 +833,7 @@ def save_promotion(data: Dict[str, Any]):
     vals = [chain_id_int, promo_name, ean, product_name, start_date, end_date, price_net]
     placeholders = ["%s"] * len(cols)
 
-    try:
-        has_created_at = db_connector.execute_query("""
-            SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
-             WHERE TABLE_SCHEMA = DATABASE()
-               AND TABLE_NAME = 'b2b_promotions'
-               AND COLUMN_NAME = 'created_at'
-             LIMIT 1
-        """, fetch='one')
-    except Exception:
-        has_created_at = None
+    has_created_at = schema_cache.has_col('b2b_promotions', 'created_at')
 
     if has_created_at:
         cols.append("created_at"); vals.append(datetime.now()); placeholders.append("%s")
@@ -999,6 +903,7 @@ def update_catalog_item(data):
           data.get('kategoria_pre_recepty') or None,
           data.get('predajna_kategoria') or None,
           float(data.get('dph', 0) or 0), ean), fetch='none')
+    b2c_price_book.invalidate()   # DPH produktu je súčasťou B2C cenníka
     return {"message": f"Položka {ean} aktualizovaná."}
 
 def delete_catalog_item(data):
@@ -1220,9 +1125,9 @@ def update_min_stock_levels(products_data):
         updates.append((kg_val, ks_val, ean))
     if not updates:
         return {"error": "Žiadne platné dáta na aktualizáciu."}
-    db_connector.execute_query("""
+    db_connector.execute_many("""
         UPDATE produkty SET minimalna_zasoba_kg=%s, minimalna_zasoba_ks=%s WHERE ean=%s
-    """, updates, fetch='none', multi=True)
+    """, updates)
     return {"message": f"Minimálne zásoby aktualizované pre {len(updates)} produktov."}
 
 
@@ -1230,101 +1135,15 @@ def update_min_stock_levels(products_data):
 # === REPORTY – štatistiky, príjem, inventúra, príjem podľa dátumu ==
 # =================================================================
 
-def get_production_stats(period, category):
+@result_cache.cached("produkty", "zaznamy_vyroba", "skody", daily=True)
+def get_production_stats(period, category, page=None, page_size=None, summary=False,
+                         damage_page=None, damage_page_size=None):
     """
-    Štatistiky výroby a škôd – bez textových porovnaní v SQL,
-    s cenovým fallbackom na celkové náklady / reálne kg, ak chýba cena_za_jednotku.
+    Štatistiky výroby a škôd – obdobie, kategória aj agregácie v SQL (viď production_stats),
+    samostatné stránkovanie výroby a škôd; summary=True vráti len súčty po kategóriách / produktoch / dňoch.
     """
-    now = datetime.now()
-    p = (str(period) if period is not None else "").lower()
-    if p.startswith("week"):
-        start_dt = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
-    elif p.startswith("month"):
-        start_dt = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    else:
-        start_dt = datetime(1970, 1, 1)
-
-    cat_raw  = (str(category) if category is not None else "").strip()
-    cat_norm = cat_raw.casefold()
-    use_cat  = bool(cat_norm) and cat_norm not in {"všetky","vsetky","all"}
-
-    prod_map_rows = db_connector.execute_query(
-        "SELECT nazov_vyrobku, kategoria_pre_recepty, mj FROM produkty"
-    ) or []
-    name2info = {
-        _norm_key(r.get("nazov_vyrobku")): {
-            "kategoria": (r.get("kategoria_pre_recepty") or "Nezaradené"),
-            "unit":      (r.get("mj") or "kg"),
-        }
-        for r in prod_map_rows
-    }
-
-    prod_rows = db_connector.execute_query("""
-        SELECT *
-          FROM zaznamy_vyroba
-         WHERE stav IN ('Ukončené','Dokončené')
-           AND datum_ukoncenia >= %s
-         ORDER BY datum_ukoncenia DESC, id_davky DESC
-    """, (start_dt,)) or []
-
-    enriched_prod = []
-    for r in prod_rows:
-        key  = _norm_key(r.get("nazov_vyrobku"))
-        meta = name2info.get(key, {"kategoria":"Nezaradené","unit": (r.get("mj") or "kg")})
-        if use_cat and meta["kategoria"].casefold() != cat_norm:
-            continue
-
-        plan_kg = float(r.get("planovane_mnozstvo_kg") or 0.0)
-        real_kg = float(r.get("realne_mnozstvo_kg") or 0.0)
-        yield_pct = ((real_kg / plan_kg) * 100.0 - 100.0) if plan_kg > 0 else 0.0
-
-        unit_cost = float(r.get("cena_za_jednotku") or 0.0)
-        if unit_cost == 0.0 and real_kg > 0:
-            total_cost = float(r.get("celkova_cena_surovin") or 0.0)
-            if total_cost:
-                unit_cost = total_cost / real_kg
-
-        row = dict(r)
-        row["kategoria_pre_recepty"] = meta["kategoria"]
-        row["unit"]                  = meta["unit"]
-        row["vytaznost"]             = yield_pct
-        row["cena_bez_energii"]      = unit_cost
-        row["cena_s_energiami"]      = (unit_cost * 1.15) if unit_cost else 0.0
-        enriched_prod.append(row)
-
-    dmg_rows = db_connector.execute_query("""
-        SELECT *
-          FROM skody
-         WHERE datum >= %s
-         ORDER BY datum DESC, id DESC
-    """, (start_dt,)) or []
-
-    dmg_ids = sorted({ d["id_davky"] for d in dmg_rows if d.get("id_davky") })
-    zv_map  = {}
-    if dmg_ids:
-        placeholders = ",".join(["%s"] * len(dmg_ids))
-        zvr = db_connector.execute_query(
-            f"SELECT id_davky, nazov_vyrobku, celkova_cena_surovin FROM zaznamy_vyroba WHERE id_davky IN ({placeholders})",
-            tuple(dmg_ids)
-        ) or []
-        for z in zvr:
-            zv_map[z["id_davky"]] = {"nazov": z.get("nazov_vyrobku"), "celkova": float(z.get("celkova_cena_surovin") or 0.0)}
-
-    enriched_dmg = []
-    for d in dmg_rows:
-        zv_info = zv_map.get(d.get("id_davky"))
-        nm  = (zv_info["nazov"] if zv_info and zv_info.get("nazov") else (d.get("nazov_vyrobku") or d.get("nazov_suroviny")))
-        key = _norm_key(nm)
-        cat = name2info.get(key, {}).get("kategoria", "Nezaradené")
-        if use_cat and cat.casefold() != cat_norm:
-            continue
-
-        dd = dict(d)
-        dd["kategoria_pre_recepty"] = cat
-        dd["naklady_skody"]         = float((zv_info or {}).get("celkova") or d.get("naklady") or d.get("naklad") or d.get("cena") or 0.0)
-        enriched_dmg.append(dd)
-
-    return {"data": enriched_prod, "damage_data": enriched_dmg}
+    return production_stats.get_stats(period, category, page=page, page_size=page_size, summary=bool(summary),
+                                      damage_page=damage_page, damage_page_size=damage_page_size)
 
 def get_receipt_report_html(period: str, category: str):
     """Tlačiteľný report príjmov do výrobného skladu (zaznamy_prijem)."""
@@ -1339,14 +1158,15 @@ def get_receipt_report_html(period: str, category: str):
     else:
         start = end = today; label = today.strftime('%d.%m.%Y')
 
-    rows = db_connector.execute_query("""
+    day_sql, day_params = date_ranges.days('zp.datum', start, end)
+    rows = db_connector.execute_query(f"""
         SELECT DATE(zp.datum) AS d, TIME(zp.datum) AS t, zp.nazov_suroviny AS name,
                COALESCE(zp.mnozstvo_kg,0) AS qty_kg, zp.nakupna_cena_eur_kg AS unit_price,
                zp.typ AS source, zp.poznamka_dodavatel AS note
         FROM zaznamy_prijem zp
-        WHERE DATE(zp.datum) BETWEEN %s AND %s
+        WHERE {day_sql}
         ORDER BY zp.datum ASC, zp.nazov_suroviny ASC
-    """, (start, end)) or []
+    """, tuple(day_params)) or []
 
     total_qty = 0.0; total_val = 0.0
     trs=[]
@@ -1445,10 +1265,13 @@ def get_reception_report(date_from: str, date_to: str, overhead_coeff: float = 1
         return {"error": "Neplatný formát dátumu. Použite YYYY-MM-DD."}
 
     zv = _oh_zv_name_col()
+    reception_totals.ensure_ready()
 
+    # riadky len za obdobie (index is_deleted, datum_prijmu); súčty dávok zo súhrnnej tabuľky
     rows = db_connector.execute_query(f"""
         SELECT
             ep.id_davky, ep.unit AS ep_unit, ep.prijem_kg, ep.prijem_ks, ep.datum_prijmu,
+            COALESCE(t.total_kg,0) AS total_real_kg, COALESCE(t.total_ks,0) AS total_real_ks,
             zv.{zv} AS product_name, zv.planovane_mnozstvo_kg AS planned_kg_batch,
             COALESCE(zv.celkova_cena_surovin,0) AS zv_total_cost,
             COALESCE(zv.cena_za_jednotku,0)     AS zv_unit_cost,
@@ -1457,7 +1280,8 @@ def get_reception_report(date_from: str, date_to: str, overhead_coeff: float = 1
             p.mj AS prod_mj, COALESCE(p.vaha_balenia_g,0) AS weight_g
         FROM expedicia_prijmy ep
         JOIN zaznamy_vyroba zv ON zv.id_davky = ep.id_davky
-        JOIN produkty      p  ON TRIM(zv.{zv}) = TRIM(p.nazov_vyrobku)
+        JOIN produkty      p  ON {product_keys.zv_join('zv', 'p')}
+        LEFT JOIN expedicia_prijmy_davky t ON t.id_davky = ep.id_davky
         WHERE ep.is_deleted = 0 AND ep.datum_prijmu BETWEEN %s AND %s
     """, (d_from, d_to)) or []
 
@@ -1465,19 +1289,6 @@ def get_reception_report(date_from: str, date_to: str, overhead_coeff: float = 1
         return {"period":{"date_from":d_from,"date_to":d_to,"overhead_coeff":overhead_coeff},
                 "rows":[], "totals":{"planned_kg":0.0,"real_kg":0.0,"yield_pct":0.0}}
 
-    totals_per_batch = db_connector.execute_query(f"""
-        SELECT ep.id_davky,
-               SUM(CASE WHEN ep.unit='kg' THEN COALESCE(ep.prijem_kg,0)
-                        ELSE COALESCE(ep.prijem_ks,0) * COALESCE(p.vaha_balenia_g,0) / 1000 END) AS total_real_kg,
-               SUM(CASE WHEN ep.unit='ks' THEN COALESCE(ep.prijem_ks,0) ELSE 0 END) AS total_real_ks
-          FROM expedicia_prijmy ep
-          JOIN zaznamy_vyroba zv ON zv.id_davky = ep.id_davky
-          JOIN produkty p        ON TRIM(zv.{zv}) = TRIM(p.nazov_vyrobku)
-         WHERE ep.is_deleted = 0
-         GROUP BY ep.id_davky
-    """) or []
-    total_map = {r['id_davky']: (_oh_safe_float(r['total_real_kg']), _oh_safe_float(r['total_real_ks'])) for r in totals_per_batch}
-
     agg: Dict[tuple, Dict[str, float]] = {}
     total_planned, total_real = 0.0, 0.0
 
@@ -1486,7 +1297,7 @@ def get_reception_report(date_from: str, date_to: str, overhead_coeff: float = 1
         mj      = r['prod_mj'] or 'kg'
         w_g     = _oh_safe_float(r['weight_g'])
         planned_batch = _oh_safe_float(r['planned_kg_batch'])
-        tot_kg, tot_ks = total_map.get(r['id_davky'], (0.0, 0.0))
+        tot_kg, tot_ks = _oh_safe_float(r['total_real_kg']), _oh_safe_float(r['total_real_ks'])
 
         real_kg = _oh_safe_float(r['prijem_kg']) if r['ep_unit']=='kg' else (_oh_safe_float(r['prijem_ks']) * w_g / 1000.0)
         planned_prop = planned_batch * (real_kg / tot_kg) if tot_kg > 0 else real_kg
@@ -1549,7 +1360,7 @@ def get_b2c_pricelist_for_admin():
         SELECT c.ean_produktu, p.nazov_vyrobku, p.dph,
                c.cena_bez_dph, c.je_v_akcii, c.akciova_cena_bez_dph
           FROM b2c_cennik_polozky c
-          JOIN produkty p ON c.ean_produktu COLLATE {COLL} = p.ean COLLATE {COLL}
+          JOIN produkty p ON {ean_key.col('produkty', 'p')} = {ean_key.col('b2c_cennik_polozky', 'c')}
     """) or []
 
     avg_idx = _avg_costs_index_by_ean()
@@ -1586,6 +1397,7 @@ def update_b2c_pricelist(data):
         if img_url != '':
             meta[ean]['obrazok'] = img_url
 
+    b2c_price_book.invalidate()
     _b2c_meta_save(meta)
     return {"message": "Zmeny v cenníku uložené."}
 
@@ -1604,14 +1416,15 @@ def add_products_to_b2c_pricelist(data):
         except Exception:
             price = 0.0
 
+        kc = ean_key.col('b2c_cennik_polozky')
         exists = db_connector.execute_query(
-            f"SELECT 1 FROM b2c_cennik_polozky WHERE ean_produktu COLLATE {COLL} = %s LIMIT 1",
-            (ean,)
+            f"SELECT 1 FROM b2c_cennik_polozky WHERE {kc} = %s LIMIT 1",
+            (ean_key.normalize(ean),)
         )
         if exists:
             db_connector.execute_query(
-                "UPDATE b2c_cennik_polozky SET cena_bez_dph = %s WHERE ean_produktu = %s",
-                (price, ean), fetch='none'
+                f"UPDATE b2c_cennik_polozky SET cena_bez_dph = %s WHERE {kc} = %s",
+                (price, ean_key.normalize(ean)), fetch='none'
             )
             updated += 1
         else:
@@ -1622,6 +1435,7 @@ def add_products_to_b2c_pricelist(data):
             )
             inserted += 1
 
+    b2c_price_book.invalidate()
     return {"message": "Hotovo.", "inserted": inserted, "updated": updated}
 
 def get_b2c_orders_for_admin():
@@ -1661,6 +1475,7 @@ def update_b2c_order_status(data):
         )
     except Exception as e:
         return {"error": f"Nepodarilo sa zapísať stav: {e}"}
+    demand_forecast.refresh_order(demand_forecast.CHANNEL_B2C, order_id)
 
     return {"message": f"Stav objednávky zmenený na '{new_status}'."}
 
@@ -1812,6 +1627,7 @@ def cancel_b2c_order(data):
         "UPDATE b2c_objednavky SET stav = 'Zrušená', poznamka = CONCAT(IFNULL(poznamka, ''), ' | ZRUŠENÉ: ', %s) WHERE id = %s",
         (reason, order_id), fetch='none'
     )
+    demand_forecast.refresh_order(demand_forecast.CHANNEL_B2C, order_id)
     order = db_connector.execute_query("SELECT zakaznik_id, cislo_objednavky FROM b2c_objednavky WHERE id = %s", (order_id,), 'one')
     if order:
         customer = db_connector.execute_query("SELECT nazov_firmy, email FROM b2b_zakaznici WHERE zakaznik_id = %s", (order['zakaznik_id'],), 'one')
@@ -2300,18 +2116,10 @@ except Exception:
 
 # ---- Low-level util --------------------------------------------------------
 def _sms_table_exists(name: str) -> bool:
-    r = db_connector.execute_query(
-        "SELECT COUNT(*) c FROM information_schema.TABLES WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s",
-        (name,), fetch="one"
-    )
-    return bool(r and int(list(r.values())[0]) > 0)
+    return schema_cache.table_exists(name)
 
 def _sms_cols_for(name: str) -> set:
-    rows = db_connector.execute_query(
-        "SELECT COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s",
-        (name,), fetch="all"
-    ) or []
-    return {r["COLUMN_NAME"] for r in rows}
+    return set(schema_cache.columns(name))
 
 def _sms_pick(colset: set, *cands, default=None):
     for c in cands:
@@ -3036,12 +2844,7 @@ def calculate_production_plan():
     ALLOWED_TYPES = ("VÝROBOK", "VÝROBOK_KRAJANY", "VÝROBOK_KUSOVY")
 
     # --- zisti názov stĺpca pre typ produktu v 'produkty' ---
-    cols = db_connector.execute_query(
-        "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
-        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'produkty'",
-        fetch="all"
-    ) or []
-    colset = {c["COLUMN_NAME"] for c in cols}
+    colset = set(schema_cache.columns('produkty'))
     type_col = None
     for cand in ("typ_produktu", "typ", "product_type", "centralny_typ", "typ_katalogu", "kategoria_centralna", "predajna_kategoria"):
         if cand in colset:
@@ -3090,8 +2893,7 @@ def calculate_production_plan():
         JOIN b2b_objednavky o ON o.id = pol.objednavka_id
         LEFT JOIN produkty p ON (
              (p.ean IS NOT NULL AND pol.ean_produktu IS NOT NULL
-               AND CONVERT(p.ean USING utf8mb4) COLLATE {COLL}
-                   = CONVERT(pol.ean_produktu USING utf8mb4) COLLATE {COLL})
+               AND {ean_key.col('produkty', 'p')} = {ean_key.col('b2b_objednavky_polozky', 'pol')})
           OR (CONVERT(p.nazov_vyrobku USING utf8mb4) COLLATE {COLL}
                    = CONVERT(pol.nazov_vyrobku USING utf8mb4) COLLATE {COLL})
         )
@@ -3144,16 +2946,10 @@ def calculate_production_plan():
 
     # ── helpers ─────────────────────────────────────────────────
     def _tbl_exists(t):
-        row = db_connector.execute_query(
-            "SELECT COUNT(*) AS c FROM information_schema.TABLES WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s",
-            (t,), fetch="one")
-        return bool(row and int(list(row.values())[0]) > 0)
+        return schema_cache.table_exists(t)
 
     def _cols(t):
-        rows = db_connector.execute_query(
-            "SELECT COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s",
-            (t,), fetch="all") or []
-        return {r["COLUMN_NAME"] for r in rows}
+        return set(schema_cache.columns(t))
 
     def _pick(colset, *cands):
         for c in cands:
@@ -3379,16 +3175,10 @@ def get_purchase_suggestions():
 
     # ── helpers na introspekciu ─────────────────────────────────
     def _tbl_exists(t):
-        row = db_connector.execute_query(
-            "SELECT COUNT(*) AS c FROM information_schema.TABLES WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s",
-            (t,), fetch="one")
-        return bool(row and int(list(row.values())[0]) > 0)
+        return schema_cache.table_exists(t)
 
     def _cols(t):
-        rows = db_connector.execute_query(
-            "SELECT COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s",
-            (t,), fetch="all") or []
-        return {r["COLUMN_NAME"] for r in rows}
+        return set(schema_cache.columns(t))
 
     def _pick(colset, *cands):
         for c in cands:
@@ -3528,18 +3318,10 @@ def get_7_day_forecast():
         return [(base + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)]
 
     def _tbl_exists(t):
-        r = db_connector.execute_query(
-            "SELECT COUNT(*) AS c FROM information_schema.TABLES WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s",
-            (t,), fetch="one"
-        )
-        return bool(r and int(list(r.values())[0]) > 0)
+        return schema_cache.table_exists(t)
 
     def _cols(t):
-        rows = db_connector.execute_query(
-            "SELECT COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA=DATABASE() AND TABLE_NAME=%s",
-            (t,), fetch="all"
-        ) or []
-        return {x["COLUMN_NAME"] for x in rows}
+        return set(schema_cache.columns(t))
 
     def _pick(colset, *cands):
         for c in cands:
@@ -7,36 +7,19 @@ try:
     from db_connector import execute_query, get_connection
 except Exception:
     raise
+import schema_cache
 
 orders_bp = Blueprint("orders", __name__)
 
 # ---------- helpers ----------
 def has_table(table):
-    try:
-        r = execute_query("""
-            SELECT 1 FROM INFORMATION_SCHEMA.TABLES
-             WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME=%s LIMIT 1
-        """, (table,), fetch='one')
-        return bool(r)
-    except Exception:
-        return False
+    return schema_cache.table_exists(table)
 
 def has_col(table, col):
-    try:
-        r = execute_query("""
-            SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
-             WHERE TABLE_SCHEMA = DATABASE()
-               AND TABLE_NAME=%s AND COLUMN_NAME=%s LIMIT 1
-        """, (table, col), fetch='one')
-        return bool(r)
-    except Exception:
-        return False
+    return schema_cache.has_col(table, col)
 
 def pick_first_existing(table, candidates):
-    for c in candidates:
-        if has_col(table, c):
-            return c
-    return None
+    return schema_cache.first_col(table, candidates)
 
 def conn_coll(default='utf8mb4_general_ci'):
     try:
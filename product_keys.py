@@ -0,0 +1,136 @@
+# product_keys.py
+# Identita produktu pre výrobné dávky: zaznamy_vyroba.produkt_ean -> produkty.ean
+# - nahrádza JOIN cez TRIM(zv.nazov_vyrobu|nazov_vyrobku) = TRIM(p.nazov_vyrobku),
+#   ktorý nevie použiť index a pri každom reporte prechádza celú históriu dávok
+# - stĺpec + index sa doplnia za behu (ensure_schema), história sa jednorazovo
+#   dopočíta podľa názvu (backfill – len riadky s produkt_ean IS NULL)
+# - nové dávky dostanú EAN pri zápise (stamp) – výroba, krájanie, manuálny príjem
+#
+# Použitie v readeroch:
+#   f"JOIN produkty p ON {product_keys.zv_join('zv', 'p')}"
+#
+# Ak stĺpec nie je (migrácia neprešla), zv_join() vráti pôvodný JOIN podľa názvu.
+
+import threading
+from typing import Iterable, Optional
+
+import db_connector
+import schema_cache
+
+ZV_KEY = "produkt_ean"
+
+_schema_ready = False
+_lock = threading.Lock()
+
+
+def zv_name_col() -> str:
+    """Stĺpec s názvom výrobku v zaznamy_vyroba ('nazov_vyrobu' | 'nazov_vyrobku')."""
+    return 'nazov_vyrobu' if schema_cache.has_col('zaznamy_vyroba', 'nazov_vyrobu') else 'nazov_vyrobku'
+
+
+def has_key() -> bool:
+    return schema_cache.has_col('zaznamy_vyroba', ZV_KEY)
+
+
+def ean_col_def() -> str:
+    """
+    Definícia stĺpca pre EAN produktu s rovnakou znakovou sadou/koláciou ako produkty.ean –
+    JOIN na produkty je potom čistý equi-join (bez 'Illegal mix of collations' a bez COLLATE).
+    """
+    row = db_connector.execute_query("""
+        SELECT CHARACTER_SET_NAME AS cs, COLLATION_NAME AS coll
+          FROM INFORMATION_SCHEMA.COLUMNS
+         WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'produkty' AND COLUMN_NAME = 'ean'
+    """, fetch='one') or {}
+    if row.get('cs') and row.get('coll'):
+        return f"VARCHAR(32) CHARACTER SET {row['cs']} COLLATE {row['coll']}"
+    return "VARCHAR(32)"
+
+
+def _index_exists(name: str) -> bool:
+    row = db_connector.execute_query("""
+        SELECT 1 FROM INFORMATION_SCHEMA.STATISTICS
+         WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'zaznamy_vyroba' AND INDEX_NAME = %s
+         LIMIT 1
+    """, (name,), fetch='one')
+    return bool(row)
+
+
+def ensure_schema() -> None:
+    """produkt_ean + indexy + backfill histórie. Raz za proces; volať mimo otvorenej transakcie."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _lock:
+        if _schema_ready:
+            return
+        if not schema_cache.table_exists('zaznamy_vyroba'):
+            return
+        try:
+            if not has_key():
+                db_connector.execute_query(
+                    f"ALTER TABLE zaznamy_vyroba ADD COLUMN {ZV_KEY} {ean_col_def()} NULL",
+                    fetch='none'
+                )
+            # (produkt_ean, datum_ukoncenia): JOIN z produkty + posledná dávka produktu
+            if not _index_exists('idx_zv_produkt_ean'):
+                db_connector.execute_query(
+                    f"CREATE INDEX idx_zv_produkt_ean ON zaznamy_vyroba ({ZV_KEY}, datum_ukoncenia)",
+                    fetch='none'
+                )
+            backfill()
+        except Exception as e:
+            print(f"!!! UPOZORNENIE: product_keys – migrácia zaznamy_vyroba zlyhala: {e}")
+        _schema_ready = True
+
+
+def backfill() -> int:
+    """Doplní produkt_ean dávkam, ktoré ho nemajú (párovanie podľa názvu). Vráti počet riadkov."""
+    if not has_key():
+        return 0
+    zv = zv_name_col()
+    n = db_connector.execute_query(f"""
+        UPDATE zaznamy_vyroba zv
+          JOIN produkty p ON TRIM(zv.{zv}) = TRIM(p.nazov_vyrobku)
+           SET zv.{ZV_KEY} = p.ean
+         WHERE zv.{ZV_KEY} IS NULL
+    """, fetch='rowcount') or 0
+    if n:
+        print(f">>> product_keys: doplnený produkt_ean pre {n} dávok.")
+    return n
+
+
+def zv_join(zv: str = "zv", p: str = "p") -> str:
+    """Podmienka JOINu zaznamy_vyroba (alias zv) -> produkty (alias p)."""
+    ensure_schema()
+    if has_key():
+        return f"{p}.ean = {zv}.{ZV_KEY}"
+    name = zv_name_col()
+    return f"TRIM({zv}.{name}) = TRIM({p}.nazov_vyrobku)"
+
+
+def stamp(batch_ids: Iterable[str], ean: Optional[str] = None, cur=None) -> None:
+    """
+    Zapíše produkt_ean novým dávkam. So zadaným `ean` priamo, inak podľa názvu dávky.
+    `cur` = kurzor otvorenej transakcie (zápis ide v nej); bez neho cez execute_query.
+    Nevolá ensure_schema – DDL počas otvorenej transakcie nad zaznamy_vyroba by čakalo na zámok.
+    """
+    ids = [b for b in dict.fromkeys(batch_ids or []) if b]
+    if not ids or not has_key():
+        return
+    ph = ",".join(["%s"] * len(ids))
+    if ean:
+        sql = f"UPDATE zaznamy_vyroba SET {ZV_KEY} = %s WHERE id_davky IN ({ph})"
+        params = (ean, *ids)
+    else:
+        sql = f"""
+            UPDATE zaznamy_vyroba zv
+              JOIN produkty p ON TRIM(zv.{zv_name_col()}) = TRIM(p.nazov_vyrobku)
+               SET zv.{ZV_KEY} = p.ean
+             WHERE zv.id_davky IN ({ph})
+        """
+        params = tuple(ids)
+    if cur is not None:
+        cur.execute(sql, params)
+    else:
+        db_connector.execute_query(sql, params, fetch='none')
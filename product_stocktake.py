@@ -0,0 +1,157 @@
+# product_stocktake.py
+# Hromadná inventúra hotových produktov (Sklad 2 / expedícia)
+# - prijme tisíce napočítaných riadkov [{ean, realQty}] (realQty v MJ produktu: kg alebo ks)
+# - ceny rozdielov z JEDNÉHO predagregovaného zdroja: product_cost_ledger.last_unit_cost
+#   (posledná jednotková cena dávky) – žiadny korelovaný subselect na produkt
+# - hlavička, detaily, korekcie skladu aj legacy rozdiely idú v JEDNEJ transakcii
+#   po dávkach (multi-VALUES INSERT, UPDATE ... CASE ean), produkty sú zamknuté FOR UPDATE,
+#   takže súbežný príjem/výdaj nezmení systémový stav medzi čítaním a prepisom
+# - vráti súhrn rozdielov (manko/prebytok v kg a €) + zoznam rozdielových riadkov
+
+from datetime import datetime, date
+from typing import Any, Callable, Dict, List, Optional
+
+import db_connector
+import cost_ledger
+
+DIFF_EPS_KG = 0.0001
+
+# tabuľky (benchmark ich presmeruje na bench_* kópie)
+T_HEADER = "expedicia_inventury"
+T_DETAIL = "expedicia_inventura_polozky"
+T_PRODUCTS = "produkty"
+T_LEDGER = "product_cost_ledger"
+
+
+def _num(v) -> Optional[float]:
+    if v is None or v == '':
+        return None
+    try:
+        return float(str(v).replace(',', '.').strip())
+    except Exception:
+        return None
+
+
+def _normalize_lines(lines) -> Dict[str, float]:
+    """{ean: napočítané množstvo} – prázdne riadky preskočí, pri duplicitnom EAN platí posledný."""
+    out: Dict[str, float] = {}
+    for it in lines or []:
+        ean = str((it or {}).get('ean') or '').strip()
+        qty = _num((it or {}).get('realQty'))
+        if ean and qty is not None:
+            out.pop(ean, None)
+            out[ean] = qty
+    return out
+
+
+def _chunks(seq: list, size: int):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def submit(lines, worker_name: str,
+           legacy_writer: Optional[Callable[[List[tuple], Any], None]] = None,
+           chunk_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Uloží inventúru. `legacy_writer(rows, conn)` (voliteľné) zapíše rozdiely aj do staršej
+    tabuľky v tej istej transakcii. Vráti {"message", "inventoryId", "summary", "diffs"}.
+    """
+    counted = _normalize_lines(lines)
+    if not counted:
+        return {"message": "Žiadne položky na spracovanie."}
+    size = max(1, int(chunk_size or db_connector.BULK_CHUNK_ROWS))
+    eans = list(counted.keys())
+    ledger_cols = cost_ledger.ledger_select()  # aj bootstrap knihy – mimo transakcie
+
+    def work(conn):
+        cur = conn.cursor(dictionary=True)
+        try:
+            now = datetime.now()
+            cur.execute(
+                f"INSERT INTO {T_HEADER} (datum, vytvoril, created_at) VALUES (%s,%s,%s)",
+                (date.today(), worker_name, now)
+            )
+            inv_id = int(cur.lastrowid)
+
+            # 1) produkty + posledná jednotková cena – po dávkach, so zámkom riadkov produkty
+            pmap: Dict[str, Dict[str, Any]] = {}
+            for chunk in _chunks(eans, size):
+                cur.execute(f"""
+                    SELECT p.ean, p.nazov_vyrobku, p.predajna_kategoria, p.aktualny_sklad_finalny_kg,
+                           p.mj, p.vaha_balenia_g, {ledger_cols}
+                      FROM {T_PRODUCTS} p
+                      LEFT JOIN {T_LEDGER} l ON l.ean = p.ean
+                     WHERE p.ean IN ({','.join(['%s'] * len(chunk))})
+                     FOR UPDATE OF p
+                """, tuple(chunk))
+                for r in cur.fetchall() or []:
+                    pmap[str(r['ean']).strip()] = r
+
+            # 2) rozdiely v Pythone
+            details, legacy, diffs, unknown = [], [], [], []
+            new_stock: Dict[str, float] = {}
+            surplus_kg = shortage_kg = surplus_eur = shortage_eur = 0.0
+            for ean, real_num in counted.items():
+                pr = pmap.get(ean)
+                if pr is None:
+                    unknown.append(ean)
+                    continue
+                real_kg = real_num if pr['mj'] == 'kg' else (real_num * float(pr['vaha_balenia_g'] or 0.0) / 1000.0)
+                sys_kg = float(pr.get('aktualny_sklad_finalny_kg') or 0.0)
+                diff_kg = real_kg - sys_kg
+                if abs(diff_kg) <= DIFF_EPS_KG:
+                    continue
+                uc = float(pr.get('last_unit_cost') or 0.0)  # posledná známa jednotková cena; ak niet, 0
+                val = diff_kg * uc
+                kat = pr.get('predajna_kategoria') or 'Nezaradené'
+                details.append((inv_id, pr['ean'], pr['nazov_vyrobku'], kat, sys_kg, real_kg, diff_kg, val))
+                legacy.append((now, pr['ean'], pr['nazov_vyrobku'], kat, sys_kg, real_kg, diff_kg, val, worker_name))
+                new_stock[pr['ean']] = real_kg
+                diffs.append({"ean": pr['ean'], "name": pr['nazov_vyrobku'], "category": kat,
+                              "system_kg": round(sys_kg, 3), "real_kg": round(real_kg, 3),
+                              "diff_kg": round(diff_kg, 3), "value_eur": round(val, 2)})
+                if diff_kg > 0:
+                    surplus_kg += diff_kg; surplus_eur += val
+                else:
+                    shortage_kg += -diff_kg; shortage_eur += -val
+
+            # 3) detaily (multi-VALUES po dávkach) + korekcie skladu (UPDATE ... CASE po dávkach)
+            if details:
+                db_connector.execute_many(f"""
+                    INSERT INTO {T_DETAIL}
+                        (inventura_id, ean, nazov, kategoria, system_stav_kg, realny_stav_kg, rozdiel_kg, hodnota_eur)
+                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s)
+                """, details, chunk_size=size, conn=conn)
+            items = list(new_stock.items())
+            for chunk in _chunks(items, size):
+                cases = " ".join(["WHEN %s THEN %s"] * len(chunk))
+                cur.execute(
+                    f"UPDATE {T_PRODUCTS} SET aktualny_sklad_finalny_kg = CASE ean {cases} "
+                    f"ELSE aktualny_sklad_finalny_kg END WHERE ean IN ({','.join(['%s'] * len(chunk))})",
+                    tuple(x for e, v in chunk for x in (e, v)) + tuple(e for e, _ in chunk)
+                )
+            if legacy and legacy_writer:
+                legacy_writer(legacy, conn)
+
+            return inv_id, details, diffs, unknown, (surplus_kg, shortage_kg, surplus_eur, shortage_eur)
+        finally:
+            cur.close()
+
+    inv_id, details, diffs, unknown, (sk, shk, se, she) = db_connector.with_transaction(work)
+    counted_n = len(counted) - len(unknown)
+    return {
+        "message": f"Inventúra uložená. Položky: {counted_n}, rozdielov: {len(details)}.",
+        "inventoryId": inv_id,
+        "summary": {
+            "lines": len(counted),
+            "counted": counted_n,
+            "differences": len(details),
+            "unknown_eans": unknown,
+            "surplus_kg": round(sk, 3),
+            "shortage_kg": round(shk, 3),
+            "surplus_eur": round(se, 2),
+            "shortage_eur": round(she, 2),
+            "net_eur": round(se - she, 2),
+        },
+        "diffs": diffs,
+    }
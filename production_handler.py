@@ -1,10 +1,13 @@
 import db_connector
+import schema_cache
+import product_keys
+import warehouse_snapshot
 from datetime import datetime
 import unicodedata
 from typing import List, Dict, Any, Tuple, Optional
 
 # Položky, ktoré sa neodpisujú (nekonečný sklad)
-INFINITE_STOCK_NAMES = {'Ľad', 'Lad', 'Voda', 'Ovar'}
+INFINITE_STOCK_NAMES = warehouse_snapshot.INFINITE_STOCK_NAMES
 
 # ───────────────────────── Pomocné ─────────────────────────
 
@@ -17,39 +20,10 @@ def slugify(value: str) -> str:
         return "".join(c for c in value if c.isalnum() or c in (' ', '_')).lower().replace(' ', '_')
 
 def _has_col(table: str, col: str) -> bool:
-    try:
-        r = db_connector.execute_query(
-            """
-            SELECT 1
-              FROM INFORMATION_SCHEMA.COLUMNS
-             WHERE TABLE_SCHEMA = DATABASE()
-               AND TABLE_NAME   = %s
-               AND COLUMN_NAME  = %s
-             LIMIT 1
-            """,
-            (table, col),
-            fetch='one'
-        )
-        return bool(r)
-    except Exception:
-        return False
+    return schema_cache.has_col(table, col)
 
 def _table_exists(table: str) -> bool:
-    try:
-        r = db_connector.execute_query(
-            """
-            SELECT 1
-              FROM INFORMATION_SCHEMA.TABLES
-             WHERE TABLE_SCHEMA = DATABASE()
-               AND TABLE_NAME   = %s
-             LIMIT 1
-            """,
-            (table,),
-            fetch='one'
-        )
-        return bool(r)
-    except Exception:
-        return False
+    return schema_cache.table_exists(table)
 
 def _pick_existing_col(table: str, candidates: List[str]) -> Optional[str]:
     for c in candidates:
@@ -57,68 +31,17 @@ def _pick_existing_col(table: str, candidates: List[str]) -> Optional[str]:
             return c
     return None
 
-def _norm(s: Optional[str]) -> str:
-    if not s: return ''
-    s = unicodedata.normalize('NFKD', str(s)).encode('ascii', 'ignore').decode('ascii')
-    return s.strip().lower()
-
 def _category_from_values(cat_raw: Optional[str], name: str) -> str:
     """
     Mapuje na: Mäso | Koreniny | Obaly | Pomocný materiál (heuristika + kategória)
     """
-    s = _norm(cat_raw)
-    n = _norm(name)
-
-    if s in ('maso', 'mäso', 'meat') or any(k in s for k in ['brav', 'hovad', 'hoväd', 'hydin', 'ryb']):
-        return 'Mäso'
-    if s.startswith('koren') or 'korenin' in s or any(k in s for k in ['paprik', 'rasc', 'kmín', 'kmin', 'cesnak', 'dusit', 'sol', 'soľ']):
-        return 'Koreniny'
-    if 'obal' in s or 'cerv' in s or 'črev' in s or 'fóli' in s or 'foli' in s or 'vak' in s or 'siet' in s or 'spag' in s or 'špag' in s:
-        return 'Obaly'
-    if 'pomoc' in s or 'material' in s or 'materi' in s:
-        return 'Pomocný materiál'
-
-    if any(k in n for k in ['brav', 'hovad', 'hoväd', 'kurac', 'mork', 'morč', 'hydin', 'ryb', 'mlet']):
-        return 'Mäso'
-    if any(k in n for k in ['koren', 'paprik', 'rasc', 'kmin', 'dusit', 'sol', 'soľ', 'cesnak']):
-        return 'Koreniny'
-    if any(k in n for k in ['obal', 'črev', 'cerv', 'fóli', 'foli', 'vak', 'siet', 'špag', 'spag']):
-        return 'Obaly'
-    if n in ('voda', 'lad', 'ľad', 'ovar') or 'pomoc' in n:
-        return 'Pomocný materiál'
-    return 'Pomocný materiál'
+    return warehouse_snapshot.category_of(cat_raw, name)
 
 def _build_sklad_select_sql() -> str:
     """
     SELECT na sklad – funguje aj bez kategoria/typ/podtyp; vráti aj cenu a min zásobu.
     """
-    has_cat  = _has_col('sklad', 'kategoria')
-    has_typ  = _has_col('sklad', 'typ')
-    has_pod  = _has_col('sklad', 'podtyp')
-    has_def  = _has_col('sklad', 'default_cena_eur_kg')
-    has_buy  = _has_col('sklad', 'nakupna_cena')
-    has_min  = _has_col('sklad', 'min_zasoba')
-    has_inf  = _has_col('sklad', 'is_infinite_stock')
-
-    cat_expr = 'kategoria' if has_cat else ('typ' if has_typ else ('podtyp' if has_pod else "' '"))
-    price_expr = (
-        "COALESCE(default_cena_eur_kg, nakupna_cena, 0)" if (has_def and has_buy)
-        else ("COALESCE(default_cena_eur_kg, 0)" if has_def else ("COALESCE(nakupna_cena, 0)" if has_buy else "0"))
-    )
-    min_expr = "COALESCE(min_zasoba, 0)" if has_min else "0"
-    inf_expr = "COALESCE(is_infinite_stock, 0)" if has_inf else "0"
-
-    return f"""
-        SELECT
-            nazov AS name,
-            {cat_expr} AS cat_raw,
-            mnozstvo AS quantity,
-            {price_expr} AS price,
-            {min_expr} AS minStock,
-            {inf_expr} AS is_infinite_stock
-        FROM sklad
-        ORDER BY nazov
-    """
+    return warehouse_snapshot.sklad_select_sql()
 
 def _zv_name_col() -> str:
     """
@@ -129,39 +52,10 @@ def _zv_name_col() -> str:
 # ───────────────────────── Sklad / Recepty (pre UI) ─────────────────────────
 
 def get_warehouse_state() -> Dict[str, Any]:
-    rows = db_connector.execute_query(_build_sklad_select_sql()) or []
-    groups: Dict[str, List[Dict[str, Any]]] = {'Mäso': [], 'Koreniny': [], 'Obaly': [], 'Pomocný materiál': []}
-    all_items: List[Dict[str, Any]] = []
-    for r in rows:
-        name = r.get('name')
-        quantity = float(r.get('quantity') or 0.0)
-        price = float(r.get('price') or 0.0)
-        min_stock = float(r.get('minStock') or 0.0)
-        is_inf = bool(r.get('is_infinite_stock') or (name in INFINITE_STOCK_NAMES))
-        cat = _category_from_values(r.get('cat_raw'), name)
-        rec = {'name': name, 'type': cat, 'quantity': quantity, 'price': price, 'minStock': min_stock, 'is_infinite_stock': is_inf}
-        groups.setdefault(cat, []).append(rec)
-        all_items.append(rec)
-    return {
-        'Mäso': groups.get('Mäso', []),
-        'Koreniny': groups.get('Koreniny', []),
-        'Obaly': groups.get('Obaly', []),
-        'Pomocný materiál': groups.get('Pomocný materiál', []),
-        'all': all_items
-    }
+    return warehouse_snapshot.warehouse_state()
 
 def get_categorized_recipes() -> Dict[str, Any]:
-    rows = db_connector.execute_query("""
-        SELECT p.nazov_vyrobku, p.kategoria_pre_recepty
-          FROM produkty p
-         WHERE p.typ_polozky LIKE 'VÝROBOK%%'
-           AND EXISTS (SELECT 1 FROM recepty r WHERE TRIM(r.nazov_vyrobku)=TRIM(p.nazov_vyrobku) LIMIT 1)
-         ORDER BY p.kategoria_pre_recepty, p.nazov_vyrobku
-    """) or []
-    out: Dict[str, List[str]] = {}
-    for r in rows:
-        out.setdefault(r.get('kategoria_pre_recepty') or 'Nezaradené', []).append(r['nazov_vyrobku'])
-    return {'data': out}
+    return {'data': warehouse_snapshot.categorized_recipes()}
 
 def get_planned_production_tasks_by_category() -> Dict[str, List[Dict[str, Any]]]:
     zv_name = _zv_name_col()
@@ -172,7 +66,7 @@ def get_planned_production_tasks_by_category() -> Dict[str, List[Dict[str, Any]]
             zv.planovane_mnozstvo_kg AS actualKgQty,
             p.kategoria_pre_recepty AS category
           FROM zaznamy_vyroba zv
-          JOIN produkty p ON TRIM(zv.{zv_name})=TRIM(p.nazov_vyrobku)
+          JOIN produkty p ON {product_keys.zv_join('zv', 'p')}
          WHERE zv.stav='Automaticky naplánované'
            AND p.typ_polozky LIKE 'VÝROBOK%%'
          ORDER BY category, productName
@@ -193,7 +87,7 @@ def get_running_production_tasks_by_category() -> Dict[str, List[Dict[str, Any]]
             zv.planovane_mnozstvo_kg AS plannedKg,
             p.kategoria_pre_recepty AS category
           FROM zaznamy_vyroba zv
-          JOIN produkty p ON TRIM(zv.{zv_name})=TRIM(p.nazov_vyrobku)
+          JOIN produkty p ON {product_keys.zv_join('zv', 'p')}
          WHERE zv.stav='Vo výrobe'
          ORDER BY category, productName
     """) or []
@@ -215,28 +109,13 @@ def get_production_menu_data() -> Dict[str, Any]:
 # ───────────────────────── Recepty / Výpočet ─────────────────────────
 
 def find_recipe_data(product_name: str) -> List[Dict[str, Any]]:
-    return db_connector.execute_query(
-        """
-        SELECT nazov_suroviny, mnozstvo_na_davku_kg
-          FROM recepty
-         WHERE TRIM(nazov_vyrobku)=TRIM(%s)
-         ORDER BY nazov_suroviny
-        """,
-        (product_name,)
-    ) or []
+    return [{'nazov_suroviny': n, 'mnozstvo_na_davku_kg': kg} for n, kg in warehouse_snapshot.recipe(product_name)]
 
 def _get_product_batch_size_kg(product_name: str) -> float:
-    row = db_connector.execute_query(
-        "SELECT vyrobna_davka_kg FROM produkty WHERE TRIM(nazov_vyrobku)=TRIM(%s) LIMIT 1",
-        (product_name,), fetch='one'
-    ) or {}
-    try:
-        val = float(row.get('vyrobna_davka_kg') or 0.0)
-        return val if val > 0 else 100.0
-    except Exception:
-        return 100.0
+    return warehouse_snapshot.batch_size_kg(product_name)
 
-def calculate_required_ingredients(product_name, planned_weight):
+def _requirements(product_name, planned_weight) -> Dict[str, Any]:
+    """Potreba surovín pre jeden plán zo snapshotu skladu a indexu receptov (bez DB)."""
     try:
         planned_weight = float(planned_weight or 0)
     except Exception:
@@ -244,25 +123,21 @@ def calculate_required_ingredients(product_name, planned_weight):
     if not product_name or planned_weight <= 0:
         return {"error": "Zadajte platný produkt a množstvo."}
 
-    recipe_ingredients = find_recipe_data(product_name)
-    if not recipe_ingredients:
+    recipe = warehouse_snapshot.recipe(product_name)
+    if not recipe:
         return {"error": f'Recept s názvom "{product_name}" nebol nájdený.'}
 
-    batch_kg = _get_product_batch_size_kg(product_name)
+    batch_kg = warehouse_snapshot.batch_size_kg(product_name)
     multiplier = planned_weight / batch_kg
 
-    warehouse = get_warehouse_state()
-    stock_map = {x['name']: x for x in (warehouse.get('all') or [])}
-
     out = []
-    for ing in recipe_ingredients:
-        per_batch = float(ing.get('mnozstvo_na_davku_kg') or 0.0)
+    for name, per_batch in recipe:
         required = per_batch * multiplier
-        meta = stock_map.get(ing['nazov_suroviny'], {})
+        meta = warehouse_snapshot.item(name) or {}
         available = float(meta.get('quantity') or 0.0)
-        is_sufficient = (ing['nazov_suroviny'] in INFINITE_STOCK_NAMES) or (available >= required)
+        is_sufficient = (name in INFINITE_STOCK_NAMES) or (available >= required)
         out.append({
-            "name": ing['nazov_suroviny'],
+            "name": name,
             "type": meta.get('type', 'Neznámy'),
             "required": round(required, 3),
             "inStock": round(available, 2),
@@ -270,6 +145,42 @@ def calculate_required_ingredients(product_name, planned_weight):
         })
     return {"data": out, "batchKg": batch_kg, "multiplier": multiplier}
 
+def calculate_required_ingredients(product_name, planned_weight):
+    return _requirements(product_name, planned_weight)
+
+def calculate_required_ingredients_batch(plans):
+    """
+    Vyhodnotí viac kandidátskych plánov naraz: [{productName, plannedWeight}, ...].
+    Vráti výsledok pre každý plán (rovnaký tvar ako calculate_required_ingredients)
+    a súhrn surovín za všetky platné plány spolu – či sklad pokryje celý plán.
+    """
+    if not isinstance(plans, list) or not plans:
+        return {"error": "Zadajte aspoň jeden plán (productName, plannedWeight)."}
+
+    results, totals = [], {}
+    for p in plans:
+        p = p or {}
+        res = _requirements(p.get('productName'), p.get('plannedWeight'))
+        results.append({"productName": p.get('productName'), "plannedWeight": p.get('plannedWeight'), **res})
+        for ing in res.get('data') or []:
+            t = totals.setdefault(ing['name'], {"name": ing['name'], "type": ing['type'],
+                                                "required": 0.0, "inStock": ing['inStock']})
+            t['required'] += ing['required']
+
+    summary = []
+    for t in totals.values():
+        infinite = t['name'] in INFINITE_STOCK_NAMES
+        t['required'] = round(t['required'], 3)
+        t['isSufficient'] = bool(infinite or t['inStock'] >= t['required'])
+        t['shortage'] = 0.0 if infinite else round(max(0.0, t['required'] - t['inStock']), 3)
+        summary.append(t)
+    summary.sort(key=lambda x: (x['isSufficient'], x['name'] or ''))
+    return {
+        "plans": results,
+        "totals": summary,
+        "feasible": all(t['isSufficient'] for t in summary) and not any('error' in r for r in results),
+    }
+
 # ───────────────────────── Štart výroby (TX) ─────────────────────────
 
 def start_production(productName, plannedWeight, productionDate, ingredients, workerName, existingLogId=None, **kwargs):
@@ -292,6 +203,7 @@ def start_production(productName, plannedWeight, productionDate, ingredients, wo
     if not ing_names:
         return {"error": "Výroba musí obsahovať aspoň jednu surovinu."}
 
+    product_keys.ensure_schema()   # DDL ešte mimo transakcie
     conn = db_connector.get_connection()
     try:
         cur = conn.cursor(dictionary=True)
@@ -375,6 +287,9 @@ def start_production(productName, plannedWeight, productionDate, ingredients, wo
                 )
             message = f"VÝROBA SPUSTENÁ! Šarža: {batch_id}."
 
+        # produkt_ean dávky (aj pre automaticky naplánované úlohy bez EAN)
+        product_keys.stamp([batch_id], cur=cur)
+
         # Zapíš použité suroviny
         to_log = [(batch_id, i['name'], float(i['quantity'])) for i in ingredients if i.get('name') and float(i.get('quantity') or 0) > 0]
         if to_log:
@@ -383,7 +298,10 @@ def start_production(productName, plannedWeight, productionDate, ingredients, wo
                 to_log
             )
 
-        conn.commit()
+        with warehouse_snapshot.writing() as w:
+            for qty, nm in updates:
+                w.add(nm, -qty)
+            conn.commit()
         return {"message": message}
     except Exception as e:
         if conn: conn.rollback()
@@ -406,7 +324,10 @@ def update_inventory(inventory_data):
         except Exception:
             return {"error": f"Neplatná položka inventúry: {item}"}
     if updates:
-        db_connector.execute_query("UPDATE sklad SET mnozstvo=%s WHERE nazov=%s", updates, fetch='none', multi=True)
+        with warehouse_snapshot.writing() as w:
+            for qty, name in updates:
+                w.set(name, qty)
+            db_connector.execute_query("UPDATE sklad SET mnozstvo=%s WHERE nazov=%s", updates, fetch='none', multi=True)
     return {"message": f"Inventúra dokončená. Aktualizovaných {len(updates)} položiek."}
 
 def get_all_warehouse_items():
@@ -457,7 +378,10 @@ def manual_warehouse_write_off(data):
                 ('MANUAL-ODPIS', name, qty)
             )
 
-        conn.commit()
+        with warehouse_snapshot.writing() as w:
+            if name not in INFINITE_STOCK_NAMES:
+                w.add(name, -qty)
+            conn.commit()
         return {"message": f"Úspešne odpísaných {qty} kg suroviny '{name}'."}
     except Exception as e:
         if conn: conn.rollback()
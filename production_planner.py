@@ -0,0 +1,224 @@
+# production_planner.py
+# Dávkový plánovač výroby pre celý horizont dopytu (všetky výrobky naraz)
+# - dopyt: demand_forecast.demand_by_product(days) – materializovaný dopyt B2B + B2C
+# - výrobky: JEDEN dotaz na produkty (VÝROBOK*), recepty a veľkosti dávok z indexu warehouse_snapshot
+# - matica výrobok × surovina (kg suroviny na 1 kg výrobku) sa zostaví raz, požiadavky
+#   celého plánu sa rozpadnú jedným prechodom cez nenulové prvky
+# - sklad surovín = sklad.mnozstvo (snapshot) + sklad_vyroba.mnozstvo; min. zásoba zo sklad.min_zasoba
+# - zdieľané suroviny sa prideľujú podľa priority: najprv pokrytie dopytu (podľa prvého dňa potreby),
+#   potom doplnenie na minimálnu zásobu; výroba po celých dávkach
+# - výrobok bez receptu sa neplánuje (0 kg, nepokrytý, reason "chýba recept")
+# - výstup: realizovateľný plán + chýbajúce suroviny (pre celý požadovaný plán) v jednom volaní
+
+import math
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import db_connector
+import demand_forecast
+import ean_key
+import warehouse_snapshot
+
+EPS = 1e-9
+
+
+def _f(v) -> float:
+    try:
+        return float(v or 0.0)
+    except Exception:
+        return 0.0
+
+
+def _products(category: Optional[str]) -> List[Dict[str, Any]]:
+    where, params = ["p.typ_polozky LIKE 'VÝROBOK%%'"], []
+    if category:
+        where.append("COALESCE(p.kategoria_pre_recepty, p.predajna_kategoria, 'Nezaradené') = %s")
+        params.append(category)
+    return db_connector.execute_query(f"""
+        SELECT {ean_key.col('produkty', 'p')} AS k, p.ean, p.nazov_vyrobku AS name,
+               COALESCE(p.kategoria_pre_recepty, p.predajna_kategoria, 'Nezaradené') AS cat,
+               COALESCE(p.minimalna_zasoba_kg, 0) AS min_stock,
+               COALESCE(p.aktualny_sklad_finalny_kg, 0) AS stock
+          FROM produkty p
+         WHERE {' AND '.join(where)}
+    """, tuple(params)) or []
+
+
+def _production_store() -> Dict[str, float]:
+    rows = db_connector.execute_query(
+        "SELECT nazov, SUM(COALESCE(mnozstvo, 0)) AS q FROM sklad_vyroba GROUP BY nazov") or []
+    return {r['nazov']: _f(r.get('q')) for r in rows}
+
+
+def _matrix(names: List[str]) -> Tuple[List[List[Tuple[int, float]]], List[str], List[float]]:
+    """
+    Riedka matica: pre každý výrobok [(index suroviny, kg suroviny na 1 kg výrobku)].
+    Vráti (riadky, zoznam surovín, veľkosti dávok výrobkov).
+    """
+    col: Dict[str, int] = {}
+    ingredients: List[str] = []
+    rows: List[List[Tuple[int, float]]] = []
+    batches: List[float] = []
+    for name in names:
+        batch_kg = warehouse_snapshot.batch_size_kg(name)
+        row: Dict[int, float] = {}
+        for ing, per_batch in warehouse_snapshot.recipe(name):
+            j = col.get(ing)
+            if j is None:
+                j = col[ing] = len(ingredients)
+                ingredients.append(ing)
+            row[j] = row.get(j, 0.0) + max(per_batch, 0.0) / batch_kg
+        rows.append(list(row.items()))
+        batches.append(batch_kg)
+    return rows, ingredients, batches
+
+
+def _round_up(qty: float, batch_kg: float) -> float:
+    return math.ceil(qty / batch_kg - EPS) * batch_kg if qty > EPS else 0.0
+
+
+def optimize(days: int = demand_forecast.HORIZON_DEFAULT, category: Optional[str] = None,
+             protect_min_stock: bool = False) -> Dict[str, Any]:
+    """
+    Plán výroby pre všetky výrobky na `days` dní dopredu.
+    protect_min_stock=True – plán nesmie siahnuť pod min. zásobu suroviny.
+    """
+    days = max(1, min(int(days or demand_forecast.HORIZON_DEFAULT), demand_forecast.HORIZON_MAX))
+    category = (category or '').strip() or None
+    start = date.today()
+
+    # 1) dopyt po produktoch (ean_key, náhradne názov)
+    by_ean: Dict[str, Tuple[float, Any]] = {}
+    by_name: Dict[str, Tuple[float, Any]] = {}
+    for r in demand_forecast.demand_by_product(days):
+        q, first = _f(r.get('qty_kg')), r.get('first_day')
+        target = by_ean if r.get('ean') else by_name
+        k = str(r.get('ean')) if r.get('ean') else warehouse_snapshot.key(r.get('product'))
+        old_q, old_first = target.get(k, (0.0, None))
+        firsts = [x for x in (old_first, first) if x is not None]
+        target[k] = (old_q + q, min(firsts) if firsts else None)
+
+    # 2) požadovaná výroba po výrobkoch (cieľ = max(min. zásoba, dopyt), ako calculate_production_plan)
+    products = _products(category)
+    names = [p['name'] for p in products]
+    rows, ingredients, batches = _matrix(names)
+    plan: List[Dict[str, Any]] = []
+    for i, p in enumerate(products):
+        dem, first = by_ean.get(str(p.get('k') or ''), (0.0, None))
+        if dem <= 0:
+            dem, first = by_name.get(warehouse_snapshot.key(p['name']), (0.0, None))
+        stock, min_stock, batch_kg = _f(p.get('stock')), _f(p.get('min_stock')), batches[i]
+        requested = _round_up(max(max(min_stock, dem) - stock, 0.0), batch_kg)
+        plan.append({
+            "ean": p.get('ean'), "name": p['name'], "category": p.get('cat') or 'Nezaradené',
+            "demand_kg": round(dem, 3), "first_need": first,
+            "stock_kg": round(stock, 3), "min_stock_kg": round(min_stock, 3), "batch_kg": batch_kg,
+            "demand_gap_kg": _round_up(max(dem - stock, 0.0), batch_kg),
+            "requested_kg": requested, "planned_kg": 0.0,
+            "has_recipe": bool(rows[i]), "limited_by": [], "reason": None,
+        })
+
+    # 3) sklad surovín
+    store = _production_store()
+    avail: List[float] = []
+    infinite: List[bool] = []
+    min_levels: List[float] = []
+    for name in ingredients:
+        meta = warehouse_snapshot.item(name) or {}
+        avail.append(_f(meta.get('quantity')) + store.get(name, 0.0))
+        infinite.append(bool(meta.get('is_infinite_stock')) or name in warehouse_snapshot.INFINITE_STOCK_NAMES)
+        min_levels.append(_f(meta.get('minStock')))
+    remaining = [a - (m if protect_min_stock else 0.0) for a, m in zip(avail, min_levels)]
+
+    # 4) hrubá potreba celého požadovaného plánu – jeden prechod cez maticu
+    gross = [0.0] * len(ingredients)
+    for i, it in enumerate(plan):
+        q = it['requested_kg']
+        if q > 0:
+            for j, coef in rows[i]:
+                gross[j] += q * coef
+
+    # 5) prideľovanie zdieľaných surovín: dopyt (podľa prvého dňa) -> doplnenie na min. zásobu
+    far = start + timedelta(days=days)
+    order = sorted(range(len(plan)), key=lambda i: (
+        plan[i]['first_need'] or far, -plan[i]['demand_gap_kg'], plan[i]['name'] or ''))
+    for goal in ('demand_gap_kg', 'requested_kg'):
+        for i in order:
+            it = plan[i]
+            if not it['has_recipe']:
+                continue   # bez receptu nevieme suroviny – nič neplánuj
+            want = min(it[goal], it['requested_kg']) - it['planned_kg']
+            if want <= EPS:
+                continue
+            can, limits = want, []
+            for j, coef in rows[i]:
+                if infinite[j] or coef <= 0:
+                    continue
+                cap = max(remaining[j], 0.0) / coef
+                if cap < want - EPS:
+                    limits.append(ingredients[j])
+                can = min(can, cap)
+            bk = it['batch_kg']
+            got = math.floor(can / bk + EPS) * bk if can < want - EPS else want
+            if limits:
+                it['limited_by'] = sorted(set(it['limited_by']) | set(limits))
+            if got <= EPS:
+                continue
+            it['planned_kg'] += got
+            for j, coef in rows[i]:
+                if not infinite[j]:
+                    remaining[j] -= got * coef
+
+    # 6) výstup
+    used = [0.0] * len(ingredients)
+    for i, it in enumerate(plan):
+        for j, coef in rows[i]:
+            used[j] += it['planned_kg'] * coef
+        it['planned_kg'] = round(it['planned_kg'], 3)
+        it['batches'] = int(round(it['planned_kg'] / it['batch_kg'])) if it['batch_kg'] > 0 else 0
+        it['fully_covered'] = it['has_recipe'] and it['planned_kg'] >= it['requested_kg'] - 1e-6
+        if not it['has_recipe'] and it['requested_kg'] > 0:
+            it['reason'] = "chýba recept"
+        elif it['limited_by']:
+            it['reason'] = "nedostatok surovín"
+        it['first_need'] = it['first_need'].isoformat() if hasattr(it['first_need'], 'isoformat') else it['first_need']
+
+    shortfalls = []
+    for j, name in enumerate(ingredients):
+        if infinite[j]:
+            continue
+        short = max(gross[j] - avail[j], 0.0)
+        purchase = max(gross[j] + min_levels[j] - avail[j], 0.0)
+        if short <= 1e-6 and purchase <= 1e-6:
+            continue
+        shortfalls.append({
+            "name": name,
+            "type": (warehouse_snapshot.item(name) or {}).get('type', 'Neznámy'),
+            "required_kg": round(gross[j], 3),
+            "available_kg": round(avail[j], 3),
+            "min_stock_kg": round(min_levels[j], 3),
+            "planned_use_kg": round(used[j], 3),
+            "shortfall_kg": round(short, 3),
+            "purchase_kg": round(purchase, 3),
+        })
+    shortfalls.sort(key=lambda x: (-x['shortfall_kg'], -x['purchase_kg'], x['name'] or ''))
+
+    active = [it for it in plan if it['requested_kg'] > 0]
+    active.sort(key=lambda it: (it['category'], -it['requested_kg'], it['name'] or ''))
+    return {
+        "horizon": {"days": days, "from": start.isoformat(), "to": (far - timedelta(days=1)).isoformat()},
+        "plan": active,
+        "shortfalls": shortfalls,
+        "summary": {
+            "products": len(plan),
+            "products_to_make": len(active),
+            "fully_covered": sum(1 for it in active if it['fully_covered']),
+            "without_recipe": sum(1 for it in active if not it['has_recipe']),
+            "requested_kg": round(sum(it['requested_kg'] for it in active), 3),
+            "planned_kg": round(sum(it['planned_kg'] for it in active), 3),
+            "ingredients": len(ingredients),
+            "short_ingredients": sum(1 for s in shortfalls if s['shortfall_kg'] > 0),
+            "feasible": all(it['fully_covered'] for it in active),
+            "protect_min_stock": bool(protect_min_stock),
+        },
+    }
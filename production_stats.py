@@ -0,0 +1,250 @@
+# production_stats.py
+# Štatistiky výroby a škôd pre Kanceláriu – agregácia a filtre v SQL
+# - dávka -> produkt cez indexovaný kľúč (product_keys.zv_join), nie cez normalizované názvy v Pythone
+# - obdobie aj kategória (produkty.kategoria_pre_recepty) sú vo WHERE, výber len potrebných stĺpcov
+# - výťažnosť a jednotková cena (fallback celkova_cena_surovin / realne_mnozstvo_kg) sa rátajú v SQL
+# - stránkovanie riadkov (page / page_size) – "celá história" už netiahne celú tabuľku dávok do workera;
+#   škody majú vlastné stránkovanie (damage_page / damage_page_size) aj celkový počet
+# - summary=True: len súčty po kategóriách / produktoch / dňoch (+ súčty škôd), bez riadkov
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import db_connector
+import product_keys
+
+ENERGY_COEFF = 1.15
+PAGE_SIZE = int(os.getenv("PRODUCTION_STATS_PAGE_SIZE", "500"))
+MAX_PAGE_SIZE = 5000
+DONE_STATES = ('Ukončené', 'Dokončené')
+ALL_CATEGORIES = {"všetky", "vsetky", "all"}
+
+_schema_ready = False
+_lock = threading.Lock()
+
+
+def ensure_schema() -> None:
+    """Index (stav, datum_ukoncenia) pre filter obdobia ukončených dávok. Raz za proces."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _lock:
+        if _schema_ready:
+            return
+        try:
+            row = db_connector.execute_query("""
+                SELECT 1 FROM INFORMATION_SCHEMA.STATISTICS
+                 WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'zaznamy_vyroba'
+                   AND INDEX_NAME = 'idx_zv_stav_ukoncenia' LIMIT 1
+            """, fetch='one')
+            if not row:
+                db_connector.execute_query(
+                    "CREATE INDEX idx_zv_stav_ukoncenia ON zaznamy_vyroba (stav, datum_ukoncenia)", fetch='none'
+                )
+        except Exception as e:
+            print(f"!!! UPOZORNENIE: production_stats – index zaznamy_vyroba zlyhal: {e}")
+        _schema_ready = True
+
+
+def period_start(period, now: Optional[datetime] = None) -> Optional[datetime]:
+    """'week' = od pondelka, 'month' = od 1. dňa mesiaca, inak celá história (None)."""
+    now = now or datetime.now()
+    p = (str(period) if period is not None else "").lower()
+    if p.startswith("week"):
+        return (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    if p.startswith("month"):
+        return now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    return None
+
+
+def _category(category) -> Optional[str]:
+    c = (str(category) if category is not None else "").strip()
+    return None if not c or c.casefold() in ALL_CATEGORIES else c
+
+
+_CAT = "COALESCE(NULLIF(p.kategoria_pre_recepty, ''), 'Nezaradené')"
+_UNIT_COST = ("(CASE WHEN COALESCE(zv.cena_za_jednotku, 0) <> 0 THEN zv.cena_za_jednotku "
+              "WHEN COALESCE(zv.realne_mnozstvo_kg, 0) > 0 AND COALESCE(zv.celkova_cena_surovin, 0) <> 0 "
+              "THEN zv.celkova_cena_surovin / zv.realne_mnozstvo_kg ELSE 0 END)")
+
+
+def _prod_where(start: Optional[datetime], cat: Optional[str]) -> Tuple[str, list]:
+    where = [f"zv.stav IN ({','.join(['%s'] * len(DONE_STATES))})"]
+    params: list = list(DONE_STATES)
+    if start is not None:
+        where.append("zv.datum_ukoncenia >= %s")
+        params.append(start)
+    if cat:
+        where.append(f"{_CAT} = %s")
+        params.append(cat)
+    return " AND ".join(where), params
+
+
+_DMG_CAT = "COALESCE(NULLIF(COALESCE(pb.kategoria_pre_recepty, pn.kategoria_pre_recepty), ''), 'Nezaradené')"
+
+
+def _dmg_where(start: Optional[datetime], cat: Optional[str]) -> Tuple[str, list]:
+    where, params = [], []
+    if start is not None:
+        where.append("s.datum >= %s")
+        params.append(start)
+    if cat:
+        where.append(f"{_DMG_CAT} = %s")
+        params.append(cat)
+    return (" AND ".join(where) or "1=1"), params
+
+
+def _dmg_from() -> str:
+    # škoda -> dávka (id_davky) -> produkt (kľúč); ručné škody (MANUAL-SKODA, bez dávky) -> produkt podľa názvu
+    return f"""
+        FROM skody s
+        LEFT JOIN zaznamy_vyroba zv ON zv.id_davky = s.id_davky
+        LEFT JOIN produkty pb ON {product_keys.zv_join('zv', 'pb')}
+        LEFT JOIN produkty pn ON zv.id_davky IS NULL AND pn.nazov_vyrobku = s.nazov_vyrobku
+    """
+
+
+def _f(v) -> float:
+    return float(v or 0.0)
+
+
+def _paging(page: int, size: int, total: int) -> Dict[str, int]:
+    return {"page": page, "page_size": size, "total": total, "pages": (total + size - 1) // size if size else 0}
+
+
+def _page_args(page, page_size) -> Tuple[int, int]:
+    try:
+        page = max(1, int(page or 1))
+    except Exception:
+        page = 1
+    try:
+        size = int(page_size or PAGE_SIZE)
+    except Exception:
+        size = PAGE_SIZE
+    return page, max(1, min(size, MAX_PAGE_SIZE))
+
+
+def _rows(start, cat, page: int, size: int) -> Dict[str, Any]:
+    name = product_keys.zv_name_col()
+    where, params = _prod_where(start, cat)
+    frm = f"FROM zaznamy_vyroba zv LEFT JOIN produkty p ON {product_keys.zv_join('zv', 'p')}"
+    total = int((db_connector.execute_query(
+        f"SELECT COUNT(*) AS c {frm} WHERE {where}", tuple(params), fetch='one') or {}).get('c') or 0)
+    rows = db_connector.execute_query(f"""
+        SELECT zv.id_davky, zv.{name} AS nazov_vyrobku, zv.datum_ukoncenia,
+               zv.planovane_mnozstvo_kg, zv.realne_mnozstvo_kg, zv.realne_mnozstvo_ks,
+               zv.celkova_cena_surovin, zv.cena_za_jednotku,
+               {_CAT} AS kategoria_pre_recepty, COALESCE(p.mj, 'kg') AS unit,
+               CASE WHEN COALESCE(zv.planovane_mnozstvo_kg, 0) > 0
+                    THEN COALESCE(zv.realne_mnozstvo_kg, 0) / zv.planovane_mnozstvo_kg * 100 - 100
+                    ELSE 0 END AS vytaznost,
+               {_UNIT_COST} AS cena_bez_energii
+          {frm}
+         WHERE {where}
+         ORDER BY zv.datum_ukoncenia DESC, zv.id_davky DESC
+         LIMIT %s OFFSET %s
+    """, tuple(params) + (size, (page - 1) * size)) or []
+    for r in rows:
+        for k in ("vytaznost", "cena_bez_energii"):
+            r[k] = _f(r.get(k))
+        r["cena_s_energiami"] = r["cena_bez_energii"] * ENERGY_COEFF
+    return {"data": rows, "paging": _paging(page, size, total)}
+
+
+def _damage_rows(start, cat, page: int, size: int) -> Dict[str, Any]:
+    name = product_keys.zv_name_col()
+    where, params = _dmg_where(start, cat)
+    total = int((db_connector.execute_query(
+        f"SELECT COUNT(*) AS c {_dmg_from()} WHERE {where}", tuple(params), fetch='one') or {}).get('c') or 0)
+    rows = db_connector.execute_query(f"""
+        SELECT s.id, s.datum, s.id_davky, COALESCE(zv.{name}, s.nazov_vyrobku) AS nazov_vyrobku,
+               s.mnozstvo, s.pracovnik, s.dovod,
+               {_DMG_CAT} AS kategoria_pre_recepty,
+               COALESCE(zv.celkova_cena_surovin, 0) AS naklady_skody
+          {_dmg_from()}
+         WHERE {where}
+         ORDER BY s.datum DESC, s.id DESC
+         LIMIT %s OFFSET %s
+    """, tuple(params) + (size, (page - 1) * size)) or []
+    for r in rows:
+        r["naklady_skody"] = _f(r.get("naklady_skody"))
+    return {"damage_data": rows, "damage_paging": _paging(page, size, total)}
+
+
+def _summary(start, cat) -> Dict[str, Any]:
+    name = product_keys.zv_name_col()
+    where, params = _prod_where(start, cat)
+    frm = f"FROM zaznamy_vyroba zv LEFT JOIN produkty p ON {product_keys.zv_join('zv', 'p')}"
+    agg = """
+        COUNT(*) AS batches,
+        SUM(COALESCE(zv.planovane_mnozstvo_kg, 0)) AS planned_kg,
+        SUM(COALESCE(zv.realne_mnozstvo_kg, 0)) AS real_kg,
+        SUM(COALESCE(zv.realne_mnozstvo_ks, 0)) AS real_ks,
+        SUM(COALESCE(zv.celkova_cena_surovin, 0)) AS cost_total
+    """
+
+    def q(group_sel: str, group_by: str, order: str):
+        out = db_connector.execute_query(
+            f"SELECT {group_sel}, {agg} {frm} WHERE {where} GROUP BY {group_by} ORDER BY {order}",
+            tuple(params)) or []
+        for r in out:
+            for k in ("planned_kg", "real_kg", "real_ks", "cost_total"):
+                r[k] = _f(r.get(k))
+            r["batches"] = int(r.get("batches") or 0)
+            r["yield_pct"] = (r["real_kg"] / r["planned_kg"] * 100.0 - 100.0) if r["planned_kg"] > 0 else 0.0
+        return out
+
+    by_category = q(f"{_CAT} AS category", "category", "category")
+    by_product = q(f"{_CAT} AS category, p.ean AS ean, COALESCE(p.nazov_vyrobku, zv.{name}) AS product, "
+                   f"COALESCE(p.mj, 'kg') AS unit",
+                   "category, ean, product, unit", "category, product")
+    by_day = q("DATE(zv.datum_ukoncenia) AS day", "day", "day")
+
+    dwhere, dparams = _dmg_where(start, cat)
+    dmg = db_connector.execute_query(f"""
+        SELECT {_DMG_CAT} AS category, COUNT(*) AS records, SUM(COALESCE(zv.celkova_cena_surovin, 0)) AS cost_total
+          {_dmg_from()}
+         WHERE {dwhere}
+         GROUP BY category ORDER BY category
+    """, tuple(dparams)) or []
+    for r in dmg:
+        r["records"] = int(r.get("records") or 0)
+        r["cost_total"] = _f(r.get("cost_total"))
+
+    tot_p = sum(r["planned_kg"] for r in by_category)
+    tot_r = sum(r["real_kg"] for r in by_category)
+    return {
+        "totals": {
+            "batches": sum(r["batches"] for r in by_category),
+            "planned_kg": tot_p, "real_kg": tot_r,
+            "real_ks": sum(r["real_ks"] for r in by_category),
+            "cost_total": sum(r["cost_total"] for r in by_category),
+            "yield_pct": (tot_r / tot_p * 100.0 - 100.0) if tot_p > 0 else 0.0,
+            "damage_records": sum(r["records"] for r in dmg),
+            "damage_cost": sum(r["cost_total"] for r in dmg),
+        },
+        "by_category": by_category,
+        "by_product": by_product,
+        "by_day": by_day,
+        "damage_by_category": dmg,
+    }
+
+
+def get_stats(period, category, page=None, page_size=None, summary=False,
+              damage_page=None, damage_page_size=None) -> Dict[str, Any]:
+    """
+    Štatistiky výroby a škôd za obdobie (week | month | inak celá história) a kategóriu receptu.
+    Riadky: {"data", "paging", "damage_data", "damage_paging"} – výroba aj škody sa stránkujú
+    nezávisle; summary=True: {"summary", "period_start"}.
+    """
+    ensure_schema()
+    start = period_start(period)
+    cat = _category(category)
+    if summary:
+        return {"summary": _summary(start, cat), "period_start": start}
+
+    out = _rows(start, cat, *_page_args(page, page_size))
+    out.update(_damage_rows(start, cat, *_page_args(damage_page, damage_page_size)))
+    return out
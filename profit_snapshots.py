@@ -0,0 +1,197 @@
+# profit_snapshots.py
+# Mesačné snapshoty ziskovosti (profit_monthly_snapshots) – jeden riadok na uzavretý mesiac
+# - hodnoty = výstup get_profitability_data(...)['calculations'] + prísny výnos výroby
+# - uzavretý mesiac (< aktuálny) sa počíta raz a ďalej sa číta zo snapshotu;
+#   aktuálny (a budúci) mesiac sa vždy počíta naživo a neukladá sa
+#
+# Zneplatnenie: mark_stale(y, m, cur) pri zmene vstupov mesiaca (oddelenia, výroba, príjmy expedície),
+# mark_batches_stale([id_davky], cur) pri zmene príjmu / ceny dávky (všetky mesiace jej príjmov).
+# stale_seq chráni pred pretekom: prepočet zapíše výsledok len ak sa medzitým mesiac znovu nezneplatnil.
+# reopen(y, m) = explicitné znovuotvorenie uzavretého mesiaca (prepočet hneď).
+
+from datetime import date
+from typing import Any, Dict, Iterable, List, Tuple
+
+import db_connector
+
+_schema_ready = False
+
+VALUE_COLS = ('expedition_profit', 'butchering_profit', 'butchering_revaluation',
+              'production_profit', 'total_profit', 'strict_revenue')
+
+
+def ensure_schema() -> None:
+    global _schema_ready
+    if _schema_ready:
+        return
+    db_connector.execute_query("""
+        CREATE TABLE IF NOT EXISTS profit_monthly_snapshots (
+          report_year            SMALLINT      NOT NULL,
+          report_month           TINYINT       NOT NULL,
+          expedition_profit      DECIMAL(14,2) NOT NULL DEFAULT 0,
+          butchering_profit      DECIMAL(14,2) NOT NULL DEFAULT 0,
+          butchering_revaluation DECIMAL(14,2) NOT NULL DEFAULT 0,
+          production_profit      DECIMAL(14,2) NOT NULL DEFAULT 0,
+          total_profit           DECIMAL(14,2) NOT NULL DEFAULT 0,
+          strict_revenue         DECIMAL(14,2) NOT NULL DEFAULT 0,
+          prod_source            VARCHAR(16)   NULL,
+          is_stale               TINYINT(1)    NOT NULL DEFAULT 0,
+          stale_seq              INT           NOT NULL DEFAULT 0,
+          computed_at            DATETIME      NULL,
+          PRIMARY KEY (report_year, report_month)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """, fetch='none')
+    _schema_ready = True
+
+
+def _is_closed(year: int, month: int) -> bool:
+    t = date.today()
+    return (int(year), int(month)) < (t.year, t.month)
+
+
+def _row_from_data(year: int, month: int, data: dict) -> Dict[str, Any]:
+    c = data.get('calculations') or {}
+    dept = data.get('department_data') or {}
+    return {
+        "year": year, "month": month, "label": f"{year}-{month:02d}",
+        "expedition_profit": round(float(c.get('expedition_profit') or 0), 2),
+        "butchering_profit": round(float(c.get('butchering_profit') or 0), 2),
+        "butchering_revaluation": round(float(c.get('butchering_revaluation') or 0), 2),
+        "production_profit": round(float(c.get('production_profit') or 0), 2),
+        "total_profit": round(float(c.get('total_profit') or 0), 2),
+        "strict_revenue": round(float(dept.get('exp_from_prod_strict') or 0), 2),
+        "prod_source": dept.get('exp_from_prod_source'),
+    }
+
+
+def _compute(year: int, month: int) -> Dict[str, Any]:
+    import profitability_handler  # lazy – profitability_handler importuje tento modul
+    return _row_from_data(year, month, profitability_handler.get_profitability_data(year, month))
+
+
+def _store(row: Dict[str, Any], seen_seq) -> None:
+    """
+    Zapíše prepočítaný snapshot. seen_seq = stale_seq prečítaný pred prepočtom (None = riadok nebol).
+    Ak sa mesiac medzitým zneplatnil, zápis sa neuplatní a ostane stale.
+    """
+    vals = tuple(row[c] for c in VALUE_COLS) + (row.get('prod_source'),)
+    if seen_seq is None:
+        db_connector.execute_query(f"""
+            INSERT IGNORE INTO profit_monthly_snapshots
+              (report_year, report_month, {', '.join(VALUE_COLS)}, prod_source, is_stale, stale_seq, computed_at)
+            VALUES (%s, %s, {', '.join(['%s'] * len(VALUE_COLS))}, %s, 0, 0, NOW())
+        """, (row['year'], row['month']) + vals, fetch='none')
+        return
+    db_connector.execute_query(f"""
+        UPDATE profit_monthly_snapshots
+           SET {', '.join(f'{c}=%s' for c in VALUE_COLS)}, prod_source=%s, is_stale=0, computed_at=NOW()
+         WHERE report_year=%s AND report_month=%s AND stale_seq=%s
+    """, vals + (row['year'], row['month'], int(seen_seq)), fetch='none')
+
+
+def _iter_months(fy: int, fm: int, ty: int, tm: int):
+    y, m = fy, fm
+    while (y, m) <= (ty, tm):
+        yield y, m
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+
+
+def get_range(fy: int, fm: int, ty: int, tm: int) -> List[Dict[str, Any]]:
+    """
+    Mesačné súhrny za rozsah (vrátane). Uzavreté mesiace jedným SELECTom zo snapshotov;
+    chýbajúce / zneplatnené sa prepočítajú a uložia, aktuálny a budúci mesiac sa počíta naživo.
+    Každý riadok nesie `source`: 'snapshot' | 'computed' | 'live'.
+    """
+    ensure_schema()
+    fy, fm, ty, tm = int(fy), int(fm), int(ty), int(tm)
+    snaps = {}
+    for r in db_connector.execute_query(f"""
+            SELECT report_year, report_month, {', '.join(VALUE_COLS)}, prod_source, is_stale, stale_seq
+              FROM profit_monthly_snapshots
+             WHERE report_year BETWEEN %s AND %s
+        """, (fy, ty)) or []:
+        snaps[(int(r['report_year']), int(r['report_month']))] = r
+
+    out = []
+    for y, m in _iter_months(fy, fm, ty, tm):
+        if not _is_closed(y, m):
+            row = _compute(y, m)
+            row['source'] = 'live'
+        else:
+            s = snaps.get((y, m))
+            if s and not int(s.get('is_stale') or 0):
+                row = {"year": y, "month": m, "label": f"{y}-{m:02d}",
+                       **{c: float(s.get(c) or 0) for c in VALUE_COLS},
+                       "prod_source": s.get('prod_source'), "source": 'snapshot'}
+            else:
+                row = _compute(y, m)
+                _store(row, s.get('stale_seq') if s else None)
+                row['source'] = 'computed'
+        out.append(row)
+    return out
+
+
+def mark_stale(year: int, month: int, cur=None) -> None:
+    """
+    Zneplatní snapshot uzavretého mesiaca (aktuálny mesiac sa počíta naživo – nič na zneplatnenie).
+    Riadok sa založí aj vtedy, keď ešte neexistuje – prebiehajúci prepočet ho potom neprepíše.
+    `cur` = kurzor transakcie zápisu vstupu (zneplatnenie je atomické so zmenou).
+    """
+    if not year or not month or not _is_closed(year, month):
+        return
+    ensure_schema()
+    sql = """INSERT INTO profit_monthly_snapshots (report_year, report_month, is_stale, stale_seq)
+             VALUES (%s, %s, 1, 1)
+             ON DUPLICATE KEY UPDATE is_stale = 1, stale_seq = stale_seq + 1"""
+    params = (int(year), int(month))
+    if cur is not None:
+        cur.execute(sql, params)
+    else:
+        db_connector.execute_query(sql, params, fetch='none')
+
+
+def _months_of_dates(dates: Iterable[Any]) -> List[Tuple[int, int]]:
+    out = []
+    for d in dates:
+        if d is None:
+            continue
+        if hasattr(d, 'year'):
+            ym = (d.year, d.month)
+        else:
+            try:
+                y, m = str(d)[:7].split('-')
+                ym = (int(y), int(m))
+            except ValueError:
+                continue
+        if ym not in out:
+            out.append(ym)
+    return out
+
+
+def mark_batches_stale(batch_ids: Iterable[str], cur) -> None:
+    """
+    Zneplatní mesiace všetkých príjmov zadaných dávok (aj zmazaných – zmazanie mení výnos mesiaca),
+    keďže prepočet ceny dávky mení prísny výnos výroby v každom mesiaci, kde bola prijatá.
+    Volať v transakcii zápisu príjmu, po prepočte ceny dávky.
+    """
+    ids = [b for b in dict.fromkeys(str(b or '').strip() for b in batch_ids or []) if b]
+    if not ids:
+        return
+    ph = ','.join(['%s'] * len(ids))
+    cur.execute(f"SELECT DISTINCT datum_prijmu AS d FROM expedicia_prijmy WHERE id_davky IN ({ph})", tuple(ids))
+    rows = cur.fetchall() or []
+    dates = [r['d'] if isinstance(r, dict) else r[0] for r in rows]
+    for y, m in _months_of_dates(dates):
+        mark_stale(y, m, cur=cur)
+
+
+def reopen(year: int, month: int) -> Dict[str, Any]:
+    """Explicitné znovuotvorenie mesiaca: zneplatní snapshot a hneď ho prepočíta."""
+    year, month = int(year), int(month)
+    if not (1 <= month <= 12):
+        return {"error": "Neplatný mesiac."}
+    if not _is_closed(year, month):
+        return {"message": f"Mesiac {year}-{month:02d} nie je uzavretý – počíta sa naživo."}
+    mark_stale(year, month)
+    row = get_range(year, month, year, month)[0]
+    return {"message": f"Snapshot ziskovosti {year}-{month:02d} bol prepočítaný.", "row": row}
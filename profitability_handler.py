@@ -3,146 +3,18 @@
 # =================================================================
 
 import db_connector
+import schema_cache
+import product_keys
+import date_ranges
 from datetime import datetime
 from flask import render_template, make_response
 import fleet_handler
+import profit_snapshots
 COLL = 'utf8mb4_0900_ai_ci'
 # -----------------------------
 # ---- Pomocné: bezpečné zistenie existencie stĺpca v tabuľke
 def _has_col(table: str, col: str) -> bool:
-    try:
-        r = db_connector.execute_query(
-            """
-            SELECT 1
-            FROM INFORMATION_SCHEMA.COLUMNS
-            WHERE TABLE_SCHEMA = DATABASE()
-              AND TABLE_NAME   = %s
-              AND COLUMN_NAME  = %s
-            LIMIT 1
-            """,
-            (table, col), fetch='one'
-        )
-        return bool(r)
-    except Exception:
-        return False
-
-def _product_manuf_avg_col() -> str | None:
-    # vyber najbližší existujúci stĺpec s priemernou výrobnou €/kg
-    for c in ('vyrobna_cena_eur_kg', 'vyrobna_cena', 'vyrobna_cena_avg_kg', 'vyrobna_cena_avg'):
-        try:
-            if _has_col('produkty', c):
-                return c
-        except Exception:
-            pass
-    return None
-
-def compute_strict_production_revenue(year: int, month: int) -> dict:
-    """
-    Striktný výnos Výroby = len to, čo EXPEDÍCIA reálne prijala v danom mesiaci,
-    ocenené výrobnou cenou €/kg.
-
-    množstvo: expedicia_prijmy (kg priamo, alebo ks -> kg podľa vaha_balenia_g)
-    cena:     primárne zaznamy_vyroba.cena_za_jednotku
-              (ak MJ výrobku 'ks', prepočet na €/kg podľa vaha_balenia_g)
-              fallback: priemerná výrobná cena z `produkty` (ak existuje)
-    Výstup: {"total": float, "items": [...], "by_product": {...}}
-    """
-    y, m = int(year), int(month)
-
-    # ak tabuľka expedicia_prijmy neexistuje, vráť nuly
-    try:
-        t_exists = db_connector.execute_query(
-            "SELECT 1 FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'expedicia_prijmy' LIMIT 1",
-            fetch='one'
-        )
-        if not t_exists:
-            return {"total": 0.0, "items": [], "by_product": {}}
-    except Exception:
-        return {"total": 0.0, "items": [], "by_product": {}}
-
-    manuf_col = _product_manuf_avg_col()
-    manuf_sel = f", p.{manuf_col} AS manuf_avg" if manuf_col else ", NULL AS manuf_avg"
-
-    query = f"""
-        SELECT
-            ep.id, ep.id_davky, ep.nazov_vyrobku, ep.unit,
-            ep.prijem_kg, ep.prijem_ks, ep.datum_prijmu,
-            zv.cena_za_jednotku,
-            p.ean, p.mj, p.vaha_balenia_g, p.nazov_vyrobku AS product_name
-            {manuf_sel}
-        FROM expedicia_prijmy ep
-        LEFT JOIN zaznamy_vyroba zv ON zv.id_davky = ep.id_davky
-        LEFT JOIN produkty p
-          ON ep.nazov_vyrobku COLLATE {COLL} = p.nazov_vyrobku COLLATE {COLL}
-        WHERE ep.is_deleted = 0
-          AND YEAR(ep.datum_prijmu) = %s
-          AND MONTH(ep.datum_prijmu) = %s
-        ORDER BY ep.datum_prijmu ASC, ep.id ASC
-    """
-    rows = db_connector.execute_query(query, (y, m)) or []
-
-    def _num(v, default=0.0):
-        try:
-            return float(v) if v not in (None, "") else default
-        except Exception:
-            return default
-
-    total = 0.0
-    items = []
-    by_product = {}
-
-    for r in rows:
-        unit = (r.get('unit') or 'kg').lower()
-        mj   = (r.get('mj') or 'kg').lower()
-        wg   = _num(r.get('vaha_balenia_g'))
-
-        # 1) množstvo v KG
-        if unit == 'kg':
-            qty_kg = _num(r.get('prijem_kg'))
-        else:
-            pcs    = _num(r.get('prijem_ks'))
-            qty_kg = (pcs * wg) / 1000.0 if wg > 0 else 0.0
-
-        # 2) výrobná cena €/kg
-        perkg = 0.0
-        cju   = r.get('cena_za_jednotku')
-        if cju is not None:
-            try:
-                cju = float(cju)
-                perkg = cju if mj == 'kg' else (cju / (wg/1000.0) if wg > 0 else 0.0)
-            except Exception:
-                perkg = 0.0
-        if perkg <= 0.0:
-            perkg = _num(r.get('manuf_avg'))
-
-        value = qty_kg * perkg
-        total += value
-
-        # položka pre históriu
-        d = r.get('datum_prijmu')
-        dstr = d.strftime('%Y-%m-%d') if hasattr(d, 'strftime') else str(d)
-        prod = r.get('product_name') or r.get('nazov_vyrobku') or ''
-        item = {
-            "date": dstr,
-            "batchId": r.get('id_davky'),
-            "ean": r.get('ean'),
-            "product": prod,
-            "qty_kg": round(qty_kg, 3),
-            "unit_cost_per_kg": round(perkg, 4),
-            "value_eur": round(value, 2),
-        }
-        items.append(item)
-
-        agg = by_product.setdefault(prod or "NEZNÁMY", {"qty_kg": 0.0, "value_eur": 0.0})
-        agg["qty_kg"] += qty_kg
-        agg["value_eur"] += value
-
-    by_product = {k: {"qty_kg": round(v["qty_kg"], 3), "value_eur": round(v["value_eur"], 2)} for k, v in by_product.items()}
-    return {"total": round(total, 2), "items": items, "by_product": by_product}
-
-def _zv_name_col() -> str:
-    # názov stĺpca s menom výrobku v zaznamy_vyroba
-    return 'nazov_vyrobu' if _has_col('zaznamy_vyroba', 'nazov_vyrobu') else 'nazov_vyrobku'
+    return schema_cache.has_col(table, col)
 
 def _product_manuf_avg_col() -> str | None:
     for c in ('vyrobna_cena_eur_kg', 'vyrobna_cena', 'vyrobna_cena_avg_kg', 'vyrobna_cena_avg'):
@@ -156,26 +28,20 @@ def compute_strict_production_revenue(year: int, month: int) -> dict:
     ohodnotený výrobnou cenou:
       - primárne podľa zaznamy_vyroba.cena_za_jednotku (€/kg alebo €/ks -> konverzia na €/kg),
       - ak chýba, fallback na priemernú výrobnú cenu produktu v `produkty` (€/kg).
-    Počíta iba záznamy za daný rok/mesiac podľa expedicia_prijmy.datum_prijmu.
+    Počíta iba záznamy za daný rok/mesiac podľa expedicia_prijmy.datum_prijmu
+    (rozsah [1. deň mesiaca, 1. deň nasledujúceho) – index (is_deleted, datum_prijmu)).
     Výstup:
       {"total": float, "items": [...], "by_product": {...}}
     """
     y, m = int(year), int(month)
 
     # ak tabuľka príjmov expedície nie je, vráť nuly
-    try:
-        t_exists = db_connector.execute_query(
-            "SELECT 1 FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'expedicia_prijmy' LIMIT 1",
-            fetch='one'
-        )
-        if not t_exists:
-            return {"total": 0.0, "items": [], "by_product": {}}
-    except Exception:
+    if not schema_cache.table_exists('expedicia_prijmy'):
         return {"total": 0.0, "items": [], "by_product": {}}
 
-    zv_name = _zv_name_col()
     manuf_col = _product_manuf_avg_col()
     manuf_sel = f", p.{manuf_col} AS manuf_avg" if manuf_col else ", NULL AS manuf_avg"
+    month_sql, month_params = date_ranges.month('ep.datum_prijmu', y, m)
 
     query = f"""
         SELECT
@@ -185,12 +51,12 @@ def compute_strict_production_revenue(year: int, month: int) -> dict:
             {manuf_sel}
         FROM expedicia_prijmy ep
         LEFT JOIN zaznamy_vyroba zv ON zv.id_davky = ep.id_davky
-        LEFT JOIN produkty p ON TRIM(zv.{zv_name}) = TRIM(p.nazov_vyrobku)
+        LEFT JOIN produkty p ON {product_keys.zv_join('zv', 'p')}
         WHERE ep.is_deleted = 0
-          AND YEAR(ep.datum_prijmu) = %s AND MONTH(ep.datum_prijmu) = %s
+          AND {month_sql}
         ORDER BY ep.datum_prijmu ASC, ep.id ASC
     """
-    rows = db_connector.execute_query(query, (y, m)) or []
+    rows = db_connector.execute_query(query, tuple(month_params)) or []
 
     total = 0.0
     items = []
@@ -430,10 +296,12 @@ def get_calculations_view(year, month):
     all_vehicles = db_connector.execute_query(vehicles_q)
     all_customers = db_connector.execute_query(customers_q)
 
-    # doplň metriky z fleet analýzy (rok/mesiac môžu prísť ako str)
-    for v in all_vehicles:
-        analysis = fleet_handler.get_fleet_analysis(v['id'], year, month)
-        v['cost_per_km'] = float(analysis.get('cost_per_km', 0) or 0)
+    # doplň metriky z fleet analýzy – všetky vozidlá jedným výpočtom matice za mesiac
+    ym = f"{int(year):04d}-{int(month):02d}"
+    fleet = fleet_handler.get_fleet_matrix([v['id'] for v in all_vehicles or []], ym, ym) if all_vehicles else {}
+    per_km = {int(fv['id']): fv['months'][ym]['cost_per_km'] for fv in (fleet.get('vehicles') or [])}
+    for v in all_vehicles or []:
+        v['cost_per_km'] = float(per_km.get(int(v['id']), 0) or 0)
 
     return {
         "calculations": calculations,
@@ -613,6 +481,7 @@ def save_department_data(data):
            general_costs         = VALUES(general_costs)
     """
     db_connector.execute_query(query, params, fetch='none')
+    profit_snapshots.mark_stale(year, month)
     return {"message": "Dáta boli úspešne uložené."}
 
 
@@ -689,6 +558,7 @@ def save_production_profit_data(data):
           transfer_price_per_unit= new.transfer_price_per_unit
     """
     db_connector.execute_query(query, data_to_save, fetch='none', multi=True)
+    profit_snapshots.mark_stale(year, month)
     return {"message": "Dáta pre ziskovosť výroby boli uložené."}
 
 def get_profitability_report_html(year, month, report_type):
@@ -730,26 +600,25 @@ def _parse_ym_param(s: str) -> tuple[int, int]:
     y, m = s.split('-', 1)
     return int(y), int(m)
 
-def _iter_months(fy: int, fm: int, ty: int, tm: int):
-    y, m = fy, fm
-    while (y < ty) or (y == ty and m <= tm):
-        yield y, m
-        if m == 12:
-            y, m = y + 1, 1
-        else:
-            m += 1
-
-def _mk_summary_row(year: int, month: int, data: dict) -> dict:
-    # použijeme už vyrátané "calculations" z get_profitability_data
-    c = data.get('calculations') or {}
+def _mk_summary_row(row: dict) -> dict:
+    # riadok z profit_snapshots.get_range (snapshot uzavretého mesiaca alebo živý výpočet)
     return {
-        "year": year, "month": month, "label": f"{year}-{month:02d}",
-        "expedition_profit": float(c.get('expedition_profit') or 0),
-        "butchering_profit": float(c.get('butchering_profit') or 0),
-        "production_profit": float(c.get('production_profit') or 0),
-        "total_profit": float(c.get('total_profit') or 0),
+        "year": row['year'], "month": row['month'], "label": row['label'],
+        "expedition_profit": float(row.get('expedition_profit') or 0),
+        "butchering_profit": float(row.get('butchering_profit') or 0),
+        "production_profit": float(row.get('production_profit') or 0),
+        "total_profit": float(row.get('total_profit') or 0),
+        "source": row.get('source'),
     }
 
+def reopen_profitability_month(data: dict):
+    """Znovuotvorenie uzavretého mesiaca – prepočet jeho snapshotu z aktuálnych vstupov."""
+    try:
+        year, month = int(data.get('year')), int(data.get('month'))
+    except (TypeError, ValueError):
+        return {"error": "Chýba rok alebo mesiac."}
+    return profit_snapshots.reopen(year, month)
+
 def get_profitability_history(args: dict):
     """JSON história ziskovosti podľa rozsahu + typu. Primárne 'summary' tabuľka za mesiace."""
     scope = (args.get('scope') or 'month').lower()
@@ -770,11 +639,13 @@ def get_profitability_history(args: dict):
     series = []
     totals = {"expedition_profit":0.0, "butchering_profit":0.0, "production_profit":0.0, "total_profit":0.0}
 
+    # uzavreté mesiace zo snapshotov (jedno čítanie), aktuálny mesiac naživo
+    snap_rows = profit_snapshots.get_range(fy, fm, ty, tm)
+
     # Zatiaľ pripravíme históriu pre 'summary' (najdôležitejší use-case)
     if rtype == 'summary':
-        for y, m in _iter_months(fy, fm, ty, tm):
-            d = get_profitability_data(y, m)
-            row = _mk_summary_row(y, m, d)
+        for r in snap_rows:
+            row = _mk_summary_row(r)
             series.append(row)
             for k in totals.keys():
                 totals[k] += float(row.get(k) or 0.0)
@@ -790,10 +661,8 @@ def get_profitability_history(args: dict):
         }
 
     # iné typy – v1 vraciame len po mesiacoch total_profit (aby UI vedelo aspoň niečo zobraziť)
-    for y, m in _iter_months(fy, fm, ty, tm):
-        d = get_profitability_data(y, m)
-        c = d.get('calculations') or {}
-        series.append({"year":y, "month":m, "label":f"{y}-{m:02d}", "total_profit": float(c.get('total_profit') or 0)})
+    for r in snap_rows:
+        series.append({"year":r['year'], "month":r['month'], "label":r['label'], "total_profit": float(r.get('total_profit') or 0)})
 
     return {"range":{"from":f"{fy}-{fm:02d}","to":f"{ty}-{tm:02d}"}, "type":rtype, "series":series}
 
@@ -830,9 +699,8 @@ def get_profitability_report_html_ex(params: dict):
     if rtype == 'summary':
         rows_html = ""
         totals = {"expedition_profit":0.0,"butchering_profit":0.0,"production_profit":0.0,"total_profit":0.0}
-        for yy, mm in _iter_months(fy, fm, ty, tm):
-            d = get_profitability_data(yy, mm)
-            c = d.get('calculations') or {}
+        for c in profit_snapshots.get_range(fy, fm, ty, tm):
+            yy, mm = c['year'], c['month']
             ep = float(c.get('expedition_profit') or 0)
             bp = float(c.get('butchering_profit') or 0)
             pp = float(c.get('production_profit') or 0)
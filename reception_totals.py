@@ -0,0 +1,138 @@
+# reception_totals.py
+# Súčty príjmov expedície po dávkach (expedicia_prijmy_davky) – jeden riadok na id_davky
+# - total_kg: kg priamo, ks prepočítané cez produkty.vaha_balenia_g; total_ks: súčet kusov;
+#   lines_count: počet aktívnych (is_deleted = 0) riadkov príjmu
+#
+# Zápis: refresh_batches([id_davky], cur) po príjme / úprave / zmazaní príjmu – prepočet len
+# dotknutých dávok cez index expedicia_prijmy(id_davky), v transakcii volajúceho.
+# rebuild() = plný prepočet (bootstrap, nočná rekonsiliácia).
+# Čítanie: get_reception_report číta riadky týždňa cez (is_deleted, datum_prijmu)
+# a súčty dávok odtiaľto – bez GROUP BY cez celú históriu príjmov.
+
+import threading
+from typing import Any, Dict, Iterable
+
+import db_connector
+import schema_cache
+import product_keys
+
+_schema_ready = False
+_bootstrapped = False
+_lock = threading.Lock()
+
+INDEXES = {
+    # týždenný report / archív / zoznam dní: is_deleted = 0 AND datum_prijmu BETWEEN|=
+    'idx_ep_deleted_date': '(is_deleted, datum_prijmu)',
+    # prepočet súčtov dávky
+    'idx_ep_batch_deleted': '(id_davky, is_deleted)',
+}
+
+
+def ensure_schema() -> None:
+    """Súhrnná tabuľka + indexy na expedicia_prijmy. Raz za proces."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    # rovnaká kolácia ako expedicia_prijmy – JOIN na id_davky bez konverzie
+    db_connector.execute_query("""
+        CREATE TABLE IF NOT EXISTS expedicia_prijmy_davky (
+          id_davky     VARCHAR(64)   NOT NULL PRIMARY KEY,
+          total_kg     DECIMAL(14,3) NOT NULL DEFAULT 0,
+          total_ks     INT           NOT NULL DEFAULT 0,
+          lines_count  INT           NOT NULL DEFAULT 0,
+          updated_at   TIMESTAMP     NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_slovak_ci
+    """, fetch='none')
+    if not schema_cache.table_exists('expedicia_prijmy'):
+        return  # tabuľku príjmov zakladá expedícia – indexy pri ďalšom volaní
+    try:
+        have = {r['n'] for r in (db_connector.execute_query("""
+            SELECT DISTINCT INDEX_NAME AS n FROM INFORMATION_SCHEMA.STATISTICS
+             WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'expedicia_prijmy'
+        """) or [])}
+        for name, cols in INDEXES.items():
+            if name not in have:
+                db_connector.execute_query(f"CREATE INDEX {name} ON expedicia_prijmy {cols}", fetch='none')
+    except Exception as e:
+        print(f"!!! UPOZORNENIE: reception_totals – indexy expedicia_prijmy zlyhali: {e}")
+    _schema_ready = True
+
+
+def _totals_sql(where: str) -> str:
+    return f"""
+        INSERT INTO expedicia_prijmy_davky (id_davky, total_kg, total_ks, lines_count)
+        SELECT ep.id_davky,
+               COALESCE(SUM(CASE WHEN ep.unit='kg' THEN COALESCE(ep.prijem_kg,0)
+                                 ELSE COALESCE(ep.prijem_ks,0) * COALESCE(p.vaha_balenia_g,0) / 1000 END), 0),
+               COALESCE(SUM(CASE WHEN ep.unit='ks' THEN COALESCE(ep.prijem_ks,0) ELSE 0 END), 0),
+               COUNT(*)
+          FROM expedicia_prijmy ep
+          LEFT JOIN zaznamy_vyroba zv ON zv.id_davky = ep.id_davky
+          LEFT JOIN produkty p ON {product_keys.zv_join('zv', 'p')}
+         WHERE ep.is_deleted = 0 {where}
+         GROUP BY ep.id_davky
+    """
+
+
+def refresh_batches(batch_ids: Iterable[str], cur=None) -> None:
+    """
+    Prepočíta súčty zadaných dávok (len ich riadky, cez index).
+    `cur` = kurzor otvorenej transakcie – súčet je atomický so zmenou príjmu.
+    """
+    ids = [b for b in dict.fromkeys(str(b or '').strip() for b in batch_ids or []) if b]
+    if not ids:
+        return
+    ensure_schema()
+    ph = ','.join(['%s'] * len(ids))
+    stmts = [
+        (f"DELETE FROM expedicia_prijmy_davky WHERE id_davky IN ({ph})", tuple(ids)),
+        (_totals_sql(f"AND ep.id_davky IN ({ph})"), tuple(ids)),
+    ]
+    if cur is not None:
+        for sql, params in stmts:
+            cur.execute(sql, params)
+        return
+
+    def work(conn):
+        c = conn.cursor()
+        try:
+            for sql, params in stmts:
+                c.execute(sql, params)
+        finally:
+            c.close()
+
+    db_connector.with_transaction(work)
+
+
+def rebuild() -> Dict[str, Any]:
+    """Plný prepočet súčtov všetkých dávok."""
+    ensure_schema()
+
+    def work(conn):
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM expedicia_prijmy_davky")
+            cur.execute(_totals_sql(""))
+            return cur.rowcount
+        finally:
+            cur.close()
+
+    n = db_connector.with_transaction(work)
+    return {"message": "Súčty príjmov expedície po dávkach prepočítané.", "rows": n}
+
+
+def ensure_ready() -> None:
+    """Pri prvom čítaní v procese: prázdnu súhrnnú tabuľku (a neprázdne príjmy) naplň rebuildom."""
+    global _bootstrapped
+    if _bootstrapped:
+        return
+    with _lock:
+        if _bootstrapped:
+            return
+        ensure_schema()
+        if schema_cache.table_exists('expedicia_prijmy') and (
+                not db_connector.execute_query("SELECT 1 AS x FROM expedicia_prijmy_davky LIMIT 1", fetch='one')
+                and db_connector.execute_query("SELECT 1 AS x FROM expedicia_prijmy WHERE is_deleted = 0 LIMIT 1",
+                                               fetch='one')):
+            rebuild()
+        _bootstrapped = True
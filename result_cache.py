@@ -0,0 +1,284 @@
+# result_cache.py
+# Cache výsledkov pomalých reportov / dashboardov Kancelárie so závislosťami na tabuľkách
+# - @cached("sklad", "produkty", ...) – kľúč = funkcia + argumenty (+ dnešný dátum pri daily=True)
+# - tagy = názvy tabuliek; každý tag má verziu, záznam si pamätá verzie svojich tagov
+#   => zápis do tabuľky zvýši verziu tagu a všetky závislé záznamy sú naraz neplatné
+# - invalidácia je automatická: db_connector.on_write() po každom COMMITe oznámi tabuľky,
+#   do ktorých transakcia zapisovala (execute_query, execute_many, bulk_upsert, with_transaction
+#   aj ručné get_connection() + commit()); invalidate(*tags) sa dá volať aj ručne
+# - TTL (RESULT_CACHE_TTL) je poistka pre zápisy mimo aplikácie (priamo v DB, iné systémy)
+# - hodnoty sa ukladajú ako pickle => každý hit dostane vlastnú kópiu (volajúci ju môže meniť)
+#
+# Backend (RESULT_CACHE_BACKEND):
+#   memory – LRU v procese (default); pri viacerých workeroch si invalidácie nevidia
+#            navzájom, zostávajúcu nekonzistenciu kryje TTL
+#   sqlite – zdieľaný lokálny súbor (RESULT_CACHE_PATH) pre všetky workery na stroji;
+#            verzie tagov sú v tom istom súbore, takže zápis v jednom workeri zneplatní cache všetkých
+#   off    – bez cache (funkcie sa volajú priamo)
+
+import functools
+import hashlib
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import db_connector
+
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory").strip().lower()
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH") or os.path.join(tempfile.gettempdir(), "result_cache.sqlite3")
+
+_lock = threading.Lock()
+_known_tags: set = set()
+_stats = {"hits": 0, "misses": 0, "stale": 0, "expired": 0, "stores": 0,
+          "invalidations": 0, "errors": 0}
+_fn_stats: Dict[str, Dict[str, int]] = {}
+
+
+# ─────────────────────────────────────────────────────────────
+# Backendy
+# ─────────────────────────────────────────────────────────────
+class _MemoryBackend:
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Tuple[bytes, str, float]]" = OrderedDict()
+        self._tags: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        return {t: self._tags.get(t, 0) for t in tags}
+
+    def bump(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for t in tags:
+                self._tags[t] = self._tags.get(t, 0) + 1
+
+    def get(self, key: str):
+        with self._lock:
+            e = self._entries.get(key)
+            if e is not None:
+                self._entries.move_to_end(key)
+            return e
+
+    def put(self, key: str, blob: bytes, sig: str, expires: float) -> None:
+        with self._lock:
+            self._entries[key] = (blob, sig, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class _SqliteBackend:
+    """Zdieľaný súbor pre workery na jednom stroji (WAL, krátke transakcie, spojenie na vlákno)."""
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self._local = threading.local()
+        self._puts = 0
+        c = self._conn()
+        c.execute("CREATE TABLE IF NOT EXISTS rc_entries (k TEXT PRIMARY KEY, v BLOB NOT NULL, "
+                  "sig TEXT NOT NULL, exp REAL NOT NULL, at REAL NOT NULL)")
+        c.execute("CREATE TABLE IF NOT EXISTS rc_tags (tag TEXT PRIMARY KEY, ver INTEGER NOT NULL)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_rc_entries_at ON rc_entries (at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = c
+        return c
+
+    def versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        tags = list(tags)
+        out = {t: 0 for t in tags}
+        if tags:
+            rows = self._conn().execute(
+                f"SELECT tag, ver FROM rc_tags WHERE tag IN ({','.join('?' * len(tags))})", tags).fetchall()
+            out.update({t: v for t, v in rows})
+        return out
+
+    def bump(self, tags: Iterable[str]) -> None:
+        self._conn().executemany(
+            "INSERT INTO rc_tags (tag, ver) VALUES (?, 1) ON CONFLICT(tag) DO UPDATE SET ver = ver + 1",
+            [(t,) for t in tags])
+
+    def get(self, key: str):
+        return self._conn().execute("SELECT v, sig, exp FROM rc_entries WHERE k = ?", (key,)).fetchone()
+
+    def put(self, key: str, blob: bytes, sig: str, expires: float) -> None:
+        c = self._conn()
+        c.execute("INSERT OR REPLACE INTO rc_entries (k, v, sig, exp, at) VALUES (?, ?, ?, ?, ?)",
+                  (key, sqlite3.Binary(blob), sig, expires, time.time()))
+        self._puts += 1
+        if self._puts % 32 == 0:
+            # najstaršie záznamy nad limit preč (približné LRU podľa času uloženia)
+            c.execute("DELETE FROM rc_entries WHERE k IN (SELECT k FROM rc_entries ORDER BY at DESC "
+                      "LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM rc_entries WHERE k = ?", (key,))
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM rc_entries")
+
+    def size(self) -> int:
+        return int(self._conn().execute("SELECT COUNT(*) FROM rc_entries").fetchone()[0])
+
+
+def _make_backend():
+    if RESULT_CACHE_BACKEND == "off":
+        return None
+    if RESULT_CACHE_BACKEND == "sqlite":
+        try:
+            return _SqliteBackend(RESULT_CACHE_PATH, RESULT_CACHE_MAX_ENTRIES)
+        except Exception as e:
+            print(f"!!! UPOZORNENIE: result_cache – sqlite backend ({RESULT_CACHE_PATH}) zlyhal, "
+                  f"používam pamäť procesu: {e}")
+    return _MemoryBackend(RESULT_CACHE_MAX_ENTRIES)
+
+
+_backend = _make_backend()
+
+
+# ─────────────────────────────────────────────────────────────
+# API
+# ─────────────────────────────────────────────────────────────
+def _sig(versions: Dict[str, int]) -> str:
+    return ",".join(f"{t}:{versions[t]}" for t in sorted(versions))
+
+
+def _key(name: str, args: tuple, kwargs: dict, daily: bool) -> str:
+    raw = repr((name, args, sorted(kwargs.items()), date.today().isoformat() if daily else None))
+    return name + ":" + hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _count(name: str, what: str) -> None:
+    _stats[what] += 1
+    fs = _fn_stats.setdefault(name, {"hits": 0, "misses": 0})
+    if what in fs:
+        fs[what] += 1
+
+
+def cached(*tags: str, ttl: Optional[float] = None, daily: bool = False) -> Callable:
+    """
+    Dekorátor: výsledok funkcie sa drží v cache, kým sa nezapíše do niektorej z tabuliek `tags`
+    (alebo neuplynie `ttl`, default RESULT_CACHE_TTL). daily=True pridá do kľúča dnešný dátum –
+    pre dotazy s CURDATE()/NOW(). Výsledky s kľúčom "error" sa neukladajú.
+    Pôvodná funkcia je dostupná ako `fn.uncached`.
+    """
+    tags = tuple(sorted({t.lower() for t in tags}))
+    _known_tags.update(tags)
+    life = RESULT_CACHE_TTL if ttl is None else float(ttl)
+
+    def deco(fn: Callable) -> Callable:
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            be = _backend
+            if be is None:
+                return fn(*args, **kwargs)
+            try:
+                key = _key(name, args, kwargs, daily)
+                sig = _sig(be.versions(tags))
+                entry = be.get(key)
+            except Exception as e:
+                _stats["errors"] += 1
+                print(f"!!! UPOZORNENIE: result_cache – čítanie zlyhalo ({name}): {e}")
+                return fn(*args, **kwargs)
+
+            if entry is not None:
+                blob, esig, exp = entry
+                if esig == sig and exp > time.time():
+                    try:
+                        value = pickle.loads(blob)
+                        _count(name, "hits")
+                        return value
+                    except Exception:
+                        _stats["errors"] += 1
+                _count(name, "stale" if esig != sig else "expired")
+            _count(name, "misses")
+
+            # verzie sú zachytené PRED výpočtom – zápis počas výpočtu uložený výsledok hneď zneplatní
+            value = fn(*args, **kwargs)
+            if not (isinstance(value, dict) and "error" in value):
+                try:
+                    be.put(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), sig, time.time() + life)
+                    _stats["stores"] += 1
+                except Exception as e:
+                    _stats["errors"] += 1
+                    print(f"!!! UPOZORNENIE: result_cache – uloženie zlyhalo ({name}): {e}")
+            return value
+
+        wrapper.uncached = fn
+        wrapper.cache_tags = tags
+        return wrapper
+
+    return deco
+
+
+def invalidate(*tags: str) -> None:
+    """Zneplatní všetky záznamy závislé od tagov (tabuliek). Neznáme tagy ignoruje."""
+    hit = [t for t in {str(t).lower() for t in tags} if t in _known_tags]
+    if not hit or _backend is None:
+        return
+    try:
+        _backend.bump(hit)
+        with _lock:
+            _stats["invalidations"] += len(hit)
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"!!! UPOZORNENIE: result_cache – invalidácia zlyhala: {e}")
+
+
+def clear() -> Dict[str, Any]:
+    """Zmaže všetky záznamy (verzie tagov ostávajú)."""
+    if _backend is not None:
+        _backend.clear()
+    return {"message": "Cache výsledkov vyčistená."}
+
+
+def stats() -> Dict[str, Any]:
+    total = _stats["hits"] + _stats["misses"]
+    try:
+        size = _backend.size() if _backend is not None else 0
+    except Exception:
+        size = -1
+    return {
+        "backend": _backend.name if _backend is not None else "off",
+        "entries": size,
+        "max_entries": RESULT_CACHE_MAX_ENTRIES,
+        "ttl_s": int(RESULT_CACHE_TTL),
+        **_stats,
+        "hit_ratio": round(_stats["hits"] / total, 3) if total else 0.0,
+        "tags": sorted(_known_tags),
+        "functions": {k: dict(v) for k, v in sorted(_fn_stats.items())},
+    }
+
+
+# automatická invalidácia po COMMITe zápisov (viď db_connector.on_write)
+db_connector.on_write(lambda tables: invalidate(*tables))
@@ -1,4 +1,10 @@
 import integration_handler
+import demand_forecast
+import cost_ledger
+import reception_totals
+import temps_series
+import mail_queue
+import meat_yield_model
 from datetime import datetime
 import traceback
 
@@ -34,6 +40,60 @@ def run_daily_tasks():
             print(f"[CHYBA] Import zlyhal: {import_result['error']}")
         else:
             print(f"[ÚSPECH] Import dokončený: {import_result['message']}")
+
+        # 3. Zosúladenie materializovaného dopytu (demand_daily) s objednávkami
+        print("\n[INFO] Prepočítavam dopyt pre prognózu...")
+        rebuild_result = demand_forecast.rebuild()
+
+        if "error" in rebuild_result:
+            print(f"[CHYBA] Prepočet dopytu zlyhal: {rebuild_result['error']}")
+        else:
+            print(f"[ÚSPECH] Prepočet dopytu dokončený: {rebuild_result['message']}")
+
+        # 4. Rekonsiliácia nákladovej knihy produktov (product_cost_ledger)
+        print("\n[INFO] Prepočítavam nákladovú knihu produktov...")
+        ledger_result = cost_ledger.rebuild()
+
+        if "error" in ledger_result:
+            print(f"[CHYBA] Prepočet nákladovej knihy zlyhal: {ledger_result['error']}")
+        else:
+            print(f"[ÚSPECH] Prepočet nákladovej knihy dokončený: {ledger_result['message']}")
+
+        # 5. Rekonsiliácia súčtov príjmov expedície po dávkach (expedicia_prijmy_davky)
+        print("\n[INFO] Prepočítavam súčty príjmov expedície...")
+        totals_result = reception_totals.rebuild()
+
+        if "error" in totals_result:
+            print(f"[CHYBA] Prepočet súčtov príjmov zlyhal: {totals_result['error']}")
+        else:
+            print(f"[ÚSPECH] Prepočet súčtov príjmov dokončený: {totals_result['message']}")
+
+        # 6. Archivácia surových meraní teplôt po uplynutí retencie (súhrny ostávajú)
+        print("\n[INFO] Archivujem staré merania teplôt...")
+        temps_result = temps_series.archive()
+
+        if "error" in temps_result:
+            print(f"[CHYBA] Archivácia meraní teplôt zlyhala: {temps_result['error']}")
+        else:
+            print(f"[ÚSPECH] Archivácia meraní teplôt dokončená: {temps_result['message']} ({temps_result['rows']} riadkov)")
+
+        # 7. Vyčistenie záznamov odoslaných e-mailov z fronty (mail_outbox)
+        print("\n[INFO] Čistím frontu odoslaných e-mailov...")
+        mail_result = mail_queue.purge()
+
+        if "error" in mail_result:
+            print(f"[CHYBA] Čistenie fronty e-mailov zlyhalo: {mail_result['error']}")
+        else:
+            print(f"[ÚSPECH] Čistenie fronty e-mailov dokončené: {mail_result['message']} ({mail_result['rows']} riadkov)")
+
+        # 8. Rekonsiliácia modelu výťažnosti rozrábky (meat_yield_buckets) z histórie rozrábok
+        print("\n[INFO] Prepočítavam model výťažnosti rozrábky...")
+        yield_result = meat_yield_model.rebuild()
+
+        if "error" in yield_result:
+            print(f"[CHYBA] Prepočet modelu výťažnosti zlyhal: {yield_result['error']}")
+        else:
+            print(f"[ÚSPECH] Prepočet modelu výťažnosti dokončený: {yield_result['message']}")
             
     except Exception as e:
         print("\n" + "!"*50)
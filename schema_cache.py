@@ -0,0 +1,215 @@
+# schema_cache.py
+# Procesová cache schémy DB (INFORMATION_SCHEMA) zdieľaná všetkými handlermi
+# - jeden dotaz načíta všetky tabuľky / stĺpce / DATA_TYPE aktuálnej DATABASE()
+# - helpery: table_exists / columns / has_col / first_col / col_type / is_numeric
+# - profile(cls): skompilované "schema profily" (napr. b2c_schema.B2COrdersProfile),
+#   ktoré sa prebudujú len pri zmene verzie katalógu
+# - invalidácia: TTL (SCHEMA_CACHE_TTL, default 300 s), explicitne cez invalidate()
+#   (admin endpoint /api/kancelaria/schema/refresh) a automaticky po DDL
+#   vykonanom cez db_connector.execute_query (CREATE/ALTER/DROP/RENAME)
+#
+# Handlery si ponechávajú svoje pôvodné helpery (_has_col, _first_col, ...),
+# len ich telo deleguje sem – volajúci kód sa nemení.
+
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import db_connector
+
+SCHEMA_CACHE_TTL = float(os.getenv("SCHEMA_CACHE_TTL", "300"))
+
+NUMERIC_TYPES = ("int", "decimal", "float", "double", "numeric")
+
+_lock = threading.RLock()
+# tabuľka -> {stĺpec_lower: (COLUMN_NAME, DATA_TYPE)}; poradie = ORDINAL_POSITION
+_catalog: Optional[Dict[str, Dict[str, Tuple[str, str]]]] = None
+_last_catalog: Optional[Dict[str, Dict[str, Tuple[str, str]]]] = None
+_tables_ci: Dict[str, str] = {}
+_loaded_at = 0.0
+_version = 0
+_stats = {"loads": 0, "hits": 0, "invalidations": 0, "load_errors": 0}
+_profiles: Dict[type, Tuple[int, object]] = {}
+
+
+# ─────────────────────────────────────────────────────────────
+# Načítanie / invalidácia
+# ─────────────────────────────────────────────────────────────
+def _load() -> None:
+    global _catalog, _last_catalog, _tables_ci, _loaded_at, _version
+    try:
+        rows = db_connector.execute_query("""
+            SELECT TABLE_NAME AS t, COLUMN_NAME AS c, DATA_TYPE AS dt
+              FROM INFORMATION_SCHEMA.COLUMNS
+             WHERE TABLE_SCHEMA = DATABASE()
+             ORDER BY TABLE_NAME, ORDINAL_POSITION
+        """) or []
+    except Exception as e:
+        # pri výpadku DB nechaj starý katalóg (ak je) a skús to pri ďalšom volaní
+        _stats["load_errors"] += 1
+        print(f"!!! UPOZORNENIE: schema_cache – nepodarilo sa načítať schému: {e}")
+        if _catalog is None:
+            return
+        _loaded_at = time.monotonic()
+        return
+
+    cat: Dict[str, Dict[str, Tuple[str, str]]] = {}
+    for r in rows:
+        t, c = str(r["t"]), str(r["c"])
+        cat.setdefault(t, {})[c.lower()] = (c, str(r.get("dt") or "").lower())
+    # verzia sa mení len pri reálnej zmene schémy (TTL reload ju neposúva)
+    if cat != _last_catalog:
+        _version += 1
+    _catalog = _last_catalog = cat
+    _tables_ci = {t.lower(): t for t in cat}
+    _loaded_at = time.monotonic()
+    _stats["loads"] += 1
+
+
+def _ensure_loaded() -> Dict[str, Dict[str, Tuple[str, str]]]:
+    cat = _catalog   # lokálna kópia – invalidate() môže global medzitým vynulovať
+    if cat is not None and (time.monotonic() - _loaded_at) < SCHEMA_CACHE_TTL:
+        _stats["hits"] += 1
+        return cat
+    with _lock:
+        if _catalog is None or (time.monotonic() - _loaded_at) >= SCHEMA_CACHE_TTL:
+            _load()
+        return _catalog or {}
+
+
+def invalidate() -> None:
+    """Zahodí katalóg; ďalší lookup načíta schému nanovo."""
+    global _catalog, _tables_ci
+    with _lock:
+        _catalog = None
+        _tables_ci = {}
+        _stats["invalidations"] += 1
+
+
+def refresh() -> Dict[str, int]:
+    """Okamžite načíta schému nanovo (admin endpoint) a vráti štatistiky."""
+    with _lock:
+        invalidate()
+        _load()
+    return stats()
+
+
+def version() -> int:
+    """Číslo verzie katalógu – zvýši sa pri každom načítaní, ktoré zmenilo schému."""
+    _ensure_loaded()
+    return _version
+
+
+def stats() -> Dict[str, int]:
+    cat = _catalog or {}
+    return {
+        **_stats,
+        "version": _version,
+        "tables": len(cat),
+        "columns": sum(len(c) for c in cat.values()),
+        "age_s": int(time.monotonic() - _loaded_at) if _catalog is not None else -1,
+        "ttl_s": int(SCHEMA_CACHE_TTL),
+    }
+
+
+_RE_CREATE_IF_NOT_EXISTS = re.compile(r"^\s*CREATE\s+TABLE\s+IF\s+NOT\s+EXISTS\s+`?(\w+)`?", re.I)
+_RE_INDEX_ONLY = re.compile(r"^\s*(CREATE\s+(UNIQUE\s+|FULLTEXT\s+)?INDEX|DROP\s+INDEX)\b", re.I)
+
+
+def note_ddl(sql: str) -> None:
+    """
+    Listener pre db_connector: po DDL zneplatní katalóg.
+    CREATE TABLE IF NOT EXISTS na už známu tabuľku a čisto indexové DDL schému
+    stĺpcov nemenia – tie (volané pri každom _ensure_* v handleroch) ignorujeme.
+    """
+    if _RE_INDEX_ONLY.match(sql or ""):
+        return
+    m = _RE_CREATE_IF_NOT_EXISTS.match(sql or "")
+    if m and _catalog is not None and _find_table(m.group(1)) is not None:
+        return
+    invalidate()
+
+
+db_connector.on_ddl(note_ddl)
+
+
+# ─────────────────────────────────────────────────────────────
+# Lookupy
+# ─────────────────────────────────────────────────────────────
+def _find_table(table: str, cat: Optional[Dict[str, Dict[str, Tuple[str, str]]]] = None
+                ) -> Optional[Dict[str, Tuple[str, str]]]:
+    cat = (_catalog or {}) if cat is None else cat
+    t = cat.get(table)
+    if t is None:
+        low = str(table).lower()
+        ci = _tables_ci
+        if not ci and cat:
+            # súbežný invalidate() vyprázdnil mapu – dohľadaj v katalógu, ktorý volajúci drží
+            ci = {k.lower(): k for k in cat}
+        real = ci.get(low)
+        t = cat.get(real) if real else None
+    return t
+
+
+def _table(table: str) -> Optional[Dict[str, Tuple[str, str]]]:
+    # katalóg vrátený z _ensure_loaded() – súbežný invalidate() ho počas lookupu nevynuluje
+    return _find_table(table, _ensure_loaded())
+
+
+def table_exists(table: str) -> bool:
+    return _table(table) is not None
+
+
+def tables() -> List[str]:
+    return list(_ensure_loaded().keys())
+
+
+def columns(table: str) -> List[str]:
+    """Zoznam stĺpcov tabuľky (reálny case, poradie podľa definície); [] ak tabuľka neexistuje."""
+    return [name for name, _ in (_table(table) or {}).values()]
+
+
+def has_col(table: str, col: str) -> bool:
+    return str(col).lower() in (_table(table) or {})
+
+
+def first_col(table: str, candidates: Iterable[str]) -> Optional[str]:
+    """Prvý existujúci stĺpec z kandidátov (vracia meno tak, ako bolo zadané), inak None."""
+    t = _table(table) or {}
+    for c in candidates:
+        if c and str(c).lower() in t:
+            return c
+    return None
+
+
+def col_type(table: str, col: str) -> str:
+    """DATA_TYPE stĺpca malými písmenami ('int', 'varchar', ...); '' ak neexistuje."""
+    hit = (_table(table) or {}).get(str(col).lower())
+    return hit[1] if hit else ""
+
+
+def is_numeric(table: str, col: str) -> bool:
+    dt = col_type(table, col)
+    return any(k in dt for k in NUMERIC_TYPES)
+
+
+# ─────────────────────────────────────────────────────────────
+# Schema profily
+# ─────────────────────────────────────────────────────────────
+def profile(cls):
+    """
+    Vráti inštanciu profilu `cls` (trieda bez argumentov, v __init__ rieši aliasy
+    stĺpcov cez tento modul). Inštancia sa drží, kým sa nezmení version().
+    """
+    ver = version()
+    hit = _profiles.get(cls)
+    if hit is not None and hit[0] == ver:
+        return hit[1]
+    with _lock:
+        hit = _profiles.get(cls)
+        if hit is None or hit[0] != ver:
+            hit = (ver, cls())
+            _profiles[cls] = hit
+        return hit[1]
@@ -145,76 +145,134 @@
   // =================================================================
   //                    ORDERS
   // =================================================================
-  async function loadB2COrders(){
-    const el = doc.getElementById('b2c-orders-tab');
-    el.innerHTML = '<p>Načítavam B2C objednávky…</p>';
+  const b2cOrdersState = { cursor: null, hasMore: false, filters: {} };
+
+  function b2cOrderRowHtml(o){
+    const statusColor = { 'Prijatá':'#3b82f6','Pripravená':'#f59e0b','Hotová':'#16a34a','Zrušená':'#ef4444' };
+    const dObj = o.datum_objednavky ? new Date(o.datum_objednavky).toLocaleDateString('sk-SK') : '';
+    const dDel = o.pozadovany_datum_dodania ? new Date(o.pozadovany_datum_dodania).toLocaleDateString('sk-SK') : '';
+
+    const pred = Number(o.predpokladana_suma_s_dph||0);
+    const fin  = (o.finalna_suma_s_dph != null) ? Number(o.finalna_suma_s_dph) : null;
+    const price = (fin != null && fin > 0)
+      ? `${pred.toFixed(2)} € / <strong class="gain">${fin.toFixed(2)} €</strong>`
+      : `${pred.toFixed(2)} € / <span class="muted">—</span>`;
+
+    const status = `<span style="font-weight:600;color:${statusColor[o.stav]||'#6b7280'}">${o.stav}</span>`;
+
+    const orderJson = encodeURIComponent(JSON.stringify(o));
+    let actions = `
+      <button class="btn btn-info" style="margin-right:.25rem" title="Detail"
+              onclick="window.__B2C_showDetailJSON && __B2C_showDetailJSON('${orderJson}')">
+        <i class="fas fa-search"></i>
+      </button>`;
+    if (o.stav === 'Prijatá') {
+      actions += `<button class="btn btn-primary" style="margin-right:.25rem"
+                  title="Zadať finálnu sumu"
+                  onclick="window.__B2C_finalize && __B2C_finalize(${o.id}, '${escapeHtml(o.cislo_objednavky||'')}')">Pripraviť</button>`;
+    }
+    if (o.stav === 'Pripravená') {
+      actions += `<button class="btn btn-success" style="margin-right:.25rem"
+                  title="Uzavrieť a pripísať body"
+                  onclick="window.__B2C_complete && __B2C_complete(${o.id}, '${escapeHtml(o.cislo_objednavky||'')}', ${Number(o.finalna_suma_s_dph||0)})">Hotová</button>`;
+    }
+    if (o.stav !== 'Hotová' && o.stav !== 'Zrušená') {
+      actions += `<button class="btn btn-danger" title="Zrušiť"
+                  onclick="window.__B2C_cancel && __B2C_cancel(${o.id})">
+                    <i class="fas fa-times"></i>
+                  </button>`;
+    }
+
+    return `<tr>
+      <td>${escapeHtml(o.cislo_objednavky||String(o.id))}<br><small>${dObj}</small></td>
+      <td>${escapeHtml(o.zakaznik_meno || o.nazov_firmy || '')}</td>
+      <td>${dDel}</td>
+      <td>${price}</td>
+      <td>${status}</td>
+      <td><div style="display:flex;align-items:center">${actions}</div></td>
+    </tr>`;
+  }
+
+  async function fetchB2COrdersPage(append){
+    const tbody = doc.getElementById('b2c-orders-tbody');
+    const more  = doc.getElementById('b2c-orders-more');
+    const info  = doc.getElementById('b2c-orders-info');
+    if (!tbody) return;
+    const qs = new URLSearchParams();
+    Object.entries(b2cOrdersState.filters).forEach(([k,v])=>{ if (v) qs.set(k, v); });
+    if (append && b2cOrdersState.cursor) qs.set('cursor', b2cOrdersState.cursor);
+    if (more) more.disabled = true;
     try{
-      const rows = await apiRequest('/api/kancelaria/b2c/get_orders');
-      if (!Array.isArray(rows) || rows.length===0) { el.innerHTML = '<p>Žiadne B2C objednávky.</p>'; return; }
+      const res = await apiRequest('/api/kancelaria/b2c/orders/page?' + qs.toString());
+      const rows = (res && Array.isArray(res.items)) ? res.items : [];
+      const html = rows.map(b2cOrderRowHtml).join('');
+      if (append) tbody.insertAdjacentHTML('beforeend', html);
+      else tbody.innerHTML = html || '<tr><td colspan="6">Žiadne B2C objednávky.</td></tr>';
+      b2cOrdersState.cursor  = res && res.next_cursor || null;
+      b2cOrdersState.hasMore = !!(res && res.has_more);
+      if (more) more.style.display = b2cOrdersState.hasMore ? 'inline-block' : 'none';
+      if (info) info.textContent = rows.length || append ? `Zobrazené: ${tbody.querySelectorAll('tr').length}` : '';
+    }catch(e){
+      if (!append) tbody.innerHTML = `<tr><td colspan="6" class="error">Chyba: ${escapeHtml(e.message||String(e))}</td></tr>`;
+    }finally{
+      if (more) more.disabled = false;
+    }
+  }
 
-      const statusColor = { 'Prijatá':'#3b82f6','Pripravená':'#f59e0b','Hotová':'#16a34a','Zrušená':'#ef4444' };
-      let html = `<div class="table-container"><table>
+  async function loadB2COrders(){
+    const el = doc.getElementById('b2c-orders-tab');
+    el.innerHTML = `
+      <div style="display:flex;flex-wrap:wrap;gap:.5rem;align-items:flex-end;margin-bottom:.75rem">
+        <label>Od <input type="date" id="b2c-of-from"></label>
+        <label>Do <input type="date" id="b2c-of-to"></label>
+        <label>Stav
+          <select id="b2c-of-status">
+            <option value="">— všetky —</option>
+            <option>Prijatá</option><option>Pripravená</option><option>Hotová</option><option>Zrušená</option>
+          </select>
+        </label>
+        <label>Zákazník / číslo <input type="text" id="b2c-of-q" placeholder="meno, e-mail, číslo obj."></label>
+        <button class="btn btn-secondary" id="b2c-of-apply">Filtrovať</button>
+      </div>
+      <div class="table-container"><table>
         <thead><tr>
           <th>Číslo obj.</th><th>Zákazník</th><th>Dátum dodania</th>
           <th>Suma (predb./finálna)</th><th>Stav</th><th>Akcie</th>
-        </tr></thead><tbody>`;
-
-      rows.forEach(o=>{
-        const dObj = o.datum_objednavky ? new Date(o.datum_objednavky).toLocaleDateString('sk-SK') : '';
-        const dDel = o.pozadovany_datum_dodania ? new Date(o.pozadovany_datum_dodania).toLocaleDateString('sk-SK') : '';
-
-        const pred = Number(o.predpokladana_suma_s_dph||0);
-        const fin  = (o.finalna_suma_s_dph != null) ? Number(o.finalna_suma_s_dph) : null;
-        const price = (fin != null && fin > 0)
-          ? `${pred.toFixed(2)} € / <strong class="gain">${fin.toFixed(2)} €</strong>`
-          : `${pred.toFixed(2)} € / <span class="muted">—</span>`;
-
-        const status = `<span style="font-weight:600;color:${statusColor[o.stav]||'#6b7280'}">${o.stav}</span>`;
-
-        const orderJson = encodeURIComponent(JSON.stringify(o));
-        let actions = `
-          <button class="btn btn-info" style="margin-right:.25rem" title="Detail"
-                  onclick="window.__B2C_showDetailJSON && __B2C_showDetailJSON('${orderJson}')">
-            <i class="fas fa-search"></i>
-          </button>`;
-        if (o.stav === 'Prijatá') {
-          actions += `<button class="btn btn-primary" style="margin-right:.25rem"
-                      title="Zadať finálnu sumu"
-                      onclick="window.__B2C_finalize && __B2C_finalize(${o.id}, '${escapeHtml(o.cislo_objednavky||'')}')">Pripraviť</button>`;
-        }
-        if (o.stav === 'Pripravená') {
-          actions += `<button class="btn btn-success" style="margin-right:.25rem"
-                      title="Uzavrieť a pripísať body"
-                      onclick="window.__B2C_complete && __B2C_complete(${o.id}, '${escapeHtml(o.cislo_objednavky||'')}', ${Number(o.finalna_suma_s_dph||0)})">Hotová</button>`;
-        }
-        if (o.stav !== 'Hotová' && o.stav !== 'Zrušená') {
-          actions += `<button class="btn btn-danger" title="Zrušiť"
-                      onclick="window.__B2C_cancel && __B2C_cancel(${o.id})">
-                        <i class="fas fa-times"></i>
-                      </button>`;
-        }
-
-        html += `<tr>
-          <td>${escapeHtml(o.cislo_objednavky||String(o.id))}<br><small>${dObj}</small></td>
-          <td>${escapeHtml(o.zakaznik_meno || o.nazov_firmy || '')}</td>
-          <td>${dDel}</td>
-          <td>${price}</td>
-          <td>${status}</td>
-          <td><div style="display:flex;align-items:center">${actions}</div></td>
-        </tr>`;
-      });
-
-      html += `</tbody></table></div>`;
-      el.innerHTML = html;
-
-      root.__B2C_showDetailJSON = (s)=>{ try{ showB2COrderDetailModal(JSON.parse(decodeURIComponent(s))); }catch(e){} };
-      root.__B2C_finalize       = finalizeB2COrder;
-      root.__B2C_complete       = completeB2COrder;
-      root.__B2C_cancel         = cancelB2COrder;
+        </tr></thead>
+        <tbody id="b2c-orders-tbody"><tr><td colspan="6">Načítavam B2C objednávky…</td></tr></tbody>
+      </table></div>
+      <div style="display:flex;gap:.75rem;align-items:center;margin-top:.5rem">
+        <button class="btn btn-secondary" id="b2c-orders-more" style="display:none">Načítať ďalšie</button>
+        <small class="muted" id="b2c-orders-info"></small>
+      </div>`;
 
-    }catch(e){
-      el.innerHTML = `<p class="error">Chyba: ${escapeHtml(e.message||String(e))}</p>`;
-    }
+    root.__B2C_showDetailJSON = (s)=>{ try{ showB2COrderDetailModal(JSON.parse(decodeURIComponent(s))); }catch(e){} };
+    root.__B2C_finalize       = finalizeB2COrder;
+    root.__B2C_complete       = completeB2COrder;
+    root.__B2C_cancel         = cancelB2COrder;
+
+    const apply = ()=>{
+      b2cOrdersState.filters = {
+        date_from: doc.getElementById('b2c-of-from').value,
+        date_to:   doc.getElementById('b2c-of-to').value,
+        status:    doc.getElementById('b2c-of-status').value,
+        customer:  doc.getElementById('b2c-of-q').value.trim(),
+      };
+      b2cOrdersState.cursor = null;
+      fetchB2COrdersPage(false);
+    };
+    doc.getElementById('b2c-of-apply').addEventListener('click', apply);
+    doc.getElementById('b2c-of-q').addEventListener('keydown', (e)=>{ if (e.key === 'Enter') apply(); });
+    doc.getElementById('b2c-orders-more').addEventListener('click', ()=> fetchB2COrdersPage(true));
+
+    // filtre ostávajú aj po akciách (Pripraviť/Hotová/Zrušiť), ktoré zoznam znovu načítajú
+    const f = b2cOrdersState.filters;
+    doc.getElementById('b2c-of-from').value   = f.date_from || '';
+    doc.getElementById('b2c-of-to').value     = f.date_to || '';
+    doc.getElementById('b2c-of-status').value = f.status || '';
+    doc.getElementById('b2c-of-q').value      = f.customer || '';
+    b2cOrdersState.cursor = null;
+    await fetchB2COrdersPage(false);
   }
 
   function showB2COrderDetailModal(order){
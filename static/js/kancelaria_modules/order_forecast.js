@@ -91,7 +91,8 @@ async function loadAndRenderForecast() {
       forecast: (base.b2c_forecast || base.forecast_b2c || base.b2c) || {}
     } : null;
 
-  const payload = (b2cCandidate && b2cCandidate.forecast)
+  // backend s channels_merged už vracia vo 'forecast' súčet B2B + B2C – nezlučovať druhýkrát
+  const payload = (b2cCandidate && b2cCandidate.forecast && !base.channels_merged)
     ? mergeForecastPayloads(base, b2cCandidate)   // B2B + B2C
     : base;                                       // len B2B (bez chýbajúcich endpointov)
 
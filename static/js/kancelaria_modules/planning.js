@@ -184,11 +184,30 @@ async function createProductionStatsContent() {
         const monthBtn = document.getElementById('load-stats-month-btn');
         const categoryEl = document.getElementById('stats-category-filter');
         let currentPeriod = 'week';
+        let prodPage = 1, damagePage = 1;
+        // stránkovanie – backend vracia {page, pages, total}; výroba aj škody majú vlastné
+        const pagerHtml = (p, kind) => {
+            if (!p || !p.pages || p.pages <= 1) return p && p.total ? `<p class="muted">Spolu: ${p.total}</p>` : '';
+            return `<div style="display:flex;gap:.5rem;align-items:center;margin-top:.5rem;">`
+                + `<button class="btn-secondary stats-pager" data-kind="${kind}" data-page="${p.page - 1}" style="margin:0;" ${p.page <= 1 ? 'disabled' : ''}>&laquo; Predošlá</button>`
+                + `<span>Strana ${p.page} / ${p.pages} (spolu ${p.total})</span>`
+                + `<button class="btn-secondary stats-pager" data-kind="${kind}" data-page="${p.page + 1}" style="margin:0;" ${p.page >= p.pages ? 'disabled' : ''}>Ďalšia &raquo;</button>`
+                + `</div>`;
+        };
+        const bindPagers = (el) => {
+            el.querySelectorAll('.stats-pager').forEach(btn => {
+                btn.onclick = () => {
+                    const page = parseInt(btn.dataset.page, 10);
+                    if (btn.dataset.kind === 'damage') damagePage = page; else prodPage = page;
+                    loadStats();
+                };
+            });
+        };
         const loadStats = async () => {
             weekBtn.style.backgroundColor = currentPeriod === 'week' ? 'var(--primary-color)' : 'var(--secondary-color)';
             monthBtn.style.backgroundColor = currentPeriod === 'month' ? 'var(--primary-color)' : 'var(--secondary-color)';
             const category = categoryEl.value;
-            const result = await apiRequest('/api/kancelaria/getProductionStats', { method: 'POST', body: { period: currentPeriod, category } });
+            const result = await apiRequest('/api/kancelaria/getProductionStats', { method: 'POST', body: { period: currentPeriod, category, page: prodPage, damagePage } });
             const container = document.getElementById('production-stats-table-container');
             if (!result.data || result.data.length === 0) {
                 container.innerHTML = "<h4>Výroba</h4><p>Nenašli sa žiadne výrobné záznamy pre zvolené obdobie.</p>";
@@ -201,7 +220,8 @@ async function createProductionStatsContent() {
                     const yieldSign = yieldVal > 0 ? '+' : '';
                     tableHtml += `<tr><td>${new Date(d.datum_ukoncenia).toLocaleDateString('sk-SK')}</td><td>${escapeHtml(d.nazov_vyrobku)}</td><td>${safeToFixed(d.planovane_mnozstvo_kg)} kg</td><td>${reality}</td><td class="${yieldClass}">${yieldSign}${safeToFixed(yieldVal)} %</td><td>${safeToFixed(d.cena_bez_energii)} €/${d.unit}</td><td>${safeToFixed(d.cena_s_energiami)} €/${d.unit}</td></tr>`;
                 });
-                container.innerHTML = `<div class="table-container">${tableHtml}</tbody></table></div>`;
+                container.innerHTML = `<div class="table-container">${tableHtml}</tbody></table></div>${pagerHtml(result.paging, 'prod')}`;
+                bindPagers(container);
             }
             const damageContainer = document.getElementById('production-damage-table-container');
             if (result.damage_data && result.damage_data.length > 0) {
@@ -209,14 +229,15 @@ async function createProductionStatsContent() {
                 result.damage_data.forEach(d => {
                     damageHtml += `<tr><td>${new Date(d.datum).toLocaleDateString('sk-SK')}</td><td>${escapeHtml(d.nazov_vyrobku)}</td><td>${escapeHtml(d.mnozstvo)}</td><td>${escapeHtml(d.pracovnik)}</td><td>${escapeHtml(d.dovod)}</td><td class="loss">${d.naklady_skody ? safeToFixed(d.naklady_skody) + ' €' : 'N/A'}</td></tr>`;
                 });
-                damageContainer.innerHTML = `<div class="table-container">${damageHtml}</tbody></table></div>`;
+                damageContainer.innerHTML = `<div class="table-container">${damageHtml}</tbody></table></div>${pagerHtml(result.damage_paging, 'damage')}`;
+                bindPagers(damageContainer);
             } else {
                 damageContainer.innerHTML = '<h4>Škody</h4><p>Nenašli sa žiadne záznamy o škodách.</p>';
             }
         };
-        weekBtn.onclick = () => { currentPeriod = 'week'; loadStats(); };
-        monthBtn.onclick = () => { currentPeriod = 'month'; loadStats(); };
-        categoryEl.onchange = () => loadStats();
+        weekBtn.onclick = () => { currentPeriod = 'week'; prodPage = damagePage = 1; loadStats(); };
+        monthBtn.onclick = () => { currentPeriod = 'month'; prodPage = damagePage = 1; loadStats(); };
+        categoryEl.onchange = () => { prodPage = damagePage = 1; loadStats(); };
         loadStats();
     };
     return { html, onReady };
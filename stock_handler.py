@@ -5,30 +5,18 @@ from typing import Any, Dict, Optional, List
 import re
 
 import db_connector
+import schema_cache
+import warehouse_snapshot
 
 stock_bp = Blueprint("stock", __name__)
 
 # ------------------------- helpers (schema) -------------------------
 
 def _has_col(table: str, col: str) -> bool:
-    try:
-        r = db_connector.execute_query("""
-            SELECT 1
-              FROM INFORMATION_SCHEMA.COLUMNS
-             WHERE TABLE_SCHEMA = DATABASE()
-               AND TABLE_NAME   = %s
-               AND COLUMN_NAME  = %s
-             LIMIT 1
-        """, (table, col), fetch='one')
-        return bool(r)
-    except Exception:
-        return False
+    return schema_cache.has_col(table, col)
 
 def _first_col(table: str, candidates: List[str]) -> Optional[str]:
-    for c in candidates:
-        if _has_col(table, c):
-            return c
-    return None
+    return schema_cache.first_col(table, candidates)
 
 def _conn_coll(default='utf8mb4_general_ci') -> str:
     try:
@@ -275,7 +263,10 @@ def receive_production():
                 VALUES (%s, %s, %s, %s, %s, %s)
             """, (when, name, qty, price if price is not None else None, prijem_typ, note))
 
-        conn.commit()
+        with warehouse_snapshot.writing() as w:
+            for it in items:
+                w.touch((it.get('name') or '').strip())   # vážená nakupna_cena
+            conn.commit()
         return jsonify({"message": f"Príjem uložený ({len(items)} riadkov)."})
     except Exception as e:
         if conn: conn.rollback()
@@ -414,11 +405,7 @@ def get_stock_item():
         return jsonify({"error":"Chýba name"}), 400
 
     def has(table, col):
-        r = db_connector.execute_query("""
-            SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
-             WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME=%s AND COLUMN_NAME=%s LIMIT 1
-        """, (table, col), fetch='one')
-        return bool(r)
+        return _has_col(table, col)
 
     cols = [
         "nazov","ean","typ","podtyp","kategoria","jednotka","unit","mj",
@@ -449,11 +436,7 @@ def save_stock_item():
         return jsonify({"error":"Chýba original_name"}), 400
 
     def has(col):
-        r = db_connector.execute_query("""
-            SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
-             WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME='sklad' AND COLUMN_NAME=%s LIMIT 1
-        """, (col,), fetch='one')
-        return bool(r)
+        return _has_col('sklad', col)
 
     # ak prišiel dodávateľ menom a nie id -> dohľadaj id
     if (not d.get("dodavatel_id")) and d.get("dodavatel"):
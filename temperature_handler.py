@@ -9,6 +9,8 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Any
 
 import db_connector
+import json_stream
+import temps_series
 from flask import jsonify, make_response, render_template
 
 # Konštanty pre typy zariadení
@@ -85,13 +87,25 @@ def _is_off_now(device: Dict[str, Any], outages: List[Dict[str, Any]], dt: datet
             return True
     return False
 
+READING_COLS = temps_series.READING_COLS
+
 def _upsert_reading(device_id: int, ts: datetime, temp: float, status: str):
-    q = """
-    INSERT INTO temps_readings (device_id, ts, temperature, status)
-    VALUES (%s,%s,%s,%s)
-    ON DUPLICATE KEY UPDATE temperature=VALUES(temperature), status=VALUES(status)
-    """
-    db_connector.execute_query(q, (device_id, ts, temp if status=='OK' else None, status), fetch='none')
+    _upsert_readings([(device_id, ts, temp if status=='OK' else None, status)])
+
+def _upsert_readings(rows: List[tuple]) -> int:
+    """Hromadný upsert (device_id, ts, temperature, status) + hodinové/denné súhrny v jednej transakcii."""
+    return temps_series.write_readings(rows)
+
+def _readings_for_tick(devices: List[Dict[str, Any]], ts: datetime) -> List[tuple]:
+    outages_map = _fetch_outages_for_devices([d['id'] for d in devices])
+    rows = []
+    for d in devices:
+        dev_id = d['id']
+        if _is_off_now(d, outages_map.get(dev_id, []), ts):
+            rows.append((dev_id, ts, None, 'OFF'))
+        else:
+            rows.append((dev_id, ts, _rand_temp(d['device_type']), 'OK'))
+    return rows
 
 # --- PUBLIC API LOGIKA --------------------------------------------------------
 def list_devices():
@@ -181,21 +195,38 @@ def get_readings_for_date(device_id: int|None, date_str: str, to_now: bool=False
             end = now
 
     if device_id:
-        q = """SELECT r.*, d.name, d.code, d.location, d.device_type
-               FROM temps_readings r
+        q = f"""SELECT r.device_id, r.ts, r.temperature, r.status, d.name, d.code, d.location, d.device_type
+               FROM {temps_series.source(start)} r
                JOIN temps_devices d ON d.id=r.device_id
                WHERE r.device_id=%s AND r.ts >= %s AND r.ts <= %s
                ORDER BY r.ts"""
-        rows = db_connector.execute_query(q, (int(device_id), start, end)) or []
-        return jsonify(rows)
+        params = (int(device_id), start, end)
     else:
-        q = """SELECT r.*, d.name, d.code, d.location, d.device_type
-               FROM temps_readings r
+        q = f"""SELECT r.device_id, r.ts, r.temperature, r.status, d.name, d.code, d.location, d.device_type
+               FROM {temps_series.source(start)} r
                JOIN temps_devices d ON d.id=r.device_id
                WHERE r.ts >= %s AND r.ts <= %s
                ORDER BY d.id, r.ts"""
-        rows = db_connector.execute_query(q, (start, end)) or []
-        return jsonify(rows)
+        params = (start, end)
+    # celodenné merania všetkých zariadení – streamujeme namiesto fetchall
+    cols = []
+    return json_stream.json_array_response(db_connector.iter_query(q, params, columns=cols), cols)
+def get_series(device_id: int|None, from_str: str, to_str: str, resolution: str = 'auto'):
+    """Rozsah meraní (aj viac mesiacov) – rozlíšenie raw/hour/day volí temps_series podľa dĺžky."""
+    try:
+        d_from = datetime.strptime(from_str, "%Y-%m-%d").date()
+        d_to = datetime.strptime(to_str or from_str, "%Y-%m-%d").date()
+    except Exception:
+        return make_response("Neplatný dátum.", 400)
+    if d_to < d_from:
+        d_from, d_to = d_to, d_from
+    start = datetime(d_from.year, d_from.month, d_from.day, 0, 0, 0)
+    end = min(datetime(d_to.year, d_to.month, d_to.day, 23, 59, 59, 999999), max(_now(), start))
+    data = temps_series.series(start, end, [int(device_id)] if device_id else None, resolution or 'auto')
+    data['from'] = start.isoformat()
+    data['to'] = end.isoformat(timespec='seconds')
+    return jsonify(data)
+
 def _build_summary_grid(device_rows, start: datetime, end: datetime):
     """
     Vytvorí maticu:
@@ -223,12 +254,7 @@ def _build_summary_grid(device_rows, start: datetime, end: datetime):
     if not ids:
         return slots, device_rows, {}
 
-    placeholders = ",".join(["%s"]*len(ids))
-    q = f"""SELECT r.* FROM temps_readings r
-            WHERE r.device_id IN ({placeholders})
-              AND r.ts >= %s AND r.ts <= %s
-            ORDER BY r.device_id, r.ts"""
-    rows = db_connector.execute_query(q, tuple(ids)+ (start, end)) or []
+    rows = temps_series.raw_rows(start, end, ids)
 
     # indexuj podľa (device_id, ts)
     by_key = {}
@@ -277,14 +303,12 @@ def report_html(date_str: str, device_id: int|None, to_now: bool=False, layout:
                                              date=day,
                                              range_end_label=range_end_label,
                                              slots=slots, headers=headers, cells=cells))
-    # default: detail (pôvodné)
-    result = []
-    for d in devs:
-        rows = db_connector.execute_query(
-            "SELECT * FROM temps_readings WHERE device_id=%s AND ts>=%s AND ts<=%s ORDER BY ts",
-            (d['id'], start, end)
-        ) or []
-        result.append({"device": d, "rows": rows})
+    # default: detail (pôvodné) – merania všetkých zariadení jedným dotazom
+    by_dev: Dict[int, List[Dict[str, Any]]] = {}
+    if devs:
+        for r in temps_series.raw_rows(start, end, [d['id'] for d in devs]):
+            by_dev.setdefault(r['device_id'], []).append(r)
+    result = [{"device": d, "rows": by_dev.get(d['id'], [])} for d in devs]
 
     return make_response(render_template("temps_report_template.html",
                                          date=day,
@@ -314,16 +338,7 @@ class _TempGenerator(threading.Thread):
         devices = _fetch_devices()
         if not devices:
             return
-        outages_map = _fetch_outages_for_devices([d['id'] for d in devices])
-
-        for d in devices:
-            dev_id = d['id']
-            off = _is_off_now(d, outages_map.get(dev_id, []), ts)
-            if off:
-                _upsert_reading(dev_id, ts, 0.0, 'OFF')
-            else:
-                temp = _rand_temp(d['device_type'])
-                _upsert_reading(dev_id, ts, temp, 'OK')
+        _upsert_readings(_readings_for_tick(devices, ts))
 
 def _seed_now():
     """Zapíše okamžite jednu vzorku na aktuálny štvrťhodinový čas (ak nechceš čakať 15 min)."""
@@ -331,15 +346,7 @@ def _seed_now():
     devices = _fetch_devices()
     if not devices:
         return
-    outages_map = _fetch_outages_for_devices([d['id'] for d in devices])
-    for d in devices:
-        dev_id = d['id']
-        off = _is_off_now(d, outages_map.get(dev_id, []), ts)
-        if off:
-            _upsert_reading(dev_id, ts, 0.0, 'OFF')
-        else:
-            temp = _rand_temp(d['device_type'])
-            _upsert_reading(dev_id, ts, temp, 'OK')
+    _upsert_readings(_readings_for_tick(devices, ts))
 
 _generator_instance: _TempGenerator|None = None
 
@@ -0,0 +1,384 @@
+# temps_series.py
+# Časová séria teplôt (HACCP) nad temps_readings
+# - kľúč série: UNIQUE (device_id, ts) – upsert generátora aj čítanie rozsahu idú cez jeden index
+# - súhrny: temps_rollup_hourly (device_id, bucket) a temps_rollup_daily (device_id, day)
+#   n_ok / n_off / n_out (mimo limitu typu zariadenia) / t_min / t_max / t_sum (priemer = t_sum / n_ok)
+#   udržiavané pri zápise v tej istej transakcii – prepočet len dotknutých hodín/dní zariadení
+# - series(): rozsah s automatickým rozlíšením (surové ≤ 2 dni, hodinové ≤ 45 dní, inak denné)
+# - archive(): surové merania staršie ako TEMPS_RAW_RETENTION_DAYS sa presúvajú do
+#   temps_readings_archive po dňoch; súhrny ostávajú (dlhodobý HACCP záznam)
+#
+# Pozn.: mesačné partície priamo na temps_readings nie sú možné – partíciovaná InnoDB
+# tabuľka nepodporuje cudzie kľúče (temps_readings.device_id → temps_devices.id).
+
+import os
+import threading
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import db_connector
+import schema_cache
+
+READING_COLS = ('device_id', 'ts', 'temperature', 'status')
+
+# limity (°C) podľa typu zariadenia – (min, max); None = bez hranice
+LIMITS: Dict[str, Tuple[Optional[float], Optional[float]]] = {
+    'CHLAD': (-2.0, 4.0),
+    'MRAZ': (None, -18.0),
+    'ROZRABKA': (None, 12.0),
+}
+
+RAW_MAX_SPAN = timedelta(days=2)
+HOURLY_MAX_SPAN = timedelta(days=45)
+RESOLUTIONS = ('raw', 'hour', 'day')
+
+try:
+    RAW_RETENTION_DAYS = max(0, int(os.getenv("TEMPS_RAW_RETENTION_DAYS", "400")))
+except ValueError:
+    RAW_RETENTION_DAYS = 400
+
+ARCHIVE_TABLE = 'temps_readings_archive'
+
+_schema_ready = False
+_bootstrapped = False
+_lock = threading.Lock()
+
+
+# --- SCHÉMA ---------------------------------------------------------------------
+def _rollup_ddl(table: str, key_col: str, key_type: str) -> str:
+    return f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+          device_id  INT           NOT NULL,
+          {key_col}  {key_type}    NOT NULL,
+          n_ok       INT           NOT NULL DEFAULT 0,
+          n_off      INT           NOT NULL DEFAULT 0,
+          n_out      INT           NOT NULL DEFAULT 0,
+          t_min      DECIMAL(5,2)  NULL,
+          t_max      DECIMAL(5,2)  NULL,
+          t_sum      DECIMAL(12,2) NOT NULL DEFAULT 0,
+          PRIMARY KEY (device_id, {key_col}),
+          KEY idx_{table}_{key_col} ({key_col})
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """
+
+
+def ensure_schema() -> None:
+    """Súhrnné tabuľky + unikátny kľúč (device_id, ts) na temps_readings. Raz za proces."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    db_connector.execute_query(_rollup_ddl('temps_rollup_hourly', 'bucket', 'DATETIME'), fetch='none')
+    db_connector.execute_query(_rollup_ddl('temps_rollup_daily', 'day', 'DATE'), fetch='none')
+    if not schema_cache.table_exists('temps_readings'):
+        return
+    try:
+        rows = db_connector.execute_query("""
+            SELECT INDEX_NAME AS n, NON_UNIQUE AS nu, GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) AS cols
+              FROM INFORMATION_SCHEMA.STATISTICS
+             WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'temps_readings'
+             GROUP BY INDEX_NAME, NON_UNIQUE
+        """) or []
+        if not any(int(r['nu'] or 0) == 0 and str(r['cols']).lower() == 'device_id,ts' for r in rows):
+            db_connector.execute_query(
+                "CREATE UNIQUE INDEX uq_temps_device_ts ON temps_readings (device_id, ts)", fetch='none')
+    except Exception as e:
+        # duplicitné (device_id, ts) zo starších verzií – upsert generátora vtedy len pridáva riadky
+        print(f"!!! UPOZORNENIE: temps_series – unikátny index (device_id, ts) zlyhal: {e}")
+    _schema_ready = True
+
+
+def ensure_ready() -> None:
+    """Pri prvom použití v procese: prázdne súhrny (a neprázdne merania) naplň rebuildom."""
+    global _bootstrapped
+    if _bootstrapped:
+        return
+    with _lock:
+        if _bootstrapped:
+            return
+        ensure_schema()
+        if schema_cache.table_exists('temps_readings') and (
+                not db_connector.execute_query("SELECT 1 AS x FROM temps_rollup_hourly LIMIT 1", fetch='one')
+                and db_connector.execute_query("SELECT 1 AS x FROM temps_readings LIMIT 1", fetch='one')):
+            rebuild()
+        _bootstrapped = True
+
+
+# --- SQL ------------------------------------------------------------------------
+def _num(v: float) -> str:
+    return f"{float(v):.2f}"
+
+
+def _out_expr(t: str = 'r.temperature', typ: str = 'd.device_type') -> str:
+    """1, ak je meranie mimo limitu typu zariadenia (limity sú konštanty modulu, nie vstup)."""
+    whens = []
+    for dev_type, (lo, hi) in LIMITS.items():
+        conds = ([f"{t} < {_num(lo)}"] if lo is not None else []) + \
+                ([f"{t} > {_num(hi)}"] if hi is not None else [])
+        if conds:
+            whens.append(f"WHEN '{dev_type}' THEN ({' OR '.join(conds)})")
+    if not whens:
+        return "0"
+    return f"COALESCE(CASE {typ} {' '.join(whens)} ELSE 0 END, 0)"
+
+
+def source(start: Optional[datetime] = None) -> str:
+    """Surové merania; ak rozsah siaha pred hranicu retencie, aj archív (riadky sa presúvajú – bez duplicít)."""
+    if schema_cache.table_exists(ARCHIVE_TABLE) and (start is None or start < _retention_cutoff()):
+        cols = ', '.join(READING_COLS)
+        return f"(SELECT {cols} FROM temps_readings UNION ALL SELECT {cols} FROM {ARCHIVE_TABLE})"
+    return "temps_readings"
+
+
+def _hourly_sql(src: str, where: str) -> str:
+    ok = "r.status = 'OK' AND r.temperature IS NOT NULL"
+    return f"""
+        INSERT INTO temps_rollup_hourly (device_id, bucket, n_ok, n_off, n_out, t_min, t_max, t_sum)
+        SELECT r.device_id,
+               TIMESTAMP(DATE(r.ts), MAKETIME(HOUR(r.ts), 0, 0)) AS b,
+               SUM({ok}),
+               SUM(r.status = 'OFF'),
+               SUM({ok} AND {_out_expr()}),
+               MIN(CASE WHEN {ok} THEN r.temperature END),
+               MAX(CASE WHEN {ok} THEN r.temperature END),
+               COALESCE(SUM(CASE WHEN {ok} THEN r.temperature END), 0)
+          FROM {src} r
+          JOIN temps_devices d ON d.id = r.device_id
+         WHERE {where}
+         GROUP BY r.device_id, b
+        ON DUPLICATE KEY UPDATE n_ok=VALUES(n_ok), n_off=VALUES(n_off), n_out=VALUES(n_out),
+                                t_min=VALUES(t_min), t_max=VALUES(t_max), t_sum=VALUES(t_sum)
+    """
+
+
+def _daily_sql(where: str) -> str:
+    return f"""
+        INSERT INTO temps_rollup_daily (device_id, day, n_ok, n_off, n_out, t_min, t_max, t_sum)
+        SELECT h.device_id, DATE(h.bucket) AS d,
+               SUM(h.n_ok), SUM(h.n_off), SUM(h.n_out), MIN(h.t_min), MAX(h.t_max), SUM(h.t_sum)
+          FROM temps_rollup_hourly h
+         WHERE {where}
+         GROUP BY h.device_id, d
+        ON DUPLICATE KEY UPDATE n_ok=VALUES(n_ok), n_off=VALUES(n_off), n_out=VALUES(n_out),
+                                t_min=VALUES(t_min), t_max=VALUES(t_max), t_sum=VALUES(t_sum)
+    """
+
+
+# --- ZÁPIS ----------------------------------------------------------------------
+def _hour_floor(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def refresh(cur, keys: Iterable[Tuple[int, datetime]]) -> None:
+    """
+    Prepočíta hodinové a denné súhrny dotknutých (device_id, ts) – v transakcii volajúceho.
+    Hodina sa počíta zo surových riadkov cez (device_id, ts), deň z 24 hodinových riadkov.
+    """
+    hours: Dict[datetime, set] = {}
+    for dev, ts in keys:
+        hours.setdefault(_hour_floor(ts), set()).add(int(dev))
+    days: Dict[date, set] = {}
+    for h, devs in sorted(hours.items()):
+        ids = sorted(devs)
+        ph = ','.join(['%s'] * len(ids))
+        cur.execute(_hourly_sql('temps_readings', f"r.device_id IN ({ph}) AND r.ts >= %s AND r.ts < %s"),
+                    tuple(ids) + (h, h + timedelta(hours=1)))
+        days.setdefault(h.date(), set()).update(ids)
+    for d, devs in sorted(days.items()):
+        ids = sorted(devs)
+        ph = ','.join(['%s'] * len(ids))
+        start = datetime.combine(d, time.min)
+        cur.execute(_daily_sql(f"h.device_id IN ({ph}) AND h.bucket >= %s AND h.bucket < %s"),
+                    tuple(ids) + (start, start + timedelta(days=1)))
+
+
+def write_readings(rows: Sequence[tuple]) -> int:
+    """Upsert meraní (device_id, ts, temperature, status) + súhrny v jednej transakcii."""
+    rows = list(rows or [])
+    if not rows:
+        return 0
+    ensure_ready()
+
+    def work(conn):
+        n = db_connector.bulk_upsert('temps_readings', rows, key_cols=('device_id', 'ts'),
+                                     columns=READING_COLS, conn=conn)
+        cur = conn.cursor()
+        try:
+            refresh(cur, ((r[0], r[1]) for r in rows))
+        finally:
+            cur.close()
+        return n
+
+    return db_connector.with_transaction(work)
+
+
+def rebuild(start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Plný (alebo dňový rozsah <start, end>) prepočet súhrnov zo surových meraní vrátane archívu.
+    Po zmene LIMITS treba prepočítať históriu, inak n_out zodpovedá starým limitom.
+    """
+    ensure_schema()
+    where_h, where_d, params = ["1=1"], ["1=1"], []
+    if start:
+        where_h.append("r.ts >= %s")
+        where_d.append("h.bucket >= %s")
+        params.append(datetime.combine(start, time.min))
+    if end:
+        where_h.append("r.ts < %s")
+        where_d.append("h.bucket < %s")
+        params.append(datetime.combine(end + timedelta(days=1), time.min))
+    dh = " AND ".join(w.replace("r.ts", "bucket") for w in where_h)
+    dd = " AND ".join(w.replace("h.bucket", "day") for w in where_d)
+    day_params = [p.date() for p in params]
+    src = source(params[0] if start else None)
+
+    def work(conn):
+        cur = conn.cursor()
+        try:
+            cur.execute(f"DELETE FROM temps_rollup_hourly WHERE {dh}", tuple(params))
+            cur.execute(f"DELETE FROM temps_rollup_daily WHERE {dd}", tuple(day_params))
+            cur.execute(_hourly_sql(src, " AND ".join(where_h)), tuple(params))
+            hours = cur.rowcount
+            cur.execute(_daily_sql(" AND ".join(where_d)), tuple(params))
+            return hours
+        finally:
+            cur.close()
+
+    n = db_connector.with_transaction(work)
+    return {"message": "Súhrny teplôt prepočítané.", "rows": n}
+
+
+# --- RETENCIA -------------------------------------------------------------------
+def _retention_cutoff() -> datetime:
+    return datetime.combine(date.today() - timedelta(days=RAW_RETENTION_DAYS), time.min)
+
+
+def archive(retention_days: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Presunie surové merania staršie ako retencia do temps_readings_archive (po dňoch,
+    každý deň vo vlastnej transakcii). Súhrny sa nemenia. retention_days=0 = vypnuté.
+    """
+    days = RAW_RETENTION_DAYS if retention_days is None else max(0, int(retention_days))
+    if days <= 0:
+        return {"message": "Retencia surových meraní je vypnutá.", "rows": 0}
+    ensure_ready()
+    cutoff = datetime.combine(date.today() - timedelta(days=days), time.min)
+    first = db_connector.execute_query("SELECT MIN(ts) AS t FROM temps_readings WHERE ts < %s",
+                                       (cutoff,), fetch='one') or {}
+    if not first.get('t'):
+        return {"message": "Žiadne merania na archiváciu.", "rows": 0}
+    db_connector.execute_query(f"CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE} LIKE temps_readings", fetch='none')
+
+    moved = 0
+    day = datetime.combine(first['t'].date(), time.min)
+    while day < cutoff:
+        nxt = min(day + timedelta(days=1), cutoff)
+
+        def work(conn, lo=day, hi=nxt):
+            cur = conn.cursor()
+            try:
+                cols = ', '.join(READING_COLS)
+                cur.execute(f"INSERT IGNORE INTO {ARCHIVE_TABLE} ({cols}) SELECT {cols} FROM temps_readings "
+                            f"WHERE ts >= %s AND ts < %s", (lo, hi))
+                cur.execute("DELETE FROM temps_readings WHERE ts >= %s AND ts < %s", (lo, hi))
+                return cur.rowcount
+            finally:
+                cur.close()
+
+        moved += db_connector.with_transaction(work) or 0
+        day = nxt
+    return {"message": f"Archivované merania pred {cutoff.date().isoformat()}.", "rows": moved}
+
+
+# --- ČÍTANIE --------------------------------------------------------------------
+def pick_resolution(start: datetime, end: datetime) -> str:
+    span = end - start
+    if span <= RAW_MAX_SPAN:
+        return 'raw'
+    if span <= HOURLY_MAX_SPAN:
+        return 'hour'
+    return 'day'
+
+
+def raw_rows(start: datetime, end: datetime, device_ids: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
+    """Surové merania <start, end> zoradené podľa zariadenia a času – jeden dotaz cez (device_id, ts)."""
+    where, params = ["r.ts >= %s AND r.ts <= %s"], [start, end]
+    if device_ids:
+        where.append(f"r.device_id IN ({','.join(['%s'] * len(device_ids))})")
+        params.extend(int(d) for d in device_ids)
+    return db_connector.execute_query(f"""
+        SELECT r.device_id, r.ts, r.temperature, r.status
+          FROM {source(start)} r
+         WHERE {' AND '.join(where)}
+         ORDER BY r.device_id, r.ts
+    """, tuple(params)) or []
+
+
+def _rollup_rows(resolution: str, start: datetime, end: datetime,
+                 device_ids: Optional[Sequence[int]]) -> List[Dict[str, Any]]:
+    if resolution == 'hour':
+        table, col, lo, hi = 'temps_rollup_hourly', 'bucket', _hour_floor(start), end
+    else:
+        table, col, lo, hi = 'temps_rollup_daily', 'day', start.date(), end.date()
+    where, params = [f"x.{col} >= %s AND x.{col} <= %s"], [lo, hi]
+    if device_ids:
+        where.append(f"x.device_id IN ({','.join(['%s'] * len(device_ids))})")
+        params.extend(int(d) for d in device_ids)
+    return db_connector.execute_query(f"""
+        SELECT x.device_id, x.{col} AS bucket, x.n_ok, x.n_off, x.n_out, x.t_min, x.t_max, x.t_sum,
+               CASE WHEN x.n_ok > 0 THEN ROUND(x.t_sum / x.n_ok, 2) END AS t_avg
+          FROM {table} x
+         WHERE {' AND '.join(where)}
+         ORDER BY x.device_id, x.{col}
+    """, tuple(params)) or []
+
+
+def _f(v) -> Optional[float]:
+    return float(v) if v is not None else None
+
+
+def series(start: datetime, end: datetime, device_ids: Optional[Sequence[int]] = None,
+           resolution: str = 'auto') -> Dict[str, Any]:
+    """
+    Rozsah meraní s rozlíšením podľa dĺžky (alebo vynúteným: raw | hour | day)
+    + súhrn po zariadeniach (min / max / priemer / mimo limitu / vypnuté) za celý rozsah.
+    """
+    ensure_ready()
+    res = resolution if resolution in RESOLUTIONS else pick_resolution(start, end)
+    summary: Dict[int, Dict[str, Any]] = {}
+
+    def acc(dev: int, n_ok: int, n_off: int, n_out: int, t_min, t_max, t_sum: float):
+        s = summary.setdefault(dev, {"device_id": dev, "n_ok": 0, "n_off": 0, "n_out": 0,
+                                     "t_min": None, "t_max": None, "_sum": 0.0})
+        s['n_ok'] += n_ok
+        s['n_off'] += n_off
+        s['n_out'] += n_out
+        s['_sum'] += t_sum
+        if t_min is not None:
+            s['t_min'] = t_min if s['t_min'] is None else min(s['t_min'], t_min)
+        if t_max is not None:
+            s['t_max'] = t_max if s['t_max'] is None else max(s['t_max'], t_max)
+
+    if res == 'raw':
+        types = {r['id']: r['device_type'] for r in
+                 (db_connector.execute_query("SELECT id, device_type FROM temps_devices") or [])}
+        rows = raw_rows(start, end, device_ids)
+        for r in rows:
+            t = _f(r.get('temperature'))
+            ok = r.get('status') == 'OK' and t is not None
+            lo, hi = LIMITS.get(types.get(r['device_id']), (None, None))
+            out = ok and ((lo is not None and t < lo) or (hi is not None and t > hi))
+            acc(r['device_id'], int(ok), int(r.get('status') == 'OFF'), int(out),
+                t if ok else None, t if ok else None, t if ok else 0.0)
+    else:
+        rows = _rollup_rows(res, start, end, device_ids)
+        for r in rows:
+            # súhrnný priemer z presnej sumy, nie zo zaokrúhleného t_avg × n_ok
+            acc(r['device_id'], int(r.get('n_ok') or 0), int(r.get('n_off') or 0), int(r.get('n_out') or 0),
+                _f(r.get('t_min')), _f(r.get('t_max')), _f(r.get('t_sum')) or 0.0)
+
+    devices = []
+    for s in summary.values():
+        s['t_avg'] = round(s.pop('_sum') / s['n_ok'], 2) if s['n_ok'] else None
+        devices.append(s)
+    return {"resolution": res, "from": start, "to": end, "rows": rows,
+            "devices": sorted(devices, key=lambda s: s['device_id'])}
@@ -0,0 +1,418 @@
+# warehouse_snapshot.py
+# Procesový snapshot skladu surovín + index receptov pre plánovanie výroby
+# - sklad: {nazov: záznam} zo JEDNÉHO SELECTu; SELECT sa skladá raz na verziu schémy
+#   (schema_cache.version()), nie siedmimi _has_col sondami pri každom volaní
+# - recepty: {kľúč produktu: [(surovina, kg na dávku)]}, produkty: {kľúč: veľkosť dávky, kategória, typ}
+#   kľúč = TRIM + bez diakritiky + casefold (približne ako TRIM(...)=TRIM(%s) v utf8mb4_0900_ai_ci)
+# - zápisové cesty výroby (start_production, manual_warehouse_write_off, update_inventory, príjmy)
+#   bežia vo `with writing() as w:` a ohlásia zmeny (w.add / w.set / w.touch); po COMMITe sa
+#   aplikujú priamo do snapshotu, bez nového načítania
+# - ostatné zápisy do sklad / recepty / produkty zachytí db_connector.on_write a príslušnú časť
+#   zneplatní (načíta sa pri ďalšom čítaní)
+# - TTL (WAREHOUSE_SNAPSHOT_TTL, default 60 s) kryje zápisy z iných procesov / priamo v DB
+
+import os
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import db_connector
+import schema_cache
+
+WAREHOUSE_SNAPSHOT_TTL = float(os.getenv("WAREHOUSE_SNAPSHOT_TTL", "60"))
+
+# Položky, ktoré sa neodpisujú (nekonečný sklad)
+INFINITE_STOCK_NAMES = {'Ľad', 'Lad', 'Voda', 'Ovar'}
+CATEGORIES = ('Mäso', 'Koreniny', 'Obaly', 'Pomocný materiál')
+DEFAULT_BATCH_KG = 100.0
+
+_lock = threading.RLock()
+_local = threading.local()
+_items: Optional[Dict[str, Dict[str, Any]]] = None
+_items_at = 0.0
+_recipes: Optional[Dict[str, List[Tuple[str, float]]]] = None
+_products: Optional[Dict[str, Dict[str, Any]]] = None
+_index_at = 0.0
+_select_sql: Optional[Tuple[int, str]] = None
+_version = 0
+_load_gen = 0   # počet načítaní skladu – zápisová cesta podľa neho pozná súbežné načítanie
+_stats = {"loads": 0, "index_loads": 0, "hits": 0, "applied": 0, "touched": 0,
+          "invalidations": 0, "load_errors": 0}
+
+
+# ─────────────────────────────────────────────────────────────
+# Pomocné
+# ─────────────────────────────────────────────────────────────
+def _norm(s: Optional[str]) -> str:
+    if not s: return ''
+    s = unicodedata.normalize('NFKD', str(s)).encode('ascii', 'ignore').decode('ascii')
+    return s.strip().lower()
+
+
+def key(name) -> str:
+    """Kľúč produktu/receptu: TRIM, bez diakritiky, bez ohľadu na veľkosť písmen."""
+    s = unicodedata.normalize('NFKD', str(name or '').strip())
+    return ''.join(c for c in s if not unicodedata.combining(c)).casefold()
+
+
+def category_of(cat_raw: Optional[str], name: str) -> str:
+    """
+    Mapuje na: Mäso | Koreniny | Obaly | Pomocný materiál (heuristika + kategória)
+    """
+    s = _norm(cat_raw)
+    n = _norm(name)
+
+    if s in ('maso', 'mäso', 'meat') or any(k in s for k in ['brav', 'hovad', 'hoväd', 'hydin', 'ryb']):
+        return 'Mäso'
+    if s.startswith('koren') or 'korenin' in s or any(k in s for k in ['paprik', 'rasc', 'kmín', 'kmin', 'cesnak', 'dusit', 'sol', 'soľ']):
+        return 'Koreniny'
+    if 'obal' in s or 'cerv' in s or 'črev' in s or 'fóli' in s or 'foli' in s or 'vak' in s or 'siet' in s or 'spag' in s or 'špag' in s:
+        return 'Obaly'
+    if 'pomoc' in s or 'material' in s or 'materi' in s:
+        return 'Pomocný materiál'
+
+    if any(k in n for k in ['brav', 'hovad', 'hoväd', 'kurac', 'mork', 'morč', 'hydin', 'ryb', 'mlet']):
+        return 'Mäso'
+    if any(k in n for k in ['koren', 'paprik', 'rasc', 'kmin', 'dusit', 'sol', 'soľ', 'cesnak']):
+        return 'Koreniny'
+    if any(k in n for k in ['obal', 'črev', 'cerv', 'fóli', 'foli', 'vak', 'siet', 'špag', 'spag']):
+        return 'Obaly'
+    if n in ('voda', 'lad', 'ľad', 'ovar') or 'pomoc' in n:
+        return 'Pomocný materiál'
+    return 'Pomocný materiál'
+
+
+def _f(v) -> float:
+    try:
+        return float(v or 0.0)
+    except Exception:
+        return 0.0
+
+
+def sklad_select_sql(where: str = "") -> str:
+    """
+    SELECT na sklad – funguje aj bez kategoria/typ/podtyp; vráti aj cenu a min zásobu.
+    Výrazy stĺpcov sa skladajú raz na verziu schémy.
+    """
+    global _select_sql
+    ver = schema_cache.version()
+    cached = _select_sql
+    if cached is None or cached[0] != ver:
+        has = lambda c: schema_cache.has_col('sklad', c)
+        has_def, has_buy = has('default_cena_eur_kg'), has('nakupna_cena')
+        cat_expr = 'kategoria' if has('kategoria') else ('typ' if has('typ') else ('podtyp' if has('podtyp') else "' '"))
+        price_expr = (
+            "COALESCE(default_cena_eur_kg, nakupna_cena, 0)" if (has_def and has_buy)
+            else ("COALESCE(default_cena_eur_kg, 0)" if has_def else ("COALESCE(nakupna_cena, 0)" if has_buy else "0"))
+        )
+        min_expr = "COALESCE(min_zasoba, 0)" if has('min_zasoba') else "0"
+        inf_expr = "COALESCE(is_infinite_stock, 0)" if has('is_infinite_stock') else "0"
+        cols = f"""
+            nazov AS name,
+            {cat_expr} AS cat_raw,
+            mnozstvo AS quantity,
+            {price_expr} AS price,
+            {min_expr} AS minStock,
+            {inf_expr} AS is_infinite_stock
+        """
+        cached = _select_sql = (ver, cols)
+    return f"SELECT {cached[1]} FROM sklad {where} ORDER BY nazov"
+
+
+def _record(r: Dict[str, Any]) -> Dict[str, Any]:
+    name = r.get('name')
+    return {
+        'name': name,
+        'type': category_of(r.get('cat_raw'), name),
+        'quantity': _f(r.get('quantity')),
+        'price': _f(r.get('price')),
+        'minStock': _f(r.get('minStock')),
+        'is_infinite_stock': bool(r.get('is_infinite_stock') or (name in INFINITE_STOCK_NAMES)),
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# Načítanie / invalidácia
+# ─────────────────────────────────────────────────────────────
+def _load_items() -> None:
+    global _items, _items_at, _version, _load_gen
+    try:
+        rows = db_connector.execute_query(sklad_select_sql()) or []
+    except Exception as e:
+        # pri výpadku DB nechaj starý snapshot (ak je) a skús to pri ďalšom volaní
+        _stats["load_errors"] += 1
+        print(f"!!! UPOZORNENIE: warehouse_snapshot – nepodarilo sa načítať sklad: {e}")
+        if _items is None:
+            raise
+        _items_at = time.monotonic()
+        return
+    items: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        rec = _record(r)
+        items.setdefault(rec['name'], rec)
+    _items = items
+    _items_at = time.monotonic()
+    _version += 1
+    _load_gen += 1
+    _stats["loads"] += 1
+
+
+def _load_index() -> None:
+    """Načíta chýbajúcu časť indexu – recepty aj produkty sa zneplatňujú samostatne."""
+    global _recipes, _products, _index_at
+    try:
+        rrows = None if _recipes is not None else (db_connector.execute_query("""
+            SELECT nazov_vyrobku, nazov_suroviny, mnozstvo_na_davku_kg
+              FROM recepty
+             ORDER BY nazov_vyrobku, nazov_suroviny
+        """) or [])
+        prows = None if _products is not None else (db_connector.execute_query(
+            "SELECT nazov_vyrobku, vyrobna_davka_kg, kategoria_pre_recepty, typ_polozky FROM produkty"
+        ) or [])
+    except Exception as e:
+        _stats["load_errors"] += 1
+        print(f"!!! UPOZORNENIE: warehouse_snapshot – nepodarilo sa načítať recepty/produkty: {e}")
+        raise
+    if rrows is not None:
+        recipes: Dict[str, List[Tuple[str, float]]] = {}
+        for r in rrows:
+            recipes.setdefault(key(r.get('nazov_vyrobku')), []).append(
+                (r.get('nazov_suroviny'), _f(r.get('mnozstvo_na_davku_kg'))))
+        _recipes = recipes
+    if prows is not None:
+        products: Dict[str, Dict[str, Any]] = {}
+        for r in prows:
+            bk = _f(r.get('vyrobna_davka_kg'))
+            products.setdefault(key(r.get('nazov_vyrobku')), {
+                'name': r.get('nazov_vyrobku'),
+                'batch_kg': bk if bk > 0 else DEFAULT_BATCH_KG,
+                'category': r.get('kategoria_pre_recepty'),
+                'is_product': str(r.get('typ_polozky') or '').upper().startswith('VÝROBOK'),
+            })
+        _products = products
+    _index_at = time.monotonic()
+    _stats["index_loads"] += 1
+
+
+def _ensure_items() -> Dict[str, Dict[str, Any]]:
+    items = _items
+    if items is not None and (time.monotonic() - _items_at) < WAREHOUSE_SNAPSHOT_TTL:
+        _stats["hits"] += 1
+        return items
+    with _lock:
+        if _items is None or (time.monotonic() - _items_at) >= WAREHOUSE_SNAPSHOT_TTL:
+            _load_items()
+        return _items or {}
+
+
+def _ensure_index() -> Tuple[Dict[str, List[Tuple[str, float]]], Dict[str, Dict[str, Any]]]:
+    global _recipes, _products
+    recipes, products = _recipes, _products
+    if recipes is not None and products is not None and (time.monotonic() - _index_at) < WAREHOUSE_SNAPSHOT_TTL:
+        return recipes, products
+    with _lock:
+        if (time.monotonic() - _index_at) >= WAREHOUSE_SNAPSHOT_TTL:
+            _recipes = _products = None
+        if _recipes is None or _products is None:
+            _load_index()
+        return _recipes or {}, _products or {}
+
+
+def invalidate(*tables: str) -> None:
+    """Zahodí časti snapshotu pre tabuľky (sklad / recepty / produkty); bez argumentov všetko."""
+    global _items, _recipes, _products
+    hit = {str(t).lower() for t in tables} or {"sklad", "recepty", "produkty"}
+    with _lock:
+        if "sklad" in hit:
+            _items = None
+        if "recepty" in hit:
+            _recipes = None
+        if "produkty" in hit:
+            _products = None
+        _stats["invalidations"] += 1
+
+
+def version() -> int:
+    """Verzia skladu – zvýši sa pri každom načítaní aj aplikovanej zmene."""
+    _ensure_items()
+    return _version
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        **_stats,
+        "version": _version,
+        "items": len(_items or {}),
+        "recipes": len(_recipes or {}),
+        "products": len(_products or {}),
+        "age_s": int(time.monotonic() - _items_at) if _items is not None else -1,
+        "ttl_s": int(WAREHOUSE_SNAPSHOT_TTL),
+    }
+
+
+# ─────────────────────────────────────────────────────────────
+# Zápisové cesty
+# ─────────────────────────────────────────────────────────────
+class _Writes:
+    """Zmeny skladu ohlásené zápisovou cestou; aplikujú sa až po COMMITe."""
+
+    def __init__(self):
+        self.deltas: Dict[str, float] = {}
+        self.absolute: Dict[str, float] = {}
+        self.touched: set = set()
+        self.committed = False
+        self.gen = _load_gen   # generácia snapshotu na začiatku bloku (pred COMMITom)
+
+    def add(self, name: str, delta: float) -> None:
+        """mnozstvo = mnozstvo + delta"""
+        if name in self.absolute:
+            self.absolute[name] += float(delta)
+        else:
+            self.deltas[name] = self.deltas.get(name, 0.0) + float(delta)
+
+    def set(self, name: str, qty: float) -> None:
+        """mnozstvo = qty"""
+        self.deltas.pop(name, None)
+        self.absolute[name] = float(qty)
+
+    def touch(self, name: str) -> None:
+        """Riadok sa zmenil inak (cena, ...) – po COMMITe sa znovu načíta len on."""
+        self.touched.add(name)
+
+    def empty(self) -> bool:
+        return not (self.deltas or self.absolute or self.touched)
+
+
+@contextmanager
+def writing():
+    """
+    Zápisová cesta skladu:  with writing() as w: ...; w.add(nazov, -qty); conn.commit()
+    COMMIT zápisu do sklad v tomto vlákne snapshot nezneplatní – po úspešnom bloku sa
+    ohlásené zmeny aplikujú priamo. Commit bez ohlásených zmien / chyba po commite => invalidácia.
+    Ak sa sklad počas bloku načítal nanovo (iné vlákno), načítanie mohlo zápis už obsahovať –
+    delta sa neaplikuje a snapshot sa zahodí.
+    """
+    w = _Writes()
+    prev = getattr(_local, "writes", None)
+    _local.writes = w
+    try:
+        yield w
+    except BaseException:
+        if w.committed:
+            invalidate("sklad")
+        raise
+    finally:
+        _local.writes = prev
+    if w.committed:
+        _apply(w)
+
+
+def _apply(w: _Writes) -> None:
+    global _version
+    if w.empty():
+        invalidate("sklad")
+        return
+    with _lock:
+        items = _items
+        if items is None:
+            return
+        if _load_gen != w.gen:
+            # súbežné načítanie počas zápisu – nevieme, či už zápis obsahuje (dvojité pripočítanie)
+            invalidate("sklad")
+            return
+        missing = [n for n in list(w.deltas) + list(w.absolute) if n not in items]
+        if missing:
+            # nová karta (alebo iný názov) – poradie/obsah snapshotu už nesedí
+            invalidate("sklad")
+            return
+        for name, d in w.deltas.items():
+            items[name]['quantity'] += d
+        for name, q in w.absolute.items():
+            items[name]['quantity'] = q
+        _version += 1
+        _stats["applied"] += len(w.deltas) + len(w.absolute)
+    if w.touched:
+        _touch(sorted(w.touched))
+
+
+def _touch(names: List[str]) -> None:
+    global _version
+    try:
+        rows = db_connector.execute_query(
+            sklad_select_sql(f"WHERE nazov IN ({','.join(['%s'] * len(names))})"), tuple(names)) or []
+    except Exception as e:
+        print(f"!!! UPOZORNENIE: warehouse_snapshot – obnovenie položiek zlyhalo: {e}")
+        invalidate("sklad")
+        return
+    with _lock:
+        items = _items
+        if items is None:
+            return
+        if len(rows) != len(names) or any(r.get('name') not in items for r in rows):
+            invalidate("sklad")
+            return
+        for r in rows:
+            items[r['name']] = _record(r)
+        _version += 1
+        _stats["touched"] += len(rows)
+
+
+def _on_write(tables) -> None:
+    hit = {t for t in tables if t in ("sklad", "recepty", "produkty")}
+    if not hit:
+        return
+    w = getattr(_local, "writes", None)
+    if w is not None and "sklad" in hit:
+        w.committed = True
+        hit.discard("sklad")
+    if hit:
+        invalidate(*hit)
+
+
+db_connector.on_write(_on_write)
+
+
+# ─────────────────────────────────────────────────────────────
+# Čítanie
+# ─────────────────────────────────────────────────────────────
+def item(name) -> Optional[Dict[str, Any]]:
+    """Záznam suroviny podľa presného názvu (needitovať) alebo None."""
+    return _ensure_items().get(name)
+
+
+def warehouse_state() -> Dict[str, Any]:
+    """Rovnaký tvar ako production_handler.get_warehouse_state (kópie záznamov)."""
+    items = _ensure_items()
+    groups: Dict[str, List[Dict[str, Any]]] = {c: [] for c in CATEGORIES}
+    all_items: List[Dict[str, Any]] = []
+    for rec in list(items.values()):
+        rec = dict(rec)
+        groups.setdefault(rec['type'], []).append(rec)
+        all_items.append(rec)
+    return {**{c: groups[c] for c in CATEGORIES}, 'all': all_items}
+
+
+def recipe(product_name) -> List[Tuple[str, float]]:
+    """[(nazov_suroviny, mnozstvo_na_davku_kg)] receptu produktu; [] ak recept neexistuje."""
+    return _ensure_index()[0].get(key(product_name), [])
+
+
+def batch_size_kg(product_name) -> float:
+    """produkty.vyrobna_davka_kg (ak nie je kladná alebo produkt chýba, DEFAULT_BATCH_KG)."""
+    p = _ensure_index()[1].get(key(product_name))
+    return p['batch_kg'] if p else DEFAULT_BATCH_KG
+
+
+def categorized_recipes() -> Dict[str, List[str]]:
+    """{kategoria_pre_recepty: [výrobky s receptom]} zoradené ako v pôvodnom SQL."""
+    recipes, products = _ensure_index()
+    rows = sorted(
+        ((p.get('category'), p['name']) for k, p in products.items() if p['is_product'] and k in recipes),
+        key=lambda x: (x[0] is not None, key(x[0] or ''), key(x[1])),
+    )
+    out: Dict[str, List[str]] = {}
+    for cat, name in rows:
+        out.setdefault(cat or 'Nezaradené', []).append(name)
+    return out